@@ -1,14 +1,32 @@
 import asyncio
-import json
+import contextlib
 import logging
 import os
+import time
+from functools import cache
 from pathlib import Path
+from typing import TYPE_CHECKING, Any, Awaitable, Callable
 
 from aiogram import Bot, Dispatcher, types
 from aiogram.filters import Command
 from aiogram.types import ContentType
 from dotenv import load_dotenv
-from openai import AsyncOpenAI
+
+from cover_letter.clients import create_llm_client
+from cover_letter.dispatch import OrderedDispatcher, UserQueueFullError
+from cover_letter.export import EXPORT_FORMATS, DocumentExporter, ExportError
+from cover_letter.history import HistoryStore, HistoryStoreError
+from cover_letter.jobs import JobQueue, JobStore
+from cover_letter.monitoring import EventLoopMonitor
+from cover_letter.outbox import Outbox
+from cover_letter.profiling import PROFILE_DIR, RequestProfiler
+from cover_letter.resume_store import ResumeStore, ResumeStoreError
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+    from cover_letter.generator import CoverLetterGenerator
+    from cover_letter.models import CoverLetterResult, HistoryEntry, Job
 
 # Configure logging
 logging.basicConfig(
@@ -18,65 +36,178 @@ logger = logging.getLogger(__name__)
 
 _ = load_dotenv()
 
-# Initialize
-bot_token: str | None = os.getenv("BOT_TOKEN")
-if not bot_token:
-    raise ValueError("BOT_TOKEN environment variable is required")
-
-openai_api_key: str | None = os.getenv("OPENAI_API_KEY")
-if not openai_api_key:
-    raise ValueError("OPENAI_API_KEY environment variable is required")
-
-bot: Bot = Bot(token=bot_token)
 dp: Dispatcher = Dispatcher()
-client: AsyncOpenAI = AsyncOpenAI(api_key=openai_api_key)
 
 # Data storage
 DATA_DIR: Path = Path("data")
-DATA_DIR.mkdir(exist_ok=True)
+# Legacy single-resume file, imported into the versioned store on first start
 RESUMES_FILE: Path = DATA_DIR / "resumes.json"
+RESUMES_DB: Path = DATA_DIR / "resumes.db"
+# Every generated letter with its vacancy, searched by /history
+HISTORY_DB: Path = DATA_DIR / "history.db"
+HISTORY_PREVIEW_CHARS: int = 60
 
 # Simple state management
 user_states: dict[str, str] = {}
 # Temporary data storage for multi-step processes
 user_temp_data: dict[str, dict[str, str]] = {}
+# Unsent cover letter variants from the last generation, best first
+user_letter_variants: dict[str, list[str]] = {}
+# Vacancy whose analysis runs in the background while the user types instructions
+user_prepared_vacancies: dict[str, str] = {}
+# Last cover letter sent to each user, rendered by /export and edited by /revise
+user_last_letters: dict[str, str] = {}
+# Vacancy keywords behind each user's last letter, to score revisions without a new analysis
+user_last_keywords: dict[str, list[str]] = {}
+# Vacancy behind each user's last letter, stored in the history with its revisions
+user_last_vacancies: dict[str, str] = {}
+# Latest queued or running generation job per user, cancelled by /cancel or a newer request
+user_jobs: dict[str, int] = {}
 WAITING_FOR_RESUME: str = "resume"
 WAITING_FOR_JOB_DESC: str = "job_desc"
 WAITING_FOR_ADDITIONAL_INSTRUCTIONS: str = "additional_instructions"
+WAITING_FOR_REVISION: str = "revision"
+
+# Event loop instrumentation (set LOOP_MONITOR=0 to disable)
+LOOP_MONITOR_ENABLED: bool = os.getenv("LOOP_MONITOR", "1") != "0"
+SLOW_CALLBACK_THRESHOLD: float = float(os.getenv("SLOW_CALLBACK_THRESHOLD", "0.25"))
+# Share of generations profiled into flamegraph files (e.g. PROFILE_SAMPLE_RATE=0.01)
+PROFILE_SAMPLE_RATE: float = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+request_profiler = RequestProfiler(os.getenv("PROFILE_DIR", PROFILE_DIR), PROFILE_SAMPLE_RATE)
+
+# Letter variants generated per request; each extra one is a paid completion, served by /next
+LETTER_CANDIDATES: int = int(os.getenv("LETTER_CANDIDATES", "1"))
+# Stream letters so overlong outputs are stopped early (set LETTER_STREAMING=0 to disable)
+LETTER_STREAMING: bool = os.getenv("LETTER_STREAMING", "1") != "0"
+
+# Updates are handled concurrently across users and in order per user
+USER_CONCURRENCY: int = int(os.getenv("USER_CONCURRENCY", "64"))
+USER_QUEUE_LIMIT: int = int(os.getenv("USER_QUEUE_LIMIT", "10"))
+update_dispatcher = OrderedDispatcher(USER_CONCURRENCY, USER_QUEUE_LIMIT)
+
+# Background generation jobs (persisted, resumed after restart)
+JOBS_FILE: Path = DATA_DIR / "jobs.db"
+JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", "4"))
+# Days finished jobs, resumes included, are kept in jobs.db
+JOB_RETENTION_DAYS: float = float(os.getenv("JOB_RETENTION_DAYS", "7"))
+COVER_LETTER_JOB: str = "cover_letter"
+REVISION_JOB: str = "revision"
+
+# Worker processes rendering /export documents
+EXPORT_WORKERS: int = int(os.getenv("EXPORT_WORKERS", "2"))
+
+
+# Clients are built on first use, so importing this module needs no secrets
+@cache
+def get_bot() -> Bot:
+    """Create the Telegram bot client."""
+    bot_token: str | None = os.getenv("BOT_TOKEN")
+    if not bot_token:
+        raise ValueError("BOT_TOKEN environment variable is required")
+    return Bot(token=bot_token)
+
+
+@cache
+def get_outbox() -> Outbox:
+    """Create the outbound message queue; every reply goes through it."""
+    return Outbox(get_bot().send_message)
+
+
+@cache
+def get_openai_client() -> "AsyncOpenAI":
+    """Create the OpenAI client, or a provider router when LLM_PROVIDERS is set."""
+    return create_llm_client()
+
+
+@cache
+def get_generator() -> "CoverLetterGenerator":
+    """Create the shared cover letter generator."""
+    from cover_letter.generator import CoverLetterGenerator
+
+    return CoverLetterGenerator(get_openai_client(), stream=LETTER_STREAMING)
+
+
+@cache
+def get_job_queue() -> JobQueue:
+    """Create the background job queue and its store."""
+    DATA_DIR.mkdir(exist_ok=True)
+    return JobQueue(
+        JobStore(JOBS_FILE),
+        {COVER_LETTER_JOB: process_cover_letter_job, REVISION_JOB: process_revision_job},
+        workers=JOB_WORKERS,
+        on_failure=notify_job_failure,
+        retention=JOB_RETENTION_DAYS * 86400,
+    )
 
 
-class ResumeStorageError(Exception):
-    """Error related to resume storage operations."""
+@cache
+def get_exporter() -> DocumentExporter:
+    """Create the PDF/DOCX exporter; its worker processes start on first export."""
+    return DocumentExporter(workers=EXPORT_WORKERS)
 
-    pass
+
+@cache
+def get_resume_store() -> ResumeStore:
+    """Open the versioned resume store, importing legacy resumes.json once."""
+    DATA_DIR.mkdir(exist_ok=True)
+    store = ResumeStore(RESUMES_DB)
+    if RESUMES_FILE.exists() and not store.stats()["users"]:
+        _ = store.import_json(RESUMES_FILE)
+    return store
 
 
-def load_resumes() -> dict[str, str]:
-    """Load resumes from JSON file."""
+@cache
+def get_history_store() -> HistoryStore:
+    """Open the generation history store."""
+    DATA_DIR.mkdir(exist_ok=True)
+    return HistoryStore(HISTORY_DB)
+
+
+async def record_history(user_id: str, job_description: str, result: "CoverLetterResult") -> None:
+    """Store a letter in the user's history; a storage error does not fail the generation."""
     try:
-        if RESUMES_FILE.exists():
-            content: str = RESUMES_FILE.read_text()
-            try:
-                loaded_data: dict[str, str] = json.loads(content)
-                logger.debug(f"Loaded {len(loaded_data)} resumes")
-                return loaded_data
-            except (json.JSONDecodeError, TypeError) as e:
-                logger.error(f"Error parsing resumes file: {e}")
-                return {}
-        return {}
-    except Exception as e:
-        logger.error(f"Error loading resumes: {e}")
-        raise ResumeStorageError(f"Failed to load resumes: {e}") from e
+        _ = await asyncio.to_thread(get_history_store().save, user_id, job_description, result)
+    except HistoryStoreError as e:
+        logger.error(f"Error saving history for user {user_id}: {e}")
 
 
-def save_resumes(resumes: dict[str, str]) -> None:
-    """Save resumes to JSON file."""
+async def find_history_match(user_id: str, job_description: str) -> "HistoryEntry | None":
+    """Earlier letter of the user for the same or a near-identical vacancy."""
     try:
-        _ = RESUMES_FILE.write_text(json.dumps(resumes, indent=2))
-        logger.debug(f"Saved {len(resumes)} resumes")
-    except Exception as e:
-        logger.error(f"Error saving resumes: {e}")
-        raise ResumeStorageError(f"Failed to save resumes: {e}") from e
+        return await asyncio.to_thread(get_history_store().find_similar, user_id, job_description)
+    except HistoryStoreError as e:
+        logger.error(f"Error searching history for user {user_id}: {e}")
+        return None
+
+
+def format_history_entry(entry: "HistoryEntry") -> str:
+    """Id, date, company and quality of a stored letter, with a vacancy preview."""
+    date = time.strftime("%Y-%m-%d", time.localtime(entry.created_at))
+    company = entry.company or "Unknown company"
+    vacancy = " ".join(entry.vacancy.split())
+    if len(vacancy) > HISTORY_PREVIEW_CHARS:
+        vacancy = vacancy[:HISTORY_PREVIEW_CHARS].rstrip() + "…"
+    return f"#{entry.id} {date} · {company} · {entry.quality_score:.0%}\n    {vacancy}"
+
+
+async def reply(message: types.Message, text: str) -> None:
+    """Send text to the message's chat through the paced outbox."""
+    _ = await get_outbox().send(message.chat.id, text)
+
+
+class ResumeStorageError(Exception):
+    """Error related to resume storage operations."""
+
+    pass
+
+
+async def get_user_resume(user_id: str) -> str | None:
+    """Get the active resume of user."""
+    try:
+        return await asyncio.to_thread(get_resume_store().get_active, user_id)
+    except ResumeStoreError as e:
+        logger.error(f"Error loading resume: {e}")
+        raise ResumeStorageError(f"Failed to load resume: {e}") from e
 
 
 async def download_and_validate_document(document: types.Document) -> str:
@@ -87,6 +218,7 @@ async def download_and_validate_document(document: types.Document) -> str:
     if not document.file_name.lower().endswith(".md"):
         raise ValueError("Only .md files are accepted")
 
+    bot = get_bot()
     file = await bot.get_file(document.file_id)
     if not file.file_path:
         raise ValueError("Could not get file path")
@@ -101,11 +233,40 @@ async def download_and_validate_document(document: types.Document) -> str:
         raise ValueError("File contains invalid characters") from e
 
 
-async def save_user_resume(user_id: str, resume_content: str) -> None:
-    """Save resume for user."""
-    resumes = load_resumes()
-    resumes[user_id] = resume_content
-    save_resumes(resumes)
+async def save_user_resume(user_id: str, resume_content: str, name: str = "resume") -> str:
+    """Save resume as a new active version for user and return the version name."""
+    try:
+        version = await asyncio.to_thread(get_resume_store().save, user_id, resume_content, name)
+        return version.name
+    except ResumeStoreError as e:
+        logger.error(f"Error saving resume: {e}")
+        raise ResumeStorageError(f"Failed to save resume: {e}") from e
+
+
+@dp.update.outer_middleware()
+async def per_user_ordering(
+    handler: Callable[[types.TelegramObject, dict[str, Any]], Awaitable[Any]],
+    event: types.TelegramObject,
+    data: dict[str, Any],
+) -> Any:
+    """
+    Serialize updates of one user so handlers never race on user_states,
+    user_temp_data or the resume store; other users are not held up.
+    Polling starts one task per update in arrival order, and nothing before
+    this middleware suspends, so the per-user order is the arrival order.
+    """
+    user = data.get("event_from_user")
+    if user is None:
+        return await handler(event, data)
+
+    try:
+        return await update_dispatcher.run(user.id, lambda: handler(event, data))
+    except UserQueueFullError:
+        logger.warning(f"Dropping update from user {user.id}: too many pending updates")
+        message = getattr(event, "message", None)
+        if message is not None:
+            await reply(message, "⏳ Still working on your previous messages, please wait.")
+        return None
 
 
 def get_user_state(user_id: str) -> str | None:
@@ -120,6 +281,7 @@ def set_user_state(user_id: str, state: str) -> None:
 
 def clear_user_state(user_id: str) -> None:
     """Clear user state."""
+    cancel_speculative_analysis(user_id)
     user_states.pop(user_id, None)
     clear_user_temp_data(user_id)
 
@@ -141,14 +303,69 @@ def clear_user_temp_data(user_id: str) -> None:
     user_temp_data.pop(user_id, None)
 
 
+def start_speculative_analysis(user_id: str, job_description: str) -> None:
+    """Analyze the vacancy while the user is still typing additional instructions."""
+    cancel_speculative_analysis(user_id)
+    _ = get_generator().prepare_analysis(job_description)
+    user_prepared_vacancies[user_id] = job_description
+
+
+def cancel_speculative_analysis(user_id: str) -> None:
+    """Cancel the background analysis of a flow the user restarted or abandoned."""
+    job_description = user_prepared_vacancies.pop(user_id, None)
+    if job_description is not None:
+        _ = get_generator().discard_analysis(job_description)
+
+
+def release_speculative_analysis(user_id: str) -> None:
+    """Hand the background analysis over to the queued generation."""
+    _ = user_prepared_vacancies.pop(user_id, None)
+
+
+async def cancel_user_generation(user_id: str) -> bool:
+    """Cancel the user's queued or running generation; False if there was none."""
+    job_id = user_jobs.pop(user_id, None)
+    if job_id is None:
+        return False
+    return await get_job_queue().cancel(job_id)
+
+
+def set_user_variants(user_id: str, variants: list[str]) -> None:
+    """Store unsent cover letter variants for user."""
+    if variants:
+        user_letter_variants[user_id] = variants
+    else:
+        user_letter_variants.pop(user_id, None)
+
+
+def pop_user_variant(user_id: str) -> str | None:
+    """Take the next unsent cover letter variant for user."""
+    variants = user_letter_variants.get(user_id)
+    if not variants:
+        return None
+    variant = variants.pop(0)
+    if not variants:
+        user_letter_variants.pop(user_id, None)
+    return variant
+
+
 @dp.message(Command("start"))
 async def start_handler(message: types.Message) -> None:
     """Handle /start command."""
-    _ = await message.answer(
+    await reply(
+        message,
         "🧠 Welcome to Lucidum!\n\n"
         "Commands:\n"
         "/set_resume - Save your resume (MD file only)\n"
-        "/generate - Create cover letter"
+        "/resumes - List your saved resume versions\n"
+        "/use_resume <name> - Switch the active resume\n"
+        "/generate - Create cover letter\n"
+        "/next - Show another variant of the last cover letter\n"
+        "/revise <edit> - Edit the last cover letter (e.g. /revise shorter)\n"
+        "/export [pdf|docx] - Get the last cover letter as a document\n"
+        "/history [words] - List your previous cover letters or search their vacancies\n"
+        "/reuse <id> - Send a previous cover letter again\n"
+        "/cancel - Stop the current cover letter",
     )
 
 
@@ -159,13 +376,65 @@ async def set_resume_handler(message: types.Message) -> None:
         return
 
     user_id: str = str(message.from_user.id)
+    cancel_speculative_analysis(user_id)
     set_user_state(user_id, WAITING_FOR_RESUME)
 
-    _ = await message.answer(
-        "Please upload your resume as a .md file 📄\n(Only Markdown files are accepted)"
+    await reply(
+        message, "Please upload your resume as a .md file 📄\n(Only Markdown files are accepted)"
+    )
+
+
+@dp.message(Command("resumes"))
+async def resumes_handler(message: types.Message) -> None:
+    """Handle /resumes command: list saved resume versions."""
+    if not message.from_user:
+        return
+
+    user_id: str = str(message.from_user.id)
+    try:
+        versions = await asyncio.to_thread(get_resume_store().list_versions, user_id)
+    except ResumeStoreError:
+        await reply(message, "❌ Error accessing resume storage. Please try again.")
+        return
+
+    if not versions:
+        await reply(message, "❌ No saved resumes. Use /set_resume to upload one.")
+        return
+
+    lines = [
+        f"{'✅' if version.active else '▫️'} {version.name} ({version.size // 1024 + 1} KB)"
+        for version in versions
+    ]
+    await reply(
+        message, "📚 Your resumes:\n" + "\n".join(lines) + "\n\nSwitch with /use_resume <name>"
     )
 
 
+@dp.message(Command("use_resume"))
+async def use_resume_handler(message: types.Message) -> None:
+    """Handle /use_resume command: make a saved version active."""
+    if not message.from_user or not message.text:
+        return
+
+    user_id: str = str(message.from_user.id)
+    parts = message.text.split(maxsplit=1)
+    if len(parts) < 2:
+        await reply(message, "❌ Usage: /use_resume <name> (see /resumes)")
+        return
+
+    name = parts[1].strip()
+    try:
+        switched = await asyncio.to_thread(get_resume_store().set_active, user_id, name)
+    except ResumeStoreError:
+        await reply(message, "❌ Error accessing resume storage. Please try again.")
+        return
+
+    if switched:
+        await reply(message, f"✅ Active resume: {name}")
+    else:
+        await reply(message, f"❌ No resume named '{name}'. See /resumes")
+
+
 @dp.message(Command("generate"))
 async def generate_handler(message: types.Message) -> None:
     """Handle /generate command."""
@@ -175,16 +444,195 @@ async def generate_handler(message: types.Message) -> None:
     user_id: str = str(message.from_user.id)
 
     try:
-        resumes = load_resumes()
-        if user_id not in resumes:
-            _ = await message.answer("❌ Please set your resume first with /set_resume")
+        if await get_user_resume(user_id) is None:
+            await reply(message, "❌ Please set your resume first with /set_resume")
             return
 
+        cancel_speculative_analysis(user_id)
+        # A new request supersedes the previous generation
+        superseded = await cancel_user_generation(user_id)
         set_user_state(user_id, WAITING_FOR_JOB_DESC)
-        _ = await message.answer("Please send the job description to generate a cover letter:")
+        notice = "⏹ Previous cover letter cancelled.\n" if superseded else ""
+        await reply(message, notice + "Please send the job description to generate a cover letter:")
 
     except ResumeStorageError:
-        _ = await message.answer("❌ Error accessing resume storage. Please try again.")
+        await reply(message, "❌ Error accessing resume storage. Please try again.")
+
+
+@dp.message(Command("cancel"))
+async def cancel_handler(message: types.Message) -> None:
+    """Handle /cancel command: stop the running generation and reset the flow."""
+    if not message.from_user:
+        return
+
+    user_id: str = str(message.from_user.id)
+    in_flow = get_user_state(user_id) is not None
+    cancelled = await cancel_user_generation(user_id)
+    clear_user_state(user_id)
+
+    if cancelled:
+        await reply(message, "⏹ Cover letter generation cancelled.")
+    elif in_flow:
+        await reply(message, "⏹ Cancelled. Use /generate to start again.")
+    else:
+        await reply(message, "Nothing to cancel.")
+
+
+@dp.message(Command("next"))
+async def next_variant_handler(message: types.Message) -> None:
+    """Handle /next command: send another variant without a new API call."""
+    if not message.from_user:
+        return
+
+    user_id: str = str(message.from_user.id)
+    variant = pop_user_variant(user_id)
+    if variant is None:
+        await reply(message, "❌ No more variants. Use /generate to create a new cover letter.")
+        return
+
+    user_last_letters[user_id] = variant
+    remaining = len(user_letter_variants.get(user_id, []))
+    footer = "\n\nMore variants: /next" if remaining else ""
+    await reply(message, f"📄 Another variant:\n\n{variant}{footer}")
+
+
+@dp.message(Command("revise"))
+async def revise_handler(message: types.Message) -> None:
+    """Handle /revise command: edit the last cover letter without a full regeneration."""
+    if not message.from_user or not message.text:
+        return
+
+    user_id: str = str(message.from_user.id)
+    if user_id not in user_last_letters:
+        await reply(message, "❌ No cover letter yet. Use /generate to create one.")
+        return
+
+    parts = message.text.split(maxsplit=1)
+    if len(parts) < 2:
+        set_user_state(user_id, WAITING_FOR_REVISION)
+        await reply(
+            message, "✏️ What should be changed?\n(Example: 'shorter', 'emphasize leadership')"
+        )
+        return
+
+    await enqueue_revision(message, user_id, parts[1].strip())
+
+
+async def enqueue_revision(message: types.Message, user_id: str, instruction: str) -> None:
+    """Queue a revision of the user's last letter; it supersedes a running generation."""
+    _ = await cancel_user_generation(user_id)
+    user_jobs[user_id] = await get_job_queue().enqueue(
+        REVISION_JOB,
+        str(message.chat.id),
+        {
+            "user_id": user_id,
+            "cover_letter": user_last_letters[user_id],
+            "instruction": instruction,
+            "keywords": user_last_keywords.get(user_id, []),
+            "job_description": user_last_vacancies.get(user_id, ""),
+        },
+    )
+    clear_user_state(user_id)
+    await reply(message, "✏️ Revising cover letter...")
+
+
+@dp.message(Command("history"))
+async def history_handler(message: types.Message) -> None:
+    """Handle /history command: list recent cover letters, or search them by words."""
+    if not message.from_user or not message.text:
+        return
+
+    user_id: str = str(message.from_user.id)
+    parts = message.text.split(maxsplit=1)
+    query = parts[1].strip() if len(parts) > 1 else ""
+    try:
+        store = get_history_store()
+        if query:
+            entries = await asyncio.to_thread(store.search, user_id, query)
+        else:
+            entries = await asyncio.to_thread(store.recent, user_id)
+    except HistoryStoreError:
+        await reply(message, "❌ Error accessing history. Please try again.")
+        return
+
+    if not entries:
+        if query:
+            await reply(message, f"❌ No cover letters match '{query}'.")
+        else:
+            await reply(message, "❌ No cover letters yet. Use /generate to create one.")
+        return
+
+    title = f"🔎 Cover letters matching '{query}':" if query else "🗂 Your recent cover letters:"
+    lines = [format_history_entry(entry) for entry in entries]
+    await reply(message, title + "\n" + "\n".join(lines) + "\n\nSend one again: /reuse <id>")
+
+
+@dp.message(Command("reuse"))
+async def reuse_handler(message: types.Message) -> None:
+    """Handle /reuse command: send a cover letter from the history again."""
+    if not message.from_user or not message.text:
+        return
+
+    user_id: str = str(message.from_user.id)
+    parts = message.text.split(maxsplit=1)
+    entry_ref = parts[1].strip().lstrip("#") if len(parts) > 1 else ""
+    if not entry_ref.isdigit():
+        await reply(message, "❌ Usage: /reuse <id> (see /history)")
+        return
+
+    try:
+        entry = await asyncio.to_thread(get_history_store().get, user_id, int(entry_ref))
+    except HistoryStoreError:
+        await reply(message, "❌ Error accessing history. Please try again.")
+        return
+    if entry is None:
+        await reply(message, f"❌ No cover letter #{entry_ref}. See /history")
+        return
+
+    # Ends a /generate flow that offered this letter
+    clear_user_state(user_id)
+    set_user_variants(user_id, [])
+    user_last_letters[user_id] = entry.cover_letter
+    user_last_keywords[user_id] = entry.keywords
+    user_last_vacancies[user_id] = entry.vacancy
+    await reply(
+        message,
+        f"📄 Cover letter #{entry.id}:\n\n{entry.cover_letter}\n\n"
+        "Edit: /revise shorter\nAs a document: /export pdf or /export docx",
+    )
+
+
+@dp.message(Command("export"))
+async def export_handler(message: types.Message) -> None:
+    """Handle /export command: send the last cover letter as PDF or DOCX."""
+    if not message.from_user or not message.text:
+        return
+
+    user_id: str = str(message.from_user.id)
+    parts = message.text.split(maxsplit=1)
+    export_format = parts[1].strip().lower() if len(parts) > 1 else "pdf"
+    if export_format not in EXPORT_FORMATS:
+        await reply(message, "❌ Usage: /export pdf or /export docx")
+        return
+
+    letter = user_last_letters.get(user_id)
+    if letter is None:
+        await reply(message, "❌ No cover letter yet. Use /generate to create one.")
+        return
+
+    try:
+        document = await get_exporter().export(letter, export_format)
+    except ExportError as e:
+        logger.error(f"Export to {export_format} failed for user {user_id}: {e}")
+        await reply(message, "❌ Could not create the document. Please try again later.")
+        return
+
+    _ = await get_outbox().submit(
+        message.chat.id,
+        lambda: message.answer_document(
+            types.BufferedInputFile(document, filename=f"cover_letter.{export_format}")
+        ),
+    )
 
 
 # Handle document uploads
@@ -204,30 +652,33 @@ async def document_handler(message: types.Message) -> None:
 
     # Check user state
     if get_user_state(user_id) != WAITING_FOR_RESUME:
-        _ = await message.answer("❌ Please use /set_resume command first to upload your resume.")
+        await reply(message, "❌ Please use /set_resume command first to upload your resume.")
         return
 
     if not document:
-        _ = await message.answer("❌ Invalid document. Please try uploading again.")
+        await reply(message, "❌ Invalid document. Please try uploading again.")
         return
 
     try:
         resume_content = await download_and_validate_document(document)
-        await save_user_resume(user_id, resume_content)
+        version_name = await save_user_resume(
+            user_id, resume_content, Path(document.file_name or "resume").stem
+        )
         clear_user_state(user_id)
 
-        _ = await message.answer(
-            f"✅ Resume from '{document.file_name}' saved successfully!\n"
-            + "Use /generate to create cover letters."
+        await reply(
+            message,
+            f"✅ Resume from '{document.file_name}' saved as '{version_name}'!\n"
+            + "Use /generate to create cover letters.",
         )
 
     except ValueError as e:
-        _ = await message.answer(f"❌ {str(e)}")
+        await reply(message, f"❌ {str(e)}")
     except ResumeStorageError:
-        _ = await message.answer("❌ Error saving resume. Please try again.")
+        await reply(message, "❌ Error saving resume. Please try again.")
     except Exception as e:
         logger.error(f"Error processing file for user {user_id}: {e}")
-        _ = await message.answer("❌ Error processing file. Please try again.")
+        await reply(message, "❌ Error processing file. Please try again.")
 
 
 # Handle text messages (job description only)
@@ -242,87 +693,135 @@ async def text_handler(message: types.Message) -> None:
     state = get_user_state(user_id)
 
     if state == WAITING_FOR_RESUME:
-        _ = await message.answer(
+        await reply(
+            message,
             "❌ Please upload your resume as a .md file, not as text.\n"
-            + "Use the document upload feature to send your .md file."
+            + "Use the document upload feature to send your .md file.",
         )
         return
 
+    if state == WAITING_FOR_REVISION:
+        if user_id not in user_last_letters:
+            clear_user_state(user_id)
+            await reply(message, "❌ No cover letter yet. Use /generate to create one.")
+            return
+        await enqueue_revision(message, user_id, text.strip())
+        return
+
     if state == WAITING_FOR_JOB_DESC:
         try:
-            resumes = load_resumes()
-            if user_id not in resumes:
-                _ = await message.answer("❌ Please set your resume first with /set_resume")
+            if await get_user_resume(user_id) is None:
+                await reply(message, "❌ Please set your resume first with /set_resume")
                 return
 
             # Save job description and ask for additional instructions
             set_user_temp_data(user_id, "job_description", text)
             set_user_state(user_id, WAITING_FOR_ADDITIONAL_INSTRUCTIONS)
-            _ = await message.answer(
+
+            match = await find_history_match(user_id, text)
+            if match is not None:
+                # No speculative analysis: the stored letter may make it unnecessary
+                same = "this" if match.similarity == 1.0 else "a nearly identical"
+                await reply(
+                    message,
+                    f"🗂 You already have a cover letter for {same} vacancy:\n"
+                    f"{format_history_entry(match)}\n\n"
+                    f"Send it again: /reuse {match.id}\n"
+                    "Or send additional instructions (or '-') to generate a new one.",
+                )
+                return
+
+            # Keywords and company are ready by the time the instructions arrive
+            start_speculative_analysis(user_id, text)
+            await reply(
+                message,
                 "📝 Additional instructions for cover letter generation?\n"
-                + "(Example: 'use only work experience from job title Senior Developer', or just send '-' to skip)"
+                + "(Example: 'use only work experience from job title Senior Developer', or just send '-' to skip)",
             )
 
         except ResumeStorageError:
-            _ = await message.answer("❌ Error accessing resume storage. Please try again.")
+            await reply(message, "❌ Error accessing resume storage. Please try again.")
         except Exception as e:
             logger.error(f"Error processing job description for user {user_id}: {e}")
-            _ = await message.answer("❌ Error processing job description. Please try again.")
+            await reply(message, "❌ Error processing job description. Please try again.")
 
     elif state == WAITING_FOR_ADDITIONAL_INSTRUCTIONS:
         try:
-            resumes = load_resumes()
-            if user_id not in resumes:
-                _ = await message.answer("❌ Please set your resume first with /set_resume")
+            resume = await get_user_resume(user_id)
+            if resume is None:
+                await reply(message, "❌ Please set your resume first with /set_resume")
                 return
 
             job_description = get_user_temp_data(user_id, "job_description")
             if not job_description:
-                _ = await message.answer(
-                    "❌ Job description not found. Please use /generate again."
-                )
+                await reply(message, "❌ Job description not found. Please use /generate again.")
                 clear_user_state(user_id)
                 return
 
             # Process additional instructions (empty string if user sent '-')
             additional_instructions = text.strip() if text.strip() != "-" else ""
 
-            _ = await message.answer("🔄 Generating cover letter...")
-            cover_letter = await generate_cover_letter(
-                resumes[user_id], job_description, additional_instructions
+            # Generation runs in a background worker that sends the result
+            _ = await cancel_user_generation(user_id)
+            user_jobs[user_id] = await get_job_queue().enqueue(
+                COVER_LETTER_JOB,
+                str(message.chat.id),
+                {
+                    "user_id": user_id,
+                    "resume": resume,
+                    "job_description": job_description,
+                    "additional_instructions": additional_instructions,
+                },
             )
-            _ = await message.answer(f"📄 Your cover letter:\n\n{cover_letter}")
+            release_speculative_analysis(user_id)
             clear_user_state(user_id)
+            await reply(message, "🔄 Generating cover letter...")
 
         except ResumeStorageError:
-            _ = await message.answer("❌ Error accessing resume storage. Please try again.")
+            await reply(message, "❌ Error accessing resume storage. Please try again.")
         except Exception as e:
             logger.error(f"Cover letter generation failed for user {user_id}: {e}")
-            _ = await message.answer("❌ Error generating cover letter. Please try again.")
+            await reply(message, "❌ Error generating cover letter. Please try again.")
     else:
-        _ = await message.answer(
+        await reply(
+            message,
             "❌ Unknown command. Please use:\n"
             + "/set_resume - to upload your resume\n"
-            + "/generate - to create a cover letter"
+            + "/generate - to create a cover letter",
         )
 
 
 async def generate_cover_letter(
-    resume: str, job_description: str, additional_instructions: str = ""
+    resume: str, job_description: str, additional_instructions: str = "", user_id: str = ""
 ) -> str:
-    """Generate a cover letter using simplified system."""
+    """
+    Generate a cover letter using simplified system.
+    Extra variants are stored for the user and served by /next.
+    """
     logger.debug("Starting cover letter generation with CoverLetterGenerator")
 
+    profiling = (
+        request_profiler.profile(f"generate-{user_id or 'anonymous'}")
+        if request_profiler.sampled()
+        else contextlib.nullcontext()
+    )
     try:
-        # Use simple cover letter generator
-        from cover_letter import CoverLetterGenerator
-
-        generator = CoverLetterGenerator(client)
-        result = await generator.generate(
-            resume=resume,
-            job_description=job_description,
-            special_requirements=additional_instructions,
-        )
+        # Shared generator, so identical in-flight requests are coalesced
+        with profiling:
+            result = await get_generator().generate(
+                resume=resume,
+                job_description=job_description,
+                special_requirements=additional_instructions,
+                candidates=LETTER_CANDIDATES,
+            )
+        if user_id:
+            set_user_variants(
+                user_id, [candidate.cover_letter for candidate in result.alternatives]
+            )
+            user_last_letters[user_id] = result.cover_letter
+            user_last_keywords[user_id] = result.metadata.get("keywords", [])
+            user_last_vacancies[user_id] = job_description
+            await record_history(user_id, job_description, result)
 
         # Simple response
         response_parts = [result.cover_letter]
@@ -339,21 +838,117 @@ async def generate_cover_letter(
     except Exception as e:
         logger.warning(f"Main generator failed, using fallback: {e}")
         # Use generator's internal fallback instead
-        generator = CoverLetterGenerator(client)
-        result = await generator._simple_fallback(
+        result = await get_generator()._simple_fallback(
             resume, job_description, 0.0, additional_instructions
         )
+        if user_id:
+            user_last_letters[user_id] = result.cover_letter
+            user_last_keywords[user_id] = []
+            user_last_vacancies[user_id] = job_description
+            if "error" not in result.metadata:
+                await record_history(user_id, job_description, result)
         return result.cover_letter
 
 
+async def process_cover_letter_job(job: "Job") -> str:
+    """Generate a cover letter for a queued job and send it to the chat."""
+    payload = job.payload
+    user_id: str = payload["user_id"]
+    cover_letter = job.result
+    if cover_letter is None:
+        cover_letter = await generate_cover_letter(
+            payload["resume"],
+            payload["job_description"],
+            payload.get("additional_instructions", ""),
+            user_id,
+        )
+        # Saved before delivery: a retry after a failed send only sends again
+        await get_job_queue().save_result(job, cover_letter)
+    # Failed attempts keep the mapping, so /cancel also stops retries
+    if user_jobs.get(user_id) == job.id:
+        _ = user_jobs.pop(user_id)
+    hints = ["Another variant: /next"] if user_id in user_letter_variants else []
+    hints.append("Edit: /revise shorter")
+    hints.append("As a document: /export pdf or /export docx")
+    footer = "\n\n" + "\n".join(hints)
+    _ = await get_outbox().send(job.chat_id, f"📄 Your cover letter:\n\n{cover_letter}{footer}")
+    return cover_letter
+
+
+async def process_revision_job(job: "Job") -> str:
+    """Revise the user's last letter for a queued job and send it to the chat."""
+    payload = job.payload
+    user_id: str = payload["user_id"]
+    revised = job.result
+    if revised is None:
+        resume = await get_user_resume(user_id) or ""
+        result = await get_generator().revise(
+            payload["cover_letter"],
+            payload["instruction"],
+            payload.get("keywords"),
+            resume,
+            payload.get("job_description", ""),
+        )
+        usage = result.metadata["usage"]
+        logger.info(
+            f"Revision for user {user_id}: {usage['prompt_tokens']} prompt and "
+            f"{usage['completion_tokens']} completion tokens in {result.generation_time:.2f}s"
+        )
+        revised = result.cover_letter
+        user_last_letters[user_id] = revised
+        await record_history(user_id, payload.get("job_description", ""), result)
+        await get_job_queue().save_result(job, revised)
+    if user_jobs.get(user_id) == job.id:
+        _ = user_jobs.pop(user_id)
+    _ = await get_outbox().send(
+        job.chat_id,
+        f"✏️ Revised cover letter:\n\n{revised}\n\n"
+        "Edit again: /revise\nAs a document: /export pdf or /export docx",
+    )
+    return revised
+
+
+async def notify_job_failure(job: "Job", error: Exception) -> None:
+    """Tell the user that a queued job failed after all retries."""
+    logger.error(f"Cover letter job {job.id} failed for chat {job.chat_id}: {error}")
+    _ = await get_outbox().send(job.chat_id, "❌ Error generating cover letter. Please try again.")
+
+
 async def main() -> None:
     """Main function to start the bot."""
     logger.info("Starting Lucidum bot")
+    loop_monitor = EventLoopMonitor(slow_callback_threshold=SLOW_CALLBACK_THRESHOLD)
+    if LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+
+    bot = get_bot()
+    # Open the stores (and import resumes.json) before the first update arrives
+    _ = await asyncio.to_thread(get_history_store)
+    resume_store = await asyncio.to_thread(get_resume_store)
+    report = await asyncio.to_thread(resume_store.stats)
+    logger.info(
+        f"Resume store: {report['users']} users, {report['versions']} versions, "
+        f"{report['compressed_bytes']} bytes compressed"
+    )
+    job_queue = get_job_queue()
+    await job_queue.start()
+
     try:
-        await dp.start_polling(bot)
+        # One task per update; per_user_ordering keeps each user's updates in order
+        await dp.start_polling(bot, handle_as_tasks=True)
     except Exception as e:
         logger.error(f"Bot failed to start: {e}", exc_info=True)
         raise
+    finally:
+        # Let in-flight generations finish; the rest resume on next start
+        await job_queue.stop()
+        # Deliver replies still waiting for their send slot
+        await get_outbox().close()
+        job_queue.store.close()
+        get_resume_store().close()
+        get_history_store().close()
+        get_exporter().close()
+        loop_monitor.stop()
 
 
 if __name__ == "__main__":
@@ -1,12 +1,49 @@
 """
 Simple cover letter generation system.
+
+Public names are loaded lazily, so importing the package (or a light
+submodule such as metrics) does not pull in openai or pydantic.
 """
 
-from .generator import CoverLetterGenerator
-from .models import CoverLetterResult, JobAnalysis
+import importlib
+from typing import TYPE_CHECKING, Any, List
+
+if TYPE_CHECKING:
+    from .generator import CoverLetterGenerator
+    from .models import CoverLetterCandidate, CoverLetterResult, JobAnalysis, ValidationReport
+    from .validator import CoverLetterValidator
+
+# Public name -> submodule that defines it
+_EXPORTS = {
+    "CoverLetterCandidate": ".models",
+    "CoverLetterGenerator": ".generator",
+    "CoverLetterResult": ".models",
+    "CoverLetterValidator": ".validator",
+    "JobAnalysis": ".models",
+    "ValidationReport": ".models",
+}
 
 __all__ = [
+    "CoverLetterCandidate",
     "CoverLetterGenerator",
     "CoverLetterResult",
+    "CoverLetterValidator",
     "JobAnalysis",
+    "ValidationReport",
 ]
+
+
+def __getattr__(name: str) -> Any:
+    """Import public names on first access."""
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    """List module attributes including lazy exports."""
+    return sorted(set(globals()) | set(_EXPORTS))
@@ -0,0 +1,339 @@
+"""
+Command-line entry point: python -m cover_letter <command>.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+from typing import Dict, List, Optional
+
+from .prompts import DEFAULT_MODEL
+
+
+def load_openai_client(args: Optional[argparse.Namespace] = None):
+    """
+    Load .env and create an OpenAI client, recording its traffic with
+    --record or answering from a cassette with --replay.
+    """
+    from dotenv import load_dotenv
+
+    from .clients import create_llm_client
+
+    _ = load_dotenv()
+    if args is not None and args.replay:
+        from .cassettes import CassettePlayer
+
+        return CassettePlayer(args.replay, delay_factor=args.replay_delay)
+
+    client = create_llm_client()
+    if args is not None and args.record:
+        from .cassettes import CassetteRecorder
+
+        return CassetteRecorder(client, args.record)
+    return client
+
+
+async def run_experiment(args: argparse.Namespace) -> int:
+    """Run a prompt experiment and print the comparison report."""
+    from .experiments import (
+        ExperimentRunner,
+        build_report,
+        format_report,
+        load_cases,
+        load_variants,
+    )
+
+    variants = load_variants(args.variants)
+    cases = load_cases(args.cases)
+    runner = ExperimentRunner(
+        load_openai_client(args), concurrency=args.concurrency, cache_dir=args.cache_dir
+    )
+    runs = await runner.run(variants, cases)
+    report = build_report(runs)
+
+    print(format_report(report))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(
+                {"report": report, "runs": [run.model_dump() for run in runs]},
+                output,
+                ensure_ascii=False,
+                indent=2,
+            )
+    return 0
+
+
+async def run_batch(args: argparse.Namespace) -> int:
+    """Generate cover letters for a JSONL file, resuming from the output file."""
+    from .batch import BatchRunner
+    from .generator import CoverLetterGenerator
+
+    client = load_openai_client(args)
+    if args.deferred:
+        from .deferred import DeferredBatchClient
+
+        # Requests of all in-flight items are packed into provider batches
+        client = DeferredBatchClient(client, poll_interval=args.poll_interval)
+
+    generator = CoverLetterGenerator(client, model=args.model)
+    runner = BatchRunner(
+        generator,
+        concurrency=args.concurrency,
+        candidates=args.candidates,
+        progress_interval=args.progress_interval,
+    )
+    try:
+        summary = await runner.run(args.input, args.output)
+    finally:
+        if args.deferred:
+            await client.close()
+    return 1 if summary["failed"] else 0
+
+
+async def run_standin(args: argparse.Namespace) -> int:
+    """Serve the local OpenAI stand-in until interrupted."""
+    import uvicorn
+
+    from .standin import create_standin_app
+
+    config = uvicorn.Config(
+        create_standin_app(latency=args.latency, error_rate=args.error_rate),
+        host=args.host,
+        port=args.port,
+        log_level="warning",
+        access_log=False,
+    )
+    await uvicorn.Server(config).serve()
+    return 0
+
+
+async def run_loadtest(args: argparse.Namespace) -> int:
+    """Load-test a generation endpoint and print latency and throughput."""
+    from .loadtest import format_load_report, run_load_test
+
+    report = await run_load_test(
+        args.url,
+        requests=args.requests,
+        concurrency=args.concurrency,
+        unique=not args.same_payload,
+    )
+    print(format_load_report(report))
+    return 0 if set(report["statuses"]) == {"200"} else 1
+
+
+async def run_export_bench(args: argparse.Namespace) -> int:
+    """Benchmark document export throughput at growing concurrency."""
+    from .export import DocumentExporter, benchmark_export, format_export_benchmark
+
+    with open(args.letter, encoding="utf-8") as letter_file:
+        text = letter_file.read()
+
+    exporter = DocumentExporter(workers=args.workers, max_pending=args.max_concurrency)
+    try:
+        for export_format in args.formats:
+            rows = await benchmark_export(
+                exporter, text, export_format, args.max_concurrency, exports=args.exports
+            )
+            print(f"{export_format} ({args.workers} workers)")
+            print(format_export_benchmark(rows))
+    finally:
+        exporter.close()
+    return 0
+
+
+async def run_revision_bench(args: argparse.Namespace) -> int:
+    """Compare latency and tokens of a revision with a full regeneration."""
+    from .generator import CoverLetterGenerator
+
+    with open(args.resume, encoding="utf-8") as resume_file:
+        resume = resume_file.read()
+    with open(args.vacancy, encoding="utf-8") as vacancy_file:
+        vacancy = vacancy_file.read()
+
+    client = load_openai_client(args)
+    totals: Dict[str, Dict[str, float]] = {}
+    for _ in range(args.rounds):
+        # A fresh generator per round, so no analysis is reused between rounds
+        generator = CoverLetterGenerator(client, model=args.model)
+        generated = await generator.generate(resume, vacancy, special_requirements=args.instruction)
+        original = await generator.generate(resume, vacancy)
+        revised = await generator.revise(
+            original.cover_letter,
+            args.instruction,
+            original.metadata.get("keywords"),
+            resume,
+            vacancy,
+        )
+        for mode, result in (("regenerate", generated), ("revise", revised)):
+            usage = result.metadata.get("usage") or {}
+            revision = result.metadata.get("revision", {})
+            row = totals.setdefault(mode, {})
+            for field, value in (
+                ("seconds", result.generation_time),
+                ("prompt_tokens", usage.get("prompt_tokens", 0)),
+                ("completion_tokens", usage.get("completion_tokens", 0)),
+                ("accepted_prediction", revision.get("accepted_prediction_tokens", 0)),
+            ):
+                row[field] = row.get(field, 0) + value / args.rounds
+
+    print(f"{'mode':<11} {'seconds':>8} {'prompt':>8} {'completion':>11} {'accepted':>9}")
+    for mode, row in totals.items():
+        print(
+            f"{mode:<11} {row['seconds']:>8.2f} {row['prompt_tokens']:>8.0f} "
+            f"{row['completion_tokens']:>11.0f} {row['accepted_prediction']:>9.0f}"
+        )
+    return 0
+
+
+async def run_history_bench(args: argparse.Namespace) -> int:
+    """Benchmark history store size and query latency on synthetic letters."""
+    from .history import benchmark_history, format_history_benchmark
+
+    if os.path.exists(args.db):
+        print(f"{args.db} already exists", file=sys.stderr)
+        return 1
+    report = benchmark_history(args.db, args.rows, users=args.users, queries=args.queries)
+    print(format_history_benchmark(report))
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the command-line parser."""
+    parser = argparse.ArgumentParser(prog="python -m cover_letter")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Debug logging")
+    cassette = parser.add_mutually_exclusive_group()
+    cassette.add_argument("--record", metavar="CASSETTE", help="Record LLM traffic to a JSONL file")
+    cassette.add_argument(
+        "--replay", metavar="CASSETTE", help="Answer LLM requests from a recorded file"
+    )
+    parser.add_argument(
+        "--replay-delay",
+        type=float,
+        default=0.0,
+        help="Scale of recorded latencies on replay (0 = instant, 1 = original)",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    experiment = commands.add_parser(
+        "experiment", help="Compare prompt variants on a folder of resumes and vacancies"
+    )
+    experiment.add_argument("--variants", required=True, help="JSON list of prompt variants")
+    experiment.add_argument(
+        "--cases", required=True, help="Folder with resumes/ and vacancies/ subfolders"
+    )
+    experiment.add_argument("--concurrency", type=int, default=4, help="Parallel generations")
+    experiment.add_argument(
+        "--cache-dir", default=".experiment_cache", help="Result cache folder ('' disables)"
+    )
+    experiment.add_argument("--output", help="Write report and runs as JSON")
+    experiment.set_defaults(handler=run_experiment)
+
+    batch = commands.add_parser(
+        "batch", help="Generate cover letters for a JSONL file of vacancies"
+    )
+    batch.add_argument(
+        "input",
+        help="JSONL lines with job_description, resume or resume_path, and optional "
+        "id, instructions, company_name",
+    )
+    batch.add_argument(
+        "--output", required=True, help="JSONL results; re-running skips completed ids"
+    )
+    batch.add_argument("--concurrency", type=int, default=8, help="Parallel generations")
+    batch.add_argument("--candidates", type=int, default=1, help="Letter variants per item")
+    batch.add_argument("--model", default=DEFAULT_MODEL, help="OpenAI model")
+    batch.add_argument(
+        "--progress-interval", type=float, default=5.0, help="Seconds between progress lines"
+    )
+    batch.add_argument(
+        "--deferred",
+        action="store_true",
+        help="Use the discounted batch API (results within hours; raise --concurrency "
+        "so many items share one batch)",
+    )
+    batch.add_argument(
+        "--poll-interval", type=float, default=60.0, help="Seconds between batch status checks"
+    )
+    batch.set_defaults(handler=run_batch)
+
+    standin = commands.add_parser(
+        "standin", help="Serve a local OpenAI stand-in (set OPENAI_BASE_URL to its /v1)"
+    )
+    standin.add_argument("--host", default="127.0.0.1", help="Bind address")
+    standin.add_argument("--port", type=int, default=8002, help="Port")
+    standin.add_argument(
+        "--latency", type=float, default=0.5, help="Seconds before each completion"
+    )
+    standin.add_argument(
+        "--error-rate", type=float, default=0.0, help="Share of completions failing with 503"
+    )
+    standin.set_defaults(handler=run_standin)
+
+    loadtest = commands.add_parser("loadtest", help="Load-test a running generation API")
+    loadtest.add_argument(
+        "--url", default="http://127.0.0.1:8001/generate", help="Endpoint to POST to"
+    )
+    loadtest.add_argument("--requests", type=int, default=200, help="Total requests")
+    loadtest.add_argument("--concurrency", type=int, default=20, help="Requests in flight")
+    loadtest.add_argument(
+        "--same-payload",
+        action="store_true",
+        help="Send identical requests (measures de-duplication and caches)",
+    )
+    loadtest.set_defaults(handler=run_loadtest)
+
+    revision_bench = commands.add_parser(
+        "revision-bench", help="Compare revising a letter with regenerating it"
+    )
+    revision_bench.add_argument("resume", help="Resume file")
+    revision_bench.add_argument("vacancy", help="Vacancy file")
+    revision_bench.add_argument(
+        "--instruction", default="Сделай письмо короче", help="Edit to apply"
+    )
+    revision_bench.add_argument("--rounds", type=int, default=3, help="Repetitions to average")
+    revision_bench.add_argument("--model", default=DEFAULT_MODEL, help="OpenAI model")
+    revision_bench.set_defaults(handler=run_revision_bench)
+
+    export_bench = commands.add_parser(
+        "export-bench", help="Benchmark PDF/DOCX export throughput at concurrency 1..N"
+    )
+    export_bench.add_argument("letter", help="Text file with a cover letter")
+    export_bench.add_argument(
+        "--formats", nargs="+", choices=["pdf", "docx"], default=["pdf", "docx"]
+    )
+    export_bench.add_argument("--workers", type=int, default=4, help="Worker processes")
+    export_bench.add_argument(
+        "--max-concurrency", type=int, default=8, help="Highest concurrency measured"
+    )
+    export_bench.add_argument(
+        "--exports", type=int, default=100, help="Exports per concurrency level"
+    )
+    export_bench.set_defaults(handler=run_export_bench)
+
+    history_bench = commands.add_parser(
+        "history-bench", help="Benchmark the generation history store at scale"
+    )
+    history_bench.add_argument("db", help="Database file to create (must not exist)")
+    history_bench.add_argument("--rows", type=int, default=1_000_000, help="Letters to store")
+    history_bench.add_argument("--users", type=int, default=10_000, help="Distinct users")
+    history_bench.add_argument("--queries", type=int, default=200, help="Queries of each kind")
+    history_bench.set_defaults(handler=run_history_bench)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Parse arguments and run the selected command."""
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.WARNING,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    return asyncio.run(args.handler(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,240 @@
+"""
+Offline batch generation: JSONL vacancies in, JSONL cover letters out.
+"""
+
+import asyncio
+import json
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterator, Optional, Set, TextIO, Tuple
+
+from pydantic import BaseModel, Field, ValidationError, model_validator
+
+from .metrics import metrics
+
+if TYPE_CHECKING:
+    from .generator import CoverLetterGenerator
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_CONCURRENCY = 8
+PROGRESS_INTERVAL = 5.0
+
+
+class BatchItem(BaseModel):
+    """One input line: a resume reference, a vacancy and instructions."""
+
+    id: str = Field(default="", description="Item id; the line number when empty")
+    resume: Optional[str] = Field(default=None, description="Resume text")
+    resume_path: Optional[str] = Field(
+        default=None, description="Resume file, relative to the input file"
+    )
+    job_description: str = Field(min_length=1, description="Vacancy text")
+    instructions: str = Field(default="", description="Additional instructions")
+    company_name: str = Field(default="", description="Company name override")
+
+    @model_validator(mode="after")
+    def check_resume(self) -> "BatchItem":
+        """Require exactly one resume source."""
+        if bool(self.resume) == bool(self.resume_path):
+            raise ValueError("Set exactly one of resume or resume_path")
+        return self
+
+
+class BatchResult(BaseModel):
+    """One output line."""
+
+    id: str
+    cover_letter: str = ""
+    quality_score: float = 0.0
+    generation_time: float = 0.0
+    fallback_used: bool = False
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    error: Optional[str] = None
+
+
+def completed_ids(output_path: Path) -> Set[str]:
+    """Ids already written without error: the checkpoint of an interrupted run."""
+    done: Set[str] = set()
+    if not output_path.exists():
+        return done
+
+    with output_path.open(encoding="utf-8") as output:
+        for line in output:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut off by an interrupted write
+                continue
+            if isinstance(result, dict) and result.get("id") and not result.get("error"):
+                done.add(str(result["id"]))
+    return done
+
+
+def read_items(input_path: Path) -> Iterator[Tuple[str, Optional[BatchItem], Optional[str]]]:
+    """Stream (id, item, error) tuples from a JSONL file without loading it whole."""
+    with input_path.open(encoding="utf-8") as source:
+        for number, line in enumerate(source, start=1):
+            if not line.strip():
+                continue
+            fallback_id = f"line-{number}"
+            try:
+                data = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield fallback_id, None, f"Invalid JSON on line {number}: {e}"
+                continue
+            try:
+                item = BatchItem(**data)
+            except (TypeError, ValidationError) as e:
+                item_id = data.get("id") if isinstance(data, dict) else None
+                yield str(item_id or fallback_id), None, f"Invalid item on line {number}: {e}"
+                continue
+            yield item.id or fallback_id, item, None
+
+
+class BatchRunner:
+    """
+    Runs a bounded number of generations concurrently over a JSONL stream.
+
+    Results are appended as they complete, so the output file doubles as
+    the checkpoint: a re-run skips ids that already have a letter and
+    retries the ones that failed.
+    """
+
+    def __init__(
+        self,
+        generator: "CoverLetterGenerator",
+        concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+        candidates: int = 1,
+        progress_interval: float = PROGRESS_INTERVAL,
+        progress_stream: Optional[TextIO] = None,
+    ):
+        """Initialize the runner."""
+        self.generator = generator
+        self.concurrency = concurrency
+        self.candidates = candidates
+        self.progress_interval = progress_interval
+        self.progress_stream = progress_stream or sys.stderr
+        self.stats: Dict[str, int] = {"succeeded": 0, "failed": 0, "skipped": 0}
+        self._resumes: Dict[Path, str] = {}
+        self._started = 0.0
+
+    async def run(self, input_path: Path | str, output_path: Path | str) -> Dict[str, Any]:
+        """Process every pending item of the input and return a summary."""
+        input_path, output_path = Path(input_path), Path(output_path)
+        done = completed_ids(output_path)
+        if done:
+            logger.info(f"Resuming batch: {len(done)} items already completed")
+
+        queue: "asyncio.Queue[Optional[Tuple[str, Optional[BatchItem], Optional[str]]]]" = (
+            asyncio.Queue(maxsize=self.concurrency * 2)
+        )
+        self._started = time.perf_counter()
+
+        with output_path.open("a", encoding="utf-8") as output:
+            if output.tell() and not output_path.read_bytes().endswith(b"\n"):
+                # Keep a line cut off by an interrupted run apart from new results
+                output.write("\n")
+
+            async def worker() -> None:
+                while (entry := await queue.get()) is not None:
+                    result = await self._process(*entry, base_dir=input_path.parent)
+                    output.write(result.model_dump_json() + "\n")
+                    output.flush()
+                    self.stats["failed" if result.error else "succeeded"] += 1
+
+            workers = [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+            reporter = asyncio.create_task(self._report_progress())
+            try:
+                for item_id, item, error in read_items(input_path):
+                    if item_id in done:
+                        self.stats["skipped"] += 1
+                        continue
+                    await queue.put((item_id, item, error))
+                for _ in workers:
+                    await queue.put(None)
+                await asyncio.gather(*workers)
+            finally:
+                reporter.cancel()
+                for task in workers:
+                    task.cancel()
+
+        summary = self.summary()
+        self._print(self._format_progress(summary, final=True))
+        return summary
+
+    def summary(self) -> Dict[str, Any]:
+        """Counts, elapsed time and throughput so far."""
+        elapsed = time.perf_counter() - self._started if self._started else 0.0
+        processed = self.stats["succeeded"] + self.stats["failed"]
+        return {
+            **self.stats,
+            "elapsed": elapsed,
+            "items_per_minute": processed / elapsed * 60 if elapsed else 0.0,
+            "latency": metrics.summary("batch.item_seconds"),
+        }
+
+    async def _process(
+        self, item_id: str, item: Optional[BatchItem], error: Optional[str], base_dir: Path
+    ) -> BatchResult:
+        """Generate one letter; errors become result lines, never exceptions."""
+        if item is None:
+            return BatchResult(id=item_id, error=error)
+
+        started = time.perf_counter()
+        try:
+            resume = item.resume or self._load_resume(base_dir / (item.resume_path or ""))
+            result = await self.generator.generate(
+                resume=resume,
+                job_description=item.job_description,
+                company_name=item.company_name,
+                special_requirements=item.instructions,
+                candidates=self.candidates,
+            )
+        except Exception as e:
+            logger.error(f"Batch item {item_id} failed: {e}")
+            return BatchResult(
+                id=item_id, generation_time=time.perf_counter() - started, error=str(e)
+            )
+
+        metrics.observe("batch.item_seconds", time.perf_counter() - started)
+        usage = result.metadata.get("usage") or {}
+        return BatchResult(
+            id=item_id,
+            cover_letter=result.cover_letter,
+            quality_score=result.quality_score,
+            generation_time=result.generation_time,
+            fallback_used=bool(result.metadata.get("fallback_used", False)),
+            prompt_tokens=usage.get("prompt_tokens", 0),
+            completion_tokens=usage.get("completion_tokens", 0),
+        )
+
+    def _load_resume(self, path: Path) -> str:
+        """Read a resume file once per run."""
+        if path not in self._resumes:
+            self._resumes[path] = path.read_text(encoding="utf-8")
+        return self._resumes[path]
+
+    async def _report_progress(self) -> None:
+        """Print a throughput line every progress interval."""
+        while True:
+            await asyncio.sleep(self.progress_interval)
+            self._print(self._format_progress(self.summary()))
+
+    def _format_progress(self, summary: Dict[str, Any], final: bool = False) -> str:
+        """Render a one-line progress summary."""
+        prefix = "done" if final else "progress"
+        return (
+            f"[batch {prefix}] ok={summary['succeeded']} failed={summary['failed']} "
+            f"skipped={summary['skipped']} elapsed={summary['elapsed']:.0f}s "
+            f"rate={summary['items_per_minute']:.1f}/min "
+            f"p50={summary['latency']['p50']:.1f}s"
+        )
+
+    def _print(self, line: str) -> None:
+        """Write a progress line."""
+        print(line, file=self.progress_stream, flush=True)
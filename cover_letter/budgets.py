@@ -0,0 +1,42 @@
+"""
+Output token budgets derived from the target letter length and language.
+"""
+
+import re
+from typing import Optional
+
+from .prompts import OUTPUT_TOKEN_HEADROOM, TOKENS_PER_WORD
+
+_CYRILLIC = re.compile(r"[а-яё]", re.IGNORECASE)
+_LATIN = re.compile(r"[a-z]", re.IGNORECASE)
+# "150-200 слов", "не длиннее 200 слов", "up to 300 words"
+_WORD_LIMIT = re.compile(r"(\d{2,4})\s*(?:[-–—]\s*(\d{2,4})\s*)?(?:слов|words)", re.IGNORECASE)
+_SENTENCE_END = re.compile(r"[.!?…](?=\s|$)")
+
+
+def detect_language(text: str) -> str:
+    """Return "ru" when Cyrillic letters dominate, otherwise "en"."""
+    cyrillic = len(_CYRILLIC.findall(text))
+    latin = len(_LATIN.findall(text))
+    return "ru" if cyrillic >= latin else "en"
+
+
+def target_word_limit(prompt: str, default: int) -> int:
+    """Largest word count a prompt asks for, or the default if it names none."""
+    limits = [int(high or low) for low, high in _WORD_LIMIT.findall(prompt)]
+    return max(limits) if limits else default
+
+
+def output_token_budget(max_words: int, language: str) -> int:
+    """max_tokens for an output of up to max_words, with headroom for overruns."""
+    tokens_per_word = TOKENS_PER_WORD.get(language, TOKENS_PER_WORD["en"])
+    return int(max_words * tokens_per_word * OUTPUT_TOKEN_HEADROOM)
+
+
+def trim_to_sentence(text: str) -> Optional[str]:
+    """Drop a trailing unfinished sentence; None if no sentence is complete."""
+    text = text.rstrip()
+    ends = list(_SENTENCE_END.finditer(text))
+    if not ends:
+        return None
+    return text[: ends[-1].end()]
@@ -0,0 +1,248 @@
+"""
+Record and replay LLM traffic for deterministic benchmarks and regression tests.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import defaultdict
+from pathlib import Path
+from types import SimpleNamespace
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from openai import OpenAIError
+
+from .metrics import MetricsRegistry, metrics
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Request options that do not change the response content
+UNMATCHED_REQUEST_KEYS = {"stream_options", "timeout", "extra_headers"}
+
+
+class CassetteError(OpenAIError):
+    """A request has no recording, or replays a recorded API error."""
+
+    pass
+
+
+def request_key(body: Dict[str, Any]) -> str:
+    """Key of a chat completion request: hash of its canonical JSON."""
+    matched = {key: value for key, value in body.items() if key not in UNMATCHED_REQUEST_KEYS}
+    canonical = json.dumps(matched, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _dump(value: Any) -> Any:
+    """JSON form of an API object as the server sent it."""
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json", exclude_unset=True)
+    return value
+
+
+class _RecordingStream:
+    """Pass-through stream that records chunks with their offsets."""
+
+    def __init__(self, stream: Any, recorder: "CassetteRecorder", entry: Dict[str, Any]):
+        self._stream = stream
+        self._recorder = recorder
+        self._entry = entry
+        self._started = time.perf_counter() - entry["elapsed"]
+        self._saved = False
+
+    def __aiter__(self) -> "_RecordingStream":
+        return self
+
+    async def __anext__(self) -> Any:
+        try:
+            chunk = await self._stream.__anext__()
+        except StopAsyncIteration:
+            self._entry["complete"] = True
+            self._save()
+            raise
+        self._entry["chunks"].append(
+            {"offset": time.perf_counter() - self._started, "chunk": _dump(chunk)}
+        )
+        return chunk
+
+    async def close(self) -> None:
+        """Close the underlying stream and write what was read."""
+        await self._stream.close()
+        self._save()
+
+    def _save(self) -> None:
+        if not self._saved:
+            self._saved = True
+            self._recorder.write(self._entry)
+
+
+class _RecordingCompletions:
+    """Drop-in for client.chat.completions that records every call."""
+
+    def __init__(self, owner: "CassetteRecorder"):
+        self._owner = owner
+
+    async def create(self, **kwargs: Any) -> Any:
+        """Forward the request and record the response."""
+        return await self._owner.record(kwargs)
+
+
+class CassetteRecorder:
+    """
+    Chat completions client that forwards to a real client and appends every
+    request/response pair to a JSONL cassette. Streamed responses keep each
+    chunk with its offset from the request start; other attributes (models,
+    close) are passed through to the wrapped client.
+    """
+
+    def __init__(
+        self,
+        client: "AsyncOpenAI",
+        path: Path | str,
+        registry: Optional[MetricsRegistry] = None,
+    ):
+        """Initialize the recorder."""
+        self.client = client
+        self.path = Path(path)
+        self.registry = registry or metrics
+        self.chat = SimpleNamespace(completions=_RecordingCompletions(self))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.client, name)
+
+    async def record(self, body: Dict[str, Any]) -> Any:
+        """Run one request against the wrapped client and record it."""
+        entry: Dict[str, Any] = {"key": request_key(body), "request": body}
+        started = time.perf_counter()
+        try:
+            response = await self.client.chat.completions.create(**body)
+        except Exception as e:
+            entry["elapsed"] = time.perf_counter() - started
+            entry["error"] = {"type": type(e).__name__, "message": str(e)}
+            self.write(entry)
+            raise
+
+        entry["elapsed"] = time.perf_counter() - started
+        if body.get("stream"):
+            entry.update(chunks=[], complete=False)
+            return _RecordingStream(response, self, entry)
+        entry["response"] = _dump(response)
+        self.write(entry)
+        return response
+
+    def write(self, entry: Dict[str, Any]) -> None:
+        """Append one interaction to the cassette."""
+        with self.path.open("a", encoding="utf-8") as cassette:
+            cassette.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+        self.registry.increment("cassette.recorded")
+
+
+class _ReplayStream:
+    """Stream of recorded chunks, optionally paced like the original."""
+
+    def __init__(self, chunks: List[Dict[str, Any]], delay_factor: float, started: float):
+        from openai.types.chat import ChatCompletionChunk
+
+        self._chunk_type = ChatCompletionChunk
+        self._chunks = chunks
+        self._delay_factor = delay_factor
+        self._started = started
+        self._position = 0
+
+    def __aiter__(self) -> "_ReplayStream":
+        return self
+
+    async def __anext__(self) -> Any:
+        if self._position >= len(self._chunks):
+            raise StopAsyncIteration
+        recorded = self._chunks[self._position]
+        self._position += 1
+        if self._delay_factor:
+            due = self._started + recorded["offset"] * self._delay_factor
+            await asyncio.sleep(max(0.0, due - time.perf_counter()))
+        return self._chunk_type.model_validate(recorded["chunk"])
+
+    async def close(self) -> None:
+        """Nothing to release."""
+        pass
+
+
+class _ReplayCompletions:
+    """Drop-in for client.chat.completions that answers from a cassette."""
+
+    def __init__(self, owner: "CassettePlayer"):
+        self._owner = owner
+
+    async def create(self, **kwargs: Any) -> Any:
+        """Return the recorded response for the request."""
+        return await self._owner.replay(kwargs)
+
+
+class CassettePlayer:
+    """
+    Chat completions client that answers from a recorded cassette.
+
+    Requests are matched by content; repeated identical requests take the
+    recordings in order and wrap around. With delay_factor=0 responses are
+    immediate; 1.0 reproduces the recorded latency and chunk timing.
+    """
+
+    def __init__(
+        self,
+        path: Path | str,
+        delay_factor: float = 0.0,
+        registry: Optional[MetricsRegistry] = None,
+    ):
+        """Load the cassette."""
+        self.path = Path(path)
+        self.delay_factor = delay_factor
+        self.registry = registry or metrics
+        self.chat = SimpleNamespace(completions=_ReplayCompletions(self))
+
+        self._entries: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self._positions: Dict[str, int] = defaultdict(int)
+        with self.path.open(encoding="utf-8") as cassette:
+            for line in cassette:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._entries[entry["key"]].append(entry)
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._entries.values())
+
+    async def replay(self, body: Dict[str, Any]) -> Any:
+        """Find the recording of a request and play it back."""
+        from openai.types.chat import ChatCompletion
+
+        key = request_key(body)
+        entries = self._entries.get(key)
+        if not entries:
+            self.registry.increment("cassette.misses")
+            raise CassetteError(f"No recording for request {key[:12]} in {self.path}")
+
+        entry = entries[self._positions[key] % len(entries)]
+        self._positions[key] += 1
+        self.registry.increment("cassette.replayed")
+
+        started = time.perf_counter()
+        if "chunks" in entry:
+            # Chunk offsets include the time to the first chunk
+            return _ReplayStream(entry["chunks"], self.delay_factor, started)
+
+        if self.delay_factor:
+            await asyncio.sleep(entry["elapsed"] * self.delay_factor)
+        if "error" in entry:
+            error = entry["error"]
+            raise CassetteError(f"{error['type']}: {error['message']}")
+        return ChatCompletion.model_validate(entry["response"])
+
+    async def close(self) -> None:
+        """Nothing to release."""
+        pass
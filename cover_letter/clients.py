@@ -0,0 +1,58 @@
+"""
+Deferred construction of API clients.
+"""
+
+import os
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+    from .providers import ProviderRouter
+
+# Path to a JSON file listing providers; when set, requests are routed across them
+LLM_PROVIDERS = os.getenv("LLM_PROVIDERS", "")
+
+# Connection pool size and request timeout; overridable for serving deployments
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "60"))
+
+
+def create_openai_client(
+    api_key: Optional[str] = None,
+    max_connections: int = OPENAI_MAX_CONNECTIONS,
+    timeout: float = OPENAI_TIMEOUT,
+) -> "AsyncOpenAI":
+    """
+    Create an OpenAI client; the key defaults to OPENAI_API_KEY and the
+    endpoint to OPENAI_BASE_URL (e.g. a local stand-in server).
+    openai is imported here, so callers pay for it only when a client is needed.
+    """
+    import httpx
+    from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise ValueError("OPENAI_API_KEY environment variable is required")
+    return AsyncOpenAI(
+        api_key=api_key,
+        timeout=timeout,
+        http_client=DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=max_connections, max_keepalive_connections=max_connections
+            )
+        ),
+    )
+
+
+def create_llm_client(providers_file: str = LLM_PROVIDERS) -> "AsyncOpenAI | ProviderRouter":
+    """
+    Client for the generator: a router over the providers listed in
+    LLM_PROVIDERS if it is set, otherwise a plain OpenAI client.
+    """
+    if not providers_file:
+        return create_openai_client()
+
+    from .providers import ProviderRouter, load_providers
+
+    return ProviderRouter(load_providers(providers_file))
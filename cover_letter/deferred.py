@@ -0,0 +1,208 @@
+"""
+Deferred execution through the provider batch API for non-interactive generation.
+"""
+
+import asyncio
+import json
+import logging
+from types import SimpleNamespace
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from openai import OpenAIError
+
+from .metrics import MetricsRegistry, metrics
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+    from .generator import CoverLetterGenerator
+    from .models import CoverLetterResult
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Requests arriving within this window are packed into one batch file
+BATCH_COLLECT_WINDOW = 2.0
+BATCH_POLL_INTERVAL = 60.0
+BATCH_COMPLETION_WINDOW = "24h"
+# Provider limit on requests per batch file
+MAX_BATCH_REQUESTS = 50_000
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_FINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+class DeferredBatchError(OpenAIError):
+    """A deferred request failed or its batch did not complete."""
+
+    pass
+
+
+class _DeferredCompletions:
+    """Drop-in for client.chat.completions that queues requests into batches."""
+
+    def __init__(self, owner: "DeferredBatchClient"):
+        self._owner = owner
+
+    async def create(self, **kwargs: Any) -> Any:
+        """Queue a chat completion request and wait for its batch result."""
+        return await self._owner.submit(kwargs)
+
+
+class DeferredBatchClient:
+    """
+    Chat completions client backed by the batch API.
+
+    It exposes chat.completions.create like AsyncOpenAI, so a regular
+    CoverLetterGenerator runs on it unchanged: concurrent generations queue
+    their stage requests, which are packed into one batch submission per
+    collect window, polled until complete and mapped back to each caller.
+    Each pipeline stage (keywords, letter, fix-up) is one batch round.
+    """
+
+    def __init__(
+        self,
+        client: "AsyncOpenAI",
+        collect_window: float = BATCH_COLLECT_WINDOW,
+        poll_interval: float = BATCH_POLL_INTERVAL,
+        completion_window: str = BATCH_COMPLETION_WINDOW,
+        max_batch_requests: int = MAX_BATCH_REQUESTS,
+        registry: Optional[MetricsRegistry] = None,
+    ):
+        """Initialize the client."""
+        self.client = client
+        self.collect_window = collect_window
+        self.poll_interval = poll_interval
+        self.completion_window = completion_window
+        self.max_batch_requests = max_batch_requests
+        self.registry = registry or metrics
+        self.chat = SimpleNamespace(completions=_DeferredCompletions(self))
+
+        self._pending: List[Tuple[Dict[str, Any], "asyncio.Future[Any]"]] = []
+        self._flush_task: Optional["asyncio.Task[None]"] = None
+        self._batch_tasks: set["asyncio.Task[None]"] = set()
+        self._next_id = 0
+
+    async def submit(self, body: Dict[str, Any]) -> Any:
+        """Queue one request body and wait for its completion."""
+        future: "asyncio.Future[Any]" = asyncio.get_running_loop().create_future()
+        self._pending.append((body, future))
+        self.registry.increment("deferred.requests")
+
+        if len(self._pending) >= self.max_batch_requests:
+            self._flush_now()
+        elif self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_after_window())
+        return await future
+
+    async def close(self) -> None:
+        """Wait for submitted batches to finish."""
+        if self._flush_task is not None:
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+        if self._batch_tasks:
+            await asyncio.gather(*self._batch_tasks, return_exceptions=True)
+
+    async def _flush_after_window(self) -> None:
+        """Collect requests for the window, then submit them."""
+        await asyncio.sleep(self.collect_window)
+        self._flush_task = None
+        self._flush_now()
+
+    def _flush_now(self) -> None:
+        """Start a batch with everything queued so far."""
+        requests, self._pending = self._pending, []
+        if self._flush_task is not None and self._flush_task is not asyncio.current_task():
+            self._flush_task.cancel()
+            self._flush_task = None
+        if not requests:
+            return
+        task = asyncio.create_task(self._run_batch(requests))
+        self._batch_tasks.add(task)
+        task.add_done_callback(self._batch_tasks.discard)
+
+    async def _run_batch(
+        self, requests: List[Tuple[Dict[str, Any], "asyncio.Future[Any]"]]
+    ) -> None:
+        """Upload, create, poll and resolve one batch."""
+        futures: Dict[str, "asyncio.Future[Any]"] = {}
+        lines = []
+        for body, future in requests:
+            custom_id = f"req-{self._next_id}"
+            self._next_id += 1
+            futures[custom_id] = future
+            lines.append(
+                json.dumps(
+                    {"custom_id": custom_id, "method": "POST", "url": BATCH_ENDPOINT, "body": body},
+                    ensure_ascii=False,
+                )
+            )
+
+        try:
+            batch_file = await self.client.files.create(
+                file=("batch.jsonl", "\n".join(lines).encode("utf-8")), purpose="batch"
+            )
+            batch = await self.client.batches.create(
+                input_file_id=batch_file.id,
+                endpoint=BATCH_ENDPOINT,
+                completion_window=self.completion_window,
+            )
+            self.registry.increment("deferred.batches")
+            logger.info(f"Submitted batch {batch.id} with {len(lines)} requests")
+
+            while batch.status not in BATCH_FINAL_STATUSES:
+                await asyncio.sleep(self.poll_interval)
+                batch = await self.client.batches.retrieve(batch.id)
+
+            logger.info(f"Batch {batch.id} finished with status {batch.status}")
+            for file_id in (batch.output_file_id, batch.error_file_id):
+                if file_id:
+                    content = await self.client.files.content(file_id)
+                    self._resolve(content.text, futures)
+        except Exception as e:
+            logger.error(f"Batch submission failed: {e}")
+            self._fail_all(futures, DeferredBatchError(f"Batch failed: {e}"))
+            return
+
+        self._fail_all(futures, DeferredBatchError(f"Batch ended with status {batch.status}"))
+
+    def _resolve(self, text: str, futures: Dict[str, "asyncio.Future[Any]"]) -> None:
+        """Map output or error lines back to waiting callers."""
+        from openai.types.chat import ChatCompletion
+
+        for line in text.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            future = futures.pop(record.get("custom_id", ""), None)
+            if future is None or future.done():
+                continue
+
+            response = record.get("response") or {}
+            if record.get("error") or response.get("status_code", 500) >= 400:
+                error = record.get("error") or response.get("body", {}).get("error")
+                self.registry.increment("deferred.errors")
+                future.set_exception(DeferredBatchError(f"Batch request failed: {error}"))
+            else:
+                future.set_result(ChatCompletion.model_validate(response["body"]))
+
+    def _fail_all(self, futures: Dict[str, "asyncio.Future[Any]"], error: Exception) -> None:
+        """Fail requests that got no result."""
+        for future in futures.values():
+            if not future.done():
+                self.registry.increment("deferred.errors")
+                future.set_exception(error)
+        futures.clear()
+
+
+async def generate_deferred(
+    generator: "CoverLetterGenerator", requests: List[Dict[str, Any]]
+) -> List["CoverLetterResult"]:
+    """
+    Run generator.generate(**request) for every request through the batch API.
+    The generator must be built on a DeferredBatchClient.
+    """
+    if not isinstance(generator.client, DeferredBatchClient):
+        raise ValueError("Generator must use a DeferredBatchClient")
+    try:
+        return list(await asyncio.gather(*(generator.generate(**request) for request in requests)))
+    finally:
+        await generator.client.close()
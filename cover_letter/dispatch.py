@@ -0,0 +1,102 @@
+"""
+Concurrent update dispatch with per-user ordering.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Hashable, Optional, TypeVar
+
+from .metrics import MetricsRegistry, metrics
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Users whose updates are handled at the same time
+DISPATCH_MAX_CONCURRENCY = 64
+# Updates of one user that may wait behind the one being handled
+DISPATCH_MAX_PENDING_PER_USER = 10
+
+
+class UserQueueFullError(Exception):
+    """Too many updates of one user are already waiting."""
+
+    pass
+
+
+class _UserSlot:
+    """Ordering lock and number of pending updates of one user."""
+
+    def __init__(self):
+        # asyncio.Lock wakes waiters in FIFO order, which keeps arrival order
+        self.lock = asyncio.Lock()
+        self.pending = 0
+
+
+class OrderedDispatcher:
+    """
+    Runs update handlers so that different users proceed in parallel (up to
+    max_concurrency at a time) while updates of the same user run one at a
+    time in the order run() was called. At most max_pending updates of a
+    user are admitted; further ones raise UserQueueFullError.
+
+    Order is preserved as long as callers reach run() in arrival order,
+    e.g. one task per update created in the order updates were received.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = DISPATCH_MAX_CONCURRENCY,
+        max_pending: int = DISPATCH_MAX_PENDING_PER_USER,
+        registry: Optional[MetricsRegistry] = None,
+    ):
+        """Initialize the dispatcher."""
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_pending
+        self.registry = registry or metrics
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._slots: Dict[Hashable, _UserSlot] = {}
+        self._running = 0
+
+    def pending(self, key: Hashable) -> int:
+        """Updates of a user admitted and not finished yet."""
+        slot = self._slots.get(key)
+        return slot.pending if slot else 0
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Users with pending updates, updates running and updates admitted."""
+        return {
+            "users": len(self._slots),
+            "running": self._running,
+            "pending": sum(slot.pending for slot in self._slots.values()),
+        }
+
+    async def run(self, key: Hashable, call: Callable[[], Awaitable[T]]) -> T:
+        """Run call() after earlier updates of the same user have finished."""
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._slots[key] = _UserSlot()
+        if slot.pending >= self.max_pending:
+            self.registry.increment("dispatch.rejected")
+            raise UserQueueFullError(f"{slot.pending} updates of {key} are already pending")
+
+        slot.pending += 1
+        queued_at = time.perf_counter()
+        try:
+            async with slot.lock:
+                async with self._semaphore:
+                    self.registry.observe("dispatch.wait_seconds", time.perf_counter() - queued_at)
+                    self._running += 1
+                    self.registry.set_gauge("dispatch.running", self._running)
+                    try:
+                        return await call()
+                    finally:
+                        self._running -= 1
+                        self.registry.set_gauge("dispatch.running", self._running)
+        finally:
+            slot.pending -= 1
+            if slot.pending == 0 and self._slots.get(key) is slot:
+                del self._slots[key]
@@ -0,0 +1,297 @@
+"""
+Prompt experiment runner: every prompt variant against every test case.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+from .metrics import percentile
+from .prompts import COVER_LETTER_TEMPERATURE, DEFAULT_MODEL
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+    from .generator import CoverLetterGenerator
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 4
+# Cell results kept in memory; older ones are reloaded from cache_dir if set
+MEMORY_CACHE_SIZE = 1000
+CASE_FILE_SUFFIXES = (".md", ".txt")
+
+# USD per 1M tokens: (input, output)
+MODEL_PRICES_PER_1M: Dict[str, tuple] = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00),
+}
+
+
+class PromptVariant(BaseModel):
+    """One prompt configuration under test."""
+
+    name: str = Field(description="Variant name used in the report")
+    system_prompt: Optional[str] = Field(default=None, description="Cover letter system prompt")
+    keyword_prompt: Optional[str] = Field(default=None, description="Keyword extraction prompt")
+    model: str = Field(default=DEFAULT_MODEL, description="OpenAI model")
+    temperature: float = Field(default=COVER_LETTER_TEMPERATURE, description="Letter temperature")
+
+
+class ExperimentCase(BaseModel):
+    """A resume and vacancy pair."""
+
+    name: str = Field(description="Case name used in the report")
+    resume: str = Field(description="Resume text")
+    job_description: str = Field(description="Vacancy text")
+
+
+class ExperimentRun(BaseModel):
+    """Outcome of one variant on one case."""
+
+    variant: str
+    case: str
+    latency: float = Field(ge=0.0, description="Generation time in seconds")
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost: float = Field(default=0.0, description="Estimated cost in USD")
+    quality_score: float = 0.0
+    fallback_used: bool = False
+    cached: bool = False
+    error: Optional[str] = None
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Estimate request cost in USD from the price table."""
+    input_price, output_price = MODEL_PRICES_PER_1M.get(model, (0.0, 0.0))
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+
+def load_cases(folder: Path | str) -> List[ExperimentCase]:
+    """
+    Load cases from a folder with resumes/ and vacancies/ subfolders.
+    Every vacancy is paired with every resume.
+    """
+    folder = Path(folder)
+
+    def read_texts(subfolder: str) -> Dict[str, str]:
+        path = folder / subfolder
+        if not path.is_dir():
+            raise ValueError(f"Missing folder: {path}")
+        return {
+            file.stem: file.read_text(encoding="utf-8")
+            for file in sorted(path.iterdir())
+            if file.suffix in CASE_FILE_SUFFIXES
+        }
+
+    resumes = read_texts("resumes")
+    vacancies = read_texts("vacancies")
+    return [
+        ExperimentCase(name=f"{vacancy_name}/{resume_name}", resume=resume, job_description=vacancy)
+        for vacancy_name, vacancy in vacancies.items()
+        for resume_name, resume in resumes.items()
+    ]
+
+
+def check_variant_names(variants: List[PromptVariant]) -> List[PromptVariant]:
+    """Reject variants sharing a name: they would share a generator and a report row."""
+    names = [variant.name for variant in variants]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate variant names: {', '.join(duplicates)}")
+    return variants
+
+
+def load_variants(path: Path | str) -> List[PromptVariant]:
+    """Load prompt variants from a JSON list."""
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    return check_variant_names([PromptVariant(**item) for item in data])
+
+
+class ExperimentRunner:
+    """
+    Runs the prompt x case matrix concurrently with a concurrency limit.
+
+    Results are cached by variant and case content, in memory (the most
+    recent memory_cache_size cells) and optionally on disk, so re-running an
+    experiment only pays for changed cells.
+    """
+
+    def __init__(
+        self,
+        client: "AsyncOpenAI",
+        concurrency: int = DEFAULT_CONCURRENCY,
+        cache_dir: Optional[Path | str] = None,
+        memory_cache_size: int = MEMORY_CACHE_SIZE,
+    ):
+        """Initialize the runner."""
+        self.client = client
+        self.concurrency = concurrency
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.memory_cache_size = memory_cache_size
+        self._cache: "OrderedDict[str, ExperimentRun]" = OrderedDict()
+        if self.cache_dir:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    async def run(
+        self,
+        variants: List[PromptVariant],
+        cases: List[ExperimentCase],
+        concurrency: Optional[int] = None,
+    ) -> List[ExperimentRun]:
+        """Run every variant on every case, at most concurrency cells at a time."""
+        from .generator import CoverLetterGenerator
+
+        semaphore = asyncio.Semaphore(concurrency or self.concurrency)
+        generators = {
+            variant.name: CoverLetterGenerator(
+                self.client, model=variant.model, temperature=variant.temperature
+            )
+            for variant in variants
+        }
+
+        async def run_cell(variant: PromptVariant, case: ExperimentCase) -> ExperimentRun:
+            async with semaphore:
+                return await self._run_cell(generators[variant.name], variant, case)
+
+        logger.info(f"Running {len(variants)} variants x {len(cases)} cases")
+        return list(
+            await asyncio.gather(
+                *(run_cell(variant, case) for variant in variants for case in cases)
+            )
+        )
+
+    async def _run_cell(
+        self, generator: "CoverLetterGenerator", variant: PromptVariant, case: ExperimentCase
+    ) -> ExperimentRun:
+        """Run one cell, using the cache when possible."""
+        key = self._cache_key(variant, case)
+        cached = self._load_cached(key)
+        if cached is not None:
+            return cached.model_copy(update={"variant": variant.name, "case": case.name})
+
+        started = time.perf_counter()
+        try:
+            result = await generator.generate(
+                resume=case.resume,
+                job_description=case.job_description,
+                custom_system_prompt=variant.system_prompt,
+                custom_keyword_prompt=variant.keyword_prompt,
+            )
+        except Exception as e:
+            logger.error(f"Experiment cell {variant.name} x {case.name} failed: {e}")
+            return ExperimentRun(
+                variant=variant.name,
+                case=case.name,
+                latency=time.perf_counter() - started,
+                error=str(e),
+            )
+
+        usage = result.metadata.get("usage") or {}
+        prompt_tokens = usage.get("prompt_tokens", 0)
+        completion_tokens = usage.get("completion_tokens", 0)
+        run = ExperimentRun(
+            variant=variant.name,
+            case=case.name,
+            latency=time.perf_counter() - started,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            cost=estimate_cost(variant.model, prompt_tokens, completion_tokens),
+            quality_score=result.quality_score,
+            fallback_used=bool(result.metadata.get("fallback_used", False)),
+        )
+        # Fallback runs usually mean transient API errors: do not pin them in the cache
+        if not run.fallback_used:
+            self._store_cached(key, run)
+        return run
+
+    def _cache_key(self, variant: PromptVariant, case: ExperimentCase) -> str:
+        """Content hash of everything that affects the cell result."""
+        content = json.dumps(
+            [
+                variant.model_dump(exclude={"name"}),
+                case.model_dump(exclude={"name"}),
+            ],
+            ensure_ascii=False,
+            sort_keys=True,
+        )
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def _load_cached(self, key: str) -> Optional[ExperimentRun]:
+        """Get a cached run from memory or disk."""
+        run = self._cache.get(key)
+        if run is not None:
+            self._cache.move_to_end(key)
+        elif self.cache_dir:
+            path = self.cache_dir / f"{key}.json"
+            if path.exists():
+                run = ExperimentRun.model_validate_json(path.read_text(encoding="utf-8"))
+                self._remember(key, run)
+        return run.model_copy(update={"cached": True}) if run else None
+
+    def _remember(self, key: str, run: ExperimentRun) -> None:
+        """Keep a run in memory, dropping the least recently used beyond the limit."""
+        self._cache[key] = run
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.memory_cache_size:
+            _ = self._cache.popitem(last=False)
+
+    def _store_cached(self, key: str, run: ExperimentRun) -> None:
+        """Cache a completed run."""
+        self._remember(key, run)
+        if self.cache_dir:
+            (self.cache_dir / f"{key}.json").write_text(run.model_dump_json(), encoding="utf-8")
+
+
+def build_report(runs: List[ExperimentRun]) -> Dict[str, Dict[str, Any]]:
+    """Aggregate runs per variant: latency percentiles, tokens, cost, quality, fallbacks."""
+    by_variant: Dict[str, List[ExperimentRun]] = {}
+    for run in runs:
+        by_variant.setdefault(run.variant, []).append(run)
+
+    report: Dict[str, Dict[str, Any]] = {}
+    for variant, variant_runs in by_variant.items():
+        succeeded = [run for run in variant_runs if run.error is None]
+        fresh = [run for run in succeeded if not run.cached]
+        latencies = sorted(run.latency for run in fresh)
+        count = len(succeeded) or 1
+        report[variant] = {
+            "runs": len(variant_runs),
+            "errors": len(variant_runs) - len(succeeded),
+            "cached": len(succeeded) - len(fresh),
+            "latency_p50": percentile(latencies, 0.50),
+            "latency_p95": percentile(latencies, 0.95),
+            "prompt_tokens": sum(run.prompt_tokens for run in succeeded),
+            "completion_tokens": sum(run.completion_tokens for run in succeeded),
+            "cost": sum(run.cost for run in succeeded),
+            "quality_mean": sum(run.quality_score for run in succeeded) / count,
+            "fallback_rate": sum(run.fallback_used for run in succeeded) / count,
+        }
+    return report
+
+
+def format_report(report: Dict[str, Dict[str, Any]]) -> str:
+    """Render the report as a plain text table."""
+    header = (
+        f"{'variant':<20} {'runs':>5} {'p50 s':>7} {'p95 s':>7} {'tokens in':>10} "
+        f"{'tokens out':>10} {'cost $':>9} {'quality':>8} {'fallback':>9}"
+    )
+    lines = [header, "-" * len(header)]
+    for variant, row in report.items():
+        lines.append(
+            f"{variant[:20]:<20} {row['runs']:>5} {row['latency_p50']:>7.2f} "
+            f"{row['latency_p95']:>7.2f} {row['prompt_tokens']:>10} "
+            f"{row['completion_tokens']:>10} {row['cost']:>9.4f} "
+            f"{row['quality_mean']:>8.2f} {row['fallback_rate']:>9.0%}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,495 @@
+"""
+PDF and DOCX export of cover letters, rendered in a process pool.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import re
+import struct
+import time
+import zipfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from typing import Any, Dict, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+from .metrics import MetricsRegistry, metrics
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ("pdf", "docx")
+EXPORT_MEDIA_TYPES = {
+    "pdf": "application/pdf",
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+}
+# Rendering is CPU-bound: one worker per core, and a bounded backlog beyond that
+EXPORT_WORKERS = max(1, min(4, os.cpu_count() or 1))
+EXPORT_MAX_PENDING = 32
+# TrueType font embedded in PDFs (must cover Cyrillic); EXPORT_FONT overrides
+EXPORT_FONT_PATHS = (
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/TTF/DejaVuSans.ttf",
+    "/System/Library/Fonts/Supplemental/Arial.ttf",
+    "C:/Windows/Fonts/arial.ttf",
+)
+
+# Page layout in points (A4, 2.5 cm margins)
+PAGE_WIDTH = 595.0
+PAGE_HEIGHT = 842.0
+PAGE_MARGIN = 72.0
+FONT_SIZE = 11.0
+LINE_HEIGHT = 15.0
+# Word processing documents name a font instead of embedding one
+DOCX_FONT = "Arial"
+
+
+class ExportError(Exception):
+    """A letter could not be exported."""
+
+    pass
+
+
+class ExportQueueFullError(ExportError):
+    """Too many exports are already waiting for a worker."""
+
+    pass
+
+
+def find_font() -> Optional[str]:
+    """Path of the TrueType font for PDFs, or None when none is installed."""
+    configured = os.getenv("EXPORT_FONT")
+    if configured:
+        return configured
+    return next((path for path in EXPORT_FONT_PATHS if os.path.isfile(path)), None)
+
+
+class TrueTypeFont:
+    """Glyph ids, advance widths and metrics of a TrueType font file."""
+
+    def __init__(self, path: str):
+        """Parse the tables needed to lay out and embed text."""
+        with open(path, "rb") as font_file:
+            self.data = font_file.read()
+        self.name = re.sub(r"[^A-Za-z0-9-]", "", os.path.splitext(os.path.basename(path))[0])
+
+        num_tables = struct.unpack_from(">H", self.data, 4)[0]
+        tables: Dict[bytes, int] = {}
+        for index in range(num_tables):
+            tag, _, offset, _ = struct.unpack_from(">4sIII", self.data, 12 + 16 * index)
+            tables[tag] = offset
+        missing = {b"head", b"hhea", b"hmtx", b"cmap"} - set(tables)
+        if missing:
+            raise ExportError(f"Font {path} lacks tables {sorted(missing)}")
+
+        head = tables[b"head"]
+        self.units_per_em = struct.unpack_from(">H", self.data, head + 18)[0]
+        self.bbox = struct.unpack_from(">4h", self.data, head + 36)
+        hhea = tables[b"hhea"]
+        self.ascent, self.descent = struct.unpack_from(">2h", self.data, hhea + 4)
+        metric_count = struct.unpack_from(">H", self.data, hhea + 34)[0]
+        self.advances = [
+            struct.unpack_from(">H", self.data, tables[b"hmtx"] + 4 * index)[0]
+            for index in range(metric_count)
+        ]
+        self.glyphs = self._read_cmap(tables[b"cmap"])
+
+    def _read_cmap(self, cmap: int) -> Dict[int, int]:
+        """Unicode code point to glyph id, from a format 4 or 12 subtable."""
+        count = struct.unpack_from(">H", self.data, cmap + 2)[0]
+        subtables = {}
+        for index in range(count):
+            platform, encoding, offset = struct.unpack_from(">HHI", self.data, cmap + 4 + 8 * index)
+            subtables[(platform, encoding)] = cmap + offset
+
+        glyphs: Dict[int, int] = {}
+        for key in ((3, 10), (0, 4), (3, 1), (0, 3)):
+            if key not in subtables:
+                continue
+            start = subtables[key]
+            table_format = struct.unpack_from(">H", self.data, start)[0]
+            if table_format == 12:
+                groups = struct.unpack_from(">I", self.data, start + 12)[0]
+                for group in range(groups):
+                    first, last, glyph = struct.unpack_from(
+                        ">III", self.data, start + 16 + 12 * group
+                    )
+                    for code in range(first, last + 1):
+                        glyphs[code] = glyph + code - first
+                return glyphs
+            if table_format == 4:
+                segments = struct.unpack_from(">H", self.data, start + 6)[0] // 2
+                ends = start + 14
+                starts = ends + 2 * segments + 2
+                deltas = starts + 2 * segments
+                range_offsets = deltas + 2 * segments
+                for segment in range(segments):
+                    end = struct.unpack_from(">H", self.data, ends + 2 * segment)[0]
+                    first = struct.unpack_from(">H", self.data, starts + 2 * segment)[0]
+                    delta = struct.unpack_from(">h", self.data, deltas + 2 * segment)[0]
+                    offset_at = range_offsets + 2 * segment
+                    range_offset = struct.unpack_from(">H", self.data, offset_at)[0]
+                    for code in range(first, min(end, 0xFFFE) + 1):
+                        if range_offset:
+                            at = offset_at + range_offset + 2 * (code - first)
+                            glyph = struct.unpack_from(">H", self.data, at)[0]
+                            glyph = (glyph + delta) & 0xFFFF if glyph else 0
+                        else:
+                            glyph = (code + delta) & 0xFFFF
+                        if glyph:
+                            glyphs[code] = glyph
+                return glyphs
+        raise ExportError(f"Font {self.name} has no Unicode character map")
+
+    def glyph(self, char: str) -> int:
+        """Glyph id of a character (0, the missing glyph, when not covered)."""
+        return self.glyphs.get(ord(char), 0)
+
+    def width(self, glyph: int) -> int:
+        """Advance width of a glyph in thousandths of the font size."""
+        advance = self.advances[min(glyph, len(self.advances) - 1)]
+        return round(advance * 1000 / self.units_per_em)
+
+    def scale(self, value: int) -> int:
+        """Font units to thousandths of the font size."""
+        return round(value * 1000 / self.units_per_em)
+
+
+class LetterTemplate:
+    """
+    Assets shared by every export: the parsed and compressed PDF font and
+    the fixed parts of a DOCX package. Built once per worker process.
+    """
+
+    def __init__(self, font_path: Optional[str] = None):
+        """Load the font (if any) and prepare the static document parts."""
+        self.font: Optional[TrueTypeFont] = None
+        self.font_stream = b""
+        if font_path:
+            self.font = TrueTypeFont(font_path)
+            self.font_stream = zlib.compress(self.font.data)
+
+        self.docx_parts = {
+            "[Content_Types].xml": (
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                '<Default Extension="rels" '
+                'ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+                '<Default Extension="xml" ContentType="application/xml"/>'
+                '<Override PartName="/word/document.xml" ContentType="application/'
+                'vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+                "</Types>"
+            ),
+            "_rels/.rels": (
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/'
+                'relationships"><Relationship Id="rId1" Type="http://schemas.openxmlformats'
+                '.org/officeDocument/2006/relationships/officeDocument" '
+                'Target="word/document.xml"/></Relationships>'
+            ),
+        }
+        half_points = int(FONT_SIZE * 2)
+        self.docx_run_properties = (
+            f'<w:rPr><w:rFonts w:ascii="{DOCX_FONT}" w:hAnsi="{DOCX_FONT}" '
+            f'w:cs="{DOCX_FONT}"/><w:sz w:val="{half_points}"/></w:rPr>'
+        )
+        twips = int(PAGE_MARGIN * 20)
+        self.docx_section = (
+            f'<w:sectPr><w:pgSz w:w="{int(PAGE_WIDTH * 20)}" w:h="{int(PAGE_HEIGHT * 20)}"/>'
+            f'<w:pgMar w:top="{twips}" w:right="{twips}" w:bottom="{twips}" '
+            f'w:left="{twips}" w:header="708" w:footer="708" w:gutter="0"/></w:sectPr>'
+        )
+
+
+def _wrap_lines(text: str, font: TrueTypeFont) -> List[List[int]]:
+    """Glyph ids of each output line, wrapping paragraphs at word boundaries."""
+    max_width = (PAGE_WIDTH - 2 * PAGE_MARGIN) * 1000 / FONT_SIZE
+    space = font.glyph(" ")
+    lines: List[List[int]] = []
+    for paragraph in text.replace("\r\n", "\n").split("\n"):
+        line: List[int] = []
+        line_width = 0
+        for word in paragraph.split():
+            glyphs = [font.glyph(char) for char in word]
+            word_width = sum(font.width(glyph) for glyph in glyphs)
+            gap = font.width(space) if line else 0
+            if line and line_width + gap + word_width > max_width:
+                lines.append(line)
+                line, line_width, gap = [], 0, 0
+            if line:
+                line.append(space)
+            line.extend(glyphs)
+            line_width += gap + word_width
+        lines.append(line)
+    return lines
+
+
+def _chunks(items: List[str], size: int) -> List[List[str]]:
+    """Split a list into consecutive chunks of at most size items."""
+    return [items[start : start + size] for start in range(0, len(items), size)]
+
+
+def _stream(data: bytes, **entries: int) -> bytes:
+    """A compressed PDF stream object body."""
+    extra = "".join(f" /{key} {value}" for key, value in entries.items())
+    return b"<< /Length %d%s /Filter /FlateDecode >>\nstream\n%s\nendstream" % (
+        len(data),
+        extra.encode(),
+        data,
+    )
+
+
+def render_pdf(text: str, template: LetterTemplate) -> bytes:
+    """Lay out a letter on A4 pages with the template's embedded font."""
+    font = template.font
+    if font is None:
+        raise ExportError("No TrueType font for PDF export; set EXPORT_FONT")
+
+    lines = _wrap_lines(text, font)
+    per_page = int((PAGE_HEIGHT - 2 * PAGE_MARGIN) // LINE_HEIGHT)
+    pages = _chunks(lines, per_page) or [[]]
+    used = sorted({glyph for line in lines for glyph in line})
+    unicode_of: Dict[int, str] = {}
+    for char in sorted(set(text)):
+        unicode_of.setdefault(font.glyph(char), char)
+
+    # Objects 1-7 are the catalog, page tree and font; pages follow in pairs
+    page_ids = [8 + 2 * index for index in range(len(pages))]
+    widths = " ".join(f"{glyph} [{font.width(glyph)}]" for glyph in used)
+    mappings = [
+        f"<{glyph:04X}> <{unicode_of[glyph].encode('utf-16-be').hex().upper()}>"
+        for glyph in used
+        if glyph in unicode_of
+    ]
+    cmap = (
+        "/CIDInit /ProcSet findresource begin 12 dict begin begincmap "
+        "/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) /Supplement 0 >> def "
+        "/CMapName /Adobe-Identity-UCS def /CMapType 2 def\n"
+        "1 begincodespacerange <0000> <FFFF> endcodespacerange\n"
+        + "".join(
+            f"{len(chunk)} beginbfchar\n" + "\n".join(chunk) + "\nendbfchar\n"
+            for chunk in _chunks(mappings, 100)
+        )
+        + "endcmap CMapName currentdict /CMap defineresource pop end end"
+    )
+    x_min, y_min, x_max, y_max = (font.scale(value) for value in font.bbox)
+
+    objects: List[bytes] = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        (
+            f"<< /Type /Pages /Kids [{' '.join(f'{page} 0 R' for page in page_ids)}] "
+            f"/Count {len(page_ids)} >>"
+        ).encode(),
+        (
+            f"<< /Type /Font /Subtype /Type0 /BaseFont /{font.name} /Encoding /Identity-H "
+            f"/DescendantFonts [4 0 R] /ToUnicode 6 0 R >>"
+        ).encode(),
+        (
+            f"<< /Type /Font /Subtype /CIDFontType2 /BaseFont /{font.name} "
+            f"/CIDSystemInfo << /Registry (Adobe) /Ordering (Identity) /Supplement 0 >> "
+            f"/FontDescriptor 5 0 R /CIDToGIDMap /Identity /DW {font.width(0)} /W [{widths}] >>"
+        ).encode(),
+        (
+            f"<< /Type /FontDescriptor /FontName /{font.name} /Flags 32 "
+            f"/FontBBox [{x_min} {y_min} {x_max} {y_max}] /ItalicAngle 0 "
+            f"/Ascent {font.scale(font.ascent)} /Descent {font.scale(font.descent)} "
+            f"/CapHeight {font.scale(font.ascent)} /StemV 80 /FontFile2 7 0 R >>"
+        ).encode(),
+        _stream(zlib.compress(cmap.encode("ascii"))),
+        _stream(template.font_stream, Length1=len(font.data)),
+    ]
+    for page_id, page in zip(page_ids, pages):
+        content = [
+            f"BT /F1 {FONT_SIZE:g} Tf {LINE_HEIGHT:g} TL",
+            f"{PAGE_MARGIN:g} {PAGE_HEIGHT - PAGE_MARGIN - FONT_SIZE:g} Td",
+        ]
+        content.extend(f"<{''.join(f'{glyph:04X}' for glyph in line)}> Tj T*" for line in page)
+        content.append("ET")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH:g} {PAGE_HEIGHT:g}] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>".encode()
+        )
+        objects.append(_stream(zlib.compress("\n".join(content).encode("ascii"))))
+
+    output = BytesIO()
+    output.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(output.tell())
+        output.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+    xref = output.tell()
+    output.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    output.write(b"".join(b"%010d 00000 n \n" % offset for offset in offsets))
+    output.write(
+        b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    )
+    return output.getvalue()
+
+
+def render_docx(text: str, template: LetterTemplate) -> bytes:
+    """Write a letter as a Word document, one paragraph per line."""
+    paragraphs = "".join(
+        f'<w:p><w:r>{template.docx_run_properties}<w:t xml:space="preserve">'
+        f"{escape(line)}</w:t></w:r></w:p>"
+        if line.strip()
+        else "<w:p/>"
+        for line in text.replace("\r\n", "\n").split("\n")
+    )
+    document = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        f"<w:body>{paragraphs}{template.docx_section}</w:body></w:document>"
+    )
+
+    output = BytesIO()
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as package:
+        for name, part in template.docx_parts.items():
+            package.writestr(name, part)
+        package.writestr("word/document.xml", document)
+    return output.getvalue()
+
+
+_RENDERERS = {"pdf": render_pdf, "docx": render_docx}
+
+# Template of the current worker process, loaded by the pool initializer
+_worker_template: Optional[LetterTemplate] = None
+
+
+def _load_worker_template(font_path: Optional[str]) -> None:
+    """Pool initializer: parse and compress template assets once per worker."""
+    global _worker_template
+    _worker_template = LetterTemplate(font_path)
+
+
+def _render_in_worker(export_format: str, text: str) -> Tuple[bytes, float]:
+    """Render in a worker process; returns the document and render seconds."""
+    started = time.perf_counter()
+    if _worker_template is None:
+        _load_worker_template(find_font())
+    return _RENDERERS[export_format](text, _worker_template), time.perf_counter() - started
+
+
+class DocumentExporter:
+    """
+    Renders letters to PDF or DOCX in a pool of worker processes, so the
+    CPU-bound layout never blocks the event loop. Each worker loads the
+    template once; at most max_pending exports are admitted at a time and
+    further ones raise ExportQueueFullError.
+    """
+
+    def __init__(
+        self,
+        workers: int = EXPORT_WORKERS,
+        max_pending: int = EXPORT_MAX_PENDING,
+        font_path: Optional[str] = None,
+        registry: Optional[MetricsRegistry] = None,
+    ):
+        """Initialize the exporter; worker processes start on first export."""
+        self.workers = workers
+        self.max_pending = max_pending
+        self.font_path = font_path or find_font()
+        self.registry = registry or metrics
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        """Start the worker pool (spawned, so workers never inherit loop threads)."""
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_load_worker_template,
+                initargs=(self.font_path,),
+            )
+        return self._pool
+
+    async def export(self, text: str, export_format: str) -> bytes:
+        """Render a letter and return the document bytes."""
+        if export_format not in _RENDERERS:
+            raise ExportError(f"Unknown export format {export_format!r}")
+        if export_format == "pdf" and not self.font_path:
+            raise ExportError("No TrueType font for PDF export; set EXPORT_FONT")
+        if self._pending >= self.max_pending:
+            self.registry.increment("export.rejected")
+            raise ExportQueueFullError(f"{self._pending} exports are already pending")
+
+        self._pending += 1
+        self.registry.set_gauge("export.pending", self._pending)
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            document, render_seconds = await loop.run_in_executor(
+                self._get_pool(), _render_in_worker, export_format, text
+            )
+        except BrokenProcessPool as e:
+            # A crashed worker breaks the pool; the next export starts a new one
+            self._pool = None
+            self.registry.increment("export.errors")
+            raise ExportError(f"Export worker crashed: {e}") from e
+        finally:
+            self._pending -= 1
+            self.registry.set_gauge("export.pending", self._pending)
+
+        self.registry.increment(f"export.{export_format}")
+        self.registry.observe("export.render_seconds", render_seconds)
+        self.registry.observe("export.seconds", time.perf_counter() - started)
+        return document
+
+    def close(self) -> None:
+        """Stop the worker processes."""
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+
+async def benchmark_export(
+    exporter: DocumentExporter,
+    text: str,
+    export_format: str,
+    max_concurrency: int,
+    exports: int = 100,
+) -> List[Dict[str, Any]]:
+    """Throughput and latency of exports at each concurrency from 1 to max."""
+    # Spawn and warm every worker so start-up is not measured
+    await asyncio.gather(*(exporter.export(text, export_format) for _ in range(exporter.workers)))
+
+    rows = []
+    for concurrency in range(1, max_concurrency + 1):
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies: List[float] = []
+
+        async def one_export() -> None:
+            async with semaphore:
+                started = time.perf_counter()
+                await exporter.export(text, export_format)
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one_export() for _ in range(exports)))
+        elapsed = time.perf_counter() - started
+        latencies.sort()
+        rows.append(
+            {
+                "concurrency": concurrency,
+                "exports_per_second": exports / elapsed,
+                "p50": latencies[len(latencies) // 2],
+                "p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+            }
+        )
+    return rows
+
+
+def format_export_benchmark(rows: List[Dict[str, Any]]) -> str:
+    """Benchmark rows as a text table."""
+    lines = ["concurrency  exports/s    p50 ms    p95 ms"]
+    for row in rows:
+        lines.append(
+            f"{row['concurrency']:>11}  {row['exports_per_second']:>9.1f}  "
+            f"{row['p50'] * 1000:>8.1f}  {row['p95'] * 1000:>8.1f}"
+        )
+    return "\n".join(lines)
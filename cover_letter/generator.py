@@ -2,17 +2,24 @@
 Simplified cover letter generator with all functionality combined.
 """
 
+import asyncio
+import contextlib
+import contextvars
+import copy
 import logging
 import re
 import time
-from typing import List, Optional
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
-from openai import AsyncOpenAI, OpenAIError
+from openai import AsyncOpenAI, BadRequestError, OpenAIError
 
-from .models import CoverLetterResult, JobAnalysis
+from .budgets import detect_language, output_token_budget, target_word_limit, trim_to_sentence
+from .metrics import metrics
+from .models import CoverLetterCandidate, CoverLetterResult, JobAnalysis, RuleViolation
 from .prompts import (
+    COVER_LETTER_CANDIDATES,
     COVER_LETTER_SYSTEM_PROMPT,
-    COVER_LETTER_MAX_TOKENS,
     COVER_LETTER_TEMPERATURE,
     DEFAULT_MODEL,
     JOB_DESCRIPTION_PREVIEW_LIMIT,
@@ -22,13 +29,83 @@ from .prompts import (
     MINIMUM_COVER_LETTER_WORDS,
     TECH_SKILL_PATTERNS,
     FALLBACK_SYSTEM_PROMPT,
-    FALLBACK_MAX_TOKENS,
     FALLBACK_TEMPERATURE,
+    FIXUP_SYSTEM_PROMPT,
+    FIXUP_TEMPERATURE,
+    HARD_VIOLATION_PENALTY,
+    LETTER_LENGTH_TOLERANCE,
+    LETTER_MAX_WORDS,
+    PREDICTED_OUTPUT_MODELS,
+    PREPARED_ANALYSIS_MAX_ENTRIES,
+    PREPARED_ANALYSIS_TTL,
+    REVISION_SYSTEM_PROMPT,
+    REVISION_TEMPERATURE,
 )
+from .providers import llm_stage
+from .resume_selection import ResumeSelector, estimate_tokens
+from .singleflight import SingleFlight, make_key
+from .vacancy_index import VacancyIndex
+from .validator import CoverLetterValidator
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# finish_reason of streamed choices cut off by the early stop
+EARLY_STOP_REASON = "early_stop"
+
+# Token usage of the generation request running in the current task
+_request_usage: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar(
+    "request_usage", default=None
+)
+
+
+def _new_usage() -> Dict[str, Any]:
+    """Create an empty per-request usage record."""
+    return {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "stages": {}, "reused": []}
+
+
+# Stage timeline and prompt composition of the generation request in the current task
+_request_timing: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar(
+    "request_timing", default=None
+)
+
+
+def _new_timing() -> Dict[str, Any]:
+    """Create an empty per-request timing record."""
+    return {"started": time.perf_counter(), "stages": [], "prompt_tokens": {}}
+
+
+def _timing_summary(timing: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Timing record as returned in metadata: offsets in seconds from the request start."""
+    if timing is None:
+        return None
+    return {
+        "total": round(time.perf_counter() - timing["started"], 4),
+        "stages": timing["stages"],
+        "prompt_tokens": timing["prompt_tokens"],
+    }
+
+
+@contextlib.contextmanager
+def _timed(stage: str, **details: Any) -> Iterator[Dict[str, Any]]:
+    """Record the start offset and duration of a pipeline stage."""
+    started = time.perf_counter()
+    entry: Dict[str, Any] = {"stage": stage, **details}
+    try:
+        yield entry
+    finally:
+        timing = _request_timing.get()
+        if timing is not None:
+            entry["start"] = round(started - timing["started"], 4)
+            entry["duration"] = round(time.perf_counter() - started, 4)
+            timing["stages"].append(entry)
+
+
+def _token_count(usage: Any, field: str) -> int:
+    """Read a token count from a response usage object, tolerating missing data."""
+    value = getattr(usage, field, 0)
+    return value if isinstance(value, int) else 0
+
 
 class CoverLetterGenerationError(Exception):
     """Error during cover letter generation."""
@@ -41,9 +118,340 @@ class CoverLetterGenerator:
     Simplified cover letter generator with all functionality combined.
     """
 
-    def __init__(self, openai_client: AsyncOpenAI):
+    def __init__(
+        self,
+        openai_client: AsyncOpenAI,
+        model: str = DEFAULT_MODEL,
+        temperature: float = COVER_LETTER_TEMPERATURE,
+        vacancy_index: Optional[VacancyIndex] = None,
+        stream: bool = False,
+    ):
         """Initialize the generator."""
         self.client = openai_client
+        self.model = model
+        self.temperature = temperature
+        # Stream letters so overlong outputs can be stopped early
+        self.stream = stream
+        # Concurrent identical requests share one in-flight OpenAI call
+        self._inflight = SingleFlight("generator.singleflight")
+        self.validator = CoverLetterValidator()
+        self.resume_selector = ResumeSelector()
+        # Reposted vacancies reuse keywords and metadata of a near-duplicate
+        self.vacancy_index = vacancy_index or VacancyIndex()
+        # Speculative analyses by vacancy key: (started at, task), oldest first
+        self._prepared: Dict[str, Tuple[float, "asyncio.Task[JobAnalysis]"]] = {}
+        # Flows (and waiting generations) holding each prepared analysis
+        self._prepared_holders: Dict[str, int] = {}
+        # Turned off after the API rejects a predicted output
+        self.predicted_outputs = model.startswith(PREDICTED_OUTPUT_MODELS)
+
+    @property
+    def coalescing_stats(self) -> Dict[str, int]:
+        """Counts of coalesced, executed and cancelled in-flight calls."""
+        return dict(self._inflight.stats)
+
+    async def _create_completion(self, stage: str, **kwargs: Any) -> Any:
+        """Call the chat completions API and record token usage for the stage."""
+        try:
+            with _timed(stage, api=True), llm_stage(stage):
+                response = await self.client.chat.completions.create(model=self.model, **kwargs)
+        except asyncio.CancelledError:
+            self._record_cancelled(stage, kwargs)
+            raise
+        self._record_usage(stage, response, kwargs.get("max_tokens"))
+        return response
+
+    async def _letter_completion(self, stage: str, max_words: int, **kwargs: Any) -> Any:
+        """Letter-sized completion, streamed with an early stop when streaming is on."""
+        if self.stream:
+            return await self._stream_completion(stage, max_words, **kwargs)
+        return await self._create_completion(stage, **kwargs)
+
+    async def _stream_completion(self, stage: str, max_words: int, **kwargs: Any) -> Any:
+        """
+        Stream a completion and stop once every choice has finished or clearly
+        exceeds max_words. Returns a response-like object with the collected text.
+        """
+        stop_words = int(max_words * (1 + LETTER_LENGTH_TOLERANCE))
+        count = kwargs.get("n", 1)
+        parts: List[List[str]] = [[] for _ in range(count)]
+        finish_reasons: List[Optional[str]] = [None] * count
+        response_usage = None
+        early_stopped = False
+
+        with _timed(stage, api=True) as timing_entry:
+            started = time.perf_counter()
+            try:
+                with llm_stage(stage):
+                    stream = await self.client.chat.completions.create(
+                        model=self.model,
+                        stream=True,
+                        stream_options={"include_usage": True},
+                        **kwargs,
+                    )
+            except asyncio.CancelledError:
+                self._record_cancelled(stage, kwargs)
+                raise
+            try:
+                async for chunk in stream:
+                    if getattr(chunk, "usage", None):
+                        response_usage = chunk.usage
+                    for choice in chunk.choices:
+                        if choice.delta and choice.delta.content:
+                            parts[choice.index].append(choice.delta.content)
+                            timing_entry.setdefault(
+                                "first_token", round(time.perf_counter() - started, 4)
+                            )
+                        if choice.finish_reason:
+                            finish_reasons[choice.index] = choice.finish_reason
+
+                    overlong = [
+                        finish_reasons[index] is None
+                        and len("".join(parts[index]).split()) > stop_words
+                        for index in range(count)
+                    ]
+                    if any(overlong) and all(
+                        finish_reasons[index] or overlong[index] for index in range(count)
+                    ):
+                        early_stopped = True
+                        for index in range(count):
+                            if overlong[index]:
+                                finish_reasons[index] = EARLY_STOP_REASON
+                        break
+            except asyncio.CancelledError:
+                self._record_cancelled(stage, kwargs, ["".join(choice) for choice in parts])
+                raise
+            finally:
+                await stream.close()
+
+        texts = ["".join(choice_parts) for choice_parts in parts]
+        if response_usage is None:
+            # Usage arrives in the last chunk, which an early stop never reads
+            prompt_text = "".join(str(message["content"]) for message in kwargs["messages"])
+            response_usage = SimpleNamespace(
+                prompt_tokens=estimate_tokens(prompt_text),
+                completion_tokens=sum(estimate_tokens(text) for text in texts),
+            )
+        response = SimpleNamespace(
+            choices=[
+                SimpleNamespace(
+                    index=index,
+                    message=SimpleNamespace(content=text),
+                    finish_reason=finish_reasons[index],
+                )
+                for index, text in enumerate(texts)
+            ],
+            usage=response_usage,
+        )
+        self._record_usage(stage, response, kwargs.get("max_tokens"), early_stopped)
+        return response
+
+    def _record_cancelled(
+        self, stage: str, request: Dict[str, Any], received: Optional[List[str]] = None
+    ) -> None:
+        """
+        Count a call aborted by cancellation and the completion tokens it did
+        not generate (up to max_tokens per choice, minus what was streamed).
+        """
+        received = received or []
+        budget = (request.get("max_tokens") or 0) * request.get("n", 1)
+        saved = max(budget - sum(estimate_tokens(text) for text in received), 0)
+        metrics.increment("generator.cancelled.calls")
+        metrics.increment(f"generator.cancelled.{stage}")
+        metrics.increment("generator.cancelled.saved_completion_tokens", saved)
+        logger.info(f"Cancelled {stage} call, ~{saved} completion tokens not generated")
+
+    def _record_usage(
+        self,
+        stage: str,
+        response: Any,
+        max_tokens: Optional[int] = None,
+        early_stopped: bool = False,
+    ) -> None:
+        """Add token usage and length outcome of a response to the request usage."""
+        truncated = sum(
+            getattr(choice, "finish_reason", None) == "length"
+            for choice in getattr(response, "choices", None) or []
+        )
+        if truncated:
+            metrics.increment("generator.output.truncated", truncated)
+        if early_stopped:
+            metrics.increment("generator.output.early_stopped")
+
+        usage = _request_usage.get()
+        if usage is None:
+            return
+
+        response_usage = getattr(response, "usage", None)
+        prompt_tokens = _token_count(response_usage, "prompt_tokens")
+        completion_tokens = _token_count(response_usage, "completion_tokens")
+        stage_usage = usage["stages"].setdefault(
+            stage, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0}
+        )
+        for record in (usage, stage_usage):
+            record["calls"] += 1
+            record["prompt_tokens"] += prompt_tokens
+            record["completion_tokens"] += completion_tokens
+        if max_tokens is not None:
+            stage_usage["max_tokens"] = max_tokens
+        if truncated:
+            stage_usage["truncated"] = stage_usage.get("truncated", 0) + truncated
+        if early_stopped:
+            stage_usage["early_stopped"] = stage_usage.get("early_stopped", 0) + 1
+
+        # Predicted output tokens the model kept or had to replace
+        details = getattr(response_usage, "completion_tokens_details", None)
+        for field in ("accepted_prediction_tokens", "rejected_prediction_tokens"):
+            count = _token_count(details, field)
+            if count:
+                stage_usage[field] = stage_usage.get(field, 0) + count
+
+    def _record_prompt_tokens(
+        self, system_prompt: str, resume: str, job_description: str, user_prompt: str
+    ) -> None:
+        """Estimate how the letter prompt splits between system, resume and vacancy."""
+        timing = _request_timing.get()
+        if timing is None:
+            return
+        shares = {
+            "system": estimate_tokens(system_prompt),
+            "resume": estimate_tokens(resume),
+            "vacancy": estimate_tokens(job_description),
+        }
+        shares["other"] = max(
+            estimate_tokens(user_prompt) - shares["resume"] - shares["vacancy"], 0
+        )
+        timing["prompt_tokens"] = shares
+
+    def _letter_limits(self, system_prompt: str) -> Tuple[int, int]:
+        """Word limit a system prompt asks for and the matching max_tokens."""
+        max_words = target_word_limit(system_prompt, LETTER_MAX_WORDS)
+        return max_words, output_token_budget(max_words, detect_language(system_prompt))
+
+    def _response_texts(self, response: Any, limit: int = 1) -> List[str]:
+        """Choice texts, with a sentence cut off by a length limit dropped."""
+        texts = []
+        choices = response.choices[:limit] if limit > 1 else [response.choices[0]]
+        for choice in choices:
+            content = choice.message.content or ""
+            if getattr(choice, "finish_reason", None) in ("length", EARLY_STOP_REASON):
+                content = trim_to_sentence(content) or content
+            texts.append(content)
+        return texts
+
+    def _reuse_analysis(self, stage: str, job_description: str, namespace: str) -> Optional[Any]:
+        """Return a stage result stored for a near-duplicate vacancy, if any."""
+        match = self.vacancy_index.lookup(job_description, namespace)
+        if match is None:
+            return None
+
+        logger.info(
+            f"Reusing {stage} of a near-duplicate vacancy (similarity {match.similarity:.2f})"
+        )
+        usage = _request_usage.get()
+        if usage is not None:
+            usage["reused"].append(stage)
+        with _timed(stage, reused=True):
+            pass
+        return copy.deepcopy(match.data[stage])
+
+    def prepare_analysis(
+        self, job_description: str, custom_keyword_prompt: Optional[str] = None
+    ) -> "asyncio.Task[JobAnalysis]":
+        """
+        Start analyzing a vacancy in the background before generation is
+        requested; generate() with the same vacancy picks up the result.
+        Every call holds the analysis until it is discarded or claimed.
+        """
+        key = make_key("analysis", job_description, custom_keyword_prompt)
+        prepared = self._prepared.get(key)
+        if prepared is not None and not prepared[1].cancelled():
+            self._prepared_holders[key] += 1
+            return prepared[1]
+
+        self._evict_prepared()
+        task = asyncio.create_task(self._analyze_job(job_description, custom_keyword_prompt))
+        # Failures surface when the analysis is claimed; do not log them as unretrieved
+        task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        self._prepared[key] = (time.monotonic(), task)
+        self._prepared_holders[key] = 1
+        metrics.increment("generator.prepared_analysis.started")
+        return task
+
+    def discard_analysis(
+        self, job_description: str, custom_keyword_prompt: Optional[str] = None
+    ) -> bool:
+        """
+        Release a speculative analysis that will not be used; it is cancelled
+        once no other flow or waiting generation holds it.
+        """
+        key = make_key("analysis", job_description, custom_keyword_prompt)
+        if key not in self._prepared:
+            return False
+        task = self._release_prepared(key)
+        if task is not None:
+            task.cancel()
+            metrics.increment("generator.prepared_analysis.discarded")
+        return True
+
+    def _release_prepared(self, key: str, holds: int = 1) -> Optional["asyncio.Task[JobAnalysis]"]:
+        """Drop holds on a prepared analysis; returns its task once the last hold is gone."""
+        self._prepared_holders[key] -= holds
+        if self._prepared_holders[key] > 0:
+            return None
+        del self._prepared_holders[key]
+        return self._prepared.pop(key)[1]
+
+    def _evict_prepared(self) -> None:
+        """
+        Drop finished analyses that expired or exceed the size limit, oldest first.
+        Running ones are left to their holders, unless stuck past the TTL.
+        """
+        now = time.monotonic()
+        for key, (started_at, task) in list(self._prepared.items()):
+            expired = now - started_at > PREPARED_ANALYSIS_TTL
+            if expired or (task.done() and len(self._prepared) >= PREPARED_ANALYSIS_MAX_ENTRIES):
+                del self._prepared[key]
+                del self._prepared_holders[key]
+                task.cancel()
+
+    async def _claim_analysis(
+        self, job_description: str, custom_keyword_prompt: Optional[str]
+    ) -> Optional[JobAnalysis]:
+        """Result of a speculative analysis of this vacancy, waiting if it is still running."""
+        key = make_key("analysis", job_description, custom_keyword_prompt)
+        prepared = self._prepared.get(key)
+        if prepared is None:
+            return None
+
+        task = prepared[1]
+        waited = not task.done()
+        # Hold it while waiting, so another flow discarding it cannot cancel it
+        self._prepared_holders[key] += 1
+        try:
+            with _timed("analysis", prepared=True, waited=waited):
+                analysis = await task
+        except asyncio.CancelledError:
+            current = asyncio.current_task()
+            if current is not None and current.cancelling():
+                raise
+            # Evicted after it was claimed; analyze normally
+            return None
+        except Exception as e:
+            logger.warning(f"Speculative job analysis failed, analyzing again: {e}")
+            return None
+        finally:
+            # Drop the wait and the flow's hold handed over to this generation
+            if self._prepared.get(key) is prepared:
+                released = self._release_prepared(key, holds=2)
+                if released is not None:
+                    released.cancel()
+
+        metrics.increment("generator.prepared_analysis.used")
+        usage = _request_usage.get()
+        if usage is not None:
+            usage["reused"].append("analysis")
+        return analysis.model_copy(deep=True)
 
     async def analyze_job_only(
         self,
@@ -54,6 +462,18 @@ class CoverLetterGenerator:
         Analyze job description only, without generating cover letter.
         Returns analysis data for UI auto-fill.
         """
+        key = make_key("analyze", job_description, custom_keyword_prompt)
+        analysis = await self._inflight.do(
+            key, lambda: self._analyze_job_only(job_description, custom_keyword_prompt)
+        )
+        return copy.deepcopy(analysis)
+
+    async def _analyze_job_only(
+        self,
+        job_description: str,
+        custom_keyword_prompt: Optional[str] = None,
+    ) -> dict:
+        """Run job analysis without de-duplication."""
         try:
             job_analysis = await self._analyze_job(job_description, custom_keyword_prompt)
 
@@ -81,6 +501,10 @@ class CoverLetterGenerator:
 
     async def _extract_job_metadata(self, job_description: str) -> dict:
         """Extract additional job metadata for UI."""
+        reused = self._reuse_analysis("metadata", job_description, "metadata")
+        if reused is not None:
+            return reused
+
         try:
             metadata_prompt = """
             Analyze the job description and extract key information. Return ONLY a JSON object with these fields:
@@ -94,8 +518,8 @@ class CoverLetterGenerator:
             Respond ONLY with valid JSON, no other text.
             """
 
-            response = await self.client.chat.completions.create(
-                model=DEFAULT_MODEL,
+            response = await self._create_completion(
+                "metadata",
                 messages=[
                     {
                         "role": "user",
@@ -112,6 +536,7 @@ class CoverLetterGenerator:
 
                 result = json.loads(content)
                 logger.debug(f"Extracted metadata: {result}")
+                self.vacancy_index.add(job_description, {"metadata": result}, "metadata")
                 return result
             else:
                 logger.warning("Empty response from OpenAI for metadata extraction")
@@ -158,16 +583,87 @@ class CoverLetterGenerator:
         special_requirements: str = "",
         custom_system_prompt: Optional[str] = None,
         custom_keyword_prompt: Optional[str] = None,
+        candidates: int = COVER_LETTER_CANDIDATES,
     ) -> CoverLetterResult:
         """
         Generate cover letter - simplified version.
+
+        With candidates > 1, several variants are generated in one API call,
+        scored locally, and the rest are returned in result.alternatives.
         """
+        key = make_key(
+            "generate",
+            resume,
+            job_description,
+            company_name,
+            hiring_manager,
+            special_requirements,
+            custom_system_prompt,
+            custom_keyword_prompt,
+            str(candidates),
+        )
+        result = await self._inflight.do(
+            key,
+            lambda: self._generate(
+                resume,
+                job_description,
+                company_name,
+                hiring_manager,
+                special_requirements,
+                custom_system_prompt,
+                custom_keyword_prompt,
+                candidates,
+            ),
+        )
+        return result.model_copy(deep=True)
+
+    async def _generate(
+        self,
+        resume: str,
+        job_description: str,
+        company_name: str = "",
+        hiring_manager: str = "",
+        special_requirements: str = "",
+        custom_system_prompt: Optional[str] = None,
+        custom_keyword_prompt: Optional[str] = None,
+        candidates: int = COVER_LETTER_CANDIDATES,
+    ) -> CoverLetterResult:
+        """Run the generation pipeline without de-duplication."""
+        usage_token = _request_usage.set(_new_usage())
+        timing_token = _request_timing.set(_new_timing())
+        try:
+            return await self._run_pipeline(
+                resume,
+                job_description,
+                company_name,
+                special_requirements,
+                custom_system_prompt,
+                custom_keyword_prompt,
+                candidates,
+            )
+        finally:
+            _request_timing.reset(timing_token)
+            _request_usage.reset(usage_token)
+
+    async def _run_pipeline(
+        self,
+        resume: str,
+        job_description: str,
+        company_name: str,
+        special_requirements: str,
+        custom_system_prompt: Optional[str],
+        custom_keyword_prompt: Optional[str],
+        candidates: int,
+    ) -> CoverLetterResult:
+        """Analyze the job, generate, score and fix the letter; fall back on errors."""
         start_time = time.time()
         logger.info("Starting cover letter generation")
 
         try:
-            # Step 1: Simple job analysis
-            job_analysis = await self._analyze_job(job_description, custom_keyword_prompt)
+            # Step 1: Simple job analysis, unless it was prepared while the user typed
+            job_analysis = await self._claim_analysis(job_description, custom_keyword_prompt)
+            if job_analysis is None:
+                job_analysis = await self._analyze_job(job_description, custom_keyword_prompt)
             logger.debug(f"Job analysis completed: {len(job_analysis.keywords)} keywords found")
 
             # Override company name if provided
@@ -175,46 +671,98 @@ class CoverLetterGenerator:
                 job_analysis.company_name = company_name
                 logger.debug(f"Using provided company name: {company_name}")
 
-            # Step 2: Generate cover letter
-            cover_letter = await self._generate_cover_letter(
-                resume,
+            # Long resumes: keep only the experience most relevant to the vacancy
+            with _timed("resume_selection"):
+                selection = self.resume_selector.select(
+                    resume, job_description, job_analysis.keywords, special_requirements
+                )
+            if selection.applied:
+                logger.info(
+                    f"Resume trimmed from ~{selection.original_tokens} "
+                    f"to ~{selection.selected_tokens} tokens"
+                )
+
+            # Step 2: Generate cover letter variants
+            cover_letters = await self._generate_cover_letter(
+                selection.text,
                 job_description,
                 job_analysis,
                 company_name,
                 special_requirements,
                 custom_system_prompt,
+                candidates,
             )
             logger.info("Cover letter generated successfully")
 
+            # Score variants locally, best first (ties keep API order)
+            vacancy_text = f"{job_description}\n{company_name}"
+            with _timed("scoring"):
+                ranked = sorted(
+                    (
+                        self._score_cover_letter(
+                            cover_letter, job_analysis.keywords, resume, vacancy_text
+                        )
+                        for cover_letter in cover_letters
+                    ),
+                    key=lambda candidate: candidate.quality_score,
+                    reverse=True,
+                )
+            best = ranked[0]
+
+            # Targeted fix-up only when a hard rule of the default prompt fails
+            fixup_applied = False
+            hard_violations = [violation for violation in best.violations if violation.hard]
+            if hard_violations and not (custom_system_prompt and custom_system_prompt.strip()):
+                fixed = await self._fix_cover_letter(best.cover_letter, hard_violations)
+                if fixed:
+                    rescored = self._score_cover_letter(
+                        fixed, job_analysis.keywords, resume, vacancy_text
+                    )
+                    if sum(v.hard for v in rescored.violations) < len(hard_violations):
+                        best = rescored
+                        fixup_applied = True
             generation_time = time.time() - start_time
 
-            generation_time = time.time() - start_time
-
-            # Simple validation and metadata
-            word_count = len(cover_letter.split())
-            keyword_matches = sum(
-                1 for kw in job_analysis.keywords if kw.lower() in cover_letter.lower()
+            system_prompt = (
+                custom_system_prompt
+                if custom_system_prompt and custom_system_prompt.strip()
+                else COVER_LETTER_SYSTEM_PROMPT
             )
-
-            # Simple quality score
-            quality_score = 0.7  # Base score
-            if 200 <= word_count <= 500:
-                quality_score += 0.1
-            if job_analysis.keywords and keyword_matches > 0:
-                quality_score += min(keyword_matches / len(job_analysis.keywords) * 0.2, 0.2)
+            target_words, _ = self._letter_limits(system_prompt)
+            overrun_words = max(best.word_count - target_words, 0)
+            metrics.observe("generator.output.overrun_words", overrun_words)
+            letter_usage = (_request_usage.get() or {}).get("stages", {}).get("cover_letter", {})
 
             metadata = {
-                "word_count": word_count,
-                "keywords_found": keyword_matches,
+                "word_count": best.word_count,
+                "keywords_found": best.keywords_found,
                 "total_keywords": len(job_analysis.keywords),
+                "violations": [violation.rule for violation in best.violations],
+                "keywords": job_analysis.keywords,
+                "company_name": job_analysis.company_name or "",
+                "fixup_applied": fixup_applied,
+                "usage": _request_usage.get(),
+                "resume_selection": selection.model_dump(exclude={"text"}),
+                "length": {
+                    "target_words": target_words,
+                    "overrun_words": overrun_words,
+                    "max_tokens": letter_usage.get("max_tokens"),
+                    "truncated": letter_usage.get("truncated", 0),
+                    "early_stopped": letter_usage.get("early_stopped", 0),
+                },
+                "timing": _timing_summary(_request_timing.get()),
             }
+            if candidates > 1:
+                metadata["candidates_requested"] = candidates
+                metadata["candidates_scored"] = len(ranked)
 
             return CoverLetterResult(
-                cover_letter=cover_letter,
-                quality_score=min(quality_score, 1.0),
-                keywords_found=keyword_matches,
+                cover_letter=best.cover_letter,
+                quality_score=best.quality_score,
+                keywords_found=best.keywords_found,
                 generation_time=generation_time,
                 metadata=metadata,
+                alternatives=ranked[1:],
             )
 
         except OpenAIError as e:
@@ -233,6 +781,168 @@ class CoverLetterGenerator:
                 resume, job_description, start_time, special_requirements
             )
 
+    async def revise(
+        self,
+        cover_letter: str,
+        instruction: str,
+        keywords: Optional[List[str]] = None,
+        resume: str = "",
+        job_description: str = "",
+    ) -> CoverLetterResult:
+        """
+        Apply a small edit ("shorter", "emphasize leadership") to a letter.
+
+        Only the letter and the instruction are sent: no resume, no vacancy
+        and no new job analysis. Keywords of the original analysis, the resume
+        and the vacancy are used only for local scoring. With models that support predicted outputs the current
+        letter is passed as the prediction, so unchanged text is cheap and fast.
+        """
+        usage_token = _request_usage.set(_new_usage())
+        timing_token = _request_timing.set(_new_timing())
+        try:
+            return await self._revise(
+                cover_letter, instruction, keywords or [], resume, job_description
+            )
+        finally:
+            _request_timing.reset(timing_token)
+            _request_usage.reset(usage_token)
+
+    async def _revise(
+        self,
+        cover_letter: str,
+        instruction: str,
+        keywords: List[str],
+        resume: str,
+        job_description: str,
+    ) -> CoverLetterResult:
+        """Run one revision call and score the revised letter."""
+        start_time = time.time()
+        logger.info(f"Revising cover letter: {instruction[:100]}")
+
+        with _timed("prompt_build"):
+            user_prompt = f"ПРАВКА:\n{instruction}\n\nПИСЬМО:\n{cover_letter}"
+            self._record_prompt_tokens(REVISION_SYSTEM_PROMPT, "", "", user_prompt)
+            # Room for a letter that was already longer than the default limit
+            max_words = max(LETTER_MAX_WORDS, len(cover_letter.split()))
+            request: Dict[str, Any] = {
+                "messages": [
+                    {"role": "system", "content": REVISION_SYSTEM_PROMPT},
+                    {"role": "user", "content": user_prompt},
+                ],
+                "max_tokens": output_token_budget(max_words, detect_language(cover_letter)),
+                "temperature": REVISION_TEMPERATURE,
+            }
+            predicted = self.predicted_outputs
+            if predicted:
+                request["prediction"] = {"type": "content", "content": cover_letter}
+
+        try:
+            try:
+                response = await self._letter_completion("revision", max_words, **request)
+            except BadRequestError as e:
+                if not predicted:
+                    raise
+                # Provider or model without predicted outputs: stop sending them
+                logger.warning(f"Predicted output rejected, revising without it: {e}")
+                self.predicted_outputs = predicted = False
+                del request["prediction"]
+                response = await self._letter_completion("revision", max_words, **request)
+        except OpenAIError as e:
+            logger.error(f"OpenAI API error during revision: {e}")
+            raise CoverLetterGenerationError(f"Failed to revise cover letter: {e}") from e
+
+        revised = self._response_texts(response)[0]
+        if not revised or len(revised.split()) < MINIMUM_COVER_LETTER_WORDS:
+            raise CoverLetterGenerationError("Revised content is too short")
+
+        with _timed("scoring"):
+            candidate = self._score_cover_letter(revised, keywords, resume, job_description)
+        revision_usage = (_request_usage.get() or {}).get("stages", {}).get("revision", {})
+
+        return CoverLetterResult(
+            cover_letter=candidate.cover_letter,
+            quality_score=candidate.quality_score,
+            keywords_found=candidate.keywords_found,
+            generation_time=time.time() - start_time,
+            metadata={
+                "word_count": candidate.word_count,
+                "keywords_found": candidate.keywords_found,
+                "total_keywords": len(keywords),
+                "violations": [violation.rule for violation in candidate.violations],
+                "keywords": keywords,
+                "revision": {
+                    "instruction": instruction,
+                    "predicted_output": predicted,
+                    "accepted_prediction_tokens": revision_usage.get(
+                        "accepted_prediction_tokens", 0
+                    ),
+                    "rejected_prediction_tokens": revision_usage.get(
+                        "rejected_prediction_tokens", 0
+                    ),
+                },
+                "usage": _request_usage.get(),
+                "timing": _timing_summary(_request_timing.get()),
+            },
+        )
+
+    def _score_cover_letter(
+        self, cover_letter: str, keywords: List[str], resume: str = "", job_description: str = ""
+    ) -> CoverLetterCandidate:
+        """Score a cover letter by prompt rules, word count and keyword coverage."""
+        report = self.validator.validate(cover_letter, resume, job_description)
+        keyword_matches = sum(1 for kw in keywords if kw.lower() in cover_letter.lower())
+
+        # Simple quality score
+        quality_score = 0.7  # Base score
+        if not any(violation.rule == "length" for violation in report.violations):
+            quality_score += 0.1
+        if keywords and keyword_matches > 0:
+            quality_score += min(keyword_matches / len(keywords) * 0.2, 0.2)
+        quality_score -= HARD_VIOLATION_PENALTY * len(report.hard_violations)
+
+        return CoverLetterCandidate(
+            cover_letter=cover_letter,
+            quality_score=max(0.0, min(quality_score, 1.0)),
+            keywords_found=keyword_matches,
+            word_count=report.word_count,
+            violations=report.violations,
+        )
+
+    async def _fix_cover_letter(
+        self, cover_letter: str, violations: List[RuleViolation]
+    ) -> Optional[str]:
+        """
+        Fix specific rule violations with a short call.
+        Only the letter and the broken rules are sent, not the resume or vacancy.
+        """
+        logger.info(f"Fixing cover letter rules: {[violation.rule for violation in violations]}")
+        rules_text = "\n".join(f"- {violation.message}" for violation in violations)
+
+        try:
+            max_tokens = output_token_budget(LETTER_MAX_WORDS, detect_language(cover_letter))
+            response = await self._letter_completion(
+                "fixup",
+                LETTER_MAX_WORDS,
+                messages=[
+                    {"role": "system", "content": FIXUP_SYSTEM_PROMPT},
+                    {
+                        "role": "user",
+                        "content": f"НАРУШЕНИЯ:\n{rules_text}\n\nПИСЬМО:\n{cover_letter}",
+                    },
+                ],
+                max_tokens=max_tokens,
+                temperature=FIXUP_TEMPERATURE,
+            )
+
+            content = self._response_texts(response)[0]
+            if content and len(content.split()) >= MINIMUM_COVER_LETTER_WORDS:
+                return content
+            logger.warning("Fix-up returned too short content, keeping original letter")
+        except Exception as e:
+            logger.warning(f"Cover letter fix-up failed, keeping original letter: {e}")
+
+        return None
+
     async def _analyze_job(
         self, job_description: str, custom_keyword_prompt: Optional[str] = None
     ) -> JobAnalysis:
@@ -249,7 +959,8 @@ class CoverLetterGenerator:
             keywords = self._extract_keywords_regex(job_description)
 
         # Basic company name extraction
-        company_name = self._extract_company_name(job_description)
+        with _timed("company"):
+            company_name = self._extract_company_name(job_description)
         if company_name:
             logger.debug(f"Extracted company name: {company_name}")
 
@@ -262,6 +973,16 @@ class CoverLetterGenerator:
         self, job_description: str, custom_prompt: Optional[str] = None
     ) -> List[str]:
         """Simple keyword extraction using OpenAI."""
+        # Keywords depend on the prompt, so each custom prompt has its own namespace
+        namespace = (
+            make_key("keywords", custom_prompt)
+            if custom_prompt and custom_prompt.strip()
+            else "keywords"
+        )
+        reused = self._reuse_analysis("keywords", job_description, namespace)
+        if reused is not None:
+            return reused
+
         logger.debug("Extracting keywords using OpenAI")
 
         # Use custom prompt if provided, otherwise use default
@@ -271,8 +992,8 @@ class CoverLetterGenerator:
         prompt = base_prompt.format(job_description=job_description[:JOB_DESCRIPTION_PREVIEW_LIMIT])
 
         try:
-            response = await self.client.chat.completions.create(
-                model=DEFAULT_MODEL,
+            response = await self._create_completion(
+                "keywords",
                 messages=[{"role": "user", "content": prompt}],
                 max_tokens=KEYWORD_EXTRACTION_MAX_TOKENS,
                 temperature=KEYWORD_EXTRACTION_TEMPERATURE,
@@ -284,6 +1005,7 @@ class CoverLetterGenerator:
                 keywords = [kw.strip() for kw in content.split(",")]
                 keywords = [kw for kw in keywords if kw and len(kw) > 2][:12]
                 logger.debug(f"Extracted {len(keywords)} keywords via OpenAI")
+                self.vacancy_index.add(job_description, {"keywords": keywords}, namespace)
                 return keywords
 
         except OpenAIError as e:
@@ -334,58 +1056,78 @@ class CoverLetterGenerator:
         company_name: str = "",
         special_requirements: str = "",
         custom_system_prompt: Optional[str] = None,
-    ) -> str:
-        """Generate cover letter using simplified prompt."""
+        candidates: int = 1,
+    ) -> List[str]:
+        """
+        Generate cover letter using simplified prompt.
+        Returns every usable variant when several candidates are requested.
+        """
         logger.debug("Generating cover letter content")
 
-        # Build system prompt (use custom if provided, otherwise default)
-        system_prompt = (
-            custom_system_prompt
-            if custom_system_prompt and custom_system_prompt.strip()
-            else COVER_LETTER_SYSTEM_PROMPT
-        )
+        with _timed("prompt_build"):
+            # Build system prompt (use custom if provided, otherwise default)
+            system_prompt = (
+                custom_system_prompt
+                if custom_system_prompt and custom_system_prompt.strip()
+                else COVER_LETTER_SYSTEM_PROMPT
+            )
 
-        # Add keywords if available
-        if job_analysis.keywords:
-            keywords_text = ", ".join(job_analysis.keywords)
-            system_prompt += f"\nКлючевые навыки: {keywords_text}\n"
+            max_words, max_tokens = self._letter_limits(system_prompt)
 
-        # Build user prompt
-        prompt_parts = [
-            "РЕЗЮМЕ КАНДИДАТА:",
-            resume,
-            "",
-            "ОПИСАНИЕ ВАКАНСИИ:",
-            job_description,
-        ]
+            # Add keywords if available
+            if job_analysis.keywords:
+                keywords_text = ", ".join(job_analysis.keywords)
+                system_prompt += f"\nКлючевые навыки: {keywords_text}\n"
 
-        # Add company name if provided
-        final_company = company_name or job_analysis.company_name
-        if final_company:
-            prompt_parts.extend(["", f"НАЗВАНИЕ КОМПАНИИ: {final_company}"])
+            # Build user prompt
+            prompt_parts = [
+                "РЕЗЮМЕ КАНДИДАТА:",
+                resume,
+                "",
+                "ОПИСАНИЕ ВАКАНСИИ:",
+                job_description,
+            ]
+
+            # Add company name if provided
+            final_company = company_name or job_analysis.company_name
+            if final_company:
+                prompt_parts.extend(["", f"НАЗВАНИЕ КОМПАНИИ: {final_company}"])
+
+            # Add special requirements if provided
+            if special_requirements:
+                prompt_parts.extend(["", f"ДОПОЛНИТЕЛЬНЫЕ ИНСТРУКЦИИ: {special_requirements}"])
 
-        # Add special requirements if provided
-        if special_requirements:
-            prompt_parts.extend(["", f"ДОПОЛНИТЕЛЬНЫЕ ИНСТРУКЦИИ: {special_requirements}"])
+            user_prompt = "\n".join(prompt_parts)
+            self._record_prompt_tokens(system_prompt, resume, job_description, user_prompt)
 
-        user_prompt = "\n".join(prompt_parts)
+        # Several variants share one prompt, so the input is billed once
+        request_options = {}
+        if candidates > 1:
+            request_options["n"] = candidates
 
         # Generate cover letter
         try:
-            response = await self.client.chat.completions.create(
-                model=DEFAULT_MODEL,
+            response = await self._letter_completion(
+                "cover_letter",
+                max_words,
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt},
                 ],
-                max_tokens=COVER_LETTER_MAX_TOKENS,
-                temperature=COVER_LETTER_TEMPERATURE,
+                max_tokens=max_tokens,
+                temperature=self.temperature,
+                **request_options,
             )
 
-            content = response.choices[0].message.content
-            if content and len(content.split()) >= MINIMUM_COVER_LETTER_WORDS:
-                logger.info("Cover letter content generated successfully")
-                return content
+            contents = self._response_texts(response, candidates)
+            usable = [
+                content
+                for content in contents
+                if content and len(content.split()) >= MINIMUM_COVER_LETTER_WORDS
+            ]
+            if usable:
+                logger.info(f"Cover letter content generated successfully ({len(usable)} variants)")
+                return usable
             else:
                 logger.warning("Generated cover letter is too short or empty")
                 raise CoverLetterGenerationError("Generated content is too short")
@@ -405,17 +1147,20 @@ class CoverLetterGenerator:
             if special_requirements:
                 user_prompt += f"\n\nДополнительные инструкции:\n{special_requirements}"
 
-            response = await self.client.chat.completions.create(
-                model=DEFAULT_MODEL,
+            max_words, max_tokens = self._letter_limits(FALLBACK_SYSTEM_PROMPT)
+            self._record_prompt_tokens(FALLBACK_SYSTEM_PROMPT, resume, job_description, user_prompt)
+            response = await self._letter_completion(
+                "fallback",
+                max_words,
                 messages=[
                     {"role": "system", "content": FALLBACK_SYSTEM_PROMPT},
                     {"role": "user", "content": user_prompt},
                 ],
-                max_tokens=FALLBACK_MAX_TOKENS,
+                max_tokens=max_tokens,
                 temperature=FALLBACK_TEMPERATURE,
             )
 
-            cover_letter = response.choices[0].message.content or "Ошибка генерации"
+            cover_letter = self._response_texts(response)[0] or "Ошибка генерации"
             generation_time = time.time() - start_time
             word_count = len(cover_letter.split())
 
@@ -427,7 +1172,12 @@ class CoverLetterGenerator:
                 quality_score=0.7,
                 keywords_found=0,
                 generation_time=generation_time,
-                metadata={"fallback_used": True, "word_count": word_count},
+                metadata={
+                    "fallback_used": True,
+                    "word_count": word_count,
+                    "usage": _request_usage.get(),
+                    "timing": _timing_summary(_request_timing.get()),
+                },
             )
 
         except Exception as e:
@@ -0,0 +1,471 @@
+"""
+Per-user history of generated cover letters with full-text search (SQLite FTS5).
+"""
+
+import hashlib
+import itertools
+import json
+import logging
+import random
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .metrics import MetricsRegistry, metrics, percentile
+from .models import CoverLetterResult, HistoryEntry
+from .prompts import VACANCY_INDEX_MIN_SHINGLES, VACANCY_SIMILARITY_THRESHOLD
+from .vacancy_index import shingles
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Oldest letters of a user are deleted beyond this count
+HISTORY_MAX_ENTRIES = 500
+HISTORY_PAGE_SIZE = 10
+# Longest vacancy words sent to full-text search when looking for a near match
+HISTORY_MATCH_TERMS = 12
+# Best-ranked candidates whose shingle similarity is computed exactly
+HISTORY_MATCH_CANDIDATES = 5
+HISTORY_MIN_TERM_LENGTH = 4
+# Level 9 compresses letters only ~1% smaller at twice the CPU time
+COMPRESSION_LEVEL = 6
+
+# The FTS5 index is contentless: texts are kept once, compressed, in letters.data.
+# It keeps term positions (detail=full): without them bm25() ranks every row 0
+# in a contentless table, and near matches could not be ranked.
+# Every indexed word carries its user's scope prefix, so a user's letters have
+# their own terms and a query reads only that user's postings, however many
+# letters other users have.
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS letters (
+    id INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    company TEXT NOT NULL,
+    quality_score REAL NOT NULL,
+    vacancy_hash INTEGER NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS letters_user ON letters (user_id, id);
+CREATE INDEX IF NOT EXISTS letters_vacancy ON letters (user_id, vacancy_hash);
+CREATE VIRTUAL TABLE IF NOT EXISTS letters_fts USING fts5(
+    company, keywords, vacancy,
+    content='', tokenize='unicode61 remove_diacritics 2'
+);
+"""
+
+# Same word boundaries as the unicode61 tokenizer, which splits on "_"
+_TERM_PATTERN = re.compile(r"[^\W_]+")
+
+
+class HistoryStoreError(Exception):
+    """Error related to generation history operations."""
+
+    pass
+
+
+def vacancy_hash(text: str) -> int:
+    """64-bit hash of a normalized vacancy, for exact repeat lookups."""
+    normalized = " ".join(text.lower().split())
+    digest = hashlib.blake2b(normalized.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def _user_scope(user_id: str) -> str:
+    """Fixed-length prefix of a user's index terms."""
+    return "u" + hashlib.blake2b(user_id.encode("utf-8"), digest_size=6).hexdigest()
+
+
+def _scoped(scope: str, text: str) -> str:
+    """Text as the user's index terms: lowercased words with the scope prefix."""
+    return " ".join(scope + word for word in _TERM_PATTERN.findall(text.lower()))
+
+
+def _jaccard(left: set, right: set) -> float:
+    """Jaccard similarity of two sets."""
+    union = len(left | right)
+    return len(left & right) / union if union else 0.0
+
+
+class HistoryStore:
+    """
+    SQLite store of every cover letter generated for a user.
+
+    Each letter is saved with its vacancy and the full generation result,
+    compressed in one blob. Vacancy, company and keywords are indexed
+    with FTS5 for /history search and for finding an earlier letter
+    written for a near-identical vacancy; letter texts are not indexed,
+    as letters of one user mostly repeat their resume.
+    """
+
+    def __init__(
+        self,
+        path: Path | str,
+        max_entries: int = HISTORY_MAX_ENTRIES,
+        registry: Optional[MetricsRegistry] = None,
+    ):
+        """Open (and create if needed) the history database."""
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.registry = registry or metrics
+        self._lock = threading.Lock()
+        try:
+            self._conn = sqlite3.connect(
+                str(self.path), check_same_thread=False, isolation_level=None
+            )
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            # A crash may lose the last letters, never corrupt the file
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+        except sqlite3.Error as e:
+            raise HistoryStoreError(f"Failed to open history store: {e}") from e
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        """Hold the lock and run the statements in one transaction."""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                yield
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def save(self, user_id: str, job_description: str, result: CoverLetterResult) -> int:
+        """Store a generated letter with its vacancy. Returns the entry id."""
+        return self.save_many([(user_id, job_description, result)])[0]
+
+    def save_many(self, entries: Iterable[Tuple[str, str, CoverLetterResult]]) -> List[int]:
+        """Store several letters in one transaction. Returns their entry ids."""
+        entry_ids: List[int] = []
+        users = set()
+        try:
+            with self._transaction():
+                for user_id, job_description, result in entries:
+                    entry_ids.append(self._insert(user_id, job_description, result))
+                    users.add(user_id)
+                for user_id in users:
+                    self._prune(user_id)
+        except (sqlite3.Error, zlib.error) as e:
+            raise HistoryStoreError(f"Failed to save history: {e}") from e
+
+        self.registry.increment("history.saved", len(entry_ids))
+        return entry_ids
+
+    def get(self, user_id: str, entry_id: int) -> Optional[HistoryEntry]:
+        """A stored letter of the user, or None."""
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT * FROM letters WHERE id = ? AND user_id = ?", (entry_id, user_id)
+                ).fetchone()
+                return self._to_entry(row) if row else None
+        except (sqlite3.Error, zlib.error) as e:
+            raise HistoryStoreError(f"Failed to load history entry: {e}") from e
+
+    def recent(self, user_id: str, limit: int = HISTORY_PAGE_SIZE) -> List[HistoryEntry]:
+        """User's latest letters, newest first."""
+        try:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT * FROM letters WHERE user_id = ? ORDER BY id DESC LIMIT ?",
+                    (user_id, limit),
+                ).fetchall()
+                return [self._to_entry(row) for row in rows]
+        except (sqlite3.Error, zlib.error) as e:
+            raise HistoryStoreError(f"Failed to load history: {e}") from e
+
+    def search(
+        self, user_id: str, query: str, limit: int = HISTORY_PAGE_SIZE
+    ) -> List[HistoryEntry]:
+        """
+        User's letters whose vacancy, company or keywords contain every
+        query word (as a prefix, so "разработ" finds "разработчик"),
+        best BM25 match first.
+        """
+        scope = _user_scope(user_id)
+        terms = [f'"{scope}{term}"*' for term in _TERM_PATTERN.findall(query.lower())]
+        if not terms:
+            return []
+        started = time.perf_counter()
+        entries = self._match(user_id, " AND ".join(terms), limit)
+        self.registry.observe("history.search_seconds", time.perf_counter() - started)
+        return entries
+
+    def find_similar(
+        self, user_id: str, job_description: str, threshold: float = VACANCY_SIMILARITY_THRESHOLD
+    ) -> Optional[HistoryEntry]:
+        """
+        Latest letter of the user written for the same or a near-identical
+        vacancy (word shingle Jaccard similarity at or above the threshold).
+        """
+        started = time.perf_counter()
+        try:
+            best = self._find_similar(user_id, job_description, threshold)
+        finally:
+            self.registry.observe("history.match_seconds", time.perf_counter() - started)
+        self.registry.increment("history.match_hits" if best else "history.match_misses")
+        return best
+
+    def _find_similar(
+        self, user_id: str, job_description: str, threshold: float
+    ) -> Optional[HistoryEntry]:
+        """Exact repeat by hash, else FTS candidates verified by shingle similarity."""
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT * FROM letters WHERE user_id = ? AND vacancy_hash = ? "
+                    "ORDER BY id DESC LIMIT 1",
+                    (user_id, vacancy_hash(job_description)),
+                ).fetchone()
+                if row is not None:
+                    return self._to_entry(row).model_copy(update={"similarity": 1.0})
+        except (sqlite3.Error, zlib.error) as e:
+            raise HistoryStoreError(f"Failed to load history: {e}") from e
+
+        features = shingles(job_description)
+        if len(features) < VACANCY_INDEX_MIN_SHINGLES:
+            return None
+        words = {
+            word
+            for word in _TERM_PATTERN.findall(job_description.lower())
+            if len(word) >= HISTORY_MIN_TERM_LENGTH
+        }
+        terms = sorted(words, key=lambda word: (-len(word), word))[:HISTORY_MATCH_TERMS]
+        if not terms:
+            return None
+
+        scope = _user_scope(user_id)
+        query = "vacancy : (" + " OR ".join(f'"{scope}{term}"' for term in terms) + ")"
+        best: Optional[HistoryEntry] = None
+        for entry in self._match(user_id, query, HISTORY_MATCH_CANDIDATES):
+            similarity = _jaccard(features, shingles(entry.vacancy))
+            if similarity >= threshold and (best is None or similarity > best.similarity):
+                best = entry.model_copy(update={"similarity": similarity})
+        return best
+
+    def _match(self, user_id: str, query: str, limit: int) -> List[HistoryEntry]:
+        """Run an FTS5 query of the user's scoped terms, best rank first."""
+        try:
+            with self._lock:
+                # The user_id check guards against scope prefix collisions
+                rows = self._conn.execute(
+                    "SELECT l.* FROM letters_fts f JOIN letters l ON l.id = f.rowid "
+                    "WHERE letters_fts MATCH ? AND l.user_id = ? ORDER BY f.rank LIMIT ?",
+                    (query, user_id, limit),
+                ).fetchall()
+                return [self._to_entry(row) for row in rows]
+        except (sqlite3.Error, zlib.error) as e:
+            raise HistoryStoreError(f"Failed to search history: {e}") from e
+
+    def size_report(self) -> Dict[str, Any]:
+        """Entry counts and bytes used by letters and by the full-text index."""
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            page_size = self._conn.execute("PRAGMA page_size").fetchone()[0]
+            page_count = self._conn.execute("PRAGMA page_count").fetchone()[0]
+            stats = self._conn.execute(
+                "SELECT COUNT(*) AS entries, COUNT(DISTINCT user_id) AS users, "
+                "COALESCE(SUM(length(data)), 0) AS stored FROM letters"
+            ).fetchone()
+            index_bytes = self._conn.execute(
+                "SELECT COALESCE(SUM(length(block)), 0) FROM letters_fts_data"
+            ).fetchone()[0]
+        return {
+            "entries": stats["entries"],
+            "users": stats["users"],
+            "compressed_bytes": stats["stored"],
+            "index_bytes": index_bytes,
+            "db_bytes": page_size * page_count,
+        }
+
+    def _insert(self, user_id: str, job_description: str, result: CoverLetterResult) -> int:
+        """Insert a letter row and its full-text index entry."""
+        company = result.metadata.get("company_name") or ""
+        keywords = result.metadata.get("keywords") or []
+        data = json.dumps(
+            {"vacancy": job_description, "result": result.model_dump(mode="json")},
+            ensure_ascii=False,
+        )
+        cursor = self._conn.execute(
+            "INSERT INTO letters (user_id, created_at, company, quality_score, vacancy_hash, data) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                user_id,
+                time.time(),
+                company,
+                result.quality_score,
+                vacancy_hash(job_description),
+                zlib.compress(data.encode("utf-8"), COMPRESSION_LEVEL),
+            ),
+        )
+        entry_id = cursor.lastrowid
+        self._conn.execute(
+            "INSERT INTO letters_fts (rowid, company, keywords, vacancy) VALUES (?, ?, ?, ?)",
+            (entry_id, *self._index_values(user_id, company, keywords, job_description)),
+        )
+        return entry_id
+
+    def _index_values(
+        self, user_id: str, company: str, keywords: List[str], vacancy: str
+    ) -> Tuple[str, ...]:
+        """Column values of a letter in the full-text index."""
+        scope = _user_scope(user_id)
+        return tuple(_scoped(scope, text) for text in (company, " ".join(keywords), vacancy))
+
+    def _prune(self, user_id: str) -> None:
+        """Delete the user's oldest letters beyond max_entries."""
+        rows = self._conn.execute(
+            "SELECT * FROM letters WHERE user_id = ? ORDER BY id DESC LIMIT -1 OFFSET ?",
+            (user_id, self.max_entries),
+        ).fetchall()
+        for row in rows:
+            # A contentless index forgets a row only when given its original values
+            entry = self._to_entry(row)
+            self._conn.execute(
+                "INSERT INTO letters_fts (letters_fts, rowid, company, keywords, vacancy) "
+                "VALUES ('delete', ?, ?, ?, ?)",
+                (
+                    entry.id,
+                    *self._index_values(user_id, entry.company, entry.keywords, entry.vacancy),
+                ),
+            )
+            self._conn.execute("DELETE FROM letters WHERE id = ?", (entry.id,))
+
+    def _to_entry(self, row: sqlite3.Row) -> HistoryEntry:
+        """Decompress a letter row into a HistoryEntry."""
+        data = json.loads(zlib.decompress(row["data"]).decode("utf-8"))
+        result = data["result"]
+        return HistoryEntry(
+            id=row["id"],
+            created_at=row["created_at"],
+            company=row["company"],
+            vacancy=data["vacancy"],
+            cover_letter=result["cover_letter"],
+            keywords=result["metadata"].get("keywords") or [],
+            quality_score=row["quality_score"],
+        )
+
+
+def _synthetic_vocabulary(rng: random.Random, size: int) -> List[str]:
+    """Random Cyrillic words standing in for the vocabulary of real letters."""
+    alphabet = "абвгдежзийклмнопрстуфхцчшщыэюя"
+    return ["".join(rng.choices(alphabet, k=rng.randint(3, 12))) for _ in range(size)]
+
+
+def benchmark_history(
+    path: Path | str,
+    rows: int,
+    users: int = 10_000,
+    queries: int = 200,
+    batch_size: int = 1000,
+    seed: int = 1,
+) -> Dict[str, Any]:
+    """
+    Fill a history store with synthetic letters and measure its size and
+    the latency of /history listing, search and near-match lookups.
+    Word frequencies follow Zipf's law, as in natural text.
+    """
+    rng = random.Random(seed)
+    vocabulary = _synthetic_vocabulary(rng, 50_000)
+    weights = list(itertools.accumulate(1 / rank for rank in range(1, len(vocabulary) + 1)))
+    # Texts are random slices of one long Zipf-distributed word stream
+    corpus = rng.choices(vocabulary, cum_weights=weights, k=min(1_000_000, 600 * (rows + 1)))
+    store = HistoryStore(path, max_entries=rows, registry=MetricsRegistry())
+    sample_every = max(rows // queries, 1)
+    samples: List[Tuple[str, str]] = []
+
+    started = time.perf_counter()
+    batch: List[Tuple[str, str, CoverLetterResult]] = []
+    raw_bytes = 0
+    for index in range(rows):
+        user_id = str(rng.randrange(users))
+        offset = rng.randrange(len(corpus) - 600)
+        vacancy = " ".join(corpus[offset : offset + 350])
+        letter = " ".join(corpus[offset + 350 : offset + 600])
+        keywords = rng.sample(vocabulary[:2000], 8)
+        raw_bytes += len(vacancy.encode("utf-8")) + len(letter.encode("utf-8"))
+        result = CoverLetterResult(
+            cover_letter=letter,
+            quality_score=rng.random(),
+            keywords_found=rng.randint(0, 8),
+            generation_time=rng.uniform(5, 30),
+            metadata={"keywords": keywords, "company_name": rng.choice(vocabulary).title()},
+        )
+        batch.append((user_id, vacancy, result))
+        if index % sample_every == 0 and len(samples) < queries:
+            samples.append((user_id, vacancy))
+        if len(batch) >= batch_size:
+            store.save_many(batch)
+            batch = []
+    if batch:
+        store.save_many(batch)
+    insert_seconds = time.perf_counter() - started
+
+    timings: Dict[str, List[float]] = {"recent": [], "search": [], "match": []}
+    matched = 0
+    for user_id, vacancy in samples:
+        words = vacancy.split()
+        # A re-posted vacancy: 2% of its words changed
+        for _ in range(len(words) // 50):
+            words[rng.randrange(len(words))] = rng.choice(vocabulary)
+        query = " ".join(sorted(words, key=len)[-2:])
+        for name, call in (
+            ("recent", lambda: store.recent(user_id)),
+            ("search", lambda: store.search(user_id, query)),
+            ("match", lambda: store.find_similar(user_id, " ".join(words))),
+        ):
+            call_started = time.perf_counter()
+            found = call()
+            timings[name].append(time.perf_counter() - call_started)
+            if name == "match" and found is not None:
+                matched += 1
+
+    report = store.size_report()
+    store.close()
+    report.update(
+        {
+            "rows": rows,
+            "raw_bytes": raw_bytes,
+            "rows_per_second": rows / insert_seconds,
+            "matched": matched,
+            "queries": len(samples),
+        }
+    )
+    for name, values in timings.items():
+        values.sort()
+        report[f"{name}_p50"] = percentile(values, 0.5)
+        report[f"{name}_p95"] = percentile(values, 0.95)
+    return report
+
+
+def format_history_benchmark(report: Dict[str, Any]) -> str:
+    """Benchmark report as text."""
+    rows = report["rows"]
+    lines = [
+        f"{rows} letters, {report['users']} users, {report['rows_per_second']:.0f} inserts/s",
+        f"database  {report['db_bytes'] / 2**20:>9.1f} MiB  {report['db_bytes'] / rows:>7.0f} B/letter",
+        f"letters   {report['compressed_bytes'] / 2**20:>9.1f} MiB  "
+        f"{report['compressed_bytes'] / rows:>7.0f} B/letter (raw text {report['raw_bytes'] / rows:.0f} B)",
+        f"fts index {report['index_bytes'] / 2**20:>9.1f} MiB  {report['index_bytes'] / rows:>7.0f} B/letter",
+        "",
+        "query        p50 ms    p95 ms",
+    ]
+    for name in ("recent", "search", "match"):
+        lines.append(
+            f"{name:<10} {report[f'{name}_p50'] * 1000:>8.2f}  {report[f'{name}_p95'] * 1000:>8.2f}"
+        )
+    lines.append(f"near matches found: {report['matched']}/{report['queries']}")
+    return "\n".join(lines)
@@ -0,0 +1,408 @@
+"""
+Persistent background job queue backed by SQLite.
+"""
+
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from .metrics import MetricsRegistry, metrics
+from .models import Job
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_ATTEMPTS = 3
+RETRY_BASE_DELAY = 2.0
+SHUTDOWN_DRAIN_TIMEOUT = 30.0
+# Finished jobs (with the resume in their payload) are deleted after this long
+DEFAULT_RETENTION = 7 * 24 * 3600.0
+PURGE_INTERVAL = 3600.0
+TERMINAL_STATUSES = (JOB_DONE, JOB_FAILED, JOB_CANCELLED)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    chat_id TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+"""
+
+JobHandler = Callable[[Job], Awaitable[Optional[str]]]
+
+
+class JobStoreError(Exception):
+    """Error related to job storage operations."""
+
+    pass
+
+
+class JobStore:
+    """
+    SQLite job table. Calls are synchronous; JobQueue runs them in a thread.
+    """
+
+    def __init__(self, path: Path | str):
+        """Open (and create if needed) the job database."""
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        try:
+            self._conn = sqlite3.connect(
+                str(self.path), check_same_thread=False, isolation_level=None
+            )
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+        except sqlite3.Error as e:
+            raise JobStoreError(f"Failed to open job store: {e}") from e
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+
+    def add(self, kind: str, chat_id: str, payload: Dict[str, Any]) -> int:
+        """Insert a pending job and return its id."""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO jobs (kind, chat_id, payload, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (kind, chat_id, json.dumps(payload, ensure_ascii=False), JOB_PENDING, now, now),
+            )
+        return int(cursor.lastrowid or 0)
+
+    def get(self, job_id: int) -> Optional[Job]:
+        """Get job by id."""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_job(row) if row else None
+
+    def pending_ids(self) -> List[int]:
+        """Ids of pending jobs in creation order."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM jobs WHERE status = ? ORDER BY id", (JOB_PENDING,)
+            ).fetchall()
+        return [row["id"] for row in rows]
+
+    def mark_running(self, job_id: int) -> Optional[Job]:
+        """Claim a pending job and count the attempt."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, updated_at = ? "
+                "WHERE id = ? AND status = ?",
+                (JOB_RUNNING, time.time(), job_id, JOB_PENDING),
+            )
+            if cursor.rowcount == 0:
+                return None
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_job(row)
+
+    def finish(
+        self, job_id: int, status: str, result: Optional[str] = None, error: Optional[str] = None
+    ) -> None:
+        """
+        Set final or retry status of a job; a cancelled job stays cancelled.
+        Without a new result the saved one is kept.
+        """
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = COALESCE(?, result), error = ?, "
+                "updated_at = ? WHERE id = ? AND status != ?",
+                (status, result, error, time.time(), job_id, JOB_CANCELLED),
+            )
+
+    def save_result(self, job_id: int, result: str) -> None:
+        """Store the result of a running job before it is finished, kept across retries."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET result = ?, updated_at = ? WHERE id = ?",
+                (result, time.time(), job_id),
+            )
+
+    def cancel(self, job_id: int) -> bool:
+        """Mark a pending or running job cancelled; False if it already ended."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ? AND status IN (?, ?)",
+                (JOB_CANCELLED, time.time(), job_id, JOB_PENDING, JOB_RUNNING),
+            )
+        return cursor.rowcount > 0
+
+    def requeue_interrupted(self) -> int:
+        """Return jobs left running by a previous process to the pending state."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE status = ?",
+                (JOB_PENDING, time.time(), JOB_RUNNING),
+            )
+        return cursor.rowcount
+
+    def purge(self, older_than: float) -> int:
+        """Delete done, failed and cancelled jobs last updated before a unix time."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?, ?) AND updated_at < ?",
+                (*TERMINAL_STATUSES, older_than),
+            )
+        return cursor.rowcount
+
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs per status."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) AS total FROM jobs GROUP BY status"
+            ).fetchall()
+        return {row["status"]: row["total"] for row in rows}
+
+    def _to_job(self, row: sqlite3.Row) -> Job:
+        """Convert a database row to a Job."""
+        data = dict(row)
+        data["payload"] = json.loads(data["payload"])
+        return Job(**data)
+
+
+class JobQueue:
+    """
+    Asyncio workers over a JobStore.
+
+    Jobs survive restarts: anything left running by a crashed or stopped
+    process is pending again on the next start. Failed attempts are retried
+    with exponential backoff up to max_attempts; handlers checkpoint paid
+    work with save_result, so a retry does not repeat it. Finished jobs are
+    deleted once older than the retention.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        handlers: Dict[str, JobHandler],
+        workers: int = DEFAULT_WORKERS,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        retry_base_delay: float = RETRY_BASE_DELAY,
+        on_failure: Optional[Callable[[Job, Exception], Awaitable[None]]] = None,
+        retention: float = DEFAULT_RETENTION,
+        registry: Optional[MetricsRegistry] = None,
+    ):
+        """Initialize the queue."""
+        self.store = store
+        self.handlers = handlers
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_base_delay = retry_base_delay
+        self.on_failure = on_failure
+        self.retention = retention
+        self.registry = registry or metrics
+
+        self._queue: "asyncio.Queue[int]" = asyncio.Queue()
+        self._worker_tasks: List["asyncio.Task[None]"] = []
+        self._busy_workers: set["asyncio.Task[None]"] = set()
+        # Handler tasks of running jobs, so a single job can be cancelled
+        self._running: Dict[int, "asyncio.Task[Optional[str]]"] = {}
+        self._retry_tasks: set["asyncio.Task[None]"] = set()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._accepting = False
+        self._last_purge = 0.0
+
+    async def start(self) -> None:
+        """Resume interrupted jobs and start workers."""
+        requeued = await asyncio.to_thread(self.store.requeue_interrupted)
+        if requeued:
+            logger.info(f"Resuming {requeued} interrupted jobs")
+        for job_id in await asyncio.to_thread(self.store.pending_ids):
+            self._queue.put_nowait(job_id)
+        await self._purge_expired()
+
+        self._accepting = True
+        self._worker_tasks = [
+            asyncio.create_task(self._worker(), name=f"job-worker-{index}")
+            for index in range(self.workers)
+        ]
+        await self._update_gauges()
+        logger.info(f"Job queue started with {self.workers} workers")
+
+    async def enqueue(self, kind: str, chat_id: str, payload: Dict[str, Any]) -> int:
+        """Persist a job and schedule it; returns immediately."""
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        if not self._accepting:
+            raise JobStoreError("Job queue is not accepting jobs")
+
+        job_id = await asyncio.to_thread(self.store.add, kind, chat_id, payload)
+        self._queue.put_nowait(job_id)
+        self.registry.increment("jobs.enqueued")
+        self.registry.set_gauge("jobs.queue_depth", self._queue.qsize())
+        logger.debug(f"Enqueued job {job_id} ({kind}) for chat {chat_id}")
+        return job_id
+
+    async def save_result(self, job: Job, result: str) -> None:
+        """
+        Checkpoint a handler's expensive work. A retry gets the job with this
+        result set, so it can redo only the steps after the checkpoint.
+        """
+        await asyncio.to_thread(self.store.save_result, job.id, result)
+        job.result = result
+
+    async def cancel(self, job_id: int) -> bool:
+        """
+        Cancel a job: a pending one is never started, a running one has its
+        handler task cancelled. Returns False if the job already ended.
+        """
+        cancelled = await asyncio.to_thread(self.store.cancel, job_id)
+        task = self._running.get(job_id)
+        if task is not None:
+            task.cancel()
+        if cancelled:
+            self.registry.increment("jobs.cancelled")
+            await self._update_gauges()
+            logger.info(f"Job {job_id} cancelled")
+        return cancelled
+
+    async def stop(self, timeout: float = SHUTDOWN_DRAIN_TIMEOUT) -> None:
+        """
+        Stop accepting jobs and let in-flight jobs finish.
+        Jobs still running after the timeout are cancelled and resume on next start.
+        """
+        self._accepting = False
+        for task in self._retry_tasks:
+            task.cancel()
+
+        # Workers stop picking new jobs; in-flight ones drain
+        for task in self._worker_tasks:
+            if task not in self._busy_workers:
+                task.cancel()
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"{len(self._busy_workers)} jobs still running after {timeout}s, cancelling"
+            )
+
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, *self._retry_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        self._retry_tasks.clear()
+        logger.info("Job queue stopped")
+
+    async def _worker(self) -> None:
+        """Take job ids from the queue and run them."""
+        task = asyncio.current_task()
+        assert task is not None
+        while self._accepting:
+            job_id = await self._queue.get()
+            if not self._accepting:
+                # Still pending in the store, picked up on next start
+                break
+
+            self._busy_workers.add(task)
+            self._idle.clear()
+            try:
+                await self._run(job_id)
+            finally:
+                self._busy_workers.discard(task)
+                if not self._busy_workers:
+                    self._idle.set()
+                self._queue.task_done()
+
+    async def _run(self, job_id: int) -> None:
+        """Run one attempt of a job and record the outcome."""
+        job = await asyncio.to_thread(self.store.mark_running, job_id)
+        if job is None:
+            return
+
+        started = time.monotonic()
+        handler_task = asyncio.create_task(self.handlers[job.kind](job))
+        self._running[job_id] = handler_task
+        try:
+            result = await handler_task
+        except asyncio.CancelledError:
+            worker = asyncio.current_task()
+            if worker is not None and worker.cancelling():
+                # Left in running state on purpose: requeued on next start
+                logger.info(f"Job {job_id} interrupted by shutdown")
+                raise
+            # Only the handler was cancelled: the job was cancelled through cancel()
+            return
+        except Exception as e:
+            await self._handle_failure(job, e)
+            return
+        finally:
+            self._running.pop(job_id, None)
+            self.registry.observe("jobs.run_seconds", time.monotonic() - started)
+
+        await asyncio.to_thread(self.store.finish, job_id, JOB_DONE, result)
+        self.registry.increment("jobs.completed")
+        await self._purge_expired()
+        await self._update_gauges()
+        logger.info(f"Job {job_id} completed in {time.monotonic() - started:.2f}s")
+
+    async def _handle_failure(self, job: Job, error: Exception) -> None:
+        """Schedule a retry or mark the job failed."""
+        if job.attempts < self.max_attempts:
+            delay = self.retry_base_delay * 2 ** (job.attempts - 1)
+            logger.warning(
+                f"Job {job.id} attempt {job.attempts} failed: {error}; retry in {delay}s"
+            )
+            await asyncio.to_thread(self.store.finish, job.id, JOB_PENDING, None, str(error))
+            self.registry.increment("jobs.retried")
+            retry = asyncio.create_task(self._requeue_later(job.id, delay))
+            self._retry_tasks.add(retry)
+            retry.add_done_callback(self._retry_tasks.discard)
+            return
+
+        logger.error(f"Job {job.id} failed after {job.attempts} attempts: {error}")
+        await asyncio.to_thread(self.store.finish, job.id, JOB_FAILED, None, str(error))
+        self.registry.increment("jobs.failed")
+        await self._update_gauges()
+        if self.on_failure:
+            try:
+                await self.on_failure(job, error)
+            except Exception as e:
+                logger.error(f"Failure callback for job {job.id} failed: {e}")
+
+    async def _requeue_later(self, job_id: int, delay: float) -> None:
+        """Put a job back on the queue after a delay."""
+        await asyncio.sleep(delay)
+        if self._accepting:
+            self._queue.put_nowait(job_id)
+
+    async def _purge_expired(self) -> None:
+        """Delete finished jobs older than the retention, at most once per PURGE_INTERVAL."""
+        now = time.time()
+        if now - self._last_purge < PURGE_INTERVAL:
+            return
+        self._last_purge = now
+        purged = await asyncio.to_thread(self.store.purge, now - self.retention)
+        if purged:
+            self.registry.increment("jobs.purged", purged)
+            logger.info(f"Purged {purged} jobs older than {self.retention / 86400:.0f} days")
+
+    async def _update_gauges(self) -> None:
+        """Publish per-status job counts."""
+        counts = await asyncio.to_thread(self.store.counts)
+        for status in (JOB_PENDING, JOB_RUNNING, JOB_DONE, JOB_FAILED, JOB_CANCELLED):
+            self.registry.set_gauge(f"jobs.{status}", counts.get(status, 0))
+        self.registry.set_gauge("jobs.queue_depth", self._queue.qsize())
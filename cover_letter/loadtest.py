@@ -0,0 +1,105 @@
+"""
+HTTP load test for the generation API.
+"""
+
+import asyncio
+import time
+import uuid
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from .metrics import percentile
+
+DEFAULT_LOAD_REQUESTS = 200
+DEFAULT_LOAD_CONCURRENCY = 20
+DEFAULT_LOAD_TIMEOUT = 120.0
+
+LOAD_TEST_RESUME = """# Иван Иванов
+
+## Опыт работы
+
+**ТехКорп**, Москва
+Python Developer | Jan 2020 — Dec 2023
+- Перевёл монолит на микросервисы, время ответа API сократилось на 40%
+- Настроил CI/CD, релизы стали в 2 раза быстрее
+"""
+
+LOAD_TEST_VACANCY = """Компания: ФинТех
+Ищем Python-разработчика: Django, FastAPI, PostgreSQL, Docker, Kubernetes.
+Задачи: развитие платёжных сервисов, проектирование API, код-ревью.
+"""
+
+
+async def run_load_test(
+    url: str,
+    requests: int = DEFAULT_LOAD_REQUESTS,
+    concurrency: int = DEFAULT_LOAD_CONCURRENCY,
+    payload: Optional[Dict[str, Any]] = None,
+    unique: bool = True,
+    timeout: float = DEFAULT_LOAD_TIMEOUT,
+) -> Dict[str, Any]:
+    """
+    POST the payload to url with bounded concurrency and summarize latencies.
+    With unique=True each request gets a distinct vacancy, so server-side
+    de-duplication and caches do not hide the generation cost.
+    """
+    import httpx
+
+    payload = payload or {"resume": LOAD_TEST_RESUME, "job_description": LOAD_TEST_VACANCY}
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    response_bytes = 0
+
+    async with httpx.AsyncClient(
+        timeout=timeout,
+        limits=httpx.Limits(max_connections=concurrency),
+        headers={"Accept-Encoding": "gzip"},
+    ) as client:
+
+        async def send(index: int) -> None:
+            nonlocal response_bytes
+            body = dict(payload)
+            if unique:
+                body["job_description"] = f"{body['job_description']}\nЗаявка {uuid.uuid4().hex}"
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    response = await client.post(url, json=body)
+                    statuses[str(response.status_code)] += 1
+                    response_bytes += int(response.headers.get("content-length", 0))
+                except httpx.HTTPError as e:
+                    statuses[type(e).__name__] += 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(send(index) for index in range(requests)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "elapsed": elapsed,
+        "requests_per_second": requests / elapsed if elapsed else 0.0,
+        "statuses": dict(statuses),
+        "latency_p50": percentile(latencies, 0.50),
+        "latency_p95": percentile(latencies, 0.95),
+        "latency_p99": percentile(latencies, 0.99),
+        "latency_max": latencies[-1] if latencies else 0.0,
+        "mean_response_bytes": response_bytes / requests if requests else 0.0,
+    }
+
+
+def format_load_report(report: Dict[str, Any]) -> str:
+    """Render a load test report as plain text."""
+    statuses = ", ".join(
+        f"{status}: {count}" for status, count in sorted(report["statuses"].items())
+    )
+    return (
+        f"{report['requests']} requests, concurrency {report['concurrency']}, "
+        f"{report['elapsed']:.1f}s, {report['requests_per_second']:.1f} req/s\n"
+        f"latency p50={report['latency_p50']:.3f}s p95={report['latency_p95']:.3f}s "
+        f"p99={report['latency_p99']:.3f}s max={report['latency_max']:.3f}s\n"
+        f"statuses: {statuses}; mean response {report['mean_response_bytes']:.0f} bytes"
+    )
@@ -0,0 +1,108 @@
+"""
+In-process metrics registry shared by the bot and the debug server.
+"""
+
+import threading
+from collections import deque
+from typing import Any, Deque, Dict
+
+# Number of recent samples kept per timing metric for percentile estimates
+DEFAULT_MAX_SAMPLES = 1024
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    """Return the nearest-rank percentile of already sorted values."""
+    if not sorted_values:
+        return 0.0
+    index = min(int(fraction * len(sorted_values)), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+class MetricsRegistry:
+    """
+    Thread-safe counters, gauges and sample summaries.
+    Samples are kept in a bounded window, so memory stays constant.
+    """
+
+    def __init__(self, max_samples: int = DEFAULT_MAX_SAMPLES):
+        """Initialize an empty registry."""
+        self._max_samples = max_samples
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[str, float] = {}
+        self._samples: Dict[str, Deque[float]] = {}
+        self._sample_counts: Dict[str, int] = {}
+        self._sample_totals: Dict[str, float] = {}
+
+    def increment(self, name: str, value: float = 1.0) -> None:
+        """Increase a counter."""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0.0) + value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        """Set a gauge to the latest value."""
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name: str, value: float) -> None:
+        """Record a sample (latency, size, lag) for a summary metric."""
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = deque(maxlen=self._max_samples)
+                self._samples[name] = samples
+            samples.append(value)
+            self._sample_counts[name] = self._sample_counts.get(name, 0) + 1
+            self._sample_totals[name] = self._sample_totals.get(name, 0.0) + value
+
+    def counter(self, name: str) -> float:
+        """Get current counter value."""
+        with self._lock:
+            return self._counters.get(name, 0.0)
+
+    def gauge(self, name: str) -> float:
+        """Get current gauge value."""
+        with self._lock:
+            return self._gauges.get(name, 0.0)
+
+    def summary(self, name: str) -> Dict[str, float]:
+        """Get count, mean and percentiles for a summary metric."""
+        with self._lock:
+            values = sorted(self._samples.get(name, ()))
+            count = self._sample_counts.get(name, 0)
+            total = self._sample_totals.get(name, 0.0)
+
+        return {
+            "count": count,
+            "mean": total / count if count else 0.0,
+            "p50": percentile(values, 0.50),
+            "p95": percentile(values, 0.95),
+            "p99": percentile(values, 0.99),
+            "max": values[-1] if values else 0.0,
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Get all metrics as a JSON-serializable dict."""
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            summary_names = list(self._samples)
+
+        return {
+            "counters": counters,
+            "gauges": gauges,
+            "summaries": {name: self.summary(name) for name in summary_names},
+        }
+
+    def reset(self) -> None:
+        """Drop all recorded metrics."""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._samples.clear()
+            self._sample_counts.clear()
+            self._sample_totals.clear()
+
+
+# Process-wide registry used by default
+metrics = MetricsRegistry()
@@ -15,6 +15,72 @@ class JobAnalysis(BaseModel):
     company_name: Optional[str] = Field(default=None, description="Company name if found")
 
 
+class VacancyMatch(BaseModel):
+    """A previously analysed vacancy similar to the query."""
+
+    similarity: float = Field(ge=0.0, le=1.0, description="Estimated Jaccard similarity")
+    data: Dict[str, Any] = Field(description="Analysis stored for the matched vacancy")
+
+
+class ResumeBlockScore(BaseModel):
+    """Relevance score of one resume experience block."""
+
+    title: str = Field(description="First line of the block (company)")
+    relevance: float = Field(ge=0.0, description="Similarity to the vacancy")
+    tenure_months: int = Field(ge=0, description="Months at this job")
+    score: float = Field(ge=0.0, description="Combined relevance and tenure score")
+    tokens: int = Field(ge=0, description="Estimated tokens in the block")
+    selected: bool = Field(default=False, description="Whether the block is sent to the model")
+    pinned: bool = Field(default=False, description="Named in the instructions, always kept")
+
+
+class ResumeSelection(BaseModel):
+    """Resume text reduced to the most relevant experience blocks."""
+
+    text: str = Field(description="Resume text to send to the model")
+    applied: bool = Field(description="Whether any block was dropped")
+    original_tokens: int = Field(ge=0, description="Estimated tokens in the full resume")
+    selected_tokens: int = Field(ge=0, description="Estimated tokens in the selected text")
+    blocks: List[ResumeBlockScore] = Field(default_factory=list, description="Per-block scores")
+
+
+class RuleViolation(BaseModel):
+    """A single broken cover letter rule."""
+
+    rule: str = Field(description="Rule identifier")
+    message: str = Field(description="Human-readable description, used in fix-up prompts")
+    hard: bool = Field(default=True, description="Hard violations trigger a fix-up call")
+
+
+class ValidationReport(BaseModel):
+    """Result of local cover letter validation."""
+
+    word_count: int = Field(ge=0, description="Number of words in cover letter")
+    violations: List[RuleViolation] = Field(default_factory=list, description="Broken rules")
+
+    @property
+    def hard_violations(self) -> List[RuleViolation]:
+        """Violations that should be fixed before sending."""
+        return [violation for violation in self.violations if violation.hard]
+
+    @property
+    def passed(self) -> bool:
+        """Whether no rule was broken."""
+        return not self.violations
+
+
+class CoverLetterCandidate(BaseModel):
+    """A locally scored cover letter variant."""
+
+    cover_letter: str = Field(description="Candidate cover letter content")
+    quality_score: float = Field(ge=0.0, le=1.0, description="Quality score from 0.0 to 1.0")
+    keywords_found: int = Field(ge=0, description="Number of keywords found in cover letter")
+    word_count: int = Field(ge=0, description="Number of words in cover letter")
+    violations: List[RuleViolation] = Field(
+        default_factory=list, description="Prompt rules broken by this variant"
+    )
+
+
 class CoverLetterResult(BaseModel):
     """Result of cover letter generation."""
 
@@ -23,3 +89,47 @@ class CoverLetterResult(BaseModel):
     keywords_found: int = Field(ge=0, description="Number of keywords found in cover letter")
     generation_time: float = Field(ge=0.0, description="Time taken to generate in seconds")
     metadata: Dict[str, Any] = Field(default_factory=dict, description="Additional metadata")
+    alternatives: List[CoverLetterCandidate] = Field(
+        default_factory=list, description="Other generated variants, best first"
+    )
+
+
+class ResumeVersion(BaseModel):
+    """A stored resume version of a user."""
+
+    name: str = Field(description="Version name")
+    content_hash: str = Field(description="SHA-256 of the resume text")
+    size: int = Field(ge=0, description="Resume size in UTF-8 bytes")
+    stored_size: int = Field(ge=0, description="Compressed size on disk in bytes")
+    created_at: float = Field(description="Creation time (unix seconds)")
+    active: bool = Field(default=False, description="Whether the version is used for generation")
+
+
+class HistoryEntry(BaseModel):
+    """A cover letter from a user's generation history."""
+
+    id: int = Field(description="Entry identifier")
+    created_at: float = Field(description="Generation time (unix seconds)")
+    company: str = Field(default="", description="Company name if found")
+    vacancy: str = Field(description="Job description the letter was written for")
+    cover_letter: str = Field(description="Cover letter content")
+    keywords: List[str] = Field(default_factory=list, description="Vacancy keywords")
+    quality_score: float = Field(ge=0.0, le=1.0, description="Quality score from 0.0 to 1.0")
+    similarity: Optional[float] = Field(
+        default=None, ge=0.0, le=1.0, description="Vacancy similarity of a near match"
+    )
+
+
+class Job(BaseModel):
+    """A persisted background job."""
+
+    id: int = Field(description="Job identifier")
+    kind: str = Field(description="Job type used to pick a handler")
+    chat_id: str = Field(description="Chat that receives the result")
+    payload: Dict[str, Any] = Field(default_factory=dict, description="Job arguments")
+    status: str = Field(description="pending, running, done, failed or cancelled")
+    attempts: int = Field(default=0, ge=0, description="Number of started attempts")
+    result: Optional[str] = Field(default=None, description="Result text when done")
+    error: Optional[str] = Field(default=None, description="Last error message")
+    created_at: float = Field(description="Creation time (unix seconds)")
+    updated_at: float = Field(description="Last status change (unix seconds)")
@@ -0,0 +1,192 @@
+"""
+Event loop lag sampling and blocking call detection.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import sysconfig
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from .metrics import MetricsRegistry, metrics
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Monitor defaults: cheap enough to stay enabled in production
+LOOP_LAG_SAMPLE_INTERVAL = 0.1
+SLOW_CALLBACK_THRESHOLD = 0.25
+LOOP_REPORT_INTERVAL = 60.0
+SLOW_CALLBACK_STACK_LIMIT = 20
+SLOW_CALLBACK_HISTORY = 20
+
+# Frames from these directories are skipped when locating the offending code
+_LIBRARY_PATHS = tuple(
+    os.path.normcase(os.path.abspath(path))
+    for path in {sysconfig.get_paths()["stdlib"], sysconfig.get_paths()["purelib"]}
+)
+
+
+def _find_app_frame(frame: Any) -> Any:
+    """Return the innermost frame that belongs to application code."""
+    current = frame
+    while current is not None:
+        filename = os.path.normcase(os.path.abspath(current.f_code.co_filename))
+        if not filename.startswith(_LIBRARY_PATHS):
+            return current
+        current = current.f_back
+    return frame
+
+
+class EventLoopMonitor:
+    """
+    Samples event loop lag and reports callbacks that block the loop.
+
+    A lightweight timer callback runs on the loop every sample interval and
+    records how late it fired. A watchdog thread checks that the timer keeps
+    ticking; when it stalls longer than the threshold, the loop thread's
+    stack is captured while the blocking call is still running.
+    """
+
+    def __init__(
+        self,
+        sample_interval: float = LOOP_LAG_SAMPLE_INTERVAL,
+        slow_callback_threshold: float = SLOW_CALLBACK_THRESHOLD,
+        report_interval: float = LOOP_REPORT_INTERVAL,
+        registry: Optional[MetricsRegistry] = None,
+    ):
+        """Initialize the monitor."""
+        self.sample_interval = sample_interval
+        self.slow_callback_threshold = slow_callback_threshold
+        self.report_interval = report_interval
+        self.registry = registry or metrics
+        self.slow_callbacks: Deque[Dict[str, Any]] = deque(maxlen=SLOW_CALLBACK_HISTORY)
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._expected_tick = 0.0
+        self._last_tick = 0.0
+        self._reported_tick = 0.0
+        self._last_report = 0.0
+        self._stop_event = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        """Whether the monitor is currently active."""
+        return self._timer is not None
+
+    def start(self) -> None:
+        """Start monitoring the running event loop."""
+        if self.running:
+            return
+
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        now = time.monotonic()
+        self._last_tick = now
+        self._last_report = now
+        self._expected_tick = now + self.sample_interval
+        self._timer = self._loop.call_at(self._loop.time() + self.sample_interval, self._tick)
+
+        self._stop_event.clear()
+        self._watchdog = threading.Thread(
+            target=self._watch, name="event-loop-watchdog", daemon=True
+        )
+        self._watchdog.start()
+        logger.info(
+            f"Event loop monitor started (interval={self.sample_interval}s, "
+            f"slow callback threshold={self.slow_callback_threshold}s)"
+        )
+
+    def stop(self) -> None:
+        """Stop monitoring."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._stop_event.set()
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1.0)
+            self._watchdog = None
+
+    def _tick(self) -> None:
+        """Timer callback: record lag and schedule the next sample."""
+        now = time.monotonic()
+        lag = max(0.0, now - self._expected_tick)
+        self._last_tick = now
+        self.registry.observe("event_loop.lag_seconds", lag)
+        self.registry.set_gauge("event_loop.lag_seconds.last", lag)
+
+        if now - self._last_report >= self.report_interval:
+            self._last_report = now
+            self._log_report()
+
+        if self._loop is not None and self._timer is not None:
+            self._expected_tick = now + self.sample_interval
+            self._timer = self._loop.call_at(self._loop.time() + self.sample_interval, self._tick)
+
+    def _watch(self) -> None:
+        """Watchdog thread: detect stalled ticks and capture the blocking stack."""
+        check_interval = max(self.slow_callback_threshold / 2, 0.01)
+        while not self._stop_event.wait(check_interval):
+            last_tick = self._last_tick
+            stalled = time.monotonic() - last_tick - self.sample_interval
+            if stalled < self.slow_callback_threshold or last_tick == self._reported_tick:
+                continue
+
+            # Report each stall once, while the offending call is still on the stack
+            self._reported_tick = last_tick
+            self._report_slow_callback(stalled)
+
+    def _report_slow_callback(self, stalled: float) -> None:
+        """Log and record the stack of the code currently blocking the loop."""
+        frame = sys._current_frames().get(self._loop_thread_id or 0)
+        if frame is None:
+            return
+
+        app_frame = _find_app_frame(frame)
+        location = (
+            f"{app_frame.f_code.co_name} "
+            f"({os.path.basename(app_frame.f_code.co_filename)}:{app_frame.f_lineno})"
+        )
+        stack = "".join(traceback.format_stack(frame, limit=SLOW_CALLBACK_STACK_LIMIT))
+
+        task_name = ""
+        try:
+            task = asyncio.current_task(self._loop)
+            if task is not None:
+                task_name = task.get_name()
+                coro = task.get_coro()
+                if coro is not None:
+                    task_name += f" ({getattr(coro, '__qualname__', coro)})"
+        except RuntimeError:
+            pass
+
+        self.slow_callbacks.append(
+            {
+                "location": location,
+                "task": task_name,
+                "blocked_for": round(stalled, 4),
+                "stack": stack,
+            }
+        )
+        self.registry.increment("event_loop.slow_callbacks")
+        logger.warning(
+            f"Event loop blocked for at least {stalled:.3f}s at {location} "
+            f"in task {task_name or 'unknown'}\n{stack}"
+        )
+
+    def _log_report(self) -> None:
+        """Log a periodic lag summary."""
+        lag = self.registry.summary("event_loop.lag_seconds")
+        slow = int(self.registry.counter("event_loop.slow_callbacks"))
+        logger.info(
+            f"Event loop lag p50={lag['p50'] * 1000:.1f}ms p99={lag['p99'] * 1000:.1f}ms "
+            f"max={lag['max'] * 1000:.1f}ms, slow callbacks={slow}"
+        )
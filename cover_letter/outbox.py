@@ -0,0 +1,294 @@
+"""
+Outbound Telegram message queue paced to the Bot API flood limits.
+"""
+
+import asyncio
+import functools
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple, TypeVar
+
+from .metrics import MetricsRegistry, metrics
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Telegram rejects longer texts (counted in UTF-16 code units)
+TELEGRAM_MESSAGE_LIMIT = 4096
+# Bot API guidance: about 30 messages per second overall, one per second in a
+# private chat and 20 per minute in a group; short bursts are tolerated
+OUTBOX_GLOBAL_RATE = 30.0
+OUTBOX_CHAT_RATE = 1.0
+OUTBOX_GROUP_RATE = 20 / 60
+OUTBOX_CHAT_BURST = 3.0
+# Sends of one message, including retries after 429 Too Many Requests
+OUTBOX_MAX_ATTEMPTS = 5
+OUTBOX_REPORT_INTERVAL = 60.0
+OUTBOX_CLOSE_TIMEOUT = 10.0
+
+# Split points from best to worst: paragraphs, lines, words
+_SEPARATORS = ("\n\n", "\n", " ")
+
+
+def telegram_length(text: str) -> int:
+    """Length of a text as Telegram counts it, in UTF-16 code units."""
+    return len(text.encode("utf-16-le")) // 2
+
+
+def split_message(text: str, limit: int = TELEGRAM_MESSAGE_LIMIT) -> List[str]:
+    """
+    Split text into messages of at most limit characters, at paragraph
+    boundaries where possible, else at line breaks, spaces or anywhere.
+    """
+    if telegram_length(text) <= limit:
+        return [text]
+    return [part for part in _split(text, limit, _SEPARATORS) if part.strip()]
+
+
+def _split(text: str, limit: int, separators: Tuple[str, ...]) -> List[str]:
+    """Greedily pack pieces of text separated by the first separator."""
+    if not separators:
+        return _hard_split(text, limit)
+
+    separator, finer = separators[0], separators[1:]
+    parts: List[str] = []
+    current = ""
+    for piece in text.split(separator):
+        candidate = current + separator + piece if current else piece
+        if telegram_length(candidate) <= limit:
+            current = candidate
+            continue
+        if current:
+            parts.append(current)
+        if telegram_length(piece) <= limit:
+            current = piece
+        else:
+            pieces = _split(piece, limit, finer)
+            parts.extend(pieces[:-1])
+            current = pieces[-1] if pieces else ""
+    if current:
+        parts.append(current)
+    return parts
+
+
+def _hard_split(text: str, limit: int) -> List[str]:
+    """Cut text into chunks of at most limit UTF-16 code units."""
+    parts: List[str] = []
+    start = length = 0
+    for index, char in enumerate(text):
+        width = 2 if ord(char) > 0xFFFF else 1
+        if length + width > limit:
+            parts.append(text[start:index])
+            start, length = index, 0
+        length += width
+    parts.append(text[start:])
+    return parts
+
+
+class TokenBucket:
+    """Rate limiter allowing rate events per second and bursts of up to burst."""
+
+    def __init__(self, rate: float, burst: float = 1.0):
+        """Initialize a full bucket."""
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def delay(self) -> float:
+        """Seconds until the next event is allowed."""
+        now = time.monotonic()
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+        delay = max(self.paused_until - now, 0.0)
+        if self.tokens < 1:
+            delay = max(delay, (1 - self.tokens) / self.rate)
+        return delay
+
+    async def acquire(self) -> float:
+        """Wait until an event is allowed and take its token. Returns the seconds waited."""
+        waited = 0.0
+        while (delay := self.delay()) > 0:
+            await asyncio.sleep(delay)
+            waited += delay
+        self.tokens -= 1
+        return waited
+
+    def pause(self, seconds: float) -> None:
+        """Allow no events for the given time, then one, then resume at the rate."""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        # No tokens accumulate during the pause
+        self.tokens = 1.0
+        self.updated = self.paused_until
+
+
+class _ChatQueue:
+    """Pending sends, rate limiter and sender task of one chat."""
+
+    def __init__(self, bucket: TokenBucket):
+        self.bucket = bucket
+        self.queue: "asyncio.Queue[Tuple[Callable[[], Awaitable[Any]], asyncio.Future, float]]" = (
+            asyncio.Queue()
+        )
+        self.worker: Optional[asyncio.Task] = None
+
+
+class Outbox:
+    """
+    Sends Telegram API calls one chat at a time, in submission order, paced
+    per chat and globally. A 429 response pauses the chat for its
+    retry_after and the call is retried; texts longer than a Telegram
+    message are split at paragraph boundaries.
+    """
+
+    def __init__(
+        self,
+        send_message: Callable[..., Awaitable[Any]],
+        global_rate: float = OUTBOX_GLOBAL_RATE,
+        chat_rate: float = OUTBOX_CHAT_RATE,
+        group_rate: float = OUTBOX_GROUP_RATE,
+        chat_burst: float = OUTBOX_CHAT_BURST,
+        max_attempts: int = OUTBOX_MAX_ATTEMPTS,
+        message_limit: int = TELEGRAM_MESSAGE_LIMIT,
+        report_interval: float = OUTBOX_REPORT_INTERVAL,
+        registry: Optional[MetricsRegistry] = None,
+    ):
+        """Initialize the outbox around a send_message(chat_id, text, **kwargs) call."""
+        self.send_message = send_message
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.chat_burst = chat_burst
+        self.max_attempts = max_attempts
+        self.message_limit = message_limit
+        self.report_interval = report_interval
+        self.registry = registry or metrics
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+
+        self._chats: Dict[str, _ChatQueue] = {}
+        self._pending: Set[asyncio.Future] = set()
+        self._last_report = time.monotonic()
+
+    @property
+    def pending(self) -> int:
+        """Calls queued or being sent."""
+        return len(self._pending)
+
+    async def send(self, chat_id: int | str, text: str, **kwargs: Any) -> List[Any]:
+        """Send a text, split into several messages if needed; returns the sent messages."""
+        parts = split_message(text, self.message_limit)
+        if len(parts) > 1:
+            self.registry.increment("outbox.split_messages")
+        # Queued together, so no other message of the chat lands between the parts
+        futures = [
+            self._enqueue(chat_id, functools.partial(self.send_message, chat_id, part, **kwargs))
+            for part in parts
+        ]
+        return list(await asyncio.gather(*futures))
+
+    async def submit(self, chat_id: int | str, call: Callable[[], Awaitable[T]]) -> T:
+        """Run another API call for the chat (e.g. sending a document) in its queue."""
+        return await self._enqueue(chat_id, call)
+
+    async def close(self, timeout: float = OUTBOX_CLOSE_TIMEOUT) -> None:
+        """Wait up to timeout for queued calls, then stop the sender tasks."""
+        if self._pending:
+            _ = await asyncio.wait(set(self._pending), timeout=timeout)
+        for chat in list(self._chats.values()):
+            if chat.worker is not None:
+                chat.worker.cancel()
+        self._chats.clear()
+        if self._pending:
+            logger.warning(f"Outbox closed with {len(self._pending)} unsent messages")
+
+    def _enqueue(self, chat_id: int | str, call: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+        """Queue a call for the chat and start its sender task if needed."""
+        key = str(chat_id)
+        chat = self._chats.get(key)
+        if chat is None:
+            # Negative ids are groups and channels, limited to 20 messages a minute
+            rate = self.group_rate if key.startswith("-") else self.chat_rate
+            chat = self._chats[key] = _ChatQueue(TokenBucket(rate, self.chat_burst))
+
+        future = asyncio.get_running_loop().create_future()
+        chat.queue.put_nowait((call, future, time.monotonic()))
+        self._pending.add(future)
+        future.add_done_callback(self._pending.discard)
+        self.registry.set_gauge("outbox.pending", len(self._pending))
+        if chat.worker is None or chat.worker.done():
+            chat.worker = asyncio.create_task(self._drain(key, chat), name=f"outbox-{key}")
+        return future
+
+    async def _drain(self, key: str, chat: _ChatQueue) -> None:
+        """Sender task: deliver the chat's calls in order until it goes idle."""
+        # Once idle this long the chat's bucket is full again and can be dropped
+        idle_timeout = chat.bucket.burst / chat.bucket.rate
+        while True:
+            try:
+                call, future, queued_at = await asyncio.wait_for(chat.queue.get(), idle_timeout)
+            except asyncio.TimeoutError:
+                if chat.queue.empty():
+                    if self._chats.get(key) is chat:
+                        del self._chats[key]
+                    return
+                continue
+            if not future.done():
+                await self._deliver(key, chat, call, future, queued_at)
+            self.registry.set_gauge("outbox.pending", len(self._pending))
+
+    async def _deliver(
+        self,
+        key: str,
+        chat: _ChatQueue,
+        call: Callable[[], Awaitable[Any]],
+        future: asyncio.Future,
+        queued_at: float,
+    ) -> None:
+        """Make one call, retrying after flood-control responses."""
+        for attempt in range(1, self.max_attempts + 1):
+            waited = await chat.bucket.acquire()
+            waited += await self.global_bucket.acquire()
+            self.registry.observe("outbox.wait_seconds", waited)
+            if future.done():
+                # The caller gave up while the call was waiting
+                return
+
+            started = time.monotonic()
+            try:
+                result = await call()
+            except Exception as e:
+                retry_after = getattr(e, "retry_after", None)
+                if retry_after is None or attempt == self.max_attempts:
+                    self.registry.increment("outbox.failed")
+                    logger.error(f"Sending to chat {key} failed after {attempt} attempts: {e}")
+                    if not future.done():
+                        future.set_exception(e)
+                    return
+                self.registry.increment("outbox.retry_after")
+                logger.warning(f"Flood control in chat {key}: retrying in {retry_after}s")
+                chat.bucket.pause(float(retry_after))
+                continue
+
+            now = time.monotonic()
+            self.registry.increment("outbox.sent")
+            self.registry.observe("outbox.send_seconds", now - started)
+            self.registry.observe("outbox.latency_seconds", now - queued_at)
+            if not future.done():
+                future.set_result(result)
+            if now - self._last_report >= self.report_interval:
+                self._last_report = now
+                self._log_report()
+            return
+
+    def _log_report(self) -> None:
+        """Log a periodic send summary."""
+        latency = self.registry.summary("outbox.latency_seconds")
+        logger.info(
+            f"Outbox sent={int(self.registry.counter('outbox.sent'))} "
+            f"latency p50={latency['p50'] * 1000:.0f}ms p99={latency['p99'] * 1000:.0f}ms, "
+            f"retries={int(self.registry.counter('outbox.retry_after'))}, "
+            f"failed={int(self.registry.counter('outbox.failed'))}, pending={self.pending}"
+        )
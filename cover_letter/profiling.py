@@ -0,0 +1,206 @@
+"""
+On-demand sampling profiler that writes flamegraph-compatible stacks.
+"""
+
+import contextlib
+import itertools
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Iterator, List, Optional
+
+from .metrics import MetricsRegistry, metrics
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Sampling every few milliseconds keeps the overhead low enough for production
+PROFILE_SAMPLE_INTERVAL = 0.005
+PROFILE_MAX_STACK_DEPTH = 128
+PROFILE_DIR = "profiles"
+# Oldest profile files are deleted beyond this count
+PROFILE_MAX_FILES = 100
+
+# Frames up to the event loop's callback runner are the same for every sample
+_LOOP_RUNNER = ("events.py", "_run")
+# The loop waiting for I/O: not CPU time of any request
+_IDLE_FRAMES = {("selectors.py", "select"), ("selectors.py", "poll")}
+
+
+def _frame_label(frame: Any) -> str:
+    """Function name and definition site of a frame, safe for folded stacks."""
+    code = frame.f_code
+    name = getattr(code, "co_qualname", code.co_name)
+    label = f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    # ";" separates frames in a folded stack
+    return label.replace(";", ":")
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of one thread from a background thread.
+
+    Samples are aggregated as folded stacks ("outer;inner count" lines), the
+    input format of flamegraph.pl, inferno and speedscope. Samples taken
+    while the event loop waits for I/O are counted as idle and left out.
+    """
+
+    def __init__(
+        self,
+        thread_id: Optional[int] = None,
+        interval: float = PROFILE_SAMPLE_INTERVAL,
+        max_depth: int = PROFILE_MAX_STACK_DEPTH,
+    ):
+        """Initialize the profiler for a thread (the calling thread by default)."""
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks: Counter[str] = Counter()
+        self.idle_samples = 0
+        self.started = 0.0
+        self.duration = 0.0
+        # Saved profile file, set by RequestProfiler
+        self.path: Optional[Path] = None
+
+        self._stop_event = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+    @property
+    def samples(self) -> int:
+        """Samples with the thread busy."""
+        return sum(self.stacks.values())
+
+    def start(self) -> None:
+        """Start sampling."""
+        self.started = time.perf_counter()
+        self._stop_event.clear()
+        self._sampler = threading.Thread(target=self._sample_loop, name="profiler", daemon=True)
+        self._sampler.start()
+
+    def stop(self) -> None:
+        """Stop sampling and wait for the sampler thread."""
+        self._stop_event.set()
+        if self._sampler is not None:
+            self._sampler.join(timeout=1.0)
+            self._sampler = None
+        self.duration = time.perf_counter() - self.started
+
+    def folded(self) -> str:
+        """Samples as folded stacks, heaviest first."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def _sample_loop(self) -> None:
+        """Sampler thread: record the target stack every interval."""
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self._record(frame)
+
+    def _record(self, frame: Any) -> None:
+        """Fold one stack into the counts."""
+        code = frame.f_code
+        if (os.path.basename(code.co_filename), code.co_name) in _IDLE_FRAMES:
+            self.idle_samples += 1
+            return
+
+        labels: List[str] = []
+        current = frame
+        while current is not None and len(labels) < self.max_depth:
+            code = current.f_code
+            if (os.path.basename(code.co_filename), code.co_name) == _LOOP_RUNNER:
+                break
+            labels.append(_frame_label(current))
+            current = current.f_back
+        self.stacks[";".join(reversed(labels))] += 1
+
+
+class RequestProfiler:
+    """
+    Profiles selected requests and saves each profile as a .folded file.
+
+    Requests are profiled when asked for explicitly or at sample_rate. One
+    request per process is profiled at a time; the sampler sees the whole
+    event loop thread, so concurrent requests share the profile, each under
+    its own task's coroutine at the root of the stacks.
+    """
+
+    def __init__(
+        self,
+        directory: Path | str = PROFILE_DIR,
+        sample_rate: float = 0.0,
+        interval: float = PROFILE_SAMPLE_INTERVAL,
+        max_files: int = PROFILE_MAX_FILES,
+        registry: Optional[MetricsRegistry] = None,
+        rng: Optional[random.Random] = None,
+    ):
+        """Initialize the request profiler."""
+        self.directory = Path(directory)
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.max_files = max_files
+        self.registry = registry or metrics
+        self.rng = rng or random.Random()
+        self._lock = threading.Lock()
+        self._sequence = itertools.count(1)
+
+    def sampled(self) -> bool:
+        """Whether a request should be profiled under the sample rate."""
+        return self.sample_rate > 0 and self.rng.random() < self.sample_rate
+
+    def path(self, name: str) -> Optional[Path]:
+        """Saved profile by file name, or None for unknown or unsafe names."""
+        if not re.fullmatch(r"[\w.-]+\.folded", name):
+            return None
+        path = self.directory / name
+        return path if path.is_file() else None
+
+    @contextlib.contextmanager
+    def profile(self, label: str) -> Iterator[Optional[SamplingProfiler]]:
+        """
+        Profile the block and save it under the label. Yields None without
+        profiling when another request is being profiled; otherwise the
+        profiler, whose .path is set once the block exits.
+        """
+        if not self._lock.acquire(blocking=False):
+            self.registry.increment("profiler.skipped")
+            logger.info(f"Profiler busy, not profiling {label}")
+            yield None
+            return
+
+        profiler = SamplingProfiler(interval=self.interval)
+        profiler.start()
+        try:
+            yield profiler
+        finally:
+            profiler.stop()
+            self._lock.release()
+            profiler.path = self._save(label, profiler)
+
+    def _save(self, label: str, profiler: SamplingProfiler) -> Optional[Path]:
+        """Write a profile file and drop the oldest ones beyond max_files."""
+        name = re.sub(r"[^\w.-]+", "-", label).strip("-") or "request"
+        stamp = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(self._sequence)}"
+        path = self.directory / f"{stamp}-{name}.folded"
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            path.write_text(profiler.folded(), encoding="utf-8")
+            saved = sorted(self.directory.glob("*.folded"), key=os.path.getmtime)
+            for old in saved[: -self.max_files]:
+                old.unlink(missing_ok=True)
+        except OSError as e:
+            logger.warning(f"Could not save profile {path}: {e}")
+            return None
+
+        self.registry.increment("profiler.profiles")
+        self.registry.observe("profiler.duration_seconds", profiler.duration)
+        logger.info(
+            f"Profiled {label} for {profiler.duration:.3f}s: {profiler.samples} busy and "
+            f"{profiler.idle_samples} idle samples saved to {path}"
+        )
+        return path
@@ -52,6 +52,35 @@ FALLBACK_SYSTEM_PROMPT = """
 Длина: 250-350 слов. Тон: профессиональный, уверенный.
 """
 
+# Targeted fix-up prompt: only the letter and the broken rules are sent
+FIXUP_SYSTEM_PROMPT = """
+Ты - редактор сопроводительных писем.
+Исправь письмо так, чтобы устранить ТОЛЬКО перечисленные нарушения.
+Сохрани структуру, факты и тон. Не добавляй новых достижений и цифр.
+Верни только исправленный текст письма, без пояснений.
+"""
+
+REVISION_SYSTEM_PROMPT = """
+Ты - редактор сопроводительных писем.
+Внеси в письмо ТОЛЬКО правку, о которой просит пользователь.
+Весь остальной текст оставь дословно: структуру, факты и тон.
+Не добавляй новых достижений и цифр.
+Верни только исправленный текст письма, без пояснений.
+"""
+
+# Local validation rules from COVER_LETTER_SYSTEM_PROMPT
+LETTER_MIN_WORDS = 150
+LETTER_MAX_WORDS = 200
+# Length further than this fraction outside the range is a hard violation
+LETTER_LENGTH_TOLERANCE = 0.25
+FORBIDDEN_PHRASES = [
+    "с интересом откликаюсь",
+]
+SALARY_PATTERNS = [
+    r"\b(?:зарплат\w*|заработн\w+\s+плат\w*|оклад\w*|зп|salary)\b",
+    r"\d+\s*(?:k|к|тыс\.?)\s*(?:руб\w*|₽)",
+]
+
 # Simple regex patterns for keyword extraction fallback
 TECH_SKILL_PATTERNS = [
     r"\b(?:python|javascript|react|vue|angular|django|flask)\b",
@@ -64,14 +93,48 @@ TECH_SKILL_PATTERNS = [
 DEFAULT_MODEL = "gpt-4o-mini"
 KEYWORD_EXTRACTION_TEMPERATURE = 0.1
 COVER_LETTER_TEMPERATURE = 0.98
+# Number of letter variants requested in one completion call (n parameter)
+COVER_LETTER_CANDIDATES = 1
 FALLBACK_TEMPERATURE = 0.5
+FIXUP_TEMPERATURE = 0.3
+REVISION_TEMPERATURE = 0.3
+# Models that accept the current letter as a predicted output for revisions
+PREDICTED_OUTPUT_MODELS = ("gpt-4o", "gpt-4.1")
 
 # Token limits
 KEYWORD_EXTRACTION_MAX_TOKENS = 150
-COVER_LETTER_MAX_TOKENS = 1000
-FALLBACK_MAX_TOKENS = 200
+# Letter, fix-up and fallback limits come from the prompt's word limit and language
+TOKENS_PER_WORD = {"ru": 2.5, "en": 1.4}
+# Room above the word limit before the output is cut off
+OUTPUT_TOKEN_HEADROOM = 1.5
 
 
 # Content limits
 JOB_DESCRIPTION_PREVIEW_LIMIT = 10000
 MINIMUM_COVER_LETTER_WORDS = 50
+
+# Resume block selection for long resumes
+RESUME_EXPERIENCE_TOKEN_BUDGET = 700
+# Share of the block score that comes from tenure rather than relevance
+RESUME_TENURE_WEIGHT = 0.3
+# Rough characters per token for mixed Russian/English text
+CHARS_PER_TOKEN = 3.0
+
+# Near-duplicate vacancy index (reuses keyword and metadata extraction)
+# Estimated Jaccard similarity of word shingles needed to reuse an analysis
+VACANCY_SIMILARITY_THRESHOLD = 0.8
+VACANCY_SHINGLE_SIZE = 3
+# 16 bands x 4 rows: vacancies around 0.5 similarity become candidates
+VACANCY_INDEX_PERMUTATIONS = 64
+VACANCY_INDEX_BANDS = 16
+VACANCY_INDEX_MAX_ENTRIES = 1000
+# Shorter texts are neither indexed nor looked up
+VACANCY_INDEX_MIN_SHINGLES = 20
+
+# Speculative job analysis started before generation is requested
+PREPARED_ANALYSIS_MAX_ENTRIES = 256
+# Unclaimed analyses older than this are dropped
+PREPARED_ANALYSIS_TTL = 1800.0
+
+# Quality scoring
+HARD_VIOLATION_PENALTY = 0.1
@@ -0,0 +1,366 @@
+"""
+LLM providers and a latency-aware router with failover.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import random
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple
+
+from openai import (
+    APIConnectionError,
+    APITimeoutError,
+    InternalServerError,
+    OpenAIError,
+    RateLimitError,
+)
+
+from .clients import OPENAI_TIMEOUT
+from .metrics import MetricsRegistry, metrics
+from .resume_selection import estimate_tokens
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Weight of the newest sample in the rolling latency and error rate
+ROUTER_SMOOTHING = 0.2
+# Seconds of latency one dollar per call is worth when ranking providers
+ROUTER_COST_WEIGHT = 1000.0
+# How much an error rate of 1.0 multiplies the expected latency
+ROUTER_ERROR_PENALTY = 4.0
+# Consecutive failures that take a provider out of rotation for the cooldown
+ROUTER_FAILURE_THRESHOLD = 3
+ROUTER_COOLDOWN = 30.0
+# Share of requests sent to a random provider to keep latency estimates fresh
+ROUTER_EXPLORATION = 0.05
+# Each provider gets one attempt per request; the router fails over instead
+PROVIDER_MAX_RETRIES = 0
+# Failures of the provider rather than the request: outages, overload and
+# timeouts. Other API errors (400, 401, 404, ...) go to the caller unchanged.
+FAILOVER_ERRORS = (
+    APIConnectionError,
+    APITimeoutError,
+    InternalServerError,
+    RateLimitError,
+    OSError,
+    asyncio.TimeoutError,
+)
+
+# Pipeline stage of the API call running in the current task
+_llm_stage: contextvars.ContextVar[str] = contextvars.ContextVar("llm_stage", default="")
+
+
+@contextlib.contextmanager
+def llm_stage(stage: str) -> Iterator[None]:
+    """Tag API calls made inside the block with a pipeline stage for routing."""
+    token = _llm_stage.set(stage)
+    try:
+        yield
+    finally:
+        _llm_stage.reset(token)
+
+
+class ProviderError(OpenAIError):
+    """Every provider failed for a request, or none is configured."""
+
+    pass
+
+
+class Provider:
+    """
+    One chat completions backend: an AsyncOpenAI-compatible client, the model
+    it serves (None keeps the generator's model), prices in dollars per
+    million tokens and the stages it may serve (None means all).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        client: "AsyncOpenAI",
+        model: Optional[str] = None,
+        input_cost: float = 0.0,
+        output_cost: float = 0.0,
+        stages: Optional[List[str]] = None,
+    ):
+        """Initialize the provider."""
+        self.name = name
+        self.client = client
+        self.model = model
+        self.input_cost = input_cost
+        self.output_cost = output_cost
+        self.stages = set(stages) if stages else None
+
+    def serves(self, stage: str) -> bool:
+        """Whether the provider may serve a stage."""
+        return self.stages is None or not stage or stage in self.stages
+
+    def estimated_cost(self, body: Dict[str, Any]) -> float:
+        """Upper-bound cost of a request: its prompt and max_tokens per choice."""
+        prompt = "".join(str(message.get("content", "")) for message in body.get("messages", []))
+        completion = (body.get("max_tokens") or 0) * (body.get("n") or 1)
+        return (estimate_tokens(prompt) * self.input_cost + completion * self.output_cost) / 1e6
+
+
+def openai_provider(
+    api_key: Optional[str] = None,
+    input_cost: float = 0.15,
+    output_cost: float = 0.6,
+    timeout: float = OPENAI_TIMEOUT,
+) -> Provider:
+    """The OpenAI API at OPENAI_BASE_URL if set (default prices are gpt-4o-mini's)."""
+    from openai import AsyncOpenAI
+
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise ValueError("OPENAI_API_KEY environment variable is required")
+    client = AsyncOpenAI(
+        api_key=api_key,
+        base_url=os.getenv("OPENAI_BASE_URL") or "https://api.openai.com/v1",
+        timeout=timeout,
+        max_retries=PROVIDER_MAX_RETRIES,
+    )
+    return Provider("openai", client, input_cost=input_cost, output_cost=output_cost)
+
+
+def compatible_provider(
+    name: str,
+    base_url: str,
+    model: Optional[str] = None,
+    api_key: str = "none",
+    timeout: float = OPENAI_TIMEOUT,
+    **options: Any,
+) -> Provider:
+    """An OpenAI-compatible endpoint, e.g. a local llama.cpp or vLLM server."""
+    from openai import AsyncOpenAI
+
+    client = AsyncOpenAI(
+        api_key=api_key, base_url=base_url, timeout=timeout, max_retries=PROVIDER_MAX_RETRIES
+    )
+    return Provider(name, client, model=model, **options)
+
+
+def mock_provider(
+    name: str = "mock", latency: float = 0.0, error_rate: float = 0.0, **options: Any
+) -> Provider:
+    """In-process stand-in with canned answers, served without a network."""
+    import httpx
+    from openai import AsyncOpenAI
+
+    from .standin import create_standin_app
+
+    transport = httpx.ASGITransport(app=create_standin_app(latency, error_rate))
+    client = AsyncOpenAI(
+        api_key="mock",
+        base_url=f"http://{name}/v1",
+        http_client=httpx.AsyncClient(transport=transport),
+        max_retries=PROVIDER_MAX_RETRIES,
+    )
+    return Provider(name, client, **options)
+
+
+def load_providers(path: Path | str) -> List[Provider]:
+    """
+    Build providers from a JSON list. Each entry has a name and either
+    "type": "openai" / "mock" or a base_url; optional keys are model,
+    api_key_env, input_cost, output_cost, stages, latency and error_rate.
+    """
+    with open(path, encoding="utf-8") as config_file:
+        entries = json.load(config_file)
+
+    providers = []
+    for entry in entries:
+        options = {
+            key: entry[key]
+            for key in ("model", "input_cost", "output_cost", "stages")
+            if key in entry
+        }
+        kind = entry.get("type", "compatible")
+        if kind == "openai":
+            costs = {key: options[key] for key in ("input_cost", "output_cost") if key in options}
+            api_key = os.getenv(entry.get("api_key_env", "OPENAI_API_KEY"))
+            providers.append(openai_provider(api_key, **costs))
+        elif kind == "mock":
+            providers.append(
+                mock_provider(
+                    entry["name"],
+                    entry.get("latency", 0.0),
+                    entry.get("error_rate", 0.0),
+                    **options,
+                )
+            )
+        else:
+            api_key = os.getenv(entry["api_key_env"], "none") if "api_key_env" in entry else "none"
+            providers.append(
+                compatible_provider(entry["name"], entry["base_url"], api_key=api_key, **options)
+            )
+    return providers
+
+
+class _ProviderStats:
+    """Rolling latency and error rate of one provider for one stage."""
+
+    def __init__(self):
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.calls = 0
+
+    def record(self, latency: Optional[float], failed: bool) -> None:
+        """Fold one call into the rolling estimates."""
+        self.calls += 1
+        if latency is not None:
+            self.latency = (
+                latency
+                if self.latency is None
+                else self.latency + ROUTER_SMOOTHING * (latency - self.latency)
+            )
+        self.error_rate += ROUTER_SMOOTHING * (float(failed) - self.error_rate)
+
+
+class _RouterCompletions:
+    """Drop-in for client.chat.completions that routes each request."""
+
+    def __init__(self, owner: "ProviderRouter"):
+        self._owner = owner
+
+    async def create(self, **kwargs: Any) -> Any:
+        """Send the request to the best provider, failing over on errors."""
+        return await self._owner.create(kwargs)
+
+
+class ProviderRouter:
+    """
+    Chat completions client over several providers.
+
+    Each request goes to the provider with the lowest score for its stage:
+    rolling latency, inflated by the rolling error rate, plus the estimated
+    cost of the request. Providers without samples for the stage are tried
+    first; one that has only failed counts as taking a full timeout, and a small share of requests explores a random provider. On an
+    outage, overload or timeout the next provider is tried; a provider
+    failing several times in a row sits out a cooldown. Errors caused by the
+    request itself, such as a 400, are raised to the caller without failover.
+    Streamed requests fail over only until the stream is open.
+    """
+
+    def __init__(
+        self,
+        providers: List[Provider],
+        exploration: float = ROUTER_EXPLORATION,
+        registry: Optional[MetricsRegistry] = None,
+        rng: Optional[random.Random] = None,
+    ):
+        """Initialize the router."""
+        if not providers:
+            raise ProviderError("At least one provider is required")
+        self.providers = providers
+        self.exploration = exploration
+        self.registry = registry or metrics
+        self.rng = rng or random.Random()
+        self.chat = SimpleNamespace(completions=_RouterCompletions(self))
+
+        self._stats: Dict[Tuple[str, str], _ProviderStats] = {}
+        self._consecutive_failures: Dict[str, int] = {provider.name: 0 for provider in providers}
+        self._open_until: Dict[str, float] = {provider.name: 0.0 for provider in providers}
+
+    @property
+    def models(self) -> Any:
+        """Model endpoints of the first provider (used by readiness probes)."""
+        return self.providers[0].client.models
+
+    def is_closed(self) -> bool:
+        """True when every provider client is closed."""
+        return all(provider.client.is_closed() for provider in self.providers)
+
+    async def close(self) -> None:
+        """Close every provider client."""
+        await asyncio.gather(*(provider.client.close() for provider in self.providers))
+
+    def stats(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """Rolling estimates per provider and stage."""
+        report: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for (name, stage), stats in self._stats.items():
+            report.setdefault(name, {})[stage or "default"] = {
+                "latency": stats.latency,
+                "error_rate": stats.error_rate,
+                "calls": stats.calls,
+            }
+        return report
+
+    def rank(self, stage: str, body: Dict[str, Any]) -> List[Provider]:
+        """Providers for a stage, best first; those cooling down go last."""
+        candidates = [provider for provider in self.providers if provider.serves(stage)]
+        if not candidates:
+            raise ProviderError(f"No provider serves stage {stage!r}")
+
+        now = time.monotonic()
+
+        def score(provider: Provider) -> Tuple[bool, float]:
+            stats = self._stats.get((provider.name, stage))
+            cooling = self._open_until[provider.name] > now
+            if stats is None:
+                # Unmeasured providers are tried first
+                return cooling, float("-inf")
+            # A provider that has only failed may cost a full timeout before failover
+            latency = OPENAI_TIMEOUT if stats.latency is None else stats.latency
+            expected = latency * (1 + ROUTER_ERROR_PENALTY * stats.error_rate)
+            return cooling, expected + ROUTER_COST_WEIGHT * provider.estimated_cost(body)
+
+        ranked = sorted(candidates, key=score)
+        if len(ranked) > 1 and self.rng.random() < self.exploration:
+            explored = self.rng.choice(ranked[1:])
+            ranked.remove(explored)
+            ranked.insert(0, explored)
+        return ranked
+
+    async def create(self, body: Dict[str, Any]) -> Any:
+        """Run one request with failover across ranked providers."""
+        stage = _llm_stage.get()
+        last_error: Optional[Exception] = None
+        for attempt, provider in enumerate(self.rank(stage, body)):
+            request = dict(body)
+            if provider.model:
+                request["model"] = provider.model
+            started = time.perf_counter()
+            try:
+                response = await provider.client.chat.completions.create(**request)
+            except FAILOVER_ERRORS as e:
+                self._record(provider, stage, None, failed=True)
+                logger.warning(f"Provider {provider.name} failed for {stage or 'request'}: {e}")
+                last_error = e
+                continue
+
+            self._record(provider, stage, time.perf_counter() - started, failed=False)
+            if attempt:
+                self.registry.increment("router.failovers")
+            return response
+
+        raise ProviderError(f"All providers failed for {stage or 'request'}: {last_error}")
+
+    def _record(
+        self, provider: Provider, stage: str, latency: Optional[float], failed: bool
+    ) -> None:
+        """Update rolling stats, the failure streak and metrics of a provider."""
+        stats = self._stats.setdefault((provider.name, stage), _ProviderStats())
+        stats.record(latency, failed)
+        self.registry.increment(f"router.{provider.name}.calls")
+        if latency is not None:
+            self.registry.observe(f"router.{provider.name}.latency_seconds", latency)
+
+        if not failed:
+            self._consecutive_failures[provider.name] = 0
+            return
+        self.registry.increment(f"router.{provider.name}.errors")
+        self._consecutive_failures[provider.name] += 1
+        if self._consecutive_failures[provider.name] >= ROUTER_FAILURE_THRESHOLD:
+            self._open_until[provider.name] = time.monotonic() + ROUTER_COOLDOWN
+            self._consecutive_failures[provider.name] = 0
+            logger.warning(f"Provider {provider.name} cooling down for {ROUTER_COOLDOWN}s")
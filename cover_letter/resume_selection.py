@@ -0,0 +1,265 @@
+"""
+Relevance-based selection of resume experience blocks for long resumes.
+"""
+
+import logging
+import math
+import re
+from collections import Counter
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+from .models import ResumeBlockScore, ResumeSelection
+from .prompts import (
+    CHARS_PER_TOKEN,
+    RESUME_EXPERIENCE_TOKEN_BUDGET,
+    RESUME_TENURE_WEIGHT,
+)
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+EXPERIENCE_HEADING = re.compile(
+    r"^#{1,3}\s*(?:опыт работы|опыт|experience|work experience|professional experience)\s*$",
+    re.IGNORECASE,
+)
+SECTION_HEADING = re.compile(r"^#{1,3}\s+\S")
+# "**Company**, City" starts a new job block
+BLOCK_HEADER = re.compile(r"^\*\*[^*]+\*\*")
+DATE_RANGE = re.compile(
+    r"(?P<start>(?:[A-Za-zА-Яа-яё]+\.?\s+)?\d{4})\s*[—–-]\s*"
+    r"(?P<end>(?:[A-Za-zА-Яа-яё]+\.?\s+)?\d{4}|present|now|current|"
+    r"(?:по\s+)?настоящее\s+время|н\.\s*в\.?)",
+    re.IGNORECASE,
+)
+TOKEN_PATTERN = re.compile(r"[a-zа-яё0-9][a-zа-яё0-9+#.]*", re.IGNORECASE)
+
+MONTHS = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12,
+    "янв": 1, "фев": 2, "мар": 3, "апр": 4, "май": 5, "мая": 5, "июн": 6,
+    "июл": 7, "авг": 8, "сен": 9, "окт": 10, "ноя": 11, "дек": 12,
+}  # fmt: skip
+
+STOPWORDS = {
+    "and", "the", "for", "with", "of", "to", "in", "on", "a", "an", "or", "as", "by",
+    "и", "в", "на", "с", "по", "для", "из", "от", "до", "за", "к", "о", "не", "а",
+    "что", "как", "мы", "вы", "это", "опыт", "работы", "сайт",
+}  # fmt: skip
+
+# Cyrillic words are cut to this length as a crude stemmer (разработал ~ разработка)
+STEM_LENGTH = 6
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count without a tokenizer."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase terms with stopwords removed and Cyrillic words stemmed."""
+    terms = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        token = token.rstrip(".")
+        if len(token) < 2 or token in STOPWORDS:
+            continue
+        if re.match(r"[а-яё]", token) and len(token) > STEM_LENGTH:
+            token = token[:STEM_LENGTH]
+        terms.append(token)
+    return terms
+
+
+def _parse_month(text: str, default_month: int) -> Tuple[int, int]:
+    """Parse "May 2024", "2024" or "мая 2024" into (year, month)."""
+    parts = text.split()
+    year = int(parts[-1])
+    month = default_month
+    if len(parts) > 1:
+        month = MONTHS.get(parts[0].lower()[:3], default_month)
+    return year, month
+
+
+def tenure_months(block: str, today: Optional[date] = None) -> int:
+    """Months covered by the first date range in a block."""
+    match = DATE_RANGE.search(block)
+    if not match:
+        return 0
+
+    today = today or date.today()
+    start_year, start_month = _parse_month(match.group("start"), 1)
+    end_text = match.group("end")
+    if re.search(r"\d{4}", end_text):
+        end_year, end_month = _parse_month(end_text, 12)
+    else:
+        end_year, end_month = today.year, today.month
+    return max((end_year - start_year) * 12 + end_month - start_month + 1, 0)
+
+
+def split_resume(resume: str) -> Tuple[str, List[str], str]:
+    """Split a markdown resume into header, experience blocks and trailing sections."""
+    lines = resume.splitlines()
+    start = next((i for i, line in enumerate(lines) if EXPERIENCE_HEADING.match(line)), None)
+    if start is None:
+        return resume, [], ""
+
+    end = next(
+        (i for i in range(start + 1, len(lines)) if SECTION_HEADING.match(lines[i])), len(lines)
+    )
+    header_lines = lines[: start + 1]
+    blocks: List[List[str]] = []
+    for line in lines[start + 1 : end]:
+        if BLOCK_HEADER.match(line):
+            blocks.append([line])
+        elif blocks:
+            blocks[-1].append(line)
+        else:
+            header_lines.append(line)
+
+    return (
+        "\n".join(header_lines).rstrip(),
+        ["\n".join(block).strip() for block in blocks],
+        "\n".join(lines[end:]),
+    )
+
+
+def block_names(block: str) -> List[str]:
+    """Company and job title of a block: its "**Company**" header and the next line."""
+    lines = [line.strip() for line in block.splitlines() if line.strip()]
+    names = [match.group(1) for match in re.finditer(r"\*\*([^*]+)\*\*", lines[0])]
+    if len(lines) > 1:
+        # "_Frontend Lead Engineer_" or "Frontend Developer | Jan 2020 — Dec 2022"
+        names.append(DATE_RANGE.sub("", lines[1]).split("|")[0].strip(" _*,"))
+    return [name.lower() for name in names if len(name) > 1]
+
+
+def named_in(block: str, instructions: str) -> bool:
+    """Whether instructions mention the block's company or job title."""
+    text = instructions.lower()
+    return any(name in text for name in block_names(block))
+
+
+class ResumeSelector:
+    """
+    Picks the experience blocks most relevant to a vacancy within a token budget.
+
+    Relevance is TF-IDF cosine similarity between a block and the vacancy
+    (plus extracted keywords), blended with tenure, so long and relevant
+    jobs win as the letter prompt asks.
+    """
+
+    def __init__(
+        self,
+        token_budget: int = RESUME_EXPERIENCE_TOKEN_BUDGET,
+        tenure_weight: float = RESUME_TENURE_WEIGHT,
+    ):
+        """Initialize the selector."""
+        self.token_budget = token_budget
+        self.tenure_weight = tenure_weight
+
+    def select(
+        self,
+        resume: str,
+        job_description: str,
+        keywords: Optional[List[str]] = None,
+        instructions: str = "",
+    ) -> ResumeSelection:
+        """
+        Return the resume with only the top-scoring experience blocks.
+        Instruction terms count towards relevance, and blocks whose company or
+        job title the instructions name are always kept.
+        """
+        header, blocks, trailer = split_resume(resume)
+        original_tokens = estimate_tokens(resume)
+        if len(blocks) < 2:
+            return ResumeSelection(
+                text=resume,
+                applied=False,
+                original_tokens=original_tokens,
+                selected_tokens=original_tokens,
+            )
+
+        scores = self._score_blocks(blocks, job_description, keywords or [], instructions)
+        block_tokens = [estimate_tokens(block) for block in blocks]
+        if sum(block_tokens) <= self.token_budget:
+            # Short enough: keep everything, still report scores
+            for score in scores:
+                score.selected = True
+            return ResumeSelection(
+                text=resume,
+                applied=False,
+                original_tokens=original_tokens,
+                selected_tokens=original_tokens,
+                blocks=scores,
+            )
+
+        # Named blocks and the best one are always kept, the rest greedily by score
+        ranked = sorted(range(len(blocks)), key=lambda i: scores[i].score, reverse=True)
+        used = 0
+        for index in sorted(ranked, key=lambda i: i != ranked[0] and not scores[i].pinned):
+            pinned = index == ranked[0] or scores[index].pinned
+            if pinned or used + block_tokens[index] <= self.token_budget:
+                scores[index].selected = True
+                used += block_tokens[index]
+
+        selected_blocks = [block for block, score in zip(blocks, scores) if score.selected]
+        text = "\n\n".join(part for part in [header, *selected_blocks, trailer] if part.strip())
+        logger.debug(f"Selected {len(selected_blocks)}/{len(blocks)} resume blocks")
+        return ResumeSelection(
+            text=text,
+            applied=True,
+            original_tokens=original_tokens,
+            selected_tokens=estimate_tokens(text),
+            blocks=scores,
+        )
+
+    def _score_blocks(
+        self, blocks: List[str], job_description: str, keywords: List[str], instructions: str = ""
+    ) -> List[ResumeBlockScore]:
+        """Score each block by similarity to the vacancy and instructions, and tenure."""
+        block_terms = [Counter(tokenize(block)) for block in blocks]
+        query_terms = Counter(tokenize(job_description))
+        for keyword in [*keywords, instructions]:
+            for term in tokenize(keyword):
+                query_terms[term] += 2
+
+        document_frequency: Counter = Counter()
+        for terms in block_terms:
+            document_frequency.update(terms.keys())
+        idf = {
+            term: math.log((len(blocks) + 1) / (document_frequency[term] + 1)) + 1
+            for term in set(document_frequency) | set(query_terms)
+        }
+
+        query_vector = self._weigh(query_terms, idf)
+        relevances = [self._cosine(self._weigh(terms, idf), query_vector) for terms in block_terms]
+        tenures = [tenure_months(block) for block in blocks]
+        max_relevance = max(relevances) or 1.0
+        max_tenure = max(tenures) or 1
+
+        return [
+            ResumeBlockScore(
+                title=block.splitlines()[0].strip("* ")[:80],
+                relevance=round(relevance, 4),
+                tenure_months=tenure,
+                score=round(
+                    (1 - self.tenure_weight) * relevance / max_relevance
+                    + self.tenure_weight * tenure / max_tenure,
+                    4,
+                ),
+                tokens=estimate_tokens(block),
+                pinned=bool(instructions) and named_in(block, instructions),
+            )
+            for block, relevance, tenure in zip(blocks, relevances, tenures)
+        ]
+
+    def _weigh(self, terms: Counter, idf: Dict[str, float]) -> Dict[str, float]:
+        """TF-IDF weights with sublinear term frequency."""
+        return {term: (1 + math.log(count)) * idf.get(term, 1.0) for term, count in terms.items()}
+
+    def _cosine(self, left: Dict[str, float], right: Dict[str, float]) -> float:
+        """Cosine similarity of sparse vectors."""
+        dot = sum(weight * right.get(term, 0.0) for term, weight in left.items())
+        norm = math.sqrt(sum(w * w for w in left.values())) * math.sqrt(
+            sum(w * w for w in right.values())
+        )
+        return dot / norm if norm else 0.0
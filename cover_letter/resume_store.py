@@ -0,0 +1,336 @@
+"""
+Versioned resume storage: compressed, content-addressed, per-user versions.
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from .models import ResumeVersion
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+MAX_RESUME_VERSIONS = 10
+# Longest chain of delta-compressed blobs before a version is stored standalone
+MAX_DELTA_CHAIN = 4
+COMPRESSION_LEVEL = 9
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    base_hash TEXT,
+    data BLOB NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS versions (
+    user_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (user_id, name)
+);
+CREATE TABLE IF NOT EXISTS active (
+    user_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL
+);
+"""
+
+
+class ResumeStoreError(Exception):
+    """Error related to resume storage operations."""
+
+    pass
+
+
+def content_hash(content: str) -> str:
+    """Hash used to deduplicate identical resumes."""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class ResumeStore:
+    """
+    SQLite resume store with several named versions per user.
+
+    Identical texts are stored once (content hash). A new text is
+    zlib-compressed with the user's latest version as a preset dictionary,
+    so a near-identical revision costs only its differences.
+    """
+
+    def __init__(self, path: Path | str, max_versions: int = MAX_RESUME_VERSIONS):
+        """Open (and create if needed) the resume database."""
+        self.path = Path(path)
+        self.max_versions = max_versions
+        self._lock = threading.Lock()
+        try:
+            self._conn = sqlite3.connect(
+                str(self.path), check_same_thread=False, isolation_level=None
+            )
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+        except sqlite3.Error as e:
+            raise ResumeStoreError(f"Failed to open resume store: {e}") from e
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        """Hold the lock and run the statements in one transaction."""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                yield
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def save(self, user_id: str, content: str, name: Optional[str] = None) -> ResumeVersion:
+        """
+        Save a resume version and make it active.
+        Re-uploading a known text only re-activates its version.
+        """
+        digest = content_hash(content)
+        try:
+            with self._transaction():
+                existing = self._conn.execute(
+                    "SELECT name FROM versions WHERE user_id = ? AND hash = ?", (user_id, digest)
+                ).fetchone()
+                if existing:
+                    version_name = existing["name"]
+                else:
+                    self._store_blob(user_id, digest, content)
+                    version_name = self._unique_name(user_id, name or "resume")
+                    self._conn.execute(
+                        "INSERT INTO versions (user_id, name, hash, created_at) VALUES (?, ?, ?, ?)",
+                        (user_id, version_name, digest, time.time()),
+                    )
+                self._set_active(user_id, version_name)
+                self._prune(user_id)
+                row = self._version_row(user_id, version_name)
+        except sqlite3.Error as e:
+            raise ResumeStoreError(f"Failed to save resume: {e}") from e
+
+        logger.debug(f"Saved resume version {version_name} for user {user_id}")
+        return self._to_version(row, active=True)
+
+    def get_active(self, user_id: str) -> Optional[str]:
+        """Text of the user's active resume, if any."""
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT v.hash FROM active a JOIN versions v "
+                    "ON v.user_id = a.user_id AND v.name = a.name WHERE a.user_id = ?",
+                    (user_id,),
+                ).fetchone()
+                return self._load_blob(row["hash"]) if row else None
+        except (sqlite3.Error, zlib.error) as e:
+            raise ResumeStoreError(f"Failed to load resume: {e}") from e
+
+    def list_versions(self, user_id: str) -> List[ResumeVersion]:
+        """User's resume versions, oldest first."""
+        try:
+            with self._lock:
+                active = self._active_name(user_id)
+                rows = self._conn.execute(
+                    "SELECT v.name, v.hash, v.created_at, b.size, length(b.data) AS stored "
+                    "FROM versions v JOIN blobs b ON b.hash = v.hash "
+                    "WHERE v.user_id = ? ORDER BY v.created_at",
+                    (user_id,),
+                ).fetchall()
+        except sqlite3.Error as e:
+            raise ResumeStoreError(f"Failed to list resumes: {e}") from e
+        return [self._to_version(row, active=row["name"] == active) for row in rows]
+
+    def set_active(self, user_id: str, name: str) -> bool:
+        """Make a stored version active. Returns False if there is no such version."""
+        try:
+            with self._transaction():
+                if self._version_row(user_id, name) is None:
+                    return False
+                self._set_active(user_id, name)
+        except sqlite3.Error as e:
+            raise ResumeStoreError(f"Failed to switch resume: {e}") from e
+        return True
+
+    def import_json(self, path: Path | str) -> int:
+        """Import a legacy resumes.json (user id -> text). Returns the number imported."""
+        path = Path(path)
+        if not path.exists():
+            return 0
+        try:
+            resumes: Dict[str, str] = json.loads(path.read_text(encoding="utf-8") or "{}")
+        except json.JSONDecodeError as e:
+            raise ResumeStoreError(f"Failed to parse {path}: {e}") from e
+
+        for user_id, content in resumes.items():
+            self.save(user_id, content, name="imported")
+        logger.info(f"Imported {len(resumes)} resumes from {path}")
+        return len(resumes)
+
+    def stats(self) -> Dict[str, int]:
+        """Counts and compressed size from the tables alone, without decoding any blob."""
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT (SELECT COUNT(*) FROM active) AS users, "
+                    "(SELECT COUNT(*) FROM versions) AS versions, "
+                    "(SELECT COUNT(*) FROM blobs) AS blobs, "
+                    "(SELECT COALESCE(SUM(length(data)), 0) FROM blobs) AS compressed_bytes"
+                ).fetchone()
+        except sqlite3.Error as e:
+            raise ResumeStoreError(f"Failed to read resume store stats: {e}") from e
+        return dict(row)
+
+    def size_report(self) -> Dict[str, Any]:
+        """
+        Storage size compared with the legacy resumes.json format
+        (indented, ASCII-escaped JSON of one text per user).
+        """
+        with self._lock:
+            page_size = self._conn.execute("PRAGMA page_size").fetchone()[0]
+            page_count = self._conn.execute("PRAGMA page_count").fetchone()[0]
+            blob_stats = self._conn.execute(
+                "SELECT COUNT(*) AS blobs, COALESCE(SUM(length(data)), 0) AS stored FROM blobs"
+            ).fetchone()
+            version_rows = self._conn.execute("SELECT user_id, name, hash FROM versions").fetchall()
+            active_rows = self._conn.execute(
+                "SELECT v.user_id, v.hash FROM active a JOIN versions v "
+                "ON v.user_id = a.user_id AND v.name = a.name"
+            ).fetchall()
+            texts = {row["hash"]: self._load_blob(row["hash"]) for row in version_rows}
+
+        active_json = {row["user_id"]: texts[row["hash"]] for row in active_rows}
+        all_versions_json = {
+            f"{row['user_id']}/{row['name']}": texts[row["hash"]] for row in version_rows
+        }
+        return {
+            "users": len(active_rows),
+            "versions": len(version_rows),
+            "blobs": blob_stats["blobs"],
+            "raw_bytes": sum(len(texts[row["hash"]].encode("utf-8")) for row in version_rows),
+            "compressed_bytes": blob_stats["stored"],
+            "db_bytes": page_size * page_count,
+            "legacy_json_bytes": len(json.dumps(active_json, indent=2)),
+            "legacy_json_all_versions_bytes": len(json.dumps(all_versions_json, indent=2)),
+        }
+
+    def _store_blob(self, user_id: str, digest: str, content: str) -> None:
+        """Compress and insert a blob, delta-encoded against the latest version if smaller."""
+        if self._conn.execute("SELECT 1 FROM blobs WHERE hash = ?", (digest,)).fetchone():
+            return
+
+        raw = content.encode("utf-8")
+        data = zlib.compress(raw, COMPRESSION_LEVEL)
+        base_hash = None
+
+        latest = self._conn.execute(
+            "SELECT hash FROM versions WHERE user_id = ? ORDER BY created_at DESC LIMIT 1",
+            (user_id,),
+        ).fetchone()
+        if latest and self._chain_length(latest["hash"]) < MAX_DELTA_CHAIN:
+            base = self._load_blob(latest["hash"]).encode("utf-8")
+            compressor = zlib.compressobj(COMPRESSION_LEVEL, zdict=base)
+            delta = compressor.compress(raw) + compressor.flush()
+            if len(delta) < len(data):
+                data, base_hash = delta, latest["hash"]
+
+        self._conn.execute(
+            "INSERT INTO blobs (hash, base_hash, data, size) VALUES (?, ?, ?, ?)",
+            (digest, base_hash, data, len(raw)),
+        )
+
+    def _load_blob(self, digest: str) -> str:
+        """Decompress a blob, resolving its delta base first."""
+        row = self._conn.execute(
+            "SELECT base_hash, data FROM blobs WHERE hash = ?", (digest,)
+        ).fetchone()
+        if row is None:
+            raise ResumeStoreError(f"Missing resume blob {digest}")
+        if row["base_hash"] is None:
+            return zlib.decompress(row["data"]).decode("utf-8")
+
+        base = self._load_blob(row["base_hash"]).encode("utf-8")
+        decompressor = zlib.decompressobj(zdict=base)
+        return (decompressor.decompress(row["data"]) + decompressor.flush()).decode("utf-8")
+
+    def _chain_length(self, digest: Optional[str]) -> int:
+        """Number of blobs needed to decode a blob."""
+        length = 0
+        while digest is not None:
+            length += 1
+            row = self._conn.execute(
+                "SELECT base_hash FROM blobs WHERE hash = ?", (digest,)
+            ).fetchone()
+            digest = row["base_hash"] if row else None
+        return length
+
+    def _unique_name(self, user_id: str, name: str) -> str:
+        """Return name, or name-2, name-3... if it is taken."""
+        candidate, suffix = name, 1
+        while self._version_row(user_id, candidate) is not None:
+            suffix += 1
+            candidate = f"{name}-{suffix}"
+        return candidate
+
+    def _prune(self, user_id: str) -> None:
+        """Drop the oldest inactive versions over the limit and unreferenced blobs."""
+        active = self._active_name(user_id)
+        rows = self._conn.execute(
+            "SELECT name FROM versions WHERE user_id = ? AND name != ? ORDER BY created_at",
+            (user_id, active or ""),
+        ).fetchall()
+        excess = len(rows) + (1 if active else 0) - self.max_versions
+        for row in rows[: max(excess, 0)]:
+            self._conn.execute(
+                "DELETE FROM versions WHERE user_id = ? AND name = ?", (user_id, row["name"])
+            )
+        if excess > 0:
+            # Blobs still used as a delta base are kept
+            self._conn.execute(
+                "DELETE FROM blobs WHERE hash NOT IN (SELECT hash FROM versions) "
+                "AND hash NOT IN (SELECT base_hash FROM blobs WHERE base_hash IS NOT NULL)"
+            )
+
+    def _set_active(self, user_id: str, name: str) -> None:
+        """Point the user's active resume at a version."""
+        self._conn.execute(
+            "INSERT INTO active (user_id, name) VALUES (?, ?) "
+            "ON CONFLICT (user_id) DO UPDATE SET name = excluded.name",
+            (user_id, name),
+        )
+
+    def _active_name(self, user_id: str) -> Optional[str]:
+        """Name of the user's active version."""
+        row = self._conn.execute("SELECT name FROM active WHERE user_id = ?", (user_id,)).fetchone()
+        return row["name"] if row else None
+
+    def _version_row(self, user_id: str, name: str) -> Optional[sqlite3.Row]:
+        """Version row joined with its blob sizes."""
+        return self._conn.execute(
+            "SELECT v.name, v.hash, v.created_at, b.size, length(b.data) AS stored "
+            "FROM versions v JOIN blobs b ON b.hash = v.hash WHERE v.user_id = ? AND v.name = ?",
+            (user_id, name),
+        ).fetchone()
+
+    def _to_version(self, row: sqlite3.Row, active: bool) -> ResumeVersion:
+        """Convert a version row to a ResumeVersion."""
+        return ResumeVersion(
+            name=row["name"],
+            content_hash=row["hash"],
+            size=row["size"],
+            stored_size=row["stored"],
+            created_at=row["created_at"],
+            active=active,
+        )
@@ -0,0 +1,99 @@
+"""
+Single-flight de-duplication of concurrent identical calls.
+"""
+
+import asyncio
+import hashlib
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, TypeVar
+
+from .metrics import MetricsRegistry, metrics
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """Normalize text for de-duplication: collapse whitespace, ignore case."""
+    return " ".join((text or "").split()).lower()
+
+
+def make_key(operation: str, *parts: Optional[str]) -> str:
+    """Build a compact de-duplication key from normalized inputs."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(normalize_text(part).encode("utf-8"))
+        digest.update(b"\x1f")
+    return f"{operation}:{digest.hexdigest()}"
+
+
+class _InFlightCall:
+    """A shared in-flight call and the number of callers waiting on it."""
+
+    def __init__(self, task: "asyncio.Task[Any]"):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time; concurrent callers share the result.
+
+    The shared call is shielded from individual callers: a cancelled caller
+    only stops waiting. The underlying call is cancelled once every caller
+    waiting on it has gone.
+    """
+
+    def __init__(self, name: str = "singleflight", registry: Optional[MetricsRegistry] = None):
+        """Initialize the coalescer."""
+        self.name = name
+        self.registry = registry or metrics
+        self.stats: Dict[str, int] = {
+            "calls": 0,
+            "executions": 0,
+            "coalesced": 0,
+            "cancelled": 0,
+        }
+        self._calls: Dict[Hashable, _InFlightCall] = {}
+
+    @property
+    def in_flight(self) -> int:
+        """Number of distinct calls currently running."""
+        return len(self._calls)
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        """Run func for key, or join an identical call already in flight."""
+        call = self._calls.get(key)
+        self._record("calls")
+        if call is None:
+            call = _InFlightCall(asyncio.ensure_future(func()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _, key=key, call=call: self._forget(key, call))
+            self._record("executions")
+        else:
+            logger.debug(f"Joining in-flight call {key}")
+            self._record("coalesced")
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Last caller gave up: abort the shared call
+                logger.debug(f"Cancelling in-flight call {key}: no waiters left")
+                call.task.cancel()
+                self._forget(key, call)
+                self._record("cancelled")
+
+    def _forget(self, key: Hashable, call: _InFlightCall) -> None:
+        """Remove a finished or abandoned call so new callers start fresh."""
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def _record(self, stat: str) -> None:
+        """Update local stats and the shared metrics registry."""
+        self.stats[stat] += 1
+        self.registry.increment(f"{self.name}.{stat}")
@@ -0,0 +1,134 @@
+"""
+Local stand-in for the OpenAI chat completions API, for load tests without network or cost.
+"""
+
+import asyncio
+import json
+import os
+import random
+import time
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict
+
+if TYPE_CHECKING:
+    from fastapi import FastAPI
+
+DEFAULT_STANDIN_LATENCY = 0.5
+
+STANDIN_KEYWORDS = "Python, Django, FastAPI, PostgreSQL, Docker, Kubernetes, Redis, CI/CD"
+STANDIN_METADATA = {
+    "hiring_manager": "",
+    "position_title": "Python Developer",
+    "key_requirements": ["Python", "Django", "PostgreSQL", "Docker", "Kubernetes"],
+}
+STANDIN_LETTER = "\n\n".join(
+    [
+        "Добрый день! Откликаюсь на вакансию Python-разработчика.",
+        " ".join(
+            [
+                "Пять лет разрабатываю backend-сервисы на Python, Django и FastAPI.",
+                "В последней компании перевёл монолит на микросервисы и сократил время",
+                "ответа API на 40%, а также настроил CI/CD, который ускорил релизы вдвое.",
+            ]
+            * 5
+        ),
+        "Буду рад обсудить, чем могу быть полезен вашей команде.",
+    ]
+)
+
+
+def _completion(body: Dict[str, Any]) -> Dict[str, Any]:
+    """Build a chat completion answer that fits the pipeline stage of the request."""
+    messages = body.get("messages", [])
+    prompt = " ".join(str(message.get("content", "")) for message in messages)
+    # Letter and fix-up calls carry a system prompt; analysis calls are a single user message
+    if any(message.get("role") == "system" for message in messages):
+        content = STANDIN_LETTER
+    elif "JSON" in prompt:
+        content = json.dumps(STANDIN_METADATA, ensure_ascii=False)
+    else:
+        content = STANDIN_KEYWORDS
+
+    count = int(body.get("n") or 1)
+    prompt_tokens = len(prompt) // 3
+    completion_tokens = len(content) // 3
+    usage: Dict[str, Any] = {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens * count,
+        "total_tokens": prompt_tokens + completion_tokens * count,
+    }
+    predicted = str((body.get("prediction") or {}).get("content") or "")
+    if predicted:
+        # The shared prefix stands in for prediction tokens the model kept
+        accepted = len(os.path.commonprefix([predicted, content])) // 3
+        usage["completion_tokens_details"] = {
+            "accepted_prediction_tokens": accepted,
+            "rejected_prediction_tokens": len(predicted) // 3 - accepted,
+        }
+    return {
+        "id": f"chatcmpl-standin-{time.monotonic_ns()}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "standin"),
+        "choices": [
+            {
+                "index": index,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": content},
+            }
+            for index in range(count)
+        ],
+        "usage": usage,
+    }
+
+
+async def _stream(completion: Dict[str, Any], chunk_words: int = 8) -> AsyncIterator[bytes]:
+    """Replay a completion as server-sent chat completion chunks, usage last."""
+    base = {key: completion[key] for key in ("id", "created", "model")}
+    base["object"] = "chat.completion.chunk"
+    for choice in completion["choices"]:
+        words = choice["message"]["content"].split(" ")
+        for start in range(0, len(words), chunk_words):
+            piece = " ".join(words[start : start + chunk_words])
+            if start:
+                piece = " " + piece
+            delta = {"index": choice["index"], "delta": {"content": piece}, "finish_reason": None}
+            yield f"data: {json.dumps({**base, 'choices': [delta]})}\n\n".encode()
+            await asyncio.sleep(0)
+        done = {"index": choice["index"], "delta": {}, "finish_reason": choice["finish_reason"]}
+        yield f"data: {json.dumps({**base, 'choices': [done]})}\n\n".encode()
+    usage = {**base, "choices": [], "usage": completion["usage"]}
+    yield f"data: {json.dumps(usage)}\n\n".encode()
+    yield b"data: [DONE]\n\n"
+
+
+def create_standin_app(
+    latency: float = DEFAULT_STANDIN_LATENCY, error_rate: float = 0.0
+) -> "FastAPI":
+    """
+    FastAPI app answering /v1/chat/completions (plain or streamed) and
+    /v1/models/{model} after a fixed latency. A share of completions given
+    by error_rate fails with 503, to exercise retries and failover.
+    Point OPENAI_BASE_URL at http://host:port/v1 to use it.
+    """
+    from fastapi import FastAPI
+    from fastapi.responses import JSONResponse, StreamingResponse
+
+    app = FastAPI(title="OpenAI stand-in")
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(body: Dict[str, Any]) -> Any:
+        await asyncio.sleep(latency)
+        if error_rate and random.random() < error_rate:
+            return JSONResponse(
+                {"error": {"message": "Stand-in overloaded", "type": "server_error"}},
+                status_code=503,
+            )
+        if body.get("stream"):
+            return StreamingResponse(_stream(_completion(body)), media_type="text/event-stream")
+        return _completion(body)
+
+    @app.get("/v1/models/{model}")
+    async def retrieve_model(model: str) -> Dict[str, Any]:
+        return {"id": model, "object": "model", "created": 0, "owned_by": "standin"}
+
+    return app
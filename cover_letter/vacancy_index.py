@@ -0,0 +1,178 @@
+"""
+Near-duplicate vacancy index (MinHash over word shingles) for reusing analysis.
+"""
+
+import hashlib
+import logging
+import random
+import re
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .metrics import MetricsRegistry, metrics
+from .models import VacancyMatch
+from .prompts import (
+    VACANCY_INDEX_BANDS,
+    VACANCY_INDEX_MAX_ENTRIES,
+    VACANCY_INDEX_MIN_SHINGLES,
+    VACANCY_INDEX_PERMUTATIONS,
+    VACANCY_SHINGLE_SIZE,
+    VACANCY_SIMILARITY_THRESHOLD,
+)
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Mersenne prime for universal hashing of 64-bit shingle hashes
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_WORD_PATTERN = re.compile(r"\w+")
+_DIGITS = re.compile(r"\d")
+_SEED = 20240501
+
+
+def shingles(text: str, size: int = VACANCY_SHINGLE_SIZE) -> Set[str]:
+    """
+    Overlapping word n-grams of normalized text.
+    Digits are masked, so changed dates and numbers do not break shingles.
+    """
+    words = _WORD_PATTERN.findall(_DIGITS.sub("0", text.lower()))
+    if len(words) < size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i : i + size]) for i in range(len(words) - size + 1)}
+
+
+class MinHasher:
+    """MinHash signatures with a fixed family of universal hash functions."""
+
+    def __init__(self, permutations: int = VACANCY_INDEX_PERMUTATIONS, seed: int = _SEED):
+        """Initialize hash function coefficients."""
+        rng = random.Random(seed)
+        self.coefficients: List[Tuple[int, int]] = [
+            (rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(permutations)
+        ]
+
+    def signature(self, features: Set[str]) -> Tuple[int, ...]:
+        """MinHash signature of a feature set."""
+        hashes = [
+            int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+            for feature in features
+        ]
+        if not hashes:
+            return tuple(_MAX_HASH for _ in self.coefficients)
+        return tuple(
+            min(((a * value + b) % _PRIME) & _MAX_HASH for value in hashes)
+            for a, b in self.coefficients
+        )
+
+
+class VacancyIndex:
+    """
+    Finds analysed vacancies that are near-duplicates of a new one.
+
+    Signatures are bucketed with LSH banding, so a lookup only compares
+    against candidates sharing a band; a candidate is a hit when its
+    estimated Jaccard similarity reaches the threshold. Entries are kept
+    per namespace (e.g. keyword prompt) and evicted oldest first.
+    """
+
+    def __init__(
+        self,
+        threshold: float = VACANCY_SIMILARITY_THRESHOLD,
+        permutations: int = VACANCY_INDEX_PERMUTATIONS,
+        bands: int = VACANCY_INDEX_BANDS,
+        max_entries: int = VACANCY_INDEX_MAX_ENTRIES,
+        registry: Optional[MetricsRegistry] = None,
+    ):
+        """Initialize an empty index."""
+        if permutations % bands:
+            raise ValueError("permutations must be divisible by bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = permutations // bands
+        self.max_entries = max_entries
+        self.registry = registry or metrics
+        self.stats: Dict[str, int] = {"lookups": 0, "hits": 0, "misses": 0}
+
+        self._hasher = MinHasher(permutations)
+        self._entries: "OrderedDict[int, Tuple[str, Tuple[int, ...], Dict[str, Any]]]" = (
+            OrderedDict()
+        )
+        self._buckets: Dict[Tuple[str, int, Tuple[int, ...]], Set[int]] = {}
+        self._next_id = 0
+
+    def __len__(self) -> int:
+        """Number of indexed vacancies."""
+        return len(self._entries)
+
+    @property
+    def hit_rate(self) -> float:
+        """Share of lookups answered from the index."""
+        return self.stats["hits"] / self.stats["lookups"] if self.stats["lookups"] else 0.0
+
+    def lookup(self, text: str, namespace: str = "") -> Optional[VacancyMatch]:
+        """Return the most similar indexed vacancy at or above the threshold."""
+        features = shingles(text)
+        if len(features) < VACANCY_INDEX_MIN_SHINGLES:
+            return None
+
+        signature = self._hasher.signature(features)
+        candidates: Set[int] = set()
+        for band in self._bands(signature):
+            candidates |= self._buckets.get((namespace, *band), set())
+
+        best: Optional[Tuple[float, int]] = None
+        for entry_id in candidates:
+            similarity = self._similarity(signature, self._entries[entry_id][1])
+            if similarity >= self.threshold and (best is None or similarity > best[0]):
+                best = (similarity, entry_id)
+
+        self._record("lookups")
+        if best is None:
+            self._record("misses")
+            return None
+
+        self._record("hits")
+        self._entries.move_to_end(best[1])
+        logger.debug(f"Near-duplicate vacancy found (similarity {best[0]:.2f})")
+        return VacancyMatch(similarity=best[0], data=dict(self._entries[best[1]][2]))
+
+    def add(self, text: str, data: Dict[str, Any], namespace: str = "") -> None:
+        """Index an analysed vacancy. Texts too short to compare reliably are skipped."""
+        features = shingles(text)
+        if len(features) < VACANCY_INDEX_MIN_SHINGLES:
+            return
+
+        signature = self._hasher.signature(features)
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = (namespace, signature, dict(data))
+        for band in self._bands(signature):
+            self._buckets.setdefault((namespace, *band), set()).add(entry_id)
+
+        while len(self._entries) > self.max_entries:
+            old_id, (old_namespace, old_signature, _) = self._entries.popitem(last=False)
+            for band in self._bands(old_signature):
+                key = (old_namespace, *band)
+                bucket = self._buckets.get(key)
+                if bucket is not None:
+                    bucket.discard(old_id)
+                    if not bucket:
+                        del self._buckets[key]
+        self.registry.set_gauge("vacancy_index.entries", len(self._entries))
+
+    def _bands(self, signature: Tuple[int, ...]) -> List[Tuple[int, Tuple[int, ...]]]:
+        """Split a signature into LSH bands."""
+        return [
+            (band, signature[band * self.rows : (band + 1) * self.rows])
+            for band in range(self.bands)
+        ]
+
+    def _similarity(self, left: Tuple[int, ...], right: Tuple[int, ...]) -> float:
+        """Estimated Jaccard similarity of two signatures."""
+        return sum(a == b for a, b in zip(left, right)) / len(left)
+
+    def _record(self, stat: str) -> None:
+        """Update local stats and the shared metrics registry."""
+        self.stats[stat] += 1
+        self.registry.increment(f"vacancy_index.{stat}")
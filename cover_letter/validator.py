@@ -0,0 +1,129 @@
+"""
+Fast local validation of generated cover letters against prompt rules.
+"""
+
+import re
+import time
+from typing import List, Optional, Set
+
+from .models import RuleViolation, ValidationReport
+from .prompts import (
+    FORBIDDEN_PHRASES,
+    LETTER_LENGTH_TOLERANCE,
+    LETTER_MAX_WORDS,
+    LETTER_MIN_WORDS,
+    SALARY_PATTERNS,
+)
+
+NUMBER_PATTERN = re.compile(r"\d+(?:[.,]\d+)?")
+YEAR_PATTERN = re.compile(r"\b(?:19|20)\d{2}\b")
+# Unsourced whole numbers up to this are usually restated facts ("вдвое" as
+# "в 2 раза"), so they are a soft violation rather than an invented metric
+SMALL_NUMBER_LIMIT = 10
+# Sentence starting with "Я" as a separate word
+YA_SENTENCE_PATTERN = re.compile(r"(?:^|[.!?…]\s+|\n\s*)Я\b", re.MULTILINE)
+SALARY_REGEXES = [re.compile(pattern, re.IGNORECASE) for pattern in SALARY_PATTERNS]
+
+
+def extract_numbers(text: str) -> Set[str]:
+    """Extract numbers from text in a normalized form."""
+    return {number.replace(",", ".") for number in NUMBER_PATTERN.findall(text)}
+
+
+def year_spans(text: str) -> Set[str]:
+    """Differences between years in text and up to the current year, e.g. "5" for 2019-2024."""
+    years = {int(year) for year in YEAR_PATTERN.findall(text)}
+    years.add(time.localtime().tm_year)
+    return {str(later - earlier) for earlier in years for later in years if later > earlier}
+
+
+def is_small_number(number: str) -> bool:
+    """Whether a normalized number is a whole number up to SMALL_NUMBER_LIMIT."""
+    return number.isdigit() and int(number) <= SMALL_NUMBER_LIMIT
+
+
+class CoverLetterValidator:
+    """
+    Checks the explicit rules of COVER_LETTER_SYSTEM_PROMPT without API calls.
+    """
+
+    def __init__(
+        self,
+        min_words: int = LETTER_MIN_WORDS,
+        max_words: int = LETTER_MAX_WORDS,
+        length_tolerance: float = LETTER_LENGTH_TOLERANCE,
+    ):
+        """Initialize the validator."""
+        self.min_words = min_words
+        self.max_words = max_words
+        self.length_tolerance = length_tolerance
+
+    def validate(
+        self, cover_letter: str, resume: str = "", job_description: str = ""
+    ) -> ValidationReport:
+        """
+        Validate a cover letter. If the resume is given, numbers must appear in
+        it or in the vacancy (versions, company names like X5, "24/7"), or be
+        year spans of resume dates; other small whole numbers are a soft warning.
+        """
+        word_count = len(cover_letter.split())
+        violations: List[RuleViolation] = []
+
+        length_violation = self._check_length(word_count)
+        if length_violation:
+            violations.append(length_violation)
+
+        if YA_SENTENCE_PATTERN.search(cover_letter):
+            violations.append(
+                RuleViolation(
+                    rule="no_ya_sentences",
+                    message='Перефразируй предложения, которые начинаются с "Я"',
+                )
+            )
+
+        text_lower = cover_letter.lower()
+        for phrase in FORBIDDEN_PHRASES:
+            if phrase in text_lower:
+                violations.append(
+                    RuleViolation(
+                        rule="forbidden_phrase",
+                        message=f'Убери фразу "{phrase}"',
+                    )
+                )
+
+        if any(regex.search(cover_letter) for regex in SALARY_REGEXES):
+            violations.append(RuleViolation(rule="no_salary", message="Убери упоминание зарплаты"))
+
+        if resume:
+            # Tenure computed from resume dates ("5 лет") is not invented
+            known = extract_numbers(resume) | extract_numbers(job_description) | year_spans(resume)
+            invented = extract_numbers(cover_letter) - known
+            hard_numbers = sorted(number for number in invented if not is_small_number(number))
+            if invented:
+                violations.append(
+                    RuleViolation(
+                        rule="numbers_from_resume",
+                        message=(
+                            "Убери цифры, которых нет ни в резюме, ни в вакансии: "
+                            + ", ".join(hard_numbers or sorted(invented))
+                        ),
+                        hard=bool(hard_numbers),
+                    )
+                )
+
+        return ValidationReport(word_count=word_count, violations=violations)
+
+    def _check_length(self, word_count: int) -> Optional[RuleViolation]:
+        """Check the word count range; far outside the range is a hard violation."""
+        if self.min_words <= word_count <= self.max_words:
+            return None
+
+        hard = word_count < self.min_words * (1 - self.length_tolerance) or (
+            word_count > self.max_words * (1 + self.length_tolerance)
+        )
+        target = f"{self.min_words}-{self.max_words}"
+        return RuleViolation(
+            rule="length",
+            message=f"Приведи длину письма к {target} словам (сейчас {word_count})",
+            hard=hard,
+        )
@@ -4,26 +4,52 @@ Debug server for testing cover letter generation prompts.
 Independent of the main Telegram bot.
 """
 
+import argparse
+import asyncio
 import os
 import logging
+import time
+from contextlib import asynccontextmanager
+from functools import cache
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, List, Optional
 
 import uvicorn
 from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator
 from dotenv import load_dotenv
-from openai import AsyncOpenAI
 
-from cover_letter.generator import CoverLetterGenerator
+from cover_letter.clients import create_llm_client
+from cover_letter.experiments import (
+    ExperimentCase,
+    ExperimentRunner,
+    PromptVariant,
+    build_report,
+    check_variant_names,
+    load_cases,
+)
+from cover_letter.export import (
+    EXPORT_MEDIA_TYPES,
+    DocumentExporter,
+    ExportError,
+    ExportQueueFullError,
+)
+from cover_letter.metrics import metrics
+from cover_letter.monitoring import EventLoopMonitor
+from cover_letter.profiling import PROFILE_DIR, RequestProfiler
 from cover_letter.prompts import (
+    DEFAULT_MODEL,
     KEYWORD_EXTRACTION_PROMPT,
     COVER_LETTER_SYSTEM_PROMPT,
     FALLBACK_SYSTEM_PROMPT,
 )
 
+if TYPE_CHECKING:
+    from cover_letter.generator import CoverLetterGenerator
+
 # Load environment variables
 load_dotenv()
 
@@ -31,19 +57,101 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Event loop instrumentation (set LOOP_MONITOR=0 to disable)
+loop_monitor = EventLoopMonitor()
+
+# Production mode (set by run_debug_server --production; workers inherit it)
+PRODUCTION: bool = os.getenv("DEBUG_SERVER_MODE", "debug") == "production"
+REQUEST_TIMEOUT: float = float(os.getenv("REQUEST_TIMEOUT", "90"))
+# Long-running endpoints that are not cut off by REQUEST_TIMEOUT
+TIMEOUT_EXEMPT_PATHS = {"/experiments"}
+GZIP_MINIMUM_SIZE = 1024
+# Experiment results are shared between workers through this folder
+EXPERIMENT_CACHE_DIR: Optional[str] = os.getenv("EXPERIMENT_CACHE_DIR") or None
+# Case folders named by /experiments requests must be inside this folder
+EXPERIMENTS_DIR: Path = Path(os.getenv("EXPERIMENTS_DIR", "experiments"))
+EXPERIMENT_MAX_CONCURRENCY: int = int(os.getenv("EXPERIMENT_MAX_CONCURRENCY", "16"))
+# Completions one /generate request may ask for (sent as the API's n)
+MAX_CANDIDATES = 5
+READINESS_TIMEOUT = 5.0
+READINESS_CACHE_SECONDS = 30.0
+
+# Requests with ?profile=1 are profiled into flamegraph files served by /profiles
+request_profiler = RequestProfiler(os.getenv("PROFILE_DIR", PROFILE_DIR))
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    """Start and stop background instrumentation."""
+    if os.getenv("LOOP_MONITOR", "1") != "0":
+        loop_monitor.start()
+    yield
+    loop_monitor.stop()
+    get_exporter().close()
+
+
 # Initialize FastAPI app
-app = FastAPI(title="Cover Letter Debug Server", version="1.0.0")
+app = FastAPI(title="Cover Letter Debug Server", version="1.0.0", lifespan=lifespan)
 
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
-# Initialize OpenAI client
-openai_api_key = os.getenv("OPENAI_API_KEY")
-if not openai_api_key:
-    raise ValueError("OPENAI_API_KEY environment variable is required")
+if PRODUCTION:
+    app.add_middleware(GZipMiddleware, minimum_size=GZIP_MINIMUM_SIZE)
+
+    @app.middleware("http")
+    async def request_timeout(request: Request, call_next):
+        """Cancel requests that run longer than REQUEST_TIMEOUT."""
+        if request.url.path in TIMEOUT_EXEMPT_PATHS:
+            return await call_next(request)
+        try:
+            return await asyncio.wait_for(call_next(request), REQUEST_TIMEOUT)
+        except asyncio.TimeoutError:
+            metrics.increment("server.request_timeouts")
+            logger.warning(f"Request to {request.url.path} timed out after {REQUEST_TIMEOUT}s")
+            return JSONResponse({"detail": "Request timed out"}, status_code=504)
+
+
+@app.middleware("http")
+async def profile_request(request: Request, call_next):
+    """Profile requests that ask for it and name the profile in X-Profile."""
+    if request.query_params.get("profile") != "1":
+        return await call_next(request)
+
+    with request_profiler.profile(request.url.path) as profiler:
+        response = await call_next(request)
+    if profiler is None:
+        response.headers["X-Profile"] = "busy"
+    elif profiler.path is not None:
+        response.headers["X-Profile"] = f"/profiles/{profiler.path.name}"
+    return response
+
+
+# Clients are built on first request, so importing this module needs no secrets
+@cache
+def get_openai_client():
+    """Create the OpenAI client, or a provider router when LLM_PROVIDERS is set."""
+    return create_llm_client()
+
 
-openai_client = AsyncOpenAI(api_key=openai_api_key)
-generator = CoverLetterGenerator(openai_client)
+@cache
+def get_generator() -> "CoverLetterGenerator":
+    """Create the shared cover letter generator."""
+    from cover_letter.generator import CoverLetterGenerator
+
+    return CoverLetterGenerator(get_openai_client())
+
+
+@cache
+def get_experiment_runner() -> ExperimentRunner:
+    """Create the experiment runner; recent results stay in memory across requests."""
+    return ExperimentRunner(get_openai_client(), cache_dir=EXPERIMENT_CACHE_DIR)
+
+
+@cache
+def get_exporter() -> DocumentExporter:
+    """Create the PDF/DOCX exporter; its worker processes start on first export."""
+    return DocumentExporter()
 
 
 class DebugRequest(BaseModel):
@@ -59,6 +167,7 @@ class DebugRequest(BaseModel):
     custom_system_prompt: Optional[str] = None
     custom_keyword_prompt: Optional[str] = None
     use_fallback: bool = False
+    candidates: int = Field(default=1, ge=1, le=MAX_CANDIDATES)
 
     # Advanced options
     model_name: Optional[str] = "gpt-4o-mini"
@@ -66,6 +175,28 @@ class DebugRequest(BaseModel):
     max_tokens: Optional[int] = 1000
 
 
+class ExperimentRequest(BaseModel):
+    """Request model for a prompt experiment."""
+
+    variants: list[PromptVariant]
+    cases: list[ExperimentCase] = []
+    cases_dir: Optional[str] = None
+    concurrency: int = 4
+
+    @field_validator("variants")
+    @classmethod
+    def unique_variant_names(cls, variants: list[PromptVariant]) -> list[PromptVariant]:
+        """Variants are reported by name, so names must be unique."""
+        return check_variant_names(variants)
+
+
+class ExportRequest(BaseModel):
+    """Request model for document export."""
+
+    cover_letter: str
+    format: str = "pdf"
+
+
 class PromptsResponse(BaseModel):
     """Response model for current prompts."""
 
@@ -93,8 +224,6 @@ class JobAnalysisResponse(BaseModel):
 @app.get("/", response_class=HTMLResponse)
 async def get_debug_interface():
     """Serve the debug interface HTML from static files."""
-    from fastapi.responses import FileResponse
-
     return FileResponse("static/index.html")
 
 
@@ -108,6 +237,61 @@ async def get_current_prompts():
     )
 
 
+@app.get("/health")
+async def health():
+    """Liveness: the worker is serving requests."""
+    return {"status": "ok", "pid": os.getpid()}
+
+
+# Last readiness probe result, cached to keep probes cheap
+_readiness = {"checked_at": 0.0, "ready": False, "error": ""}
+
+
+@app.get("/ready")
+async def readiness():
+    """Readiness: the OpenAI client pool is open and the API answers."""
+    now = time.monotonic()
+    if now - _readiness["checked_at"] > READINESS_CACHE_SECONDS or not _readiness["ready"]:
+        try:
+            client = get_openai_client()
+            if client.is_closed():
+                raise RuntimeError("OpenAI client is closed")
+            await asyncio.wait_for(client.models.retrieve(DEFAULT_MODEL), READINESS_TIMEOUT)
+            _readiness.update(ready=True, error="")
+        except Exception as e:
+            logger.warning(f"Readiness check failed: {e}")
+            _readiness.update(ready=False, error=str(e) or type(e).__name__)
+        _readiness["checked_at"] = now
+
+    lag = metrics.summary("event_loop.lag_seconds")
+    return JSONResponse(
+        {
+            "ready": _readiness["ready"],
+            "error": _readiness["error"],
+            "pid": os.getpid(),
+            "event_loop_lag_p99": lag["p99"],
+        },
+        status_code=200 if _readiness["ready"] else 503,
+    )
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """Get in-process metrics and recent slow callbacks."""
+    snapshot = metrics.snapshot()
+    snapshot["slow_callbacks"] = list(loop_monitor.slow_callbacks)
+    return snapshot
+
+
+@app.get("/profiles/{name}")
+async def get_profile(name: str):
+    """Download a saved profile in folded stack format."""
+    path = request_profiler.path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain")
+
+
 @app.post("/analyze-job")
 async def analyze_job_description(request: JobAnalysisRequest):
     """Analyze job description using the generator's _analyze_job method."""
@@ -117,7 +301,7 @@ async def analyze_job_description(request: JobAnalysisRequest):
 
     try:
         # Use the generator's dedicated analysis method
-        analysis_result = await generator.analyze_job_only(request.job_description)
+        analysis_result = await get_generator().analyze_job_only(request.job_description)
 
         return JobAnalysisResponse(
             company_name=analysis_result["company_name"],
@@ -151,7 +335,7 @@ async def generate_cover_letter(request: DebugRequest):
 
     try:
         # Pass custom prompts if provided
-        result = await generator.generate(
+        result = await get_generator().generate(
             resume=request.resume,
             job_description=request.job_description,
             company_name=request.company_name or "",
@@ -159,23 +343,100 @@ async def generate_cover_letter(request: DebugRequest):
             special_requirements=request.special_requirements or "",
             custom_system_prompt=request.custom_system_prompt,
             custom_keyword_prompt=request.custom_keyword_prompt,
+            candidates=request.candidates,
         )
 
-        return result
+        # pydantic-core serializes the result directly, skipping jsonable_encoder
+        return Response(content=result.model_dump_json(), media_type="application/json")
 
     except Exception as e:
         logger.error(f"Error generating cover letter: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Generation failed: {str(e)}")
 
 
-def run_debug_server():
-    """Run the debug server."""
+def resolve_cases_dir(cases_dir: str) -> Path:
+    """Resolve a case folder relative to EXPERIMENTS_DIR; paths outside it are rejected."""
+    root = EXPERIMENTS_DIR.resolve()
+    path = (root / cases_dir).resolve()
+    if not path.is_relative_to(root):
+        raise ValueError(f"cases_dir must be inside {EXPERIMENTS_DIR}")
+    return path
+
+
+@app.post("/experiments")
+async def run_experiment(request: ExperimentRequest):
+    """Run every prompt variant on every case and return a comparison report."""
+    cases = list(request.cases)
+    if request.cases_dir:
+        try:
+            cases.extend(load_cases(resolve_cases_dir(request.cases_dir)))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    if not request.variants or not cases:
+        raise HTTPException(status_code=400, detail="Variants and cases are required")
+
+    # Per request: the runner and its result cache are shared by concurrent requests
+    concurrency = min(max(1, request.concurrency), EXPERIMENT_MAX_CONCURRENCY)
+    runs = await get_experiment_runner().run(request.variants, cases, concurrency)
+    return {"report": build_report(runs), "runs": runs}
+
+
+@app.post("/export")
+async def export_cover_letter(request: ExportRequest):
+    """Render a cover letter as a PDF or DOCX download."""
+    if not request.cover_letter.strip():
+        raise HTTPException(status_code=400, detail="Cover letter is required")
+    if request.format not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unknown format: {request.format}")
+
+    try:
+        document = await get_exporter().export(request.cover_letter, request.format)
+    except ExportQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ExportError as e:
+        logger.error(f"Export failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Export failed: {e}")
+
+    return Response(
+        content=document,
+        media_type=EXPORT_MEDIA_TYPES[request.format],
+        headers={"Content-Disposition": f'attachment; filename="cover_letter.{request.format}"'},
+    )
+
+
+def run_debug_server(argv: Optional[List[str]] = None):
+    """Run the debug server, or the multi-worker API server with --production."""
+    parser = argparse.ArgumentParser(description="Cover letter debug and API server")
+    parser.add_argument("--production", action="store_true", help="Serve as an internal API")
+    parser.add_argument("--host", default="127.0.0.1", help="Bind address")
+    parser.add_argument("--port", type=int, default=8001, help="Port")
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1, help="Worker processes (production)"
+    )
+    args = parser.parse_args(argv)
+
+    if args.production:
+        # Workers import the app themselves and read the mode from the environment
+        os.environ["DEBUG_SERVER_MODE"] = "production"
+        print(f"🚀 Starting Cover Letter API on {args.host}:{args.port} ({args.workers} workers)")
+        uvicorn.run(
+            "debug_server:app",
+            host=args.host,
+            port=args.port,
+            workers=args.workers,
+            log_level="warning",
+            access_log=False,
+            timeout_graceful_shutdown=int(REQUEST_TIMEOUT),
+        )
+        return
+
     print("🚀 Starting Cover Letter Debug Server...")
-    print("📋 Interface available at: http://localhost:8001")
+    print(f"📋 Interface available at: http://localhost:{args.port}")
     print("⚠️  Make sure OPENAI_API_KEY is set in your .env file")
     print("🛑 Press Ctrl+C to stop")
 
-    uvicorn.run("debug_server:app", host="127.0.0.1", port=8001, reload=True, log_level="info")
+    uvicorn.run("debug_server:app", host=args.host, port=args.port, reload=True, log_level="info")
 
 
 if __name__ == "__main__":
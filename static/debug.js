@@ -43,7 +43,7 @@ async function generateCoverLetter() {
         const result = await response.json();
         
         if (response.ok) {
-            showResult(result, false);
+            showResult(result, false, data);
         } else {
             showResult(result, true);
         }
@@ -110,7 +110,7 @@ async function testWithCustomPrompts() {
         const result = await response.json();
         
         if (response.ok) {
-            showResult(result, false);
+            showResult(result, false, data);
             // Switch back to generate tab to see result
             switchTab('generate');
             document.querySelector('.tab[onclick*="generate"]').classList.add('active');
@@ -163,7 +163,29 @@ Python, Django, FastAPI, PostgreSQL, Redis, Docker, Kubernetes, Git`;
     document.getElementById('companyName').value = 'TechCorp';
 }
 
-function showResult(result, isError) {
+// Letter of the last successful generation, for document export
+let lastCoverLetter = '';
+
+async function exportLetter(format) {
+    const response = await fetch('/export', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ cover_letter: lastCoverLetter, format: format })
+    });
+    if (!response.ok) {
+        const error = await response.json();
+        alert(`Export failed: ${error.detail || response.status}`);
+        return;
+    }
+
+    const link = document.createElement('a');
+    link.href = URL.createObjectURL(await response.blob());
+    link.download = `cover_letter.${format}`;
+    link.click();
+    URL.revokeObjectURL(link.href);
+}
+
+function showResult(result, isError, request) {
     const resultDiv = document.getElementById('result');
     
     if (isError) {
@@ -187,9 +209,169 @@ function showResult(result, isError) {
                     <strong>Word Count:</strong> ${metadata.word_count || 'N/A'}
                     ${fallbackText}
                 </div>
+                <div class="export-buttons">
+                    <button class="secondary-btn" onclick="exportLetter('pdf')">📄 Download PDF</button>
+                    <button class="secondary-btn" onclick="exportLetter('docx')">📝 Download DOCX</button>
+                </div>
+                ${renderWaterfall(metadata.timing)}
+                ${renderTokenBreakdown(metadata.timing, metadata.usage)}
             </div>
         `;
+        lastCoverLetter = result.cover_letter;
+        saveRun(result, request || {});
+    }
+    renderRunHistory();
+}
+
+// Per-stage timing and token breakdown
+
+const RUN_HISTORY_KEY = 'coverLetterRuns';
+const RUN_HISTORY_LIMIT = 10;
+
+function escapeHtml(text) {
+    const div = document.createElement('div');
+    div.textContent = text;
+    return div.innerHTML;
+}
+
+function renderWaterfall(timing) {
+    if (!timing || !timing.stages || timing.stages.length === 0) {
+        return '';
+    }
+    const total = Math.max(timing.total, 0.001);
+    const rows = timing.stages
+        .slice()
+        .sort((a, b) => a.start - b.start)
+        .map(stage => {
+            const left = (stage.start / total) * 100;
+            const width = Math.max((stage.duration / total) * 100, 0.5);
+            const kind = stage.reused ? 'reused' : (stage.api ? 'api' : 'local');
+            const firstToken = stage.first_token !== undefined
+                ? `<div class="waterfall-marker" style="left: ${((stage.start + stage.first_token) / total) * 100}%" title="First token"></div>`
+                : '';
+            const label = stage.reused ? 'reused' : `${(stage.duration * 1000).toFixed(0)} ms`;
+            return `
+                <div class="waterfall-row">
+                    <div class="waterfall-label">${stage.stage}</div>
+                    <div class="waterfall-track">
+                        <div class="waterfall-bar ${kind}" style="left: ${left}%; width: ${width}%"></div>
+                        ${firstToken}
+                    </div>
+                    <div class="waterfall-value">${label}</div>
+                </div>
+            `;
+        })
+        .join('');
+    return `
+        <div class="waterfall">
+            <h4>⏱️ Timeline (${timing.total.toFixed(2)}s)</h4>
+            ${rows}
+        </div>
+    `;
+}
+
+function renderTokenBreakdown(timing, usage) {
+    const shares = (timing && timing.prompt_tokens) || {};
+    const parts = Object.entries(shares).filter(([, tokens]) => tokens > 0);
+    if (parts.length === 0) {
+        return '';
+    }
+    const total = parts.reduce((sum, [, tokens]) => sum + tokens, 0);
+    const segments = parts
+        .map(([name, tokens]) => `<div class="token-segment ${name}" style="width: ${(tokens / total) * 100}%" title="${name}: ~${tokens} tokens"></div>`)
+        .join('');
+    const legend = parts
+        .map(([name, tokens]) => `<span class="token-legend ${name}">${name} ~${tokens} (${((tokens / total) * 100).toFixed(0)}%)</span>`)
+        .join(' ');
+    const stages = Object.entries((usage && usage.stages) || {})
+        .map(([stage, stageUsage]) => `${stage}: ${stageUsage.prompt_tokens} in / ${stageUsage.completion_tokens} out`)
+        .join(' | ');
+    return `
+        <div class="token-breakdown">
+            <h4>🧮 Letter prompt composition (estimated)</h4>
+            <div class="token-bar">${segments}</div>
+            <div class="metadata">${legend}${stages ? '<br>' + stages : ''}</div>
+        </div>
+    `;
+}
+
+function loadRuns() {
+    try {
+        return JSON.parse(localStorage.getItem(RUN_HISTORY_KEY)) || [];
+    } catch (error) {
+        return [];
+    }
+}
+
+function saveRun(result, request) {
+    const metadata = result.metadata || {};
+    const usage = metadata.usage || {};
+    const stages = (metadata.timing && metadata.timing.stages) || [];
+    const letterStage = stages.find(stage => stage.stage === 'cover_letter' || stage.stage === 'fallback');
+    const prompt = request.custom_system_prompt && request.custom_system_prompt.trim()
+        ? request.custom_system_prompt.trim().substring(0, 40) + '…'
+        : 'default';
+    const runs = loadRuns();
+    runs.unshift({
+        at: new Date().toLocaleTimeString(),
+        prompt: prompt,
+        model: request.model_name || '',
+        total: result.generation_time,
+        letter: letterStage ? letterStage.duration : null,
+        promptTokens: usage.prompt_tokens || 0,
+        completionTokens: usage.completion_tokens || 0,
+        quality: result.quality_score,
+        words: metadata.word_count || 0,
+        fallback: Boolean(metadata.fallback_used)
+    });
+    localStorage.setItem(RUN_HISTORY_KEY, JSON.stringify(runs.slice(0, RUN_HISTORY_LIMIT)));
+}
+
+function clearRunHistory() {
+    localStorage.removeItem(RUN_HISTORY_KEY);
+    renderRunHistory();
+}
+
+function renderRunHistory() {
+    const historyDiv = document.getElementById('runHistory');
+    if (!historyDiv) {
+        return;
+    }
+    const runs = loadRuns();
+    if (runs.length === 0) {
+        historyDiv.innerHTML = '';
+        return;
     }
+    const fastest = Math.min(...runs.map(run => run.total));
+    const rows = runs
+        .map(run => `
+            <tr>
+                <td>${run.at}</td>
+                <td>${escapeHtml(run.prompt)}${run.fallback ? ' (fallback)' : ''}</td>
+                <td>${escapeHtml(run.model)}</td>
+                <td class="${run.total === fastest ? 'best' : ''}">${run.total.toFixed(2)}s</td>
+                <td>${run.letter !== null ? run.letter.toFixed(2) + 's' : '—'}</td>
+                <td>${run.promptTokens} / ${run.completionTokens}</td>
+                <td>${(run.quality * 100).toFixed(0)}%</td>
+                <td>${run.words}</td>
+            </tr>
+        `)
+        .join('');
+    historyDiv.innerHTML = `
+        <div class="section run-history">
+            <h3>📊 Last ${runs.length} runs</h3>
+            <table>
+                <thead>
+                    <tr>
+                        <th>Time</th><th>Prompt</th><th>Model</th><th>Total</th>
+                        <th>Letter call</th><th>Tokens in / out</th><th>Quality</th><th>Words</th>
+                    </tr>
+                </thead>
+                <tbody>${rows}</tbody>
+            </table>
+            <button class="secondary-btn" onclick="clearRunHistory()">🧹 Clear History</button>
+        </div>
+    `;
 }
 
 // Temperature slider handler
@@ -304,4 +486,5 @@ function loadCurrentPromptsToQuick() {
 // Load current prompts on page load
 window.onload = function() {
     loadCurrentPrompts();
+    renderRunHistory();
 }; 
\ No newline at end of file
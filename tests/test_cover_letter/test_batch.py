@@ -0,0 +1,138 @@
+"""
+Tests for offline batch generation.
+"""
+
+import asyncio
+import io
+import json
+
+import pytest
+
+from cover_letter import CoverLetterResult
+from cover_letter.batch import BatchRunner, completed_ids
+
+
+class FakeGenerator:
+    """Generator stand-in that records calls."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+
+    async def generate(self, resume, job_description, **kwargs):
+        self.calls.append((resume, job_description, kwargs))
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(self.delay)
+        self.active -= 1
+        return CoverLetterResult(
+            cover_letter=f"Letter for {job_description}",
+            quality_score=0.9,
+            keywords_found=1,
+            generation_time=self.delay,
+            metadata={"usage": {"prompt_tokens": 10, "completion_tokens": 5}},
+        )
+
+
+def write_jsonl(path, rows):
+    """Write rows as JSONL; strings are written verbatim."""
+    path.write_text(
+        "".join((row if isinstance(row, str) else json.dumps(row)) + "\n" for row in rows),
+        encoding="utf-8",
+    )
+
+
+def read_jsonl(path):
+    """Read JSONL rows."""
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+class TestBatchRunner:
+    """Test BatchRunner streaming, concurrency and checkpointing."""
+
+    @pytest.mark.asyncio
+    async def test_generates_all_items(self, tmp_path):
+        """Test that every valid line gets a result and bad lines become errors."""
+        (tmp_path / "cv.md").write_text("Python developer", encoding="utf-8")
+        source = tmp_path / "input.jsonl"
+        write_jsonl(
+            source,
+            [
+                {"id": "a", "resume_path": "cv.md", "job_description": "Vacancy A"},
+                {
+                    "resume": "Go developer",
+                    "job_description": "Vacancy B",
+                    "instructions": "кратко",
+                },
+                "{not json",
+                {"id": "c", "job_description": "Vacancy C"},
+            ],
+        )
+        generator = FakeGenerator()
+        runner = BatchRunner(generator, progress_stream=io.StringIO())
+
+        summary = await runner.run(source, tmp_path / "out.jsonl")
+        results = {row["id"]: row for row in read_jsonl(tmp_path / "out.jsonl")}
+
+        assert summary["succeeded"] == 2
+        assert summary["failed"] == 2
+        assert results["a"]["cover_letter"] == "Letter for Vacancy A"
+        assert results["a"]["prompt_tokens"] == 10
+        assert "line-3" in results and results["line-3"]["error"]
+        assert results["c"]["error"]
+        calls = {call[1]: call for call in generator.calls}
+        assert calls["Vacancy A"][0] == "Python developer"
+        assert calls["Vacancy B"][2]["special_requirements"] == "кратко"
+
+    @pytest.mark.asyncio
+    async def test_resume_skips_completed(self, tmp_path):
+        """Test that a re-run only processes items without a successful result."""
+        source = tmp_path / "input.jsonl"
+        write_jsonl(
+            source,
+            [{"id": str(i), "resume": "CV", "job_description": f"Vacancy {i}"} for i in range(4)],
+        )
+        output = tmp_path / "out.jsonl"
+        write_jsonl(
+            output,
+            [
+                {"id": "0", "cover_letter": "done"},
+                {"id": "1", "error": "timeout"},
+            ],
+        )
+        # A line cut off by an interrupted run, without a trailing newline
+        with output.open("a", encoding="utf-8") as file:
+            file.write('{"id": "2", "cover_le')
+        generator = FakeGenerator()
+
+        assert completed_ids(output) == {"0"}
+        summary = await BatchRunner(generator, progress_stream=io.StringIO()).run(source, output)
+
+        assert summary["skipped"] == 1
+        assert sorted(call[1] for call in generator.calls) == [
+            "Vacancy 1",
+            "Vacancy 2",
+            "Vacancy 3",
+        ]
+        assert completed_ids(output) == {"0", "1", "2", "3"}
+
+    @pytest.mark.asyncio
+    async def test_concurrency_is_bounded(self, tmp_path):
+        """Test that no more than the configured number of generations run at once."""
+        source = tmp_path / "input.jsonl"
+        write_jsonl(
+            source,
+            [{"resume": "CV", "job_description": f"Vacancy {i}"} for i in range(10)],
+        )
+        generator = FakeGenerator(delay=0.01)
+        progress = io.StringIO()
+
+        await BatchRunner(generator, concurrency=3, progress_stream=progress).run(
+            source, tmp_path / "out.jsonl"
+        )
+
+        assert len(generator.calls) == 10
+        assert generator.max_active == 3
+        assert "[batch done] ok=10" in progress.getvalue()
@@ -0,0 +1,150 @@
+"""
+Tests for output token budgets and early stopping of streamed letters.
+"""
+
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from cover_letter import CoverLetterGenerator
+from cover_letter.budgets import (
+    detect_language,
+    output_token_budget,
+    target_word_limit,
+    trim_to_sentence,
+)
+from cover_letter.prompts import COVER_LETTER_SYSTEM_PROMPT, FALLBACK_SYSTEM_PROMPT
+
+
+class FakeStream:
+    """Async iterator over chunks that records how many were consumed."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.consumed = 0
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.consumed >= len(self.chunks):
+            raise StopAsyncIteration
+        self.consumed += 1
+        return self.chunks[self.consumed - 1]
+
+    async def close(self):
+        self.closed = True
+
+
+def chunk(content=None, finish_reason=None, index=0, usage=None):
+    """Build a streamed chat completion chunk."""
+    choices = []
+    if content is not None or finish_reason is not None:
+        choices.append(
+            SimpleNamespace(
+                index=index,
+                delta=SimpleNamespace(content=content),
+                finish_reason=finish_reason,
+            )
+        )
+    return SimpleNamespace(choices=choices, usage=usage)
+
+
+def word_chunks(sentence: str, repeat: int):
+    """Chunks of a sentence repeated, one sentence per chunk."""
+    return [chunk(sentence + " ") for _ in range(repeat)]
+
+
+class TestBudgets:
+    """Test budget helpers."""
+
+    def test_word_limits_from_prompts(self):
+        """Test that word limits are read from the prompts."""
+        assert target_word_limit(COVER_LETTER_SYSTEM_PROMPT, 100) == 200
+        assert target_word_limit(FALLBACK_SYSTEM_PROMPT, 100) == 350
+        assert target_word_limit("Write up to 120 words.", 100) == 120
+        assert target_word_limit("Пиши кратко.", 100) == 100
+
+    def test_token_budget_by_language(self):
+        """Test that Russian output gets more tokens per word than English."""
+        assert detect_language("Добрый день, команда Python") == "ru"
+        assert detect_language("Dear hiring team") == "en"
+        assert output_token_budget(200, "ru") > output_token_budget(200, "en")
+        # The old 200-token fallback limit could not fit a 350-word letter
+        assert output_token_budget(350, "ru") > 350
+
+    def test_trim_to_sentence(self):
+        """Test that an unfinished trailing sentence is dropped."""
+        assert trim_to_sentence("Первое. Второе! Трет") == "Первое. Второе!"
+        assert trim_to_sentence("без точки") is None
+
+
+class TestEarlyStop:
+    """Test streamed letter generation with early stop."""
+
+    @pytest.mark.asyncio
+    async def test_overlong_letter_is_stopped(self):
+        """Test that streaming stops once the letter clearly exceeds the limit."""
+        sentence = "Разработал сервис на Python и ускорил обработку данных."
+        stream = FakeStream(word_chunks(sentence, 100) + [chunk(finish_reason="stop")])
+        client = Mock()
+        client.chat.completions.create = AsyncMock(return_value=stream)
+        generator = CoverLetterGenerator(client, stream=True)
+
+        response = await generator._letter_completion(
+            "cover_letter", 200, messages=[{"role": "user", "content": "x"}], max_tokens=750
+        )
+
+        text = response.choices[0].message.content
+        assert stream.closed
+        assert stream.consumed < 50
+        assert 250 < len(text.split()) < 270
+        assert response.choices[0].finish_reason == "early_stop"
+        assert generator._response_texts(response)[0].endswith("данных.")
+        assert response.usage.completion_tokens > 0
+
+    @pytest.mark.asyncio
+    async def test_short_letter_runs_to_completion(self):
+        """Test that a letter within the limit is fully read, including usage."""
+        usage = SimpleNamespace(prompt_tokens=300, completion_tokens=120)
+        stream = FakeStream(
+            word_chunks("Короткое предложение письма.", 10)
+            + [chunk(finish_reason="stop"), chunk(usage=usage)]
+        )
+        client = Mock()
+        client.chat.completions.create = AsyncMock(return_value=stream)
+        generator = CoverLetterGenerator(client, stream=True)
+
+        response = await generator._letter_completion(
+            "cover_letter", 200, messages=[{"role": "user", "content": "x"}], max_tokens=750
+        )
+
+        assert stream.consumed == len(stream.chunks)
+        assert response.choices[0].finish_reason == "stop"
+        assert response.usage is usage
+        kwargs = client.chat.completions.create.call_args.kwargs
+        assert kwargs["stream"] is True
+        assert kwargs["stream_options"] == {"include_usage": True}
+
+    @pytest.mark.asyncio
+    async def test_length_metadata(self, mock_openai_client, mock_response_builder):
+        """Test that the budget and overrun are reported in metadata."""
+        letter = "Добрый день! " + "Сделал проект. " * 110
+        mock_openai_client.chat.completions.create.side_effect = [
+            mock_response_builder.create_response("Python, Django"),
+            mock_response_builder.create_response(letter),
+        ]
+        generator = CoverLetterGenerator(mock_openai_client)
+
+        result = await generator.generate(
+            "Python", "Python developer", custom_system_prompt="Пиши до 150 слов."
+        )
+
+        length = result.metadata["length"]
+        assert length["target_words"] == 150
+        assert length["overrun_words"] == 222 - 150
+        assert length["max_tokens"] == output_token_budget(150, "ru")
+        call = mock_openai_client.chat.completions.create.call_args_list[1]
+        assert call.kwargs["max_tokens"] == output_token_budget(150, "ru")
@@ -0,0 +1,129 @@
+"""
+Tests for recording and replaying LLM traffic.
+"""
+
+import json
+import time
+
+import httpx
+import pytest
+from openai import AsyncOpenAI
+
+from cover_letter import CoverLetterGenerator
+from cover_letter.generator import CoverLetterGenerationError
+from cover_letter.cassettes import CassetteError, CassettePlayer, CassetteRecorder, request_key
+from cover_letter.standin import create_standin_app
+
+
+def standin_client(latency: float = 0.0) -> AsyncOpenAI:
+    """OpenAI client talking to an in-process stand-in."""
+    transport = httpx.ASGITransport(app=create_standin_app(latency=latency))
+    return AsyncOpenAI(
+        api_key="test",
+        base_url="http://standin/v1",
+        http_client=httpx.AsyncClient(transport=transport),
+    )
+
+
+def write_cassette(path, body, content):
+    """Write a cassette with one non-streamed completion."""
+    response = {
+        "id": "chatcmpl-1",
+        "object": "chat.completion",
+        "created": 0,
+        "model": body["model"],
+        "choices": [
+            {
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": content},
+            }
+        ],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+    }
+    entry = {"key": request_key(body), "request": body, "elapsed": 0.2, "response": response}
+    path.write_text(json.dumps(entry, ensure_ascii=False) + "\n", encoding="utf-8")
+
+
+class TestCassettes:
+    """Test cassette recording and replay."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("stream", [False, True])
+    async def test_record_and_replay(self, tmp_path, sample_resume, sample_job_description, stream):
+        """Test that a replayed generation matches the recorded one."""
+        cassette = tmp_path / "run.jsonl"
+        client = standin_client()
+        recorder = CassetteRecorder(client, cassette)
+        recorded = await CoverLetterGenerator(recorder, stream=stream).generate(
+            sample_resume, sample_job_description
+        )
+        await client.close()
+
+        entries = [json.loads(line) for line in cassette.read_text().splitlines()]
+        assert entries
+        if stream:
+            letter = next(entry for entry in entries if "chunks" in entry)
+            assert letter["complete"] is True
+            assert all(chunk["offset"] >= 0 for chunk in letter["chunks"])
+
+        player = CassettePlayer(cassette)
+        replayed = await CoverLetterGenerator(player, stream=stream).generate(
+            sample_resume, sample_job_description
+        )
+
+        assert len(player) == len(entries)
+        assert replayed.cover_letter == recorded.cover_letter
+        assert replayed.metadata["keywords_found"] == recorded.metadata["keywords_found"]
+        assert replayed.metadata["usage"]["calls"] == recorded.metadata["usage"]["calls"]
+
+    @pytest.mark.asyncio
+    async def test_replay_keyword_parsing(self, tmp_path, mock_openai_client):
+        """Test comma splitting of a recorded keyword response."""
+        generator = CoverLetterGenerator(mock_openai_client)
+        captured = {}
+
+        async def capture(**kwargs):
+            captured.update(kwargs)
+            raise CassetteError("not recorded yet")
+
+        mock_openai_client.chat.completions.create.side_effect = capture
+        with pytest.raises(CoverLetterGenerationError):
+            await generator._extract_keywords("Ищем Python-разработчика")
+
+        cassette = tmp_path / "keywords.jsonl"
+        write_cassette(cassette, captured, " Python ,Django,, SQL ")
+        generator.client = CassettePlayer(cassette)
+
+        keywords = await generator._extract_keywords("Ищем Python-разработчика")
+
+        assert keywords == ["Python", "Django", "SQL"]
+
+    @pytest.mark.asyncio
+    async def test_missing_recording(self, tmp_path):
+        """Test that an unknown request fails instead of reaching the network."""
+        cassette = tmp_path / "empty.jsonl"
+        cassette.write_text("")
+        player = CassettePlayer(cassette)
+
+        with pytest.raises(CassetteError):
+            await player.chat.completions.create(model="gpt-4o-mini", messages=[])
+
+    @pytest.mark.asyncio
+    async def test_replay_delays(self, tmp_path):
+        """Test that recorded latency is reproduced only when asked."""
+        body = {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "x"}]}
+        cassette = tmp_path / "slow.jsonl"
+        write_cassette(cassette, body, "ok")
+
+        started = time.perf_counter()
+        await CassettePlayer(cassette).chat.completions.create(**body)
+        instant = time.perf_counter() - started
+
+        started = time.perf_counter()
+        response = await CassettePlayer(cassette, delay_factor=0.5).chat.completions.create(**body)
+        paced = time.perf_counter() - started
+
+        assert response.choices[0].message.content == "ok"
+        assert instant < 0.05
+        assert paced >= 0.1
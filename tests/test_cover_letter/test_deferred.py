@@ -0,0 +1,152 @@
+"""
+Tests for the deferred batch API backend against a local stand-in batch server.
+"""
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from cover_letter import CoverLetterGenerator
+from cover_letter.deferred import DeferredBatchClient, DeferredBatchError, generate_deferred
+from cover_letter.metrics import MetricsRegistry
+
+LETTER = "Добрый день! " + " ".join(["опыт"] * 160)
+
+
+class LocalBatchServer:
+    """
+    In-memory stand-in for the files and batches endpoints.
+    Each batch completes after a number of polls; bodies are answered by a responder.
+    """
+
+    def __init__(self, responder, polls_to_complete: int = 2, status: str = "completed"):
+        self.responder = responder
+        self.polls_to_complete = polls_to_complete
+        self.final_status = status
+        self.files = SimpleNamespace(create=self._create_file, content=self._file_content)
+        self.batches = SimpleNamespace(create=self._create_batch, retrieve=self._retrieve)
+        self.submitted = []
+        self._files = {}
+        self._batches = {}
+
+    async def _create_file(self, file, purpose):
+        file_id = f"file-{len(self._files)}"
+        self._files[file_id] = file[1].decode("utf-8")
+        return SimpleNamespace(id=file_id)
+
+    async def _file_content(self, file_id):
+        return SimpleNamespace(text=self._files[file_id])
+
+    async def _create_batch(self, input_file_id, endpoint, completion_window):
+        batch_id = f"batch-{len(self._batches)}"
+        requests = [json.loads(line) for line in self._files[input_file_id].splitlines()]
+        self.submitted.append(requests)
+        self._batches[batch_id] = {"requests": requests, "polls": 0}
+        return SimpleNamespace(id=batch_id, status="validating")
+
+    async def _retrieve(self, batch_id):
+        batch = self._batches[batch_id]
+        batch["polls"] += 1
+        if batch["polls"] < self.polls_to_complete:
+            return SimpleNamespace(id=batch_id, status="in_progress")
+        if self.final_status != "completed":
+            return SimpleNamespace(
+                id=batch_id, status=self.final_status, output_file_id=None, error_file_id=None
+            )
+
+        output_id = f"file-{len(self._files)}"
+        self._files[output_id] = "\n".join(
+            json.dumps(
+                {
+                    "custom_id": request["custom_id"],
+                    "response": {"status_code": 200, "body": self._completion(request["body"])},
+                    "error": None,
+                }
+            )
+            for request in batch["requests"]
+        )
+        return SimpleNamespace(
+            id=batch_id, status="completed", output_file_id=output_id, error_file_id=None
+        )
+
+    def _completion(self, body):
+        count = body.get("n", 1)
+        return {
+            "id": "chatcmpl-local",
+            "object": "chat.completion",
+            "created": 0,
+            "model": body["model"],
+            "choices": [
+                {
+                    "index": index,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": self.responder(body)},
+                }
+                for index in range(count)
+            ],
+            "usage": {"prompt_tokens": 100, "completion_tokens": 50, "total_tokens": 150},
+        }
+
+
+def responder(body):
+    """Answer keyword prompts with keywords and everything else with a letter."""
+    prompt = body["messages"][-1]["content"]
+    return "Python, Django, PostgreSQL" if "ключев" in prompt.lower() else LETTER
+
+
+class TestDeferredBatchClient:
+    """Test batching, polling and result mapping."""
+
+    @pytest.mark.asyncio
+    async def test_requests_are_packed_into_one_batch(self):
+        """Test that concurrent requests share a batch and get their own results."""
+        server = LocalBatchServer(lambda body: body["messages"][0]["content"].upper())
+        client = DeferredBatchClient(
+            server, collect_window=0.01, poll_interval=0.001, registry=MetricsRegistry()
+        )
+
+        responses = await asyncio.gather(
+            *(
+                client.chat.completions.create(
+                    model="gpt-4o-mini", messages=[{"role": "user", "content": f"q{i}"}]
+                )
+                for i in range(5)
+            )
+        )
+
+        assert len(server.submitted) == 1
+        assert len(server.submitted[0]) == 5
+        assert [r.choices[0].message.content for r in responses] == [f"Q{i}" for i in range(5)]
+        assert responses[0].usage.prompt_tokens == 100
+
+    @pytest.mark.asyncio
+    async def test_failed_batch_raises_openai_error(self):
+        """Test that an expired batch fails its requests with an OpenAIError."""
+        server = LocalBatchServer(responder, status="expired")
+        client = DeferredBatchClient(
+            server, collect_window=0.01, poll_interval=0.001, registry=MetricsRegistry()
+        )
+
+        with pytest.raises(DeferredBatchError, match="expired"):
+            await client.chat.completions.create(model="gpt-4o-mini", messages=[])
+
+    @pytest.mark.asyncio
+    async def test_generate_deferred_uses_regular_pipeline(self):
+        """Test that letters come back as CoverLetterResult with the usual scoring."""
+        server = LocalBatchServer(responder)
+        client = DeferredBatchClient(server, collect_window=0.01, poll_interval=0.001)
+        generator = CoverLetterGenerator(client)
+        requests = [
+            {"resume": "Python developer", "job_description": f"Вакансия {i}: Python, Django"}
+            for i in range(3)
+        ]
+
+        results = await generate_deferred(generator, requests)
+
+        assert [result.cover_letter for result in results] == [LETTER] * 3
+        assert all(not result.metadata.get("fallback_used") for result in results)
+        assert results[0].metadata["usage"]["stages"]["cover_letter"]["prompt_tokens"] == 100
+        # One batch round for keywords, one for letters
+        assert [len(batch) for batch in server.submitted] == [3, 3]
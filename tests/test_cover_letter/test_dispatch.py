@@ -0,0 +1,137 @@
+"""
+Tests for per-user ordered dispatch of bot updates.
+"""
+
+import asyncio
+import random
+
+import pytest
+
+from cover_letter.dispatch import OrderedDispatcher, UserQueueFullError
+from cover_letter.metrics import MetricsRegistry
+
+
+class UserConversation:
+    """Per-user state machine that detects lost or reordered transitions."""
+
+    def __init__(self):
+        self.states: dict[int, int] = {}
+        self.seen: dict[int, list[int]] = {}
+
+    async def handle(self, user: int, step: int) -> None:
+        """Read the state, yield to other tasks, then write the next state."""
+        state = self.states.get(user, 0)
+        await asyncio.sleep(random.uniform(0, 0.002))
+        self.seen.setdefault(user, []).append(step)
+        self.states[user] = state + 1
+
+
+class TestOrderedDispatcher:
+    """Test concurrency, ordering and queue bounds."""
+
+    @pytest.mark.asyncio
+    async def test_no_lost_or_reordered_transitions(self):
+        """Test many users sending bursts of updates at once."""
+        dispatcher = OrderedDispatcher(
+            max_concurrency=8, max_pending=50, registry=MetricsRegistry()
+        )
+        conversation = UserConversation()
+        users, steps = 20, 30
+
+        # One task per update in arrival order, interleaved across users
+        tasks = [
+            asyncio.create_task(
+                dispatcher.run(user, lambda user=user, step=step: conversation.handle(user, step))
+            )
+            for step in range(steps)
+            for user in range(users)
+        ]
+        await asyncio.gather(*tasks)
+
+        assert conversation.states == {user: steps for user in range(users)}
+        assert all(conversation.seen[user] == list(range(steps)) for user in range(users))
+        assert dispatcher.stats == {"users": 0, "running": 0, "pending": 0}
+
+    @pytest.mark.asyncio
+    async def test_users_run_in_parallel_up_to_limit(self):
+        """Test that different users overlap but never exceed the limit."""
+        dispatcher = OrderedDispatcher(max_concurrency=3, registry=MetricsRegistry())
+        running = 0
+        peak = 0
+
+        async def slow_handler():
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+        await asyncio.gather(*(dispatcher.run(user, slow_handler) for user in range(10)))
+
+        assert peak == 3
+
+    @pytest.mark.asyncio
+    async def test_same_user_never_overlaps(self):
+        """Test that a user's updates are serialized even with free capacity."""
+        dispatcher = OrderedDispatcher(max_concurrency=10, registry=MetricsRegistry())
+        running = 0
+        peak = 0
+
+        async def slow_handler():
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.005)
+            running -= 1
+
+        await asyncio.gather(*(dispatcher.run("user", slow_handler) for _ in range(5)))
+
+        assert peak == 1
+
+    @pytest.mark.asyncio
+    async def test_queue_depth_is_bounded(self):
+        """Test that updates beyond the per-user limit are rejected."""
+        registry = MetricsRegistry()
+        dispatcher = OrderedDispatcher(max_pending=3, registry=registry)
+        release = asyncio.Event()
+
+        async def blocked():
+            await release.wait()
+            return "done"
+
+        admitted = [asyncio.create_task(dispatcher.run("user", blocked)) for _ in range(3)]
+        await asyncio.sleep(0)
+        assert dispatcher.pending("user") == 3
+
+        with pytest.raises(UserQueueFullError):
+            await dispatcher.run("user", blocked)
+        # Other users are not affected by one user's backlog
+        other = asyncio.create_task(dispatcher.run("other", blocked))
+
+        release.set()
+        assert await asyncio.gather(*admitted, other) == ["done"] * 4
+        assert registry.counter("dispatch.rejected") == 1
+
+    @pytest.mark.asyncio
+    async def test_failure_does_not_block_next_update(self):
+        """Test that a failing handler releases the user for the next update."""
+        dispatcher = OrderedDispatcher(registry=MetricsRegistry())
+        order = []
+
+        async def failing():
+            order.append("failing")
+            raise RuntimeError("boom")
+
+        async def succeeding():
+            order.append("succeeding")
+            return 1
+
+        results = await asyncio.gather(
+            dispatcher.run("user", failing),
+            dispatcher.run("user", succeeding),
+            return_exceptions=True,
+        )
+
+        assert isinstance(results[0], RuntimeError)
+        assert results[1] == 1
+        assert order == ["failing", "succeeding"]
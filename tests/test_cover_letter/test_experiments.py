@@ -0,0 +1,153 @@
+"""
+Tests for the prompt experiment runner.
+"""
+
+import json
+from unittest.mock import Mock
+
+import pytest
+
+from cover_letter.__main__ import build_parser
+from cover_letter.experiments import (
+    ExperimentCase,
+    ExperimentRunner,
+    PromptVariant,
+    build_report,
+    estimate_cost,
+    format_report,
+    load_cases,
+    load_variants,
+)
+
+LETTER = "Добрый день! Python и Django - основной стек. " + " ".join(["опыт"] * 160)
+
+
+def make_response(content, prompt_tokens=100, completion_tokens=50):
+    """Create a mock response with token usage."""
+    response = Mock()
+    response.choices = [Mock()]
+    response.choices[0].message = Mock(content=content)
+    response.usage = Mock(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+    return response
+
+
+@pytest.fixture
+def experiment_client(mock_openai_client):
+    """Client answering keyword and letter calls with token usage."""
+
+    async def create(**kwargs):
+        if kwargs["messages"][0]["role"] == "system":
+            return make_response(LETTER, prompt_tokens=1000, completion_tokens=300)
+        return make_response("Python, Django")
+
+    mock_openai_client.chat.completions.create.side_effect = create
+    return mock_openai_client
+
+
+class TestExperimentRunner:
+    """Test ExperimentRunner."""
+
+    @pytest.mark.asyncio
+    async def test_matrix_report(self, experiment_client):
+        """Test that every variant runs on every case and is aggregated."""
+        variants = [
+            PromptVariant(name="default"),
+            PromptVariant(name="cold", system_prompt="Пиши кратко.", temperature=0.2),
+        ]
+        cases = [
+            ExperimentCase(name=f"case{i}", resume="Python", job_description=f"Vacancy {i}")
+            for i in range(3)
+        ]
+
+        runs = await ExperimentRunner(experiment_client, concurrency=2).run(variants, cases)
+        report = build_report(runs)
+
+        assert len(runs) == 6
+        assert set(report) == {"default", "cold"}
+        assert report["default"]["runs"] == 3
+        assert report["default"]["prompt_tokens"] == 3 * 1100
+        assert report["default"]["completion_tokens"] == 3 * 350
+        assert report["default"]["fallback_rate"] == 0.0
+        assert report["default"]["cost"] == pytest.approx(
+            3 * estimate_cost("gpt-4o-mini", 1100, 350)
+        )
+        assert "default" in format_report(report)
+
+        letter_temperatures = {
+            call.kwargs["temperature"]
+            for call in experiment_client.chat.completions.create.call_args_list
+            if call.kwargs["messages"][0]["role"] == "system"
+        }
+        assert letter_temperatures == {0.98, 0.2}
+
+    @pytest.mark.asyncio
+    async def test_disk_cache_skips_finished_cells(self, experiment_client, tmp_path):
+        """Test that a second run reuses cached cells without API calls."""
+        variants = [PromptVariant(name="default")]
+        cases = [ExperimentCase(name="case", resume="Python", job_description="Vacancy")]
+
+        await ExperimentRunner(experiment_client, cache_dir=tmp_path).run(variants, cases)
+        calls = experiment_client.chat.completions.create.call_count
+        runs = await ExperimentRunner(experiment_client, cache_dir=tmp_path).run(variants, cases)
+
+        assert experiment_client.chat.completions.create.call_count == calls
+        assert runs[0].cached
+        assert build_report(runs)["default"]["cached"] == 1
+
+    @pytest.mark.asyncio
+    async def test_memory_cache_is_bounded(self, experiment_client):
+        """Test that the in-memory cache keeps only the most recent cells."""
+        runner = ExperimentRunner(experiment_client, memory_cache_size=2)
+        variants = [PromptVariant(name="default")]
+        cases = [
+            ExperimentCase(name=f"case{i}", resume="Python", job_description=f"Vacancy {i}")
+            for i in range(3)
+        ]
+
+        for case in cases:
+            await runner.run(variants, [case])
+        calls = experiment_client.chat.completions.create.call_count
+        latest = await runner.run(variants, cases[1:])
+        oldest = await runner.run(variants, cases[:1])
+
+        assert len(runner._cache) == 2
+        assert all(run.cached for run in latest)
+        assert not oldest[0].cached
+        assert experiment_client.chat.completions.create.call_count > calls
+
+
+class TestExperimentInputs:
+    """Test loading experiment inputs."""
+
+    def test_load_cases_and_variants(self, tmp_path):
+        """Test case folder pairing and variant file parsing."""
+        (tmp_path / "resumes").mkdir()
+        (tmp_path / "vacancies").mkdir()
+        (tmp_path / "resumes" / "anna.md").write_text("# Анна", encoding="utf-8")
+        (tmp_path / "vacancies" / "backend.md").write_text("Backend", encoding="utf-8")
+        (tmp_path / "vacancies" / "data.txt").write_text("Data", encoding="utf-8")
+        variants_file = tmp_path / "variants.json"
+        variants_file.write_text(json.dumps([{"name": "a", "model": "gpt-4o"}]))
+
+        cases = load_cases(tmp_path)
+        variants = load_variants(variants_file)
+
+        assert [case.name for case in cases] == ["backend/anna", "data/anna"]
+        assert variants[0].model == "gpt-4o"
+
+    def test_duplicate_variant_names_rejected(self, tmp_path):
+        """Test that variants sharing a name are refused."""
+        variants_file = tmp_path / "variants.json"
+        variants_file.write_text(json.dumps([{"name": "a"}, {"name": "a", "temperature": 0.2}]))
+
+        with pytest.raises(ValueError, match="Duplicate variant names: a"):
+            load_variants(variants_file)
+
+    def test_cli_arguments(self):
+        """Test the experiment command line."""
+        args = build_parser().parse_args(
+            ["experiment", "--variants", "v.json", "--cases", "cases", "--concurrency", "8"]
+        )
+
+        assert args.command == "experiment"
+        assert args.concurrency == 8
@@ -0,0 +1,181 @@
+"""
+Tests for PDF and DOCX export of cover letters.
+"""
+
+import asyncio
+import re
+import zipfile
+import zlib
+from io import BytesIO
+from xml.etree import ElementTree
+
+import httpx
+import pytest
+
+import debug_server
+from cover_letter.export import (
+    DocumentExporter,
+    ExportError,
+    ExportQueueFullError,
+    LetterTemplate,
+    find_font,
+    render_docx,
+    render_pdf,
+)
+from cover_letter.metrics import MetricsRegistry
+
+LETTER = "Добрый день!\n\nМеня зовут Иван, я Python-разработчик <Django & FastAPI>.\n\nС уважением,\nИван"
+WORD_NAMESPACE = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+requires_font = pytest.mark.skipif(find_font() is None, reason="No TrueType font installed")
+
+
+def docx_paragraphs(document: bytes) -> list[str]:
+    """Text of each paragraph of a DOCX package."""
+    with zipfile.ZipFile(BytesIO(document)) as package:
+        root = ElementTree.fromstring(package.read("word/document.xml"))
+    return [
+        "".join(text.text or "" for text in paragraph.iter(f"{WORD_NAMESPACE}t"))
+        for paragraph in root.iter(f"{WORD_NAMESPACE}p")
+    ]
+
+
+def pdf_lines(document: bytes) -> list[str]:
+    """Text lines of a PDF, decoded through its ToUnicode map."""
+    streams = [
+        zlib.decompress(match.group(1))
+        for match in re.finditer(rb"stream\n(.*?)\nendstream", document, re.S)
+    ]
+    unicode_of = {}
+    for stream in streams:
+        if stream.startswith(b"/CIDInit"):
+            for glyph, text in re.findall(rb"<([0-9A-F]{4})> <([0-9A-F]+)>", stream):
+                unicode_of[glyph.decode()] = bytes.fromhex(text.decode()).decode("utf-16-be")
+
+    lines = []
+    for stream in streams:
+        if stream.startswith(b"BT"):
+            for hex_text in re.findall(rb"<([0-9A-F]*)> Tj", stream):
+                glyphs = re.findall(r"[0-9A-F]{4}", hex_text.decode())
+                lines.append("".join(unicode_of[glyph] for glyph in glyphs))
+    return lines
+
+
+class TestRenderers:
+    """Test document rendering in the current process."""
+
+    def test_docx(self):
+        """Test that every line becomes a paragraph with escaped text."""
+        document = render_docx(LETTER, LetterTemplate())
+
+        assert docx_paragraphs(document) == LETTER.split("\n")
+
+    @requires_font
+    def test_pdf_text_round_trip(self):
+        """Test that the PDF embeds the font and its text maps back to Unicode."""
+        document = render_pdf(LETTER, LetterTemplate(find_font()))
+
+        assert document.startswith(b"%PDF-1.4")
+        assert b"/FontFile2 7 0 R" in document
+        assert pdf_lines(document) == LETTER.split("\n")
+
+    @requires_font
+    def test_pdf_xref_offsets(self):
+        """Test that the cross-reference table points at each object."""
+        document = render_pdf(LETTER, LetterTemplate(find_font()))
+
+        xref = int(re.search(rb"startxref\n(\d+)", document).group(1))
+        offsets = re.findall(rb"(\d{10}) 00000 n", document[xref:])
+        for number, offset in enumerate(offsets, start=1):
+            assert document[int(offset) :].startswith(b"%d 0 obj" % number)
+
+    @requires_font
+    def test_pdf_wraps_and_paginates(self):
+        """Test that long paragraphs wrap and overflow onto a second page."""
+        paragraph = "Опыт разработки высоконагруженных сервисов на Python. " * 12
+        text = "\n\n".join([paragraph] * 8)
+
+        document = render_pdf(text, LetterTemplate(find_font()))
+
+        lines = pdf_lines(document)
+        assert int(re.search(rb"/Count (\d+)", document).group(1)) > 1
+        assert len(lines) > 16
+        assert " ".join(line for line in lines if line) == " ".join(text.split())
+
+    def test_pdf_without_font(self):
+        """Test that PDF export needs a font."""
+        with pytest.raises(ExportError):
+            render_pdf(LETTER, LetterTemplate())
+
+
+class TestDocumentExporter:
+    """Test rendering through the process pool."""
+
+    @pytest.mark.asyncio
+    async def test_export_in_worker(self):
+        """Test that documents are rendered in a worker process."""
+        registry = MetricsRegistry()
+        exporter = DocumentExporter(workers=1, registry=registry)
+        try:
+            document = await exporter.export(LETTER, "docx")
+        finally:
+            exporter.close()
+
+        assert docx_paragraphs(document) == LETTER.split("\n")
+        assert registry.counter("export.docx") == 1
+        assert registry.summary("export.render_seconds")["count"] == 1
+
+    @pytest.mark.asyncio
+    async def test_rejects_beyond_pending_limit(self):
+        """Test that exports beyond max_pending are rejected."""
+        registry = MetricsRegistry()
+        exporter = DocumentExporter(workers=1, max_pending=1, registry=registry)
+        try:
+            results = await asyncio.gather(
+                exporter.export(LETTER, "docx"),
+                exporter.export(LETTER, "docx"),
+                return_exceptions=True,
+            )
+        finally:
+            exporter.close()
+
+        assert isinstance(results[0], bytes)
+        assert isinstance(results[1], ExportQueueFullError)
+        assert registry.counter("export.rejected") == 1
+
+    @pytest.mark.asyncio
+    async def test_unknown_format(self):
+        """Test that unknown formats fail before reaching a worker."""
+        exporter = DocumentExporter(workers=1, registry=MetricsRegistry())
+
+        with pytest.raises(ExportError):
+            await exporter.export(LETTER, "odt")
+
+
+class TestExportEndpoint:
+    """Test the debug server export endpoint."""
+
+    @pytest.mark.asyncio
+    async def test_export_download(self, monkeypatch):
+        """Test that the endpoint returns an attachment of the right type."""
+        exporter = DocumentExporter(workers=1, registry=MetricsRegistry())
+        monkeypatch.setattr(debug_server, "get_exporter", lambda: exporter)
+
+        try:
+            async with httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=debug_server.app), base_url="http://test"
+            ) as client:
+                response = await client.post(
+                    "/export", json={"cover_letter": LETTER, "format": "docx"}
+                )
+                invalid = await client.post(
+                    "/export", json={"cover_letter": LETTER, "format": "odt"}
+                )
+        finally:
+            exporter.close()
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/vnd.openxmlformats")
+        assert "cover_letter.docx" in response.headers["content-disposition"]
+        assert docx_paragraphs(response.content) == LETTER.split("\n")
+        assert invalid.status_code == 400
@@ -0,0 +1,105 @@
+"""
+Tests for the generation history store.
+"""
+
+import sqlite3
+
+import pytest
+
+from cover_letter.history import HistoryStore, benchmark_history
+from cover_letter.metrics import MetricsRegistry
+from cover_letter.models import CoverLetterResult
+
+OTHER_VACANCY = """
+Ищем дизайнера интерфейсов в продуктовую команду мобильного банка.
+Нужно проектировать сценарии, собирать прототипы в Figma, проводить
+юзабилити-тесты и работать с дизайн-системой вместе с аналитиками.
+Будет плюсом опыт моушн-дизайна и иллюстрации для маркетинговых кампаний.
+"""
+
+
+def make_result(letter: str, company: str = "TechStart") -> CoverLetterResult:
+    """Generation result with analysis metadata."""
+    return CoverLetterResult(
+        cover_letter=letter,
+        quality_score=0.9,
+        keywords_found=2,
+        generation_time=1.5,
+        metadata={"keywords": ["Python", "Kubernetes"], "company_name": company},
+    )
+
+
+@pytest.fixture
+def store(tmp_path):
+    """History store in a temporary directory."""
+    store = HistoryStore(tmp_path / "history.db", registry=MetricsRegistry())
+    yield store
+    store.close()
+
+
+class TestHistoryStore:
+    """Test saving, listing, search and near-match lookups."""
+
+    def test_save_and_list(self, store, sample_job_description):
+        """Test that letters are listed newest first and only to their owner."""
+        first = store.save("1", sample_job_description, make_result("Первое письмо"))
+        second = store.save("1", OTHER_VACANCY, make_result("Второе письмо", company=""))
+
+        entries = store.recent("1")
+        assert [entry.id for entry in entries] == [second, first]
+        assert entries[1].vacancy == sample_job_description
+        assert entries[1].company == "TechStart"
+        assert entries[1].keywords == ["Python", "Kubernetes"]
+        assert store.get("1", first).cover_letter == "Первое письмо"
+        assert store.get("2", first) is None
+        assert store.recent("2") == []
+
+    def test_search(self, store, sample_job_description):
+        """Test that every query word must match, as a prefix, within the user's vacancies."""
+        store.save("1", sample_job_description, make_result("Письмо разработчика"))
+        store.save("1", OTHER_VACANCY, make_result("Письмо дизайнера", company="Банк"))
+        store.save("2", sample_job_description, make_result("Чужое письмо"))
+
+        assert [entry.cover_letter for entry in store.search("1", "fastapi")] == [
+            "Письмо разработчика"
+        ]
+        assert [entry.company for entry in store.search("1", "прототип")] == ["Банк"]
+        assert store.search("1", "kubernetes разработ") != []
+        assert store.search("1", "fastapi figma") == []
+        assert store.search("1", "\"'*") == []
+
+    def test_find_similar(self, store, sample_job_description):
+        """Test exact repeats and re-posted vacancies with small edits."""
+        entry_id = store.save("1", sample_job_description, make_result("Письмо"))
+        store.save("1", OTHER_VACANCY, make_result("Другое письмо"))
+        reposted = sample_job_description.replace("Медицинская страховка", "ДМС и спортзал")
+
+        exact = store.find_similar("1", sample_job_description.upper())
+        near = store.find_similar("1", reposted)
+
+        assert exact.id == entry_id and exact.similarity == 1.0
+        assert near.id == entry_id and 0.8 <= near.similarity < 1.0
+        assert store.find_similar("2", sample_job_description) is None
+        assert store.find_similar("1", "Python разработчик") is None
+        assert store.registry.counter("history.match_hits") == 2
+
+    def test_prune_removes_from_index(self, tmp_path, sample_job_description):
+        """Test that letters beyond max_entries are dropped from the table and the index."""
+        store = HistoryStore(tmp_path / "history.db", max_entries=2, registry=MetricsRegistry())
+        for index in range(4):
+            store.save("1", f"{sample_job_description}\nВакансия {index}", make_result(f"v{index}"))
+
+        assert [entry.cover_letter for entry in store.recent("1")] == ["v3", "v2"]
+        assert len(store.search("1", "techstart")) == 2
+        assert store.size_report()["entries"] == 2
+        store.close()
+        with sqlite3.connect(tmp_path / "history.db") as conn:
+            assert conn.execute("SELECT COUNT(*) FROM letters_fts_docsize").fetchone()[0] == 2
+
+    def test_benchmark(self, tmp_path):
+        """Test that the benchmark finds every re-posted vacancy."""
+        report = benchmark_history(tmp_path / "bench.db", rows=300, users=10, queries=10)
+
+        assert report["entries"] == 300
+        assert report["matched"] == report["queries"] == 10
+        assert report["db_bytes"] > report["index_bytes"] > 0
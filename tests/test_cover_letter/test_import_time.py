@@ -0,0 +1,63 @@
+"""
+Import-time regression checks (python -X importtime).
+"""
+
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+# Cumulative import time budget for the package itself, in microseconds.
+# Loading the package must not pull in openai or pydantic.
+IMPORT_TIME_BUDGET_US = 50_000
+HEAVY_MODULES = ("openai", "pydantic")
+
+
+def import_times(statement: str) -> dict:
+    """Run a statement with -X importtime and return cumulative times per module."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line.split("|")
+        times[module.strip()] = int(cumulative)
+    return times
+
+
+class TestImportTime:
+    """Test that light imports stay light."""
+
+    @pytest.mark.parametrize(
+        "module",
+        ["cover_letter", "cover_letter.metrics", "cover_letter.monitoring", "cover_letter.clients"],
+    )
+    def test_light_modules_skip_heavy_dependencies(self, module):
+        """Test that light modules import without openai or pydantic."""
+        times = import_times(f"import {module}")
+
+        assert not [name for name in times if name.split(".")[0] in HEAVY_MODULES]
+
+    def test_package_import_budget(self):
+        """Test the package import time budget."""
+        times = import_times("import cover_letter")
+
+        assert times["cover_letter"] < IMPORT_TIME_BUDGET_US
+
+    def test_lazy_exports_resolve(self):
+        """Test that lazy public names still import."""
+        import cover_letter
+
+        assert cover_letter.CoverLetterGenerator.__name__ == "CoverLetterGenerator"
+        assert "CoverLetterResult" in dir(cover_letter)
+        with pytest.raises(AttributeError):
+            _ = cover_letter.Missing
@@ -2,8 +2,11 @@
 Integration tests for complete cover letter generation pipeline.
 """
 
+import asyncio
+
 import pytest
 from cover_letter import CoverLetterGenerator, CoverLetterResult
+from cover_letter.metrics import metrics
 
 
 class TestIntegration:
@@ -240,3 +243,124 @@ Best regards"""
         # Quality score should be reasonable
         assert 0.0 <= result.quality_score <= 1.0
         assert isinstance(result.quality_score, float)
+
+    @pytest.mark.asyncio
+    async def test_multi_candidate_generation(
+        self, mock_openai_client, mock_response_builder, simple_resume, simple_job_description
+    ):
+        """Test that several variants come from one call and are ranked locally."""
+        from unittest.mock import Mock
+
+        weak_letter = " ".join(["Текст"] * 160)
+        strong_letter = "Python и Django. " + " ".join(["Опыт"] * 160)
+
+        letters_response = Mock()
+        letters_response.choices = [Mock(), Mock()]
+        letters_response.choices[0].message = Mock(content=weak_letter)
+        letters_response.choices[1].message = Mock(content=strong_letter)
+
+        mock_openai_client.chat.completions.create.side_effect = [
+            mock_response_builder.create_response("Python, Django"),
+            letters_response,
+        ]
+
+        generator = CoverLetterGenerator(mock_openai_client)
+        result = await generator.generate(simple_resume, simple_job_description, candidates=2)
+
+        assert mock_openai_client.chat.completions.create.call_count == 2
+        assert mock_openai_client.chat.completions.create.call_args.kwargs["n"] == 2
+        assert result.cover_letter == strong_letter
+        assert result.keywords_found == 2
+        assert [alt.cover_letter for alt in result.alternatives] == [weak_letter]
+        assert result.alternatives[0].quality_score < result.quality_score
+        assert result.metadata["candidates_scored"] == 2
+
+    @pytest.mark.asyncio
+    async def test_timing_breakdown(
+        self, mock_openai_client, mock_response_builder, sample_resume, sample_job_description
+    ):
+        """Test that stages are timed in order and the prompt split is reported."""
+        mock_openai_client.chat.completions.create.side_effect = [
+            mock_response_builder.create_response("Python, Django, FastAPI"),
+            mock_response_builder.create_cover_letter_response(),
+        ]
+
+        generator = CoverLetterGenerator(mock_openai_client)
+        result = await generator.generate(
+            sample_resume, sample_job_description, custom_system_prompt="Пиши до 250 слов."
+        )
+
+        timing = result.metadata["timing"]
+        stages = [stage["stage"] for stage in timing["stages"]]
+        assert stages == [
+            "keywords",
+            "company",
+            "resume_selection",
+            "prompt_build",
+            "cover_letter",
+            "scoring",
+        ]
+        # Offsets are rounded to 0.1 ms, so allow for rounding at the last stage
+        assert all(
+            stage["start"] + stage["duration"] <= timing["total"] + 1e-3
+            for stage in timing["stages"]
+        )
+        api_stages = [stage["stage"] for stage in timing["stages"] if stage.get("api")]
+        assert api_stages == ["keywords", "cover_letter"]
+        shares = timing["prompt_tokens"]
+        assert shares["resume"] > shares["system"] > 0
+        assert shares["vacancy"] > 0
+
+    @pytest.mark.asyncio
+    async def test_cancellation_aborts_call_without_fallback(
+        self, mock_openai_client, mock_response_builder, sample_resume, sample_job_description
+    ):
+        """Test that cancelling generate() aborts the API call instead of falling back."""
+        letter_started = asyncio.Event()
+
+        async def create(**kwargs):
+            if kwargs["messages"][0]["role"] != "system":
+                return mock_response_builder.create_response("Python, Django")
+            letter_started.set()
+            await asyncio.sleep(10)
+
+        mock_openai_client.chat.completions.create.side_effect = create
+        generator = CoverLetterGenerator(mock_openai_client)
+        calls_before = metrics.counter("generator.cancelled.cover_letter")
+        saved_before = metrics.counter("generator.cancelled.saved_completion_tokens")
+
+        task = asyncio.create_task(generator.generate(sample_resume, sample_job_description))
+        await letter_started.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        # No fallback call was made after the cancelled letter call
+        assert mock_openai_client.chat.completions.create.call_count == 2
+        assert metrics.counter("generator.cancelled.cover_letter") == calls_before + 1
+        assert metrics.counter("generator.cancelled.saved_completion_tokens") > saved_before
+
+    @pytest.mark.asyncio
+    async def test_cancellation_while_opening_stream(
+        self, mock_openai_client, mock_response_builder, sample_resume, sample_job_description
+    ):
+        """Test that a streamed call cancelled before the stream opens is still recorded."""
+        letter_started = asyncio.Event()
+
+        async def create(**kwargs):
+            if not kwargs.get("stream"):
+                return mock_response_builder.create_response("Python, Django")
+            letter_started.set()
+            await asyncio.sleep(10)
+
+        mock_openai_client.chat.completions.create.side_effect = create
+        generator = CoverLetterGenerator(mock_openai_client, stream=True)
+        calls_before = metrics.counter("generator.cancelled.cover_letter")
+
+        task = asyncio.create_task(generator.generate(sample_resume, sample_job_description))
+        await letter_started.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        assert metrics.counter("generator.cancelled.cover_letter") == calls_before + 1
@@ -0,0 +1,260 @@
+"""
+Tests for the persistent background job queue.
+"""
+
+import asyncio
+import time
+from unittest.mock import AsyncMock
+
+import pytest
+
+from cover_letter.jobs import (
+    JOB_CANCELLED,
+    JOB_DONE,
+    JOB_FAILED,
+    JOB_PENDING,
+    JOB_RUNNING,
+    JobQueue,
+    JobStore,
+)
+from cover_letter.metrics import MetricsRegistry
+
+
+@pytest.fixture
+def job_store(tmp_path):
+    """Job store in a temporary database."""
+    store = JobStore(tmp_path / "jobs.db")
+    yield store
+    store.close()
+
+
+class TestJobStore:
+    """Test JobStore persistence."""
+
+    def test_add_and_claim(self, job_store):
+        """Test that a job is stored pending and claimed once."""
+        job_id = job_store.add("letter", "42", {"text": "Вакансия"})
+
+        job = job_store.mark_running(job_id)
+
+        assert job is not None
+        assert job.status == JOB_RUNNING
+        assert job.attempts == 1
+        assert job.payload == {"text": "Вакансия"}
+        assert job_store.mark_running(job_id) is None
+
+    def test_interrupted_jobs_survive_restart(self, tmp_path):
+        """Test that running jobs are pending again after reopening the store."""
+        store = JobStore(tmp_path / "jobs.db")
+        job_id = store.add("letter", "42", {})
+        store.mark_running(job_id)
+        store.close()
+
+        reopened = JobStore(tmp_path / "jobs.db")
+        try:
+            assert reopened.requeue_interrupted() == 1
+            assert reopened.pending_ids() == [job_id]
+        finally:
+            reopened.close()
+
+    def test_purge_keeps_recent_and_unfinished_jobs(self, job_store):
+        """Test that only finished jobs older than the cutoff are deleted."""
+        done = job_store.add("letter", "1", {"resume": "Резюме"})
+        job_store.finish(done, JOB_DONE, "Письмо")
+        failed = job_store.add("letter", "1", {})
+        job_store.finish(failed, JOB_FAILED, None, "error")
+        pending = job_store.add("letter", "1", {})
+
+        assert job_store.purge(time.time() - 3600) == 0
+        assert job_store.purge(time.time() + 1) == 2
+        assert job_store.get(done) is None and job_store.get(failed) is None
+        assert job_store.get(pending).status == JOB_PENDING
+
+
+class TestJobQueue:
+    """Test JobQueue workers."""
+
+    @pytest.mark.asyncio
+    async def test_enqueue_runs_handler(self, job_store):
+        """Test that enqueued jobs are processed and results stored."""
+
+        async def handler(job):
+            return job.payload["text"].upper()
+
+        queue = JobQueue(job_store, {"letter": handler}, workers=2, registry=MetricsRegistry())
+        await queue.start()
+        job_ids = [await queue.enqueue("letter", "1", {"text": f"job {i}"}) for i in range(5)]
+        await queue._queue.join()
+        await queue.stop()
+
+        for index, job_id in enumerate(job_ids):
+            job = job_store.get(job_id)
+            assert job.status == JOB_DONE
+            assert job.result == f"JOB {index}"
+
+    @pytest.mark.asyncio
+    async def test_retry_then_fail(self, job_store):
+        """Test retries with backoff and the failure callback."""
+        failures = []
+
+        async def handler(job):
+            raise RuntimeError("send failed")
+
+        async def on_failure(job, error):
+            failures.append((job.id, str(error)))
+
+        queue = JobQueue(
+            job_store,
+            {"letter": handler},
+            max_attempts=2,
+            retry_base_delay=0.01,
+            on_failure=on_failure,
+            registry=MetricsRegistry(),
+        )
+        await queue.start()
+        job_id = await queue.enqueue("letter", "1", {})
+        for _ in range(100):
+            if failures:
+                break
+            await asyncio.sleep(0.01)
+        await queue.stop()
+
+        job = job_store.get(job_id)
+        assert job.status == JOB_FAILED
+        assert job.attempts == 2
+        assert failures == [(job_id, "send failed")]
+
+    @pytest.mark.asyncio
+    async def test_retry_keeps_saved_result(self, job_store):
+        """Test that a retry after a failed send reuses the saved result."""
+        generated = []
+        sends = []
+        queue = None
+
+        async def handler(job):
+            if job.result is None:
+                generated.append(job.id)
+                await queue.save_result(job, "Письмо")
+            sends.append(job.result)
+            if len(sends) == 1:
+                raise RuntimeError("send failed")
+            return job.result
+
+        queue = JobQueue(
+            job_store, {"letter": handler}, retry_base_delay=0.01, registry=MetricsRegistry()
+        )
+        await queue.start()
+        job_id = await queue.enqueue("letter", "1", {})
+        for _ in range(100):
+            if len(sends) == 2:
+                break
+            await asyncio.sleep(0.01)
+        await queue._queue.join()
+        await queue.stop()
+
+        job = job_store.get(job_id)
+        assert generated == [job_id]
+        assert sends == ["Письмо", "Письмо"]
+        assert job.status == JOB_DONE and job.attempts == 2
+        assert job.result == "Письмо"
+
+    @pytest.mark.asyncio
+    async def test_start_purges_expired_jobs(self, job_store):
+        """Test that finished jobs past the retention are deleted on start."""
+        job_id = job_store.add("letter", "1", {"resume": "Резюме"})
+        job_store.finish(job_id, JOB_CANCELLED)
+        registry = MetricsRegistry()
+
+        queue = JobQueue(job_store, {"letter": AsyncMock()}, retention=-1, registry=registry)
+        await queue.start()
+        await queue.stop()
+
+        assert job_store.get(job_id) is None
+        assert registry.counter("jobs.purged") == 1
+
+    @pytest.mark.asyncio
+    async def test_shutdown_drains_and_resumes(self, job_store):
+        """Test graceful drain of running jobs and resume of pending ones."""
+        started = asyncio.Event()
+        processed = []
+
+        async def slow_handler(job):
+            started.set()
+            await asyncio.sleep(0.05)
+            processed.append(job.id)
+            return "ok"
+
+        queue = JobQueue(job_store, {"letter": slow_handler}, workers=1, registry=MetricsRegistry())
+        await queue.start()
+        first = await queue.enqueue("letter", "1", {})
+        second = await queue.enqueue("letter", "1", {})
+        await started.wait()
+        await queue.stop()
+
+        # In-flight job finished, queued job waits for the next process
+        assert processed == [first]
+        assert job_store.get(second).status == JOB_PENDING
+
+        restarted = JobQueue(
+            job_store, {"letter": slow_handler}, workers=1, registry=MetricsRegistry()
+        )
+        await restarted.start()
+        await restarted._queue.join()
+        await restarted.stop()
+
+        assert processed == [first, second]
+
+    @pytest.mark.asyncio
+    async def test_drain_timeout_leaves_job_for_next_start(self, job_store):
+        """Test that a job cancelled at shutdown is resumed later."""
+
+        async def stuck_handler(job):
+            await asyncio.sleep(10)
+
+        queue = JobQueue(job_store, {"letter": stuck_handler}, registry=MetricsRegistry())
+        await queue.start()
+        job_id = await queue.enqueue("letter", "1", {})
+        await asyncio.sleep(0.02)
+        await queue.stop(timeout=0.01)
+
+        assert job_store.get(job_id).status == JOB_RUNNING
+        assert job_store.requeue_interrupted() == 1
+
+    @pytest.mark.asyncio
+    async def test_cancel_running_and_pending_jobs(self, job_store):
+        """Test that cancel stops a running handler, skips a queued job and keeps the worker."""
+        started = asyncio.Event()
+        interrupted = []
+        processed = []
+
+        async def handler(job):
+            if job.payload.get("slow"):
+                started.set()
+                try:
+                    await asyncio.sleep(10)
+                except asyncio.CancelledError:
+                    interrupted.append(job.id)
+                    raise
+            processed.append(job.id)
+            return "ok"
+
+        registry = MetricsRegistry()
+        queue = JobQueue(job_store, {"letter": handler}, workers=1, registry=registry)
+        await queue.start()
+        running = await queue.enqueue("letter", "1", {"slow": True})
+        queued = await queue.enqueue("letter", "1", {})
+        last = await queue.enqueue("letter", "1", {})
+        await started.wait()
+
+        assert await queue.cancel(queued)
+        assert await queue.cancel(running)
+        await queue._queue.join()
+        await queue.stop()
+
+        assert interrupted == [running]
+        assert processed == [last]
+        assert job_store.get(running).status == JOB_CANCELLED
+        assert job_store.get(queued).status == JOB_CANCELLED
+        assert job_store.get(queued).attempts == 0
+        assert not await queue.cancel(last)
+        assert registry.counter("jobs.cancelled") == 2
@@ -0,0 +1,59 @@
+"""
+Tests for the in-process metrics registry.
+"""
+
+from cover_letter.metrics import MetricsRegistry
+
+
+class TestMetricsRegistry:
+    """Test MetricsRegistry."""
+
+    def test_counters_and_gauges(self):
+        """Test counter accumulation and gauge overwrite."""
+        registry = MetricsRegistry()
+        registry.increment("requests")
+        registry.increment("requests", 2)
+        registry.set_gauge("queue_depth", 5)
+        registry.set_gauge("queue_depth", 3)
+
+        assert registry.counter("requests") == 3
+        assert registry.gauge("queue_depth") == 3
+        assert registry.counter("missing") == 0
+
+    def test_summary_percentiles(self):
+        """Test summary statistics over observed samples."""
+        registry = MetricsRegistry()
+        for value in range(1, 101):
+            registry.observe("latency", float(value))
+
+        summary = registry.summary("latency")
+
+        assert summary["count"] == 100
+        assert summary["mean"] == 50.5
+        assert summary["p50"] == 51.0
+        assert summary["p99"] == 100.0
+        assert summary["max"] == 100.0
+
+    def test_sample_window_is_bounded(self):
+        """Test that only recent samples are kept for percentiles."""
+        registry = MetricsRegistry(max_samples=10)
+        for value in range(100):
+            registry.observe("lag", float(value))
+
+        summary = registry.summary("lag")
+
+        assert summary["count"] == 100
+        assert summary["p50"] >= 90.0
+
+    def test_snapshot_and_reset(self):
+        """Test snapshot structure and reset."""
+        registry = MetricsRegistry()
+        registry.increment("a")
+        registry.observe("b", 1.0)
+
+        snapshot = registry.snapshot()
+        assert snapshot["counters"] == {"a": 1.0}
+        assert snapshot["summaries"]["b"]["count"] == 1
+
+        registry.reset()
+        assert registry.snapshot() == {"counters": {}, "gauges": {}, "summaries": {}}
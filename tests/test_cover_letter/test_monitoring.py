@@ -0,0 +1,57 @@
+"""
+Tests for event loop lag and blocking call monitoring.
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from cover_letter.metrics import MetricsRegistry
+from cover_letter.monitoring import EventLoopMonitor
+
+
+def blocking_handler():
+    """Simulate synchronous I/O inside a handler."""
+    time.sleep(0.3)
+
+
+class TestEventLoopMonitor:
+    """Test EventLoopMonitor."""
+
+    @pytest.mark.asyncio
+    async def test_samples_loop_lag(self):
+        """Test that lag samples are recorded while the loop is idle."""
+        registry = MetricsRegistry()
+        monitor = EventLoopMonitor(sample_interval=0.01, registry=registry)
+        monitor.start()
+        try:
+            await asyncio.sleep(0.1)
+        finally:
+            monitor.stop()
+
+        assert registry.summary("event_loop.lag_seconds")["count"] > 0
+        assert registry.counter("event_loop.slow_callbacks") == 0
+        assert not monitor.running
+
+    @pytest.mark.asyncio
+    async def test_detects_blocking_call(self):
+        """Test that a blocking call is reported with its location and stack."""
+        registry = MetricsRegistry()
+        monitor = EventLoopMonitor(
+            sample_interval=0.01, slow_callback_threshold=0.1, registry=registry
+        )
+        monitor.start()
+        try:
+            await asyncio.sleep(0.02)
+            blocking_handler()
+            await asyncio.sleep(0.02)
+        finally:
+            monitor.stop()
+
+        assert registry.counter("event_loop.slow_callbacks") == 1
+        assert registry.summary("event_loop.lag_seconds")["max"] >= 0.1
+
+        report = monitor.slow_callbacks[-1]
+        assert "blocking_handler" in report["location"]
+        assert "time.sleep" in report["stack"]
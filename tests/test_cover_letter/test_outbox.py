@@ -0,0 +1,223 @@
+"""
+Tests for the paced outbound Telegram message queue.
+"""
+
+import asyncio
+import time
+
+import pytest
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+from cover_letter.metrics import MetricsRegistry
+from cover_letter.outbox import Outbox, TokenBucket, split_message, telegram_length
+
+
+class FakeTelegram:
+    """Records sent messages; optionally fails the first sends."""
+
+    def __init__(self, failures=()):
+        self.sent = []
+        self.failures = list(failures)
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if self.failures:
+            raise self.failures.pop(0)
+        self.sent.append((chat_id, text, time.monotonic()))
+        return len(self.sent)
+
+
+def flood_error(chat_id: int, retry_after: int) -> TelegramRetryAfter:
+    """429 Too Many Requests as raised by aiogram."""
+    method = SendMessage(chat_id=chat_id, text="...")
+    return TelegramRetryAfter(method=method, message="Too Many Requests", retry_after=retry_after)
+
+
+class TestSplitMessage:
+    """Test splitting of texts over the Telegram limit."""
+
+    def test_short_text_is_kept(self):
+        """Test that a text within the limit is one message."""
+        assert split_message("Добрый день!\n\nС уважением", limit=100) == [
+            "Добрый день!\n\nС уважением"
+        ]
+
+    def test_splits_at_paragraphs(self):
+        """Test that paragraphs are packed whole into each message."""
+        paragraphs = [f"Абзац {index}. " + "слово " * 30 for index in range(10)]
+        text = "\n\n".join(paragraphs)
+
+        parts = split_message(text, limit=500)
+
+        assert len(parts) > 1
+        assert all(telegram_length(part) <= 500 for part in parts)
+        assert "\n\n".join(parts) == text
+
+    def test_long_paragraph_splits_at_words(self):
+        """Test that a paragraph over the limit is split between words."""
+        text = "Вступление\n\n" + " ".join(f"слово{index}" for index in range(200))
+
+        parts = split_message(text, limit=300)
+
+        assert parts[0] == "Вступление"
+        assert all(telegram_length(part) <= 300 for part in parts)
+        assert " ".join(parts[1:]).split() == text.split()[1:]
+
+    def test_hard_split_counts_utf16(self):
+        """Test that unbreakable text is cut by UTF-16 length, keeping emoji whole."""
+        text = "📄" * 30
+
+        parts = split_message(text, limit=16)
+
+        assert [telegram_length(part) for part in parts] == [16, 16, 16, 12]
+        assert "".join(parts) == text
+
+
+class TestTokenBucket:
+    """Test the rate limiter."""
+
+    @pytest.mark.asyncio
+    async def test_paces_after_burst(self):
+        """Test that events beyond the burst wait for new tokens."""
+        bucket = TokenBucket(rate=50, burst=2)
+        started = time.monotonic()
+
+        for _ in range(4):
+            await bucket.acquire()
+
+        assert time.monotonic() - started >= 0.035
+
+
+class TestOutbox:
+    """Test ordering, pacing and flood-control handling."""
+
+    @pytest.mark.asyncio
+    async def test_per_chat_pacing_and_order(self):
+        """Test that a chat's messages are spaced and ordered, other chats are not held up."""
+        telegram = FakeTelegram()
+        outbox = Outbox(
+            telegram.send_message, chat_rate=20, chat_burst=1, registry=MetricsRegistry()
+        )
+
+        await asyncio.gather(
+            *(outbox.send(1, f"first chat {index}") for index in range(3)),
+            outbox.send(2, "second chat"),
+        )
+
+        first_chat = [(text, at) for chat_id, text, at in telegram.sent if chat_id == 1]
+        assert [text for text, _ in first_chat] == [f"first chat {index}" for index in range(3)]
+        gaps = [later - earlier for (_, earlier), (_, later) in zip(first_chat, first_chat[1:])]
+        assert min(gaps) >= 0.04
+        second_at = next(at for chat_id, _, at in telegram.sent if chat_id == 2)
+        assert second_at < first_chat[1][1]
+        await outbox.close()
+
+    @pytest.mark.asyncio
+    async def test_group_rate(self):
+        """Test that group chats get the slower group rate."""
+        telegram = FakeTelegram()
+        outbox = Outbox(
+            telegram.send_message,
+            chat_rate=1000,
+            group_rate=20,
+            chat_burst=1,
+            registry=MetricsRegistry(),
+        )
+
+        started = time.monotonic()
+        await asyncio.gather(outbox.send(-100, "a"), outbox.send(-100, "b"))
+
+        assert time.monotonic() - started >= 0.04
+        await outbox.close()
+
+    @pytest.mark.asyncio
+    async def test_global_rate(self):
+        """Test that sends across chats share the global rate."""
+        telegram = FakeTelegram()
+        outbox = Outbox(
+            telegram.send_message, global_rate=50, chat_rate=1000, registry=MetricsRegistry()
+        )
+
+        started = time.monotonic()
+        await asyncio.gather(*(outbox.send(chat_id, "hi") for chat_id in range(60)))
+
+        assert len(telegram.sent) == 60
+        # 50 from the initial burst, 10 more at 50 per second
+        assert time.monotonic() - started >= 0.18
+        await outbox.close()
+
+    @pytest.mark.asyncio
+    async def test_retry_after(self, monkeypatch):
+        """Test that a 429 pauses the chat for retry_after and the message is resent."""
+        registry = MetricsRegistry()
+        telegram = FakeTelegram(failures=[flood_error(1, retry_after=1)])
+        outbox = Outbox(telegram.send_message, registry=registry)
+        pauses = []
+        original_pause = TokenBucket.pause
+
+        def short_pause(bucket, seconds):
+            pauses.append(seconds)
+            original_pause(bucket, seconds / 20)
+
+        monkeypatch.setattr(TokenBucket, "pause", short_pause)
+
+        started = time.monotonic()
+        results = await outbox.send(1, "Письмо")
+
+        assert results == [1]
+        assert [text for _, text, _ in telegram.sent] == ["Письмо"]
+        assert pauses == [1.0]
+        assert time.monotonic() - started >= 0.05
+        assert registry.counter("outbox.retry_after") == 1
+        assert registry.summary("outbox.latency_seconds")["count"] == 1
+        await outbox.close()
+
+    @pytest.mark.asyncio
+    async def test_other_errors_fail(self):
+        """Test that errors without retry_after reach the caller and later messages still go out."""
+        registry = MetricsRegistry()
+        error = TelegramBadRequest(method=SendMessage(chat_id=1, text=""), message="Bad Request")
+        telegram = FakeTelegram(failures=[error])
+        outbox = Outbox(telegram.send_message, registry=registry)
+
+        with pytest.raises(TelegramBadRequest):
+            await outbox.send(1, "first")
+        await outbox.send(1, "second")
+
+        assert [text for _, text, _ in telegram.sent] == ["second"]
+        assert registry.counter("outbox.failed") == 1
+        await outbox.close()
+
+    @pytest.mark.asyncio
+    async def test_long_letter_is_split(self):
+        """Test that a letter over the limit is sent as several ordered messages."""
+        registry = MetricsRegistry()
+        telegram = FakeTelegram()
+        outbox = Outbox(telegram.send_message, chat_rate=1000, message_limit=100, registry=registry)
+        text = "\n\n".join(f"Абзац номер {index}, " + "текст " * 8 for index in range(6))
+
+        results = await outbox.send(1, text)
+
+        assert len(results) == len(telegram.sent) > 1
+        assert "\n\n".join(sent for _, sent, _ in telegram.sent) == text
+        assert registry.counter("outbox.split_messages") == 1
+        await outbox.close()
+
+    @pytest.mark.asyncio
+    async def test_submit_and_close(self):
+        """Test other API calls in the chat queue and draining on close."""
+        telegram = FakeTelegram()
+        outbox = Outbox(
+            telegram.send_message, chat_rate=20, chat_burst=1, registry=MetricsRegistry()
+        )
+
+        async def send_document():
+            return "document"
+
+        assert await outbox.submit(1, send_document) == "document"
+        pending = asyncio.create_task(outbox.send(1, "after the document"))
+        await asyncio.sleep(0)
+        await outbox.close()
+
+        assert pending.done() and pending.result() == [1]
+        assert outbox.pending == 0
@@ -0,0 +1,130 @@
+"""
+Tests for speculative job analysis started before generation is requested.
+"""
+
+import asyncio
+
+import pytest
+
+from cover_letter import CoverLetterGenerator
+
+
+@pytest.fixture
+def routed_client(mock_openai_client, mock_response_builder):
+    """Mock client answering keyword and letter calls, with a slow keyword call."""
+    calls = {"keywords": 0, "letter": 0}
+
+    async def create(**kwargs):
+        if kwargs["messages"][0]["role"] == "system":
+            calls["letter"] += 1
+            return mock_response_builder.create_cover_letter_response()
+        calls["keywords"] += 1
+        await asyncio.sleep(0.05)
+        return mock_response_builder.create_response("Python, Django, FastAPI")
+
+    mock_openai_client.chat.completions.create.side_effect = create
+    mock_openai_client.calls = calls
+    return mock_openai_client
+
+
+class TestPreparedAnalysis:
+    """Test speculative analysis hand-off to generate()."""
+
+    @pytest.mark.asyncio
+    async def test_generate_uses_finished_analysis(
+        self, routed_client, sample_resume, sample_job_description
+    ):
+        """Test that a finished analysis is reused without a second keyword call."""
+        generator = CoverLetterGenerator(routed_client)
+        await generator.prepare_analysis(sample_job_description)
+
+        result = await generator.generate(sample_resume, sample_job_description)
+
+        assert routed_client.calls["keywords"] == 1
+        assert "analysis" in result.metadata["usage"]["reused"]
+        stage = result.metadata["timing"]["stages"][0]
+        assert stage["stage"] == "analysis"
+        assert stage["prepared"] is True
+        assert stage["waited"] is False
+
+    @pytest.mark.asyncio
+    async def test_generate_waits_for_running_analysis(
+        self, routed_client, sample_resume, sample_job_description
+    ):
+        """Test that generate() joins an analysis still in flight."""
+        generator = CoverLetterGenerator(routed_client)
+        generator.prepare_analysis(sample_job_description)
+        await asyncio.sleep(0)
+
+        result = await generator.generate(sample_resume, sample_job_description)
+
+        assert routed_client.calls["keywords"] == 1
+        assert result.metadata["timing"]["stages"][0]["waited"] is True
+        assert result.metadata["total_keywords"] == 3
+
+    @pytest.mark.asyncio
+    async def test_discarded_analysis_is_cancelled(
+        self, routed_client, sample_resume, sample_job_description
+    ):
+        """Test that an abandoned flow cancels its analysis."""
+        generator = CoverLetterGenerator(routed_client)
+        task = generator.prepare_analysis(sample_job_description)
+        await asyncio.sleep(0)
+
+        assert generator.discard_analysis(sample_job_description)
+        await asyncio.sleep(0)
+        assert task.cancelled()
+        assert not generator.discard_analysis(sample_job_description)
+
+        result = await generator.generate(sample_resume, sample_job_description)
+
+        assert "analysis" not in result.metadata["usage"]["reused"]
+        assert routed_client.calls["keywords"] == 2
+
+    @pytest.mark.asyncio
+    async def test_prepare_is_idempotent(self, routed_client, sample_job_description):
+        """Test that preparing the same vacancy twice starts one analysis."""
+        generator = CoverLetterGenerator(routed_client)
+
+        first = generator.prepare_analysis(sample_job_description)
+        second = generator.prepare_analysis(sample_job_description)
+        await first
+
+        assert first is second
+        assert routed_client.calls["keywords"] == 1
+
+    @pytest.mark.asyncio
+    async def test_discard_keeps_analysis_held_by_another_flow(
+        self, routed_client, sample_resume, sample_job_description
+    ):
+        """Test that one user abandoning a shared vacancy does not cancel another's analysis."""
+        generator = CoverLetterGenerator(routed_client)
+        task = generator.prepare_analysis(sample_job_description)
+        generator.prepare_analysis(sample_job_description)
+        await asyncio.sleep(0)
+
+        assert generator.discard_analysis(sample_job_description)
+        result = await generator.generate(sample_resume, sample_job_description)
+
+        assert not task.cancelled()
+        assert "analysis" in result.metadata["usage"]["reused"]
+        assert routed_client.calls["keywords"] == 1
+        assert not generator.discard_analysis(sample_job_description)
+
+    @pytest.mark.asyncio
+    async def test_eviction_skips_running_analyses(
+        self, monkeypatch, routed_client, sample_job_description
+    ):
+        """Test that the size limit evicts finished analyses but never running ones."""
+        monkeypatch.setattr("cover_letter.generator.PREPARED_ANALYSIS_MAX_ENTRIES", 1)
+        generator = CoverLetterGenerator(routed_client)
+
+        finished = generator.prepare_analysis("Вакансия 1")
+        await finished
+        running = generator.prepare_analysis("Вакансия 2")
+        generator.prepare_analysis(sample_job_description)
+        await asyncio.sleep(0)
+
+        assert not generator.discard_analysis("Вакансия 1")
+        assert not running.cancelled()
+        assert generator.discard_analysis("Вакансия 2")
@@ -0,0 +1,127 @@
+"""
+Tests for on-demand request profiling.
+"""
+
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+from openai import AsyncOpenAI
+
+import debug_server
+from cover_letter import CoverLetterGenerator
+from cover_letter.metrics import MetricsRegistry
+from cover_letter.profiling import RequestProfiler, SamplingProfiler
+from cover_letter.standin import create_standin_app
+
+
+def busy_work(seconds: float) -> None:
+    """Burn CPU in a recognizable frame."""
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        json.dumps({"numbers": list(range(50))})
+
+
+class TestSamplingProfiler:
+    """Test stack sampling and the folded output."""
+
+    @pytest.mark.asyncio
+    async def test_samples_busy_code(self):
+        """Test that CPU time lands in the busy frame and waiting is idle."""
+        profiler = SamplingProfiler(interval=0.002)
+        profiler.start()
+        await asyncio.sleep(0.05)
+        busy_work(0.1)
+        profiler.stop()
+
+        assert profiler.samples > 0
+        assert profiler.idle_samples > 0
+        heaviest = profiler.folded().splitlines()[0]
+        stack, count = heaviest.rsplit(" ", 1)
+        assert "busy_work (test_profiling.py:" in stack
+        assert int(count) > 0
+        # Event loop internals below the running callback are trimmed
+        assert "run_forever" not in profiler.folded()
+
+
+class TestRequestProfiler:
+    """Test profile files and the one-at-a-time limit."""
+
+    def test_saves_folded_file(self, tmp_path):
+        """Test that a profile is written and found by name."""
+        profiler = RequestProfiler(tmp_path, registry=MetricsRegistry())
+
+        with profiler.profile("/generate") as active:
+            busy_work(0.05)
+
+        assert active.path is not None
+        assert active.path.name.endswith("-generate.folded")
+        assert "busy_work" in active.path.read_text()
+        assert profiler.path(active.path.name) == active.path
+        assert profiler.path("../secrets.folded") is None
+
+    def test_one_profile_at_a_time(self, tmp_path):
+        """Test that a nested request is not profiled while another one is."""
+        registry = MetricsRegistry()
+        profiler = RequestProfiler(tmp_path, registry=registry)
+
+        with profiler.profile("outer") as outer:
+            with profiler.profile("inner") as inner:
+                assert inner is None
+
+        assert outer.path is not None
+        assert registry.counter("profiler.skipped") == 1
+
+    def test_old_profiles_are_pruned(self, tmp_path):
+        """Test that only the newest max_files profiles are kept."""
+        profiler = RequestProfiler(tmp_path, max_files=2, registry=MetricsRegistry())
+
+        for index in range(4):
+            with profiler.profile(f"request-{index}"):
+                pass
+
+        assert len(list(tmp_path.glob("*.folded"))) == 2
+
+    def test_sample_rate(self, tmp_path):
+        """Test that the sample rate selects requests."""
+        assert not RequestProfiler(tmp_path).sampled()
+        assert RequestProfiler(tmp_path, sample_rate=1.0).sampled()
+
+
+class TestProfiledEndpoint:
+    """Test profile=1 on the debug server."""
+
+    @pytest.mark.asyncio
+    async def test_profile_flag(self, monkeypatch, tmp_path, sample_resume, sample_job_description):
+        """Test that a profiled request links a downloadable profile."""
+        transport = httpx.ASGITransport(app=create_standin_app(latency=0))
+        openai_client = AsyncOpenAI(
+            api_key="test",
+            base_url="http://standin/v1",
+            http_client=httpx.AsyncClient(transport=transport),
+        )
+        generator = CoverLetterGenerator(openai_client)
+        monkeypatch.setattr(debug_server, "get_generator", lambda: generator)
+        monkeypatch.setattr(
+            debug_server, "request_profiler", RequestProfiler(tmp_path, interval=0.001)
+        )
+        body = {"resume": sample_resume, "job_description": sample_job_description}
+
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=debug_server.app), base_url="http://test"
+        ) as client:
+            plain = await client.post("/generate", json=body)
+            profiled = await client.post("/generate?profile=1", json=body)
+            profile = await client.get(profiled.headers["X-Profile"])
+            missing = await client.get("/profiles/unknown.folded")
+
+        assert plain.status_code == 200
+        assert "X-Profile" not in plain.headers
+        assert profiled.status_code == 200
+        assert profiled.json()["cover_letter"].startswith("Добрый день!")
+        assert profile.status_code == 200
+        assert profile.headers["content-type"].startswith("text/plain")
+        assert missing.status_code == 404
+        await openai_client.close()
@@ -0,0 +1,247 @@
+"""
+Tests for LLM providers and the latency-aware router.
+"""
+
+import json
+
+import httpx
+import pytest
+from openai import BadRequestError
+
+from cover_letter import CoverLetterGenerator
+from cover_letter.clients import OPENAI_TIMEOUT
+from cover_letter.metrics import MetricsRegistry
+from cover_letter.providers import (
+    ROUTER_FAILURE_THRESHOLD,
+    Provider,
+    ProviderError,
+    ProviderRouter,
+    llm_stage,
+    load_providers,
+    mock_provider,
+    openai_provider,
+)
+from cover_letter.standin import STANDIN_LETTER
+
+KEYWORD_REQUEST = {
+    "model": "gpt-4o-mini",
+    "messages": [{"role": "user", "content": "Извлеки ключевые слова из вакансии"}],
+    "max_tokens": 100,
+}
+
+
+def reject_requests(monkeypatch, provider: Provider, rejected: str = "") -> Provider:
+    """
+    Make a provider answer 400 Bad Request to requests with the rejected
+    key, or to every request if it is empty.
+    """
+    completions = provider.client.chat.completions
+    original = completions.create
+
+    async def create(**kwargs):
+        if not rejected or rejected in kwargs:
+            request = httpx.Request("POST", f"http://{provider.name}/v1/chat/completions")
+            response = httpx.Response(400, request=request)
+            raise BadRequestError(
+                f"{rejected or 'request'} is not supported", response=response, body=None
+            )
+        return await original(**kwargs)
+
+    monkeypatch.setattr(completions, "create", create)
+    return provider
+
+
+async def route(router: ProviderRouter, stage: str = "keywords", **overrides):
+    """Send a keyword-style request through the router for a stage."""
+    with llm_stage(stage):
+        return await router.chat.completions.create(**{**KEYWORD_REQUEST, **overrides})
+
+
+class TestProviderRouter:
+    """Test routing, failover and stage restrictions."""
+
+    @pytest.mark.asyncio
+    async def test_prefers_faster_provider(self):
+        """Test that traffic moves to the provider with lower rolling latency."""
+        registry = MetricsRegistry()
+        router = ProviderRouter(
+            [mock_provider("slow", latency=0.03), mock_provider("fast", latency=0.0)],
+            exploration=0.0,
+            registry=registry,
+        )
+
+        for _ in range(12):
+            await route(router)
+
+        # Each provider is measured once, then the fast one takes the rest
+        assert registry.counter("router.slow.calls") == 1
+        assert registry.counter("router.fast.calls") == 11
+        stats = router.stats()
+        assert stats["fast"]["keywords"]["latency"] < stats["slow"]["keywords"]["latency"]
+        await router.close()
+
+    @pytest.mark.asyncio
+    async def test_failover_and_cooldown(self):
+        """Test that a failing provider is ranked last and sits out a cooldown after a streak."""
+        registry = MetricsRegistry()
+        router = ProviderRouter(
+            [mock_provider("broken", error_rate=1.0), mock_provider("backup", latency=0.01)],
+            exploration=0.0,
+            registry=registry,
+        )
+
+        response = await route(router)
+        assert "Python" in response.choices[0].message.content
+        assert registry.counter("router.failovers") == 1
+
+        for _ in range(5):
+            await route(router)
+
+        # Having only failed, "broken" ranks behind the measured backup
+        assert registry.counter("router.broken.errors") == 1
+        assert [provider.name for provider in router.rank("keywords", KEYWORD_REQUEST)] == [
+            "backup",
+            "broken",
+        ]
+
+        router.exploration = 1.0
+        for _ in range(ROUTER_FAILURE_THRESHOLD - 1):
+            await route(router)
+        router.exploration = 0.0
+
+        # The streak opens the circuit, and "broken" stays last once it closes again
+        assert registry.counter("router.broken.errors") == ROUTER_FAILURE_THRESHOLD
+        assert router._open_until["broken"] > 0
+        router._open_until["broken"] = 0.0
+        assert router.rank("keywords", KEYWORD_REQUEST)[0].name == "backup"
+        await router.close()
+
+    @pytest.mark.asyncio
+    async def test_all_providers_failing(self):
+        """Test that the router raises once every provider failed."""
+        router = ProviderRouter(
+            [mock_provider("a", error_rate=1.0), mock_provider("b", error_rate=1.0)],
+            registry=MetricsRegistry(),
+        )
+
+        with pytest.raises(ProviderError):
+            await route(router)
+        await router.close()
+
+    @pytest.mark.asyncio
+    async def test_client_error_reaches_caller(self, monkeypatch):
+        """Test that a 400 is raised unchanged, without failover or cooldown."""
+        registry = MetricsRegistry()
+        router = ProviderRouter(
+            [
+                reject_requests(monkeypatch, mock_provider("strict")),
+                mock_provider("backup"),
+            ],
+            exploration=0.0,
+            registry=registry,
+        )
+
+        for _ in range(ROUTER_FAILURE_THRESHOLD + 1):
+            with pytest.raises(BadRequestError):
+                await route(router)
+
+        assert registry.counter("router.strict.errors") == 0
+        assert registry.counter("router.backup.calls") == 0
+        assert router.rank("keywords", KEYWORD_REQUEST)[0].name == "strict"
+        await router.close()
+
+    @pytest.mark.asyncio
+    async def test_revision_prediction_fallback_through_router(self, monkeypatch):
+        """Test that a provider rejecting predicted outputs still serves the revision."""
+        router = ProviderRouter(
+            [reject_requests(monkeypatch, mock_provider("strict"), rejected="prediction")],
+            registry=MetricsRegistry(),
+        )
+        generator = CoverLetterGenerator(router)
+
+        result = await generator.revise(STANDIN_LETTER, "Короче")
+
+        assert result.metadata["revision"]["predicted_output"] is False
+        assert generator.predicted_outputs is False
+        await router.close()
+
+    @pytest.mark.asyncio
+    async def test_cost_breaks_latency_ties(self):
+        """Test that a cheaper provider wins at similar latency."""
+        router = ProviderRouter(
+            [
+                mock_provider("premium", input_cost=5.0, output_cost=15.0),
+                mock_provider("budget", input_cost=0.1, output_cost=0.4),
+            ],
+            exploration=0.0,
+            registry=MetricsRegistry(),
+        )
+        for provider in router.providers:
+            router._record(provider, "cover_letter", 1.0, failed=False)
+
+        ranked = router.rank("cover_letter", {**KEYWORD_REQUEST, "max_tokens": 750})
+
+        assert ranked[0].name == "budget"
+        await router.close()
+
+    @pytest.mark.asyncio
+    async def test_generation_across_stage_restricted_providers(
+        self, sample_resume, sample_job_description
+    ):
+        """Test a streamed generation with a keywords-only provider."""
+        router = ProviderRouter(
+            [
+                mock_provider("local", stages=["keywords"]),
+                mock_provider("cloud", latency=0.01, model="remote-model"),
+            ],
+            exploration=0.0,
+            registry=MetricsRegistry(),
+        )
+        generator = CoverLetterGenerator(router, stream=True)
+
+        result = await generator.generate(sample_resume, sample_job_description)
+
+        assert result.cover_letter.startswith("Добрый день!")
+        stats = router.stats()
+        assert "cover_letter" not in stats["local"]
+        assert stats["cloud"]["cover_letter"]["calls"] == 1
+        await router.close()
+
+
+class TestProviderConfig:
+    """Test loading providers from JSON."""
+
+    def test_openai_provider_honours_base_url(self, monkeypatch):
+        """Test that the OpenAI provider uses OPENAI_BASE_URL and the shared timeout."""
+        monkeypatch.setenv("OPENAI_BASE_URL", "http://127.0.0.1:8000/v1")
+
+        provider = openai_provider("test-key")
+
+        assert str(provider.client.base_url).startswith("http://127.0.0.1:8000/v1")
+        assert provider.client.timeout == OPENAI_TIMEOUT
+
+    def test_load_providers(self, tmp_path):
+        """Test that each provider type is built with its options."""
+        config = tmp_path / "providers.json"
+        config.write_text(
+            json.dumps(
+                [
+                    {
+                        "name": "llama",
+                        "base_url": "http://127.0.0.1:8080/v1",
+                        "model": "qwen2.5-7b",
+                        "stages": ["keywords", "metadata"],
+                    },
+                    {"name": "mock", "type": "mock", "latency": 0.1, "output_cost": 1.0},
+                ]
+            )
+        )
+
+        llama, mock = load_providers(config)
+
+        assert llama.model == "qwen2.5-7b"
+        assert str(llama.client.base_url).startswith("http://127.0.0.1:8080/v1")
+        assert llama.client.timeout == OPENAI_TIMEOUT
+        assert llama.serves("keywords") and not llama.serves("cover_letter")
+        assert mock.name == "mock"
+        assert mock.output_cost == 1.0
@@ -0,0 +1,93 @@
+"""
+Tests for relevance-based resume block selection.
+"""
+
+from datetime import date
+
+from cover_letter.resume_selection import ResumeSelector, split_resume, tenure_months
+
+RESUME = """# Иван Иванов
+
+Frontend-разработчик.
+
+## Опыт работы
+
+**Alpha**, Москва
+Frontend Developer | Jan 2020 — Dec 2022
+- Разрабатывал интерфейсы на React и TypeScript
+- Настроил Redux и тестирование Jest
+
+**Beta**, Москва
+Backend Developer | Jan 2023 — Jun 2023
+- Писал сервисы на Go и PostgreSQL
+
+**Gamma**, Москва
+Data Analyst | Jan 2018 — Dec 2019
+- Строил отчёты в Excel и Power BI
+
+## Навыки
+
+React, TypeScript, Go
+"""
+
+VACANCY = "Ищем frontend-разработчика: React, TypeScript, Redux, Jest."
+
+
+class TestResumeSelection:
+    """Test resume splitting and block selection."""
+
+    def test_split_resume(self):
+        """Test that experience blocks are split by company headers."""
+        header, blocks, trailer = split_resume(RESUME)
+
+        assert header.endswith("## Опыт работы")
+        assert [block.splitlines()[0] for block in blocks] == [
+            "**Alpha**, Москва",
+            "**Beta**, Москва",
+            "**Gamma**, Москва",
+        ]
+        assert trailer.startswith("## Навыки")
+
+    def test_tenure_months(self):
+        """Test date range parsing, including open-ended ranges."""
+        assert tenure_months("Jan 2020 — Dec 2022") == 36
+        assert tenure_months("2019 — 2020") == 24
+        assert tenure_months("мая 2024 — настоящее время", today=date(2024, 7, 1)) == 3
+        assert tenure_months("no dates here") == 0
+
+    def test_selects_relevant_blocks_within_budget(self):
+        """Test that the most relevant block is kept and order is preserved."""
+        _, blocks, _ = split_resume(RESUME)
+        selector = ResumeSelector(token_budget=len(blocks[0]) // 2)
+
+        selection = selector.select(RESUME, VACANCY, ["React", "TypeScript"])
+
+        assert selection.applied
+        assert "**Alpha**" in selection.text
+        assert "**Beta**" not in selection.text
+        assert "## Навыки" in selection.text
+        assert selection.selected_tokens < selection.original_tokens
+        assert [block.selected for block in selection.blocks] == [True, False, False]
+
+    def test_keeps_blocks_named_in_instructions(self):
+        """Test that a short, irrelevant block named in the instructions is kept."""
+        _, blocks, _ = split_resume(RESUME)
+        selector = ResumeSelector(token_budget=len(blocks[0]) // 2)
+
+        by_company = selector.select(RESUME, VACANCY, ["React"], "Упомяни опыт в Beta")
+        by_title = selector.select(
+            RESUME, VACANCY, ["React"], "use only work experience from job title Backend Developer"
+        )
+
+        for selection in (by_company, by_title):
+            assert "**Beta**" in selection.text
+            assert "**Alpha**" in selection.text
+            assert [block.pinned for block in selection.blocks] == [False, True, False]
+
+    def test_short_resume_unchanged(self):
+        """Test that a resume within budget is returned as is."""
+        selection = ResumeSelector(token_budget=10_000).select(RESUME, VACANCY)
+
+        assert not selection.applied
+        assert selection.text == RESUME
+        assert all(block.selected for block in selection.blocks)
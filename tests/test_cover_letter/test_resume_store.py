@@ -0,0 +1,114 @@
+"""
+Tests for versioned resume storage.
+"""
+
+import json
+
+import pytest
+
+from cover_letter.resume_store import ResumeStore, ResumeStoreError
+
+
+@pytest.fixture
+def store(tmp_path):
+    """Resume store in a temporary directory."""
+    store = ResumeStore(tmp_path / "resumes.db")
+    yield store
+    store.close()
+
+
+def make_resume(revision: int) -> str:
+    """Long Cyrillic resume that differs only in one line per revision."""
+    lines = [f"- Разработка интерфейсов, проект {index}, React и TypeScript" for index in range(60)]
+    lines[30] = f"- Ревизия {revision}: улучшил производительность на {revision * 5}%"
+    return "# Иван Иванов\n\n## Опыт работы\n\n" + "\n".join(lines)
+
+
+class TestResumeStore:
+    """Test ResumeStore versions, deduplication and compression."""
+
+    def test_save_and_get_active(self, store):
+        """Test that the latest saved version is active."""
+        store.save("1", make_resume(1), "cv")
+        version = store.save("1", make_resume(2), "cv")
+
+        assert version.name == "cv-2"
+        assert store.get_active("1") == make_resume(2)
+        assert [v.name for v in store.list_versions("1")] == ["cv", "cv-2"]
+        assert store.get_active("2") is None
+
+    def test_switch_active_version(self, store):
+        """Test picking an older version."""
+        store.save("1", make_resume(1), "old")
+        store.save("1", make_resume(2), "new")
+
+        assert store.set_active("1", "old")
+        assert not store.set_active("1", "missing")
+        assert store.get_active("1") == make_resume(1)
+        assert [v.active for v in store.list_versions("1")] == [True, False]
+
+    def test_identical_upload_is_deduplicated(self, store):
+        """Test that re-uploading the same text re-activates the existing version."""
+        store.save("1", make_resume(1), "a")
+        store.save("1", make_resume(2), "b")
+        version = store.save("1", make_resume(1), "c")
+
+        assert version.name == "a"
+        assert len(store.list_versions("1")) == 2
+        assert store.size_report()["blobs"] == 2
+
+    def test_near_identical_revisions_are_delta_compressed(self, store):
+        """Test that a small revision is stored much smaller than the first version."""
+        first = store.save("1", make_resume(1))
+        second = store.save("1", make_resume(2))
+
+        assert first.stored_size < first.size
+        assert second.stored_size < first.stored_size / 4
+        assert store.get_active("1") == make_resume(2)
+
+    def test_prune_keeps_delta_bases_readable(self, tmp_path):
+        """Test that old versions are dropped without breaking newer ones."""
+        store = ResumeStore(tmp_path / "resumes.db", max_versions=3)
+        for revision in range(8):
+            store.save("1", make_resume(revision))
+
+        versions = store.list_versions("1")
+        assert len(versions) == 3
+        for version in versions:
+            assert store.set_active("1", version.name)
+            assert store.get_active("1").count("Ревизия") == 1
+        store.close()
+
+    def test_import_json_and_size_report(self, store, tmp_path):
+        """Test legacy import and the size comparison with resumes.json."""
+        legacy = tmp_path / "resumes.json"
+        legacy.write_text(json.dumps({"1": make_resume(1), "2": make_resume(2)}, indent=2))
+
+        assert store.import_json(legacy) == 2
+        report = store.size_report()
+
+        assert report["users"] == 2
+        assert report["legacy_json_bytes"] == legacy.stat().st_size
+        assert report["compressed_bytes"] < report["legacy_json_bytes"] / 10
+        stats = store.stats()
+        assert stats["users"] == 2 and stats["versions"] == 2
+        assert stats["compressed_bytes"] == report["compressed_bytes"]
+
+    def test_errors_are_wrapped(self, store):
+        """Test that database errors of every method surface as ResumeStoreError."""
+        store.close()
+
+        with pytest.raises(ResumeStoreError):
+            store.list_versions("1")
+        with pytest.raises(ResumeStoreError):
+            store.set_active("1", "resume")
+        with pytest.raises(ResumeStoreError):
+            store.stats()
+
+    def test_invalid_legacy_file(self, store, tmp_path):
+        """Test that a corrupt resumes.json raises ResumeStoreError."""
+        legacy = tmp_path / "resumes.json"
+        legacy.write_text("{not json")
+
+        with pytest.raises(ResumeStoreError):
+            store.import_json(legacy)
@@ -0,0 +1,116 @@
+"""
+Tests for incremental revision of a generated cover letter.
+"""
+
+import httpx
+import pytest
+from openai import AsyncOpenAI, BadRequestError
+
+from cover_letter import CoverLetterGenerator
+from cover_letter.generator import CoverLetterGenerationError
+from cover_letter.standin import STANDIN_LETTER, create_standin_app
+
+
+def bad_request(message: str) -> BadRequestError:
+    """A 400 error as raised by the OpenAI client."""
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    return BadRequestError(message, response=httpx.Response(400, request=request), body=None)
+
+
+class TestRevision:
+    """Test revise() against mocked and stand-in APIs."""
+
+    @pytest.mark.asyncio
+    async def test_sends_only_letter_and_instruction(
+        self, mock_openai_client, mock_response_builder, sample_resume, sample_job_description
+    ):
+        """Test that a revision is one call without resume or vacancy."""
+        letter = mock_response_builder.create_cover_letter_response().choices[0].message.content
+        mock_openai_client.chat.completions.create.return_value = (
+            mock_response_builder.create_cover_letter_response()
+        )
+        generator = CoverLetterGenerator(mock_openai_client)
+
+        result = await generator.revise(
+            letter, "Подчеркни опыт руководства", ["Python", "Kubernetes"], sample_resume
+        )
+
+        assert mock_openai_client.chat.completions.create.await_count == 1
+        request = mock_openai_client.chat.completions.create.call_args.kwargs
+        prompt = " ".join(message["content"] for message in request["messages"])
+        assert "Подчеркни опыт руководства" in prompt
+        assert "Мы предлагаем" not in prompt and "## Навыки" not in prompt
+        assert request["prediction"] == {"type": "content", "content": letter}
+        assert result.metadata["revision"]["predicted_output"] is True
+        assert result.keywords_found == 2
+        assert list(result.metadata["usage"]["stages"]) == ["revision"]
+
+    @pytest.mark.asyncio
+    async def test_prediction_rejected_falls_back(self, mock_openai_client, mock_response_builder):
+        """Test that a rejected prediction is retried without it and turned off."""
+        letter = mock_response_builder.create_cover_letter_response().choices[0].message.content
+        mock_openai_client.chat.completions.create.side_effect = [
+            bad_request("prediction is not supported"),
+            mock_response_builder.create_cover_letter_response(),
+            mock_response_builder.create_cover_letter_response(),
+        ]
+        generator = CoverLetterGenerator(mock_openai_client)
+
+        first = await generator.revise(letter, "Короче")
+        second = await generator.revise(letter, "Ещё короче")
+
+        calls = mock_openai_client.chat.completions.create.call_args_list
+        assert "prediction" in calls[0].kwargs
+        assert "prediction" not in calls[1].kwargs and "prediction" not in calls[2].kwargs
+        assert first.metadata["revision"]["predicted_output"] is False
+        assert second.metadata["revision"]["predicted_output"] is False
+
+    @pytest.mark.asyncio
+    async def test_model_without_predicted_outputs(self, mock_openai_client, mock_response_builder):
+        """Test that models without predicted outputs get a plain request."""
+        mock_openai_client.chat.completions.create.return_value = (
+            mock_response_builder.create_cover_letter_response()
+        )
+        generator = CoverLetterGenerator(mock_openai_client, model="gpt-3.5-turbo")
+
+        await generator.revise(STANDIN_LETTER, "Короче")
+
+        assert "prediction" not in mock_openai_client.chat.completions.create.call_args.kwargs
+
+    @pytest.mark.asyncio
+    async def test_too_short_revision(self, mock_openai_client, mock_response_builder):
+        """Test that an unusable revision raises instead of replacing the letter."""
+        mock_openai_client.chat.completions.create.return_value = (
+            mock_response_builder.create_response("Готово.")
+        )
+        generator = CoverLetterGenerator(mock_openai_client)
+
+        with pytest.raises(CoverLetterGenerationError):
+            await generator.revise(STANDIN_LETTER, "Короче")
+
+    @pytest.mark.asyncio
+    async def test_cheaper_than_regeneration(self, sample_resume, sample_job_description):
+        """Test revision token usage against a full regeneration on the stand-in."""
+        transport = httpx.ASGITransport(app=create_standin_app(latency=0))
+        client = AsyncOpenAI(
+            api_key="test",
+            base_url="http://standin/v1",
+            http_client=httpx.AsyncClient(transport=transport),
+        )
+        generator = CoverLetterGenerator(client, stream=True)
+
+        original = await generator.generate(sample_resume, sample_job_description)
+        regenerated = await generator.generate(
+            sample_resume, sample_job_description, special_requirements="Короче"
+        )
+        revised = await generator.revise(
+            original.cover_letter, "Короче", original.metadata["keywords"], sample_resume
+        )
+
+        regenerated_usage = regenerated.metadata["usage"]
+        revised_usage = revised.metadata["usage"]
+        assert revised_usage["calls"] == 1
+        assert revised_usage["prompt_tokens"] * 2 < regenerated_usage["prompt_tokens"]
+        assert revised.metadata["revision"]["accepted_prediction_tokens"] > 0
+        assert revised.metadata["total_keywords"] == len(original.metadata["keywords"]) > 0
+        await client.close()
@@ -0,0 +1,193 @@
+"""
+Tests for the serving mode: the OpenAI stand-in and the health endpoints.
+"""
+
+from unittest.mock import AsyncMock, Mock
+
+import httpx
+import pytest
+from openai import AsyncOpenAI
+
+import debug_server
+from cover_letter import CoverLetterGenerator
+from cover_letter.standin import STANDIN_KEYWORDS, create_standin_app
+
+
+def standin_client() -> AsyncOpenAI:
+    """OpenAI client talking to an in-process stand-in without latency."""
+    transport = httpx.ASGITransport(app=create_standin_app(latency=0))
+    return AsyncOpenAI(
+        api_key="test",
+        base_url="http://standin/v1",
+        http_client=httpx.AsyncClient(transport=transport),
+    )
+
+
+def debug_app_client() -> httpx.AsyncClient:
+    """HTTP client for the debug server app."""
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=debug_server.app), base_url="http://test"
+    )
+
+
+class TestStandin:
+    """Test the OpenAI stand-in server."""
+
+    @pytest.mark.asyncio
+    async def test_plain_completion(self):
+        """Test that analysis calls get keywords and honour n."""
+        client = standin_client()
+
+        response = await client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[{"role": "user", "content": "Извлеки ключевые слова"}],
+            n=2,
+        )
+
+        assert len(response.choices) == 2
+        assert response.choices[0].message.content == STANDIN_KEYWORDS
+        assert response.usage.completion_tokens > 0
+        await client.close()
+
+    @pytest.mark.asyncio
+    async def test_streamed_generation(self, sample_resume, sample_job_description):
+        """Test a full streamed generation against the stand-in."""
+        client = standin_client()
+        generator = CoverLetterGenerator(client, stream=True)
+
+        result = await generator.generate(sample_resume, sample_job_description)
+
+        assert result.cover_letter.startswith("Добрый день!")
+        assert result.metadata["keywords_found"] > 0
+        assert result.metadata["usage"]["completion_tokens"] > 0
+        await client.close()
+
+
+class TestHealth:
+    """Test liveness and readiness endpoints."""
+
+    @pytest.fixture(autouse=True)
+    def reset_readiness(self):
+        """Forget cached readiness results between tests."""
+        debug_server._readiness.update(checked_at=0.0, ready=False, error="")
+        yield
+        debug_server._readiness.update(checked_at=0.0, ready=False, error="")
+
+    @pytest.mark.asyncio
+    async def test_health(self):
+        """Test that liveness does not touch the API."""
+        async with debug_app_client() as client:
+            response = await client.get("/health")
+
+        assert response.status_code == 200
+        assert response.json()["status"] == "ok"
+
+    @pytest.mark.asyncio
+    async def test_ready(self, monkeypatch):
+        """Test that readiness probes the API and caches the result."""
+        openai_client = Mock()
+        openai_client.is_closed.return_value = False
+        openai_client.models.retrieve = AsyncMock()
+        monkeypatch.setattr(debug_server, "get_openai_client", lambda: openai_client)
+
+        async with debug_app_client() as client:
+            first = await client.get("/ready")
+            second = await client.get("/ready")
+
+        assert first.status_code == 200
+        assert first.json()["ready"] is True
+        assert second.status_code == 200
+        assert openai_client.models.retrieve.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_not_ready(self, monkeypatch):
+        """Test that a failing probe makes the worker unready."""
+        openai_client = Mock()
+        openai_client.is_closed.return_value = False
+        openai_client.models.retrieve = AsyncMock(side_effect=RuntimeError("unreachable"))
+        monkeypatch.setattr(debug_server, "get_openai_client", lambda: openai_client)
+
+        async with debug_app_client() as client:
+            response = await client.get("/ready")
+
+        assert response.status_code == 503
+        assert response.json()["error"] == "unreachable"
+
+
+class TestExperimentsEndpoint:
+    """Test limits on /experiments requests."""
+
+    @pytest.fixture
+    def runner(self, monkeypatch, tmp_path):
+        """Shared runner stand-in recording the concurrency of each run."""
+        runner = Mock(concurrency=4)
+        runner.run = AsyncMock(return_value=[])
+        monkeypatch.setattr(debug_server, "get_experiment_runner", lambda: runner)
+        monkeypatch.setattr(debug_server, "EXPERIMENTS_DIR", tmp_path / "experiments")
+        return runner
+
+    @pytest.mark.asyncio
+    async def test_concurrency_is_per_request_and_capped(self, runner):
+        """Test that concurrency goes to the run call, clamped, without touching the runner."""
+        body = {
+            "variants": [{"name": "base"}],
+            "cases": [{"name": "case", "resume": "Резюме", "job_description": "Вакансия"}],
+            "concurrency": 10_000,
+        }
+
+        async with debug_app_client() as client:
+            response = await client.post("/experiments", json=body)
+
+        assert response.status_code == 200
+        assert runner.run.await_args.args[2] == debug_server.EXPERIMENT_MAX_CONCURRENCY
+        assert runner.concurrency == 4
+
+    @pytest.mark.asyncio
+    async def test_cases_dir_outside_root_rejected(self, runner, tmp_path):
+        """Test that case folders outside EXPERIMENTS_DIR are refused."""
+        (tmp_path / "secret" / "resumes").mkdir(parents=True)
+        body = {"variants": [{"name": "base"}]}
+
+        async with debug_app_client() as client:
+            relative = await client.post("/experiments", json={**body, "cases_dir": "../secret"})
+            absolute = await client.post(
+                "/experiments", json={**body, "cases_dir": str(tmp_path / "secret")}
+            )
+
+        assert relative.status_code == absolute.status_code == 400
+        runner.run.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_duplicate_variant_names_rejected(self, runner):
+        """Test that two variants with one name are refused before running."""
+        body = {
+            "variants": [{"name": "base"}, {"name": "base", "temperature": 0.2}],
+            "cases": [{"name": "case", "resume": "Резюме", "job_description": "Вакансия"}],
+        }
+
+        async with debug_app_client() as client:
+            response = await client.post("/experiments", json=body)
+
+        assert response.status_code == 422
+        runner.run.assert_not_awaited()
+
+
+class TestGenerateEndpoint:
+    """Test request validation of /generate."""
+
+    @pytest.mark.asyncio
+    async def test_candidates_are_capped(self, monkeypatch):
+        """Test that asking for more completions than MAX_CANDIDATES is rejected."""
+        generator = Mock()
+        generator.generate = AsyncMock()
+        monkeypatch.setattr(debug_server, "get_generator", lambda: generator)
+        body = {"resume": "Резюме", "job_description": "Вакансия"}
+
+        async with debug_app_client() as client:
+            too_many = await client.post(
+                "/generate", json={**body, "candidates": debug_server.MAX_CANDIDATES + 1}
+            )
+            zero = await client.post("/generate", json={**body, "candidates": 0})
+
+        assert too_many.status_code == zero.status_code == 422
+        generator.generate.assert_not_awaited()
@@ -0,0 +1,128 @@
+"""
+Tests for single-flight coalescing of identical calls.
+"""
+
+import asyncio
+
+import pytest
+
+from cover_letter import CoverLetterGenerator
+from cover_letter.metrics import MetricsRegistry
+from cover_letter.singleflight import SingleFlight, make_key
+
+
+class TestSingleFlight:
+    """Test SingleFlight."""
+
+    def test_key_normalization(self):
+        """Test that whitespace and case differences map to the same key."""
+        assert make_key("op", "Python  Developer\n") == make_key("op", "python developer")
+        assert make_key("op", "a", "b") != make_key("op", "ab", "")
+        assert make_key("op", None) == make_key("op", "")
+
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_share_one_execution(self):
+        """Test that concurrent calls with one key run the function once."""
+        flight = SingleFlight(registry=MetricsRegistry())
+        executions = 0
+
+        async def work():
+            nonlocal executions
+            executions += 1
+            await asyncio.sleep(0.01)
+            return "result"
+
+        results = await asyncio.gather(*(flight.do("key", work) for _ in range(5)))
+
+        assert results == ["result"] * 5
+        assert executions == 1
+        assert flight.stats["coalesced"] == 4
+        assert flight.in_flight == 0
+
+    @pytest.mark.asyncio
+    async def test_errors_propagate_to_all_waiters(self):
+        """Test that a failing shared call raises in every waiter."""
+        flight = SingleFlight(registry=MetricsRegistry())
+
+        async def work():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        results = await asyncio.gather(
+            flight.do("key", work), flight.do("key", work), return_exceptions=True
+        )
+
+        assert all(isinstance(result, ValueError) for result in results)
+
+    @pytest.mark.asyncio
+    async def test_cancel_one_waiter_keeps_shared_call(self):
+        """Test that the shared call survives while other callers still wait."""
+        flight = SingleFlight(registry=MetricsRegistry())
+
+        async def work():
+            await asyncio.sleep(0.05)
+            return "done"
+
+        first = asyncio.create_task(flight.do("key", work))
+        second = asyncio.create_task(flight.do("key", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+
+        assert await second == "done"
+        assert first.cancelled()
+        assert flight.stats["cancelled"] == 0
+
+    @pytest.mark.asyncio
+    async def test_cancel_all_waiters_cancels_shared_call(self):
+        """Test that the shared call is aborted when every caller has gone."""
+        flight = SingleFlight(registry=MetricsRegistry())
+        started = asyncio.Event()
+        aborted = asyncio.Event()
+
+        async def work():
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                aborted.set()
+                raise
+
+        waiters = [asyncio.create_task(flight.do("key", work)) for _ in range(2)]
+        await started.wait()
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.sleep(0)
+
+        assert aborted.is_set()
+        assert flight.stats["cancelled"] == 1
+        assert flight.in_flight == 0
+
+
+class TestGeneratorCoalescing:
+    """Test coalescing inside CoverLetterGenerator."""
+
+    @pytest.mark.asyncio
+    async def test_duplicate_analysis_makes_one_set_of_calls(
+        self, mock_openai_client, mock_response_builder
+    ):
+        """Test that identical concurrent analyses share OpenAI calls."""
+
+        async def create(**kwargs):
+            await asyncio.sleep(0.01)
+            if "JSON" in kwargs["messages"][0]["content"]:
+                return mock_response_builder.create_response('{"position_title": "Dev"}')
+            return mock_response_builder.create_response("Python, Django, SQL")
+
+        mock_openai_client.chat.completions.create.side_effect = create
+        generator = CoverLetterGenerator(mock_openai_client)
+
+        first, second = await asyncio.gather(
+            generator.analyze_job_only("Python developer"),
+            generator.analyze_job_only("  python   DEVELOPER "),
+        )
+
+        assert first == second
+        assert first is not second
+        assert mock_openai_client.chat.completions.create.call_count == 2
+        assert generator.coalescing_stats["coalesced"] == 1
@@ -0,0 +1,91 @@
+"""
+Tests for the near-duplicate vacancy index.
+"""
+
+import pytest
+
+from cover_letter import CoverLetterGenerator
+from cover_letter.metrics import MetricsRegistry
+from cover_letter.vacancy_index import VacancyIndex, shingles
+
+VACANCY = """Компания: ТехКорп
+Ищем Python-разработчика в команду платформы данных.
+Задачи: разработка сервисов на Django и FastAPI, проектирование API,
+оптимизация запросов к PostgreSQL, участие в код-ревью.
+Требования: опыт коммерческой разработки от 3 лет, Docker, Kubernetes, Redis.
+Условия: удалённая работа, гибкий график, ДМС.
+Дата публикации: 12.05.2024"""
+
+# Same vacancy reposted with a new date and an extra salary line
+REPOSTED = VACANCY.replace("12.05.2024", "19.05.2024") + "\nЗарплата: от 250 000 руб."
+
+OTHER = """Компания: ДизайнЛаб
+Ищем продуктового дизайнера для мобильного приложения.
+Задачи: проектирование интерфейсов в Figma, развитие дизайн-системы,
+проведение исследований пользователей и юзабилити-тестов, прототипирование.
+Требования: портфолио мобильных продуктов, опыт работы с аналитикой."""
+
+
+class TestVacancyIndex:
+    """Test MinHash near-duplicate lookup."""
+
+    def test_shingles(self):
+        """Test word shingles are case-insensitive and ignore punctuation."""
+        assert shingles("Python, Django и FastAPI!", size=2) == {
+            "python django",
+            "django и",
+            "и fastapi",
+        }
+        assert shingles("") == set()
+
+    def test_near_duplicate_hit(self):
+        """Test that a reposted vacancy matches and a different one does not."""
+        index = VacancyIndex(registry=MetricsRegistry())
+        index.add(VACANCY, {"keywords": ["Python", "Django"]})
+
+        match = index.lookup(REPOSTED)
+
+        assert match is not None
+        assert match.similarity >= index.threshold
+        assert match.data == {"keywords": ["Python", "Django"]}
+        assert index.lookup(OTHER) is None
+        assert index.stats == {"lookups": 2, "hits": 1, "misses": 1}
+        assert index.hit_rate == 0.5
+
+    def test_threshold_and_namespace(self):
+        """Test that the threshold is configurable and namespaces are separate."""
+        strict = VacancyIndex(threshold=1.0, registry=MetricsRegistry())
+        strict.add(VACANCY, {"keywords": []}, namespace="a")
+
+        assert strict.lookup(VACANCY, namespace="a") is not None
+        assert strict.lookup(VACANCY, namespace="b") is None
+        assert strict.lookup(REPOSTED, namespace="a") is None
+
+    def test_eviction(self):
+        """Test that the oldest entries are evicted over the size limit."""
+        index = VacancyIndex(max_entries=1, registry=MetricsRegistry())
+        index.add(VACANCY, {"keywords": []})
+        index.add(OTHER, {"keywords": []})
+
+        assert len(index) == 1
+        assert index.lookup(VACANCY) is None
+        assert index.lookup(OTHER) is not None
+
+    @pytest.mark.asyncio
+    async def test_generator_reuses_keywords(self, mock_openai_client, mock_response_builder):
+        """Test that a reposted vacancy skips keyword extraction."""
+        mock_openai_client.chat.completions.create.side_effect = [
+            mock_response_builder.create_response("Python, Django, PostgreSQL"),
+            mock_response_builder.create_cover_letter_response(),
+            mock_response_builder.create_cover_letter_response(),
+        ]
+        generator = CoverLetterGenerator(mock_openai_client)
+        # A custom prompt skips the rule fix-up call
+        prompt = "Напиши сопроводительное письмо."
+
+        await generator.generate("Python developer", VACANCY, custom_system_prompt=prompt)
+        result = await generator.generate("Python developer", REPOSTED, custom_system_prompt=prompt)
+
+        assert mock_openai_client.chat.completions.create.call_count == 3
+        assert result.metadata["usage"]["reused"] == ["keywords"]
+        assert generator.vacancy_index.stats["hits"] == 1
@@ -0,0 +1,144 @@
+"""
+Tests for local cover letter validation.
+"""
+
+import pytest
+
+from cover_letter import CoverLetterGenerator, CoverLetterValidator
+from cover_letter.validator import extract_numbers
+
+
+def make_letter(body: str, words: int = 170) -> str:
+    """Pad a letter body with neutral words up to the given length."""
+    padding = max(words - len(body.split()), 0)
+    return body + " " + " ".join(["опыт"] * padding)
+
+
+class TestCoverLetterValidator:
+    """Test CoverLetterValidator rules."""
+
+    def test_valid_letter_passes(self):
+        """Test that a letter following all rules has no violations."""
+        letter = make_letter("Добрый день! Увеличила производительность на 45%.")
+        report = CoverLetterValidator().validate(letter, resume="производительность 45%")
+
+        assert report.passed
+        assert report.word_count == 170
+
+    def test_length_rule_severity(self):
+        """Test soft and hard length violations."""
+        validator = CoverLetterValidator()
+
+        slightly_long = validator.validate(make_letter("Добрый день!", 220))
+        far_too_long = validator.validate(make_letter("Добрый день!", 400))
+
+        assert [v.rule for v in slightly_long.violations] == ["length"]
+        assert not slightly_long.hard_violations
+        assert far_too_long.hard_violations[0].rule == "length"
+
+    def test_ya_sentences(self):
+        """Test detection of sentences starting with "Я"."""
+        validator = CoverLetterValidator()
+
+        assert not validator.validate(make_letter("Добрый день. Я разработчик.")).passed
+        assert not validator.validate(make_letter("Я разработчик.")).passed
+        assert validator.validate(make_letter("Мне и Яндексу это важно.")).passed
+
+    def test_forbidden_phrase_and_salary(self):
+        """Test forbidden opener and salary mentions."""
+        letter = make_letter("С интересом откликаюсь на вакансию. Ожидаемая зарплата обсуждается.")
+        rules = {v.rule for v in CoverLetterValidator().validate(letter).violations}
+
+        assert rules == {"forbidden_phrase", "no_salary"}
+
+    def test_numbers_must_come_from_resume(self):
+        """Test that numbers absent from the resume are reported."""
+        letter = make_letter("Сократила время деплоя на 60% и ускорила релизы в 3 раза.")
+        report = CoverLetterValidator().validate(letter, resume="деплой быстрее на 60%")
+
+        assert report.violations[0].rule == "numbers_from_resume"
+        assert "3" in report.violations[0].message
+        assert extract_numbers("1,5 года и 2.5 месяца") == {"1.5", "2.5"}
+
+    def test_numbers_from_vacancy_are_allowed(self):
+        """Test that versions and company names from the vacancy are not reported."""
+        letter = make_letter("Пишу на Python 3.12 и хочу поддерживать сервисы X5 в режиме 24/7.")
+        vacancy = "X5 Tech ищет Python 3.12 разработчика, дежурства 24/7"
+        validator = CoverLetterValidator()
+
+        assert validator.validate(letter, resume="Python", job_description=vacancy).passed
+        assert not validator.validate(letter, resume="Python").passed
+
+    def test_restated_numbers_are_soft(self):
+        """Test that tenure from resume dates passes and small restated numbers only warn."""
+        resume = "Backend-разработчик. Ускорила выгрузку вдвое, 40% экономии."
+        tenure = make_letter("Добрый день! Уже 5 лет пишу backend на Python.")
+        restated = make_letter("Добрый день! Ускорила выгрузку в 2 раза.")
+        invented = make_letter("Добрый день! Ускорила выгрузку в 2 раза и на 75%.")
+        validator = CoverLetterValidator()
+
+        assert validator.validate(tenure, "2019 - 2024 " + resume).passed
+        report = validator.validate(restated, resume)
+        assert [v.rule for v in report.violations] == ["numbers_from_resume"]
+        assert not report.hard_violations
+        hard = validator.validate(invented, resume).hard_violations
+        assert hard[0].message.endswith(": 75")
+
+
+class TestTargetedFixup:
+    """Test fix-up calls inside CoverLetterGenerator."""
+
+    @pytest.mark.asyncio
+    async def test_fixup_runs_only_on_hard_violation(
+        self, mock_openai_client, mock_response_builder
+    ):
+        """Test that a hard violation triggers one short fix-up call."""
+        broken = make_letter("С интересом откликаюсь на позицию Python.")
+        fixed = make_letter("Добрый день! Python - основной инструмент.")
+        mock_openai_client.chat.completions.create.side_effect = [
+            mock_response_builder.create_response("Python"),
+            mock_response_builder.create_response(broken),
+            mock_response_builder.create_response(fixed),
+        ]
+
+        generator = CoverLetterGenerator(mock_openai_client)
+        result = await generator.generate("Python", "Python developer")
+
+        fixup_call = mock_openai_client.chat.completions.create.call_args
+        fixup_prompt = fixup_call.kwargs["messages"][1]["content"]
+        assert result.cover_letter == fixed
+        assert result.metadata["fixup_applied"] is True
+        assert "с интересом откликаюсь" in fixup_prompt
+        assert "Python developer" not in fixup_prompt
+
+    @pytest.mark.asyncio
+    async def test_no_fixup_for_restated_tenure(self, mock_openai_client, mock_response_builder):
+        """Test that tenure computed from resume dates does not trigger a fix-up."""
+        letter = make_letter("Добрый день! Python - основной инструмент уже 6 лет.")
+        mock_openai_client.chat.completions.create.side_effect = [
+            mock_response_builder.create_response("Python"),
+            mock_response_builder.create_response(letter),
+        ]
+
+        generator = CoverLetterGenerator(mock_openai_client)
+        result = await generator.generate("2017 - 2023 Python-разработчик", "Python developer")
+
+        assert mock_openai_client.chat.completions.create.call_count == 2
+        assert result.metadata["fixup_applied"] is False
+
+    @pytest.mark.asyncio
+    async def test_no_fixup_for_valid_letter(self, mock_openai_client, mock_response_builder):
+        """Test that a valid letter is returned without extra calls."""
+        letter = make_letter("Добрый день! Python - основной инструмент.")
+        mock_openai_client.chat.completions.create.side_effect = [
+            mock_response_builder.create_response("Python"),
+            mock_response_builder.create_response(letter),
+        ]
+
+        generator = CoverLetterGenerator(mock_openai_client)
+        result = await generator.generate("Python", "Python developer")
+
+        assert mock_openai_client.chat.completions.create.call_count == 2
+        assert result.metadata["fixup_applied"] is False
+        assert result.metadata["violations"] == []
+        assert result.quality_score == 1.0